@@ -1,10 +1,21 @@
 import streamlit as st
 from dotenv import load_dotenv
 import os
+import uuid
 
 # Import the core logic modules
+from core.corpus import Corpus
+from core.fast_path import FastPathConfig
 from core.gemini_client import GeminiClient
-from core.qa_logic import format_prompt
+from core.ingestion import SUPPORTED_EXTENSIONS, IngestionPool, spool
+from core.memory import ConversationMemory, model_summarizer
+from core.response_cache import ResponseCache
+from core.qa_logic import answer_question
+from helpers.telemetry import Telemetry
+
+
+# Global singleton instance
+telemetry = Telemetry()
 
 
 def load_css(file_name: str):
@@ -25,9 +36,85 @@ def get_gemini_client():
     """
     Cached factory function for the GeminiClient.
     Using @st.cache_resource ensures we initialize the client
-    only once per session.
+    only once per session. The response cache is shared by all
+    sessions, so repeated questions about the same document are
+    answered without another API call.
+    """
+    return GeminiClient(response_cache=ResponseCache.from_env())
+
+
+@st.cache_resource
+def get_corpus():
+    """
+    Persistent document corpus shared by all sessions (SQLite + FTS5,
+    see `core.corpus`), each seeing only its owner's documents. Uploads
+    are indexed once and kept across restarts, so documents can be
+    picked again instead of re-uploaded.
+    """
+    return Corpus.from_env()
+
+
+def get_owner() -> str:
+    """
+    The token this user's documents are stored under in the shared corpus.
+    It is kept in the page's `?owner=` query parameter, so the same link
+    (or a bookmark of it) finds the documents again after a restart, while
+    other users, with other links, don't see or overwrite them.
     """
-    return GeminiClient()
+    owner = st.query_params.get("owner")
+    if not owner:
+        owner = st.query_params["owner"] = uuid.uuid4().hex
+    return owner
+
+
+@st.cache_resource
+def get_ingestion_pool():
+    """
+    Worker processes shared by all sessions that extract text from
+    uploads (`core.ingestion`), so large PDF/DOCX/HTML files don't block
+    the app while they are read.
+    """
+    return IngestionPool.from_env()
+
+
+def ingest_uploads(corpus: Corpus, uploads: list[tuple[str, str, str]]):
+    """
+    Extracts the text of new uploads in the ingestion pool, showing each
+    file's progress, and adds them to the corpus (and the selection).
+
+    Args:
+        corpus: The corpus to add the documents to.
+        uploads: (file name, spooled file path, content hash) triples;
+            the spooled files are deleted.
+    """
+    paths = {name: path for name, path, _ in uploads}
+    hashes = {name: doc_hash for name, _, doc_hash in uploads}
+    bars = {name: st.progress(0.0, text=f"Reading {name}...") for name in paths}
+
+    def show(progress):
+        bars[progress.name].progress(min(progress.fraction, 1.0),
+                                     text=f"Reading {progress.name}: {progress.chars:,} characters")
+
+    for name, future in get_ingestion_pool().extract_many(paths.items(), on_progress=show):
+        try:
+            document = future.result()
+            try:
+                if not document.chars:
+                    st.warning(f"No text found in {name}")
+                    continue
+                # Chunked and indexed once; a changed file only
+                # re-indexes the chunks that differ
+                corpus.ingest(name, document.read_text())
+            finally:
+                document.discard()
+            st.session_state.ingested[name] = hashes[name]
+            if name not in st.session_state.selected_docs:
+                st.session_state.selected_docs = st.session_state.selected_docs + [name]
+        except Exception as e:
+            st.error(f"Error reading {name}: {e}")
+        finally:
+            os.remove(paths[name])
+            bars[name].empty()
 
 
 def main():
@@ -37,6 +124,9 @@ def main():
     # Load environment variables from.env file [30]
     load_dotenv()
 
+    # Tracing/metrics are off unless TELEMETRY_ENABLED is set (see .env.example)
+    telemetry.configure_from_env()
+
     # Set page configuration [2]
     st.set_page_config(page_title="AI Document Analyst", layout="wide")
 
@@ -45,7 +135,7 @@ def main():
 
     # App title
     st.title("📄 AI Document Analyst")
-    st.markdown("Upload a document and ask questions about its content.")
+    st.markdown("Upload documents (they are kept for next time) and ask questions about their content.")
 
     # Get the cached Gemini client
     try:
@@ -59,30 +149,71 @@ def main():
     if "messages" not in st.session_state:
         st.session_state.messages = []
 
-    if "doc_context" not in st.session_state:
-        st.session_state.doc_context = None
+    # Recent turns verbatim, older ones as a summary that is built
+    # incrementally, so follow-ups work without prompts growing unbounded
+    if "memory" not in st.session_state:
+        st.session_state.memory = ConversationMemory.from_env(model_summarizer(client))
+
+    if "selected_docs" not in st.session_state:
+        st.session_state.selected_docs = []
+
+    if "chat_docs" not in st.session_state:
+        st.session_state.chat_docs = []
 
-    # --- Sidebar for File Upload ---
+    # Content hash of each file this session has already ingested
+    if "ingested" not in st.session_state:
+        st.session_state.ingested = {}
+
+    # Uploads already looked at (the uploader keeps returning them on every rerun)
+    if "seen_uploads" not in st.session_state:
+        st.session_state.seen_uploads = set()
+
+    # Only this user's documents: same-named uploads of others don't collide
+    corpus = get_corpus().scoped(get_owner())
+
+    # --- Sidebar for File Upload and Document Selection ---
     with st.sidebar:
-        st.header("Document Upload")
-        uploaded_file = st.file_uploader(
-            "Upload your text document",
-            type=["txt"],
-            accept_multiple_files=False
+        st.header("Documents")
+        uploaded_files = st.file_uploader(
+            "Upload your documents (text, HTML, DOCX or PDF)",
+            type=SUPPORTED_EXTENSIONS,
+            accept_multiple_files=True
         )
 
-        if uploaded_file is not None:
+        new_uploads = []
+        for uploaded_file in uploaded_files or []:
+            if uploaded_file.file_id in st.session_state.seen_uploads:
+                continue
+            st.session_state.seen_uploads.add(uploaded_file.file_id)
             try:
-                # Read and decode the file content
-                doc_bytes = uploaded_file.getvalue()
-                st.session_state.doc_context = doc_bytes.decode("utf-8")
+                # Copied to disk in chunks for the worker processes; only
+                # new or changed content is ingested (and selected)
+                uploaded_file.seek(0)
+                path, doc_hash = spool(uploaded_file)
+            except OSError as e:
+                st.error(f"Error reading {uploaded_file.name}: {e}")
+                continue
+            if st.session_state.ingested.get(uploaded_file.name) == doc_hash:
+                os.remove(path)
+            else:
+                new_uploads.append((uploaded_file.name, path, doc_hash))
+
+        if new_uploads:
+            ingest_uploads(corpus, new_uploads)
 
-                # Clear chat and notify user
-                st.session_state.messages = []
-                st.success("Document loaded successfully!")
-            except Exception as e:
-                st.error(f"Error reading file: {e}")
-                st.session_state.doc_context = None
+        available = [document.name for document in corpus.documents()]
+        st.session_state.selected_docs = [
+            name for name in st.session_state.selected_docs if name in available
+        ]
+        selected = st.multiselect("Documents to ask about", options=available, key="selected_docs")
+
+        if selected != st.session_state.chat_docs:
+            # Clear chat when the set of documents changes
+            st.session_state.chat_docs = list(selected)
+            st.session_state.messages = []
+            st.session_state.memory.reset()
+        if selected:
+            st.success(f"{len(selected)} document(s) selected")
 
     # --- Main Chat Interface ---
 
@@ -95,28 +226,40 @@ def main():
     if prompt := st.chat_input("Ask a question about your document..."):
 
         # 1. Check if a document has been uploaded
-        if st.session_state.doc_context is None:
-            st.error("Please upload a document first before asking questions.")
+        if not st.session_state.chat_docs:
+            st.error("Please upload or select a document first before asking questions.")
         else:
-            # 2. Add user message to history and display it
+            # 2. Add user message to history and display it; the earlier
+            # turns (compacted) are sent along for follow-up questions
+            history = st.session_state.memory.history(st.session_state.messages)
             st.session_state.messages.append({"role": "user", "content": prompt})
             with st.chat_message("user"):
                 st.markdown(prompt)
 
             # 3. Generate and display the assistant's response
-            with st.chat_message("assistant"):
+            with st.chat_message("assistant"), telemetry.request(), telemetry.span("request", source="app"):
                 try:
-                    # Format the prompt using our logic [7, 8]
-                    full_prompt = format_prompt(
-                        context=st.session_state.doc_context,
-                        query=prompt
-                    )
+                    selection = corpus.select(st.session_state.chat_docs)
 
-                    # Get the streaming response from the client [2]
-                    response_stream = client.get_streaming_response(full_prompt)
+                    # Format the prompt using our logic [7, 8]: only the most
+                    # relevant excerpts across the selected documents are sent
+                    # (the full text is read only when needed); selections larger
+                    # than the context window are answered map-reduce,
+                    # and confident FAQ matches locally if FAST_PATH is enabled
+                    response_stream = answer_question(
+                        client,
+                        context=None,
+                        query=prompt,
+                        index=selection,
+                        fast_path=FastPathConfig.from_env(),
+                        history=history,
+                        document_hash=selection.content_hash
+                    )
 
-                    # Use st.write_stream to display the response in real-time
-                    full_response = st.write_stream(response_stream)
+                    # Use st.write_stream to display the response in real-time;
+                    # this span covers generation plus rendering of the stream
+                    with telemetry.span("render_stream"):
+                        full_response = st.write_stream(response_stream)
 
                     # 4. Add the full assistant response to history
                     st.session_state.messages.append({
@@ -132,6 +275,10 @@ def main():
                         "content": error_message
                     })
 
+            # 5. Fold older turns into the summary in the background once the
+            # answer is shown; the next question's history waits for it
+            st.session_state.memory.compact_in_background(st.session_state.messages)
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
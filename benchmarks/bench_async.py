@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sequential vs. concurrent (asyncio) requests.
+
+Drives `AsyncModelRunner` against the local stand-in backend, whose
+responses take a fixed time, to show that N concurrent requests finish in roughly the
+latency of one request (per concurrency "wave") rather than the sum.
+
+Usage:
+    python benchmarks/bench_async.py --requests 20 --latency 0.5 --max-concurrency 8
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add parent directory to path to access project modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from core.async_client import AsyncModelRunner
+from core.backends import StandInBackend, StandInConfig
+
+
+async def consume(runner: AsyncModelRunner, model, prompt: str) -> str:
+    return "".join([chunk async for chunk in runner.stream(model, prompt)])
+
+
+async def run_sequential(runner, model, count: int):
+    for i in range(count):
+        await consume(runner, model, f"question {i}")
+
+
+async def run_concurrent(runner, model, count: int):
+    await asyncio.gather(*(consume(runner, model, f"question {i}") for i in range(count)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per stand-in response")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    config = StandInConfig(time_to_first_chunk_s=args.latency, inter_chunk_delay_s=0)
+    model = StandInBackend(config).create_model("stand-in")
+    runner = AsyncModelRunner(args.max_concurrency)
+
+    start = time.perf_counter()
+    asyncio.run(run_sequential(runner, model, args.requests))
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    asyncio.run(run_concurrent(runner, model, args.requests))
+    concurrent = time.perf_counter() - start
+
+    waves = -(-args.requests // args.max_concurrency)
+    print("Async client concurrency benchmark")
+    print("=" * 60)
+    print(f"  Requests: {args.requests}, latency: {args.latency}s, cap: {args.max_concurrency}")
+    print(f"  Sequential : {sequential:.2f}s (sum of latencies = {args.requests * args.latency:.2f}s)")
+    print(f"  Concurrent : {concurrent:.2f}s (ideal = {waves} x {args.latency}s = {waves * args.latency:.2f}s)")
+    print(f"  Peak in-flight requests: {runner.peak_in_flight}")
+    print(f"  Speedup: {sequential / concurrent:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Input tokens and time to first chunk of a question session, with and
+without upstream context caching.
+
+Asks the same questions about one large document (sent whole) twice
+against a stand-in that bills per input token and whose time to first
+chunk grows with the uncached prompt size:
+
+- `inline`: every request carries the document (the previous behaviour),
+- `cached`: the document is cached upstream on the first question
+  (`core.context_cache`); later requests send only the question and are
+  billed the cached-token rate for the document.
+
+Billed tokens are in uncached-token units, so they are proportional to cost.
+
+Usage:
+    python benchmarks/bench_context_cache.py
+    python benchmarks/bench_context_cache.py --size-kb 800 --questions 50 --cached-price 0.1
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Add parent directory to path to access project modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.common import make_document, make_queries, percentile, write_results
+from core.backends import StandInBackend, StandInConfig
+from core.context_cache import ContextCacheConfig
+from core.gemini_client import GeminiClient
+from core.model_cache import ModelSelectionCache
+from core.qa_logic import answer_question
+from core.tokens import estimate_tokens
+
+
+def run(mode: str, document: str, questions: list[str], model_cache, args) -> dict:
+    config = StandInConfig(time_to_first_chunk_s=args.ttfc, prefill_s_per_1k_tokens=args.prefill_per_1k,
+                           inter_chunk_delay_s=0.002, cached_token_price=args.cached_price)
+    backend = StandInBackend(config)
+    client = GeminiClient(model_cache=model_cache, backend=backend,
+                          context_cache=ContextCacheConfig(enabled=mode == "cached"))
+
+    first_chunks = []
+    start = time.perf_counter()
+    for question in questions:
+        asked = time.perf_counter()
+        stream = answer_question(client, document, question)
+        next(stream)
+        first_chunks.append((time.perf_counter() - asked) * 1000)
+        "".join(stream)
+    total_s = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "questions": len(questions),
+        "input_tokens": backend.input_tokens,
+        "cached_input_tokens": backend.cached_input_tokens,
+        "billed_input_tokens": round(backend.billed_input_tokens),
+        "ttfc_ms_first": round(first_chunks[0], 1),
+        "ttfc_ms_p50_rest": round(percentile(first_chunks[1:], 50), 1),
+        "ttfc_ms_p95_rest": round(percentile(first_chunks[1:], 95), 1),
+        "total_s": round(total_s, 2),
+        "caches_created": len(backend.caches),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-kb", type=int, default=400, help="Document size")
+    parser.add_argument("--questions", type=int, default=20, help="Questions in the session")
+    parser.add_argument("--ttfc", type=float, default=0.2, help="Stand-in time to first chunk (s)")
+    parser.add_argument("--prefill-per-1k", type=float, default=0.01,
+                        help="Stand-in extra TTFC per 1k uncached prompt tokens (s)")
+    parser.add_argument("--cached-price", type=float, default=0.25,
+                        help="Price of a cached input token relative to an uncached one")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "context_cache.json"))
+    args = parser.parse_args()
+
+    document = make_document(args.size_kb * 1024)
+    questions = make_queries(args.questions)
+
+    print(f"Context cache benchmark: {args.questions} questions, {estimate_tokens(document)}-token document")
+    print("=" * 60)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        model_cache = ModelSelectionCache(path=os.path.join(tmp, "models.json"))
+        # Resolve the model outside the measurements
+        GeminiClient(model_cache=model_cache, backend=StandInBackend(StandInConfig(time_to_first_chunk_s=0))).model
+        for mode in ("inline", "cached"):
+            row = run(mode, document, questions, model_cache, args)
+            results.append(row)
+            print(f"  {mode:<7} billed {row['billed_input_tokens']:>9} tok ({row['cached_input_tokens']:>9} cached)  "
+                  f"TTFC first {row['ttfc_ms_first']:>6.0f}ms, then p50 {row['ttfc_ms_p50_rest']:>6.0f}ms "
+                  f"p95 {row['ttfc_ms_p95_rest']:>6.0f}ms  total {row['total_s']:.1f}s")
+
+    inline, cached = results
+    print(f"\n✅ Caching billed {cached['billed_input_tokens'] / inline['billed_input_tokens']:.0%} of the inline "
+          f"input tokens; median time to first chunk {cached['ttfc_ms_p50_rest']:.0f}ms vs. "
+          f"{inline['ttfc_ms_p50_rest']:.0f}ms after the first question")
+
+    write_results(args.output, "context_cache", vars(args), results)
+    print(f"\n📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Prompt size and latency across a long conversation, with and without memory.
+
+Runs the same 50-turn conversation about one document three ways against a
+stand-in model whose time to first chunk grows with the prompt size:
+
+- `none`: every question is sent alone (the app's previous behaviour;
+  follow-ups can't be understood),
+- `full`: every earlier turn is sent verbatim (prompts grow each turn),
+- `memory`: `ConversationMemory` - recent turns verbatim, older ones
+  folded into a summary after each answer (off the answer's critical path).
+
+Reports prompt tokens and answer latency early and late in the
+conversation, plus the summary requests `memory` made and their time.
+
+Usage:
+    python benchmarks/bench_conversation.py
+    python benchmarks/bench_conversation.py --turns 100 --recent-tokens 1000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Add parent directory to path to access project modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.common import make_queries, percentile, write_results
+from core.backends import StandInBackend, StandInConfig
+from core.gemini_client import GeminiClient
+from core.memory import ConversationMemory, model_summarizer
+from core.model_cache import ModelSelectionCache
+from core.qa_logic import answer_question
+from core.tokens import estimate_tokens
+
+DATASET = os.path.join(os.path.dirname(__file__), "..", "tests", "data", "golden_qa_dataset.jsonl")
+STRATEGIES = ("none", "full", "memory")
+
+
+def run(strategy: str, document: str, questions: list[str], model_cache, args) -> dict:
+    config = StandInConfig(time_to_first_chunk_s=args.ttfc, prefill_s_per_1k_tokens=args.prefill_per_1k,
+                           inter_chunk_delay_s=0.002, response_chars=args.answer_chars)
+    backend = StandInBackend(config)
+    client = GeminiClient(model_cache=model_cache, backend=backend)
+    memory = ConversationMemory(model_summarizer(client), recent_tokens=args.recent_tokens,
+                                summary_tokens=args.summary_tokens)
+
+    prompt_tokens = []
+    stream = client.get_streaming_response
+
+    def recording_stream(prompt, **kwargs):
+        prompt_tokens.append(estimate_tokens(prompt))
+        return stream(prompt, **kwargs)
+
+    client.get_streaming_response = recording_stream
+    messages, latencies, turn_prompt_tokens, compact_s = [], [], [], 0.0
+    for question in questions:
+        history = {"none": [], "full": list(messages), "memory": memory.history(messages)}[strategy]
+        start = time.perf_counter()
+        answer = "".join(answer_question(client, document, question, history=history))
+        latencies.append((time.perf_counter() - start) * 1000)
+        turn_prompt_tokens.append(prompt_tokens[-1])
+        messages += [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+        if strategy == "memory":
+            start = time.perf_counter()
+            memory.compact(messages)
+            compact_s += time.perf_counter() - start
+
+    early, late = slice(0, 5), slice(-5, None)
+    return {
+        "strategy": strategy,
+        "turns": len(questions),
+        "prompt_tokens_first5": round(sum(turn_prompt_tokens[early]) / 5),
+        "prompt_tokens_last5": round(sum(turn_prompt_tokens[late]) / 5),
+        "prompt_tokens_max": max(turn_prompt_tokens),
+        "latency_ms_first5": round(sum(latencies[early]) / 5, 1),
+        "latency_ms_last5": round(sum(latencies[late]) / 5, 1),
+        "latency_ms_p50": round(percentile(latencies, 50), 1),
+        "upstream_requests": backend.requests,
+        "summary_requests": memory.compactions,
+        "summary_s_total": round(compact_s, 3),
+        "prompt_tokens_per_turn": turn_prompt_tokens,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50, help="Questions asked (each followed by an answer)")
+    parser.add_argument("--recent-tokens", type=int, default=2000)
+    parser.add_argument("--summary-tokens", type=int, default=400)
+    parser.add_argument("--answer-chars", type=int, default=800, help="Stand-in answer length")
+    parser.add_argument("--ttfc", type=float, default=0.1, help="Stand-in time to first chunk (s)")
+    parser.add_argument("--prefill-per-1k", type=float, default=0.05,
+                        help="Stand-in extra TTFC per 1k prompt tokens (s)")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "conversation.json"))
+    args = parser.parse_args()
+
+    with open(DATASET) as f:
+        document = json.loads(f.readline())["retrieval_context"]
+    questions = make_queries(args.turns)
+
+    print(f"Conversation benchmark: {args.turns} turns, {estimate_tokens(document)}-token document")
+    print("=" * 60)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        model_cache = ModelSelectionCache(path=os.path.join(tmp, "models.json"))
+        # Resolve the model outside the measurements
+        GeminiClient(model_cache=model_cache, backend=StandInBackend(StandInConfig(time_to_first_chunk_s=0))).model
+        for strategy in STRATEGIES:
+            row = run(strategy, document, questions, model_cache, args)
+            results.append(row)
+            print(f"  {strategy:<7} prompt {row['prompt_tokens_first5']:>5} -> {row['prompt_tokens_last5']:>5} tok "
+                  f"(max {row['prompt_tokens_max']:>5})  latency {row['latency_ms_first5']:>6.0f} -> "
+                  f"{row['latency_ms_last5']:>6.0f}ms  summaries {row['summary_requests']:>2} "
+                  f"({row['summary_s_total']:.2f}s, after answers)")
+
+    full, memory = results[1], results[2]
+    print(f"\n✅ Turn {args.turns}: memory prompt {memory['prompt_tokens_last5']} tok vs. "
+          f"{full['prompt_tokens_last5']} tok with the full history; latency "
+          f"{memory['latency_ms_last5']:.0f}ms vs. {full['latency_ms_last5']:.0f}ms")
+
+    write_results(args.output, "conversation", vars(args), results)
+    print(f"\n📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
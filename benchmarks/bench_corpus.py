@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Ingest throughput and query latency of the persistent SQLite/FTS5 corpus.
+
+Ingests several thousand generated documents into a fresh corpus, then
+measures re-ingesting them unchanged (a content-hash lookup each), an
+incremental update of a share of the documents (text appended: only the
+changed tail chunks are re-indexed) and `CorpusSelection.build_context`
+latency over the whole corpus and over small selections.
+
+Usage:
+    python benchmarks/bench_corpus.py
+    python benchmarks/bench_corpus.py --documents 5000 --document-kb 16
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add parent directory to path to access project modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.common import make_document, make_queries, percentile, peak_rss_mb, write_results
+from core.corpus import Corpus
+
+
+def query_latencies(corpus: Corpus, selections: list[list[str]], queries: list[str]) -> list[float]:
+    latencies = []
+    for names, query in zip(selections, queries):
+        start = time.perf_counter()
+        corpus.select(names).build_context(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=3000)
+    parser.add_argument("--document-kb", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=200, help="Documents per ingest transaction")
+    parser.add_argument("--update-share", type=float, default=0.01, help="Share of documents edited")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--selection-size", type=int, default=5)
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "corpus.json"))
+    args = parser.parse_args()
+
+    documents = [(f"doc-{i:05d}.txt", make_document(args.document_kb * 1024, seed=i)) for i in range(args.documents)]
+    total_mb = sum(len(text.encode("utf-8")) for _, text in documents) / (1024 * 1024)
+    names = [name for name, _ in documents]
+    queries = make_queries(args.queries)
+    rng = random.Random(11)
+
+    print(f"Corpus benchmark: {args.documents} documents, {total_mb:.1f} MB")
+    print("=" * 60)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.db")
+        corpus = Corpus(path)
+
+        start = time.perf_counter()
+        chunks = 0
+        for i in range(0, len(documents), args.batch):
+            chunks += sum(r.chunks_added for r in corpus.ingest_many(documents[i:i + args.batch]))
+        ingest_s = time.perf_counter() - start
+        row = {
+            "documents": args.documents, "corpus_mb": round(total_mb, 2), "chunks": chunks,
+            "ingest_s": round(ingest_s, 2),
+            "ingest_docs_per_s": round(args.documents / ingest_s, 1),
+            "ingest_mb_per_s": round(total_mb / ingest_s, 2),
+        }
+        print(f"  ingest      {row['ingest_docs_per_s']:>8.0f} docs/s  {row['ingest_mb_per_s']:>6.2f} MB/s  "
+              f"({chunks} chunks in {ingest_s:.1f}s)")
+
+        start = time.perf_counter()
+        results_unchanged = corpus.ingest_many(documents)
+        row["reingest_unchanged_s"] = round(time.perf_counter() - start, 3)
+        assert all(r.status == "unchanged" for r in results_unchanged)
+        print(f"  re-ingest   {row['reingest_unchanged_s']:>8.3f}s for all documents (unchanged)")
+
+        edited = rng.sample(documents, max(1, int(args.documents * args.update_share)))
+        updates = [(name, text + f"\n\nAddendum {name}: the refund window is now 45 days.\n") for name, text in edited]
+        start = time.perf_counter()
+        update_results = corpus.ingest_many(updates)
+        update_s = time.perf_counter() - start
+        row.update({
+            "updated_documents": len(updates),
+            "update_s": round(update_s, 3),
+            "update_chunks_kept": sum(r.chunks_kept for r in update_results),
+            "update_chunks_added": sum(r.chunks_added for r in update_results),
+        })
+        print(f"  update      {len(updates)} docs in {update_s * 1000:.0f}ms: "
+              f"{row['update_chunks_kept']} chunks kept, {row['update_chunks_added']} re-indexed")
+
+        everything = query_latencies(corpus, [names] * len(queries), queries)
+        small = query_latencies(corpus, [rng.sample(names, args.selection_size) for _ in queries], queries)
+        for label, latencies in (("all", everything), (f"select{args.selection_size}", small)):
+            row[f"query_{label}_ms_p50"] = round(percentile(latencies, 50), 2)
+            row[f"query_{label}_ms_p95"] = round(percentile(latencies, 95), 2)
+            print(f"  query {label:<8} p50 {row[f'query_{label}_ms_p50']:>7.2f}ms  "
+                  f"p95 {row[f'query_{label}_ms_p95']:>7.2f}ms")
+
+        corpus.close()
+        row["db_mb"] = round(sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp)) / (1024 * 1024), 1)
+        row["peak_rss_mb"] = round(peak_rss_mb(), 1)
+        results.append(row)
+
+    print(f"\n✅ {row['ingest_docs_per_s']:.0f} docs/s ingest, query p95 {row['query_all_ms_p95']:.1f}ms over "
+          f"{args.documents} documents (database {row['db_mb']} MB)")
+
+    write_results(args.output, "corpus", vars(args), results)
+    print(f"\n📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold vs. warm run of the DeepEval golden-dataset suite.
+
+Runs `tests/test_qa_evaluation.py` twice against a fresh evaluation cache:
+the cold run generates every output and judges every metric; the warm
+run should be served almost entirely from the cache.
+
+Requires GOOGLE_API_KEY (live API).
+
+Usage:
+    python benchmarks/bench_eval_suite.py --workers 8
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def run_suite(project_root: str, env: dict) -> tuple[float, int]:
+    """Runs the eval suite once and returns (wall-clock seconds, exit code)."""
+    cmd = [
+        sys.executable, "-m", "pytest", "-q", "-o", "addopts=",
+        os.path.join(project_root, "tests", "test_qa_evaluation.py"),
+    ]
+    start = time.perf_counter()
+    result = subprocess.run(cmd, cwd=project_root, env=env, check=False)
+    return time.perf_counter() - start, result.returncode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="EVAL_WORKERS for the generation phase")
+    args = parser.parse_args()
+
+    project_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            EVAL_WORKERS=str(args.workers),
+            EVAL_CACHE_PATH=os.path.join(tmp, "eval_cache.db"),
+        )
+        env.pop("EVAL_NO_CACHE", None)
+
+        cold_s, cold_code = run_suite(project_root, env)
+        warm_s, warm_code = run_suite(project_root, env)
+
+    print("DeepEval suite: cold vs. warm cache")
+    print("=" * 60)
+    print(f"  Cold run: {cold_s:.1f}s (exit code {cold_code})")
+    print(f"  Warm run: {warm_s:.1f}s (exit code {warm_code})")
+    if warm_s > 0:
+        print(f"  Speedup : {cold_s / warm_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Hit rate and latency of the local extractive fast path on the golden dataset.
+
+Every golden question is answered through `answer_question` with the fast
+path off, in `section` mode (only the matched section goes upstream) and
+in `answer` mode (confident matches are answered locally), against a
+stand-in model. Reports the hit rate, end-to-end latency, prompt size and
+upstream requests per mode, plus two offline quality checks of the local
+answers: every sentence must occur verbatim in the document (extractive
+faithfulness) and no question the document can't answer may be answered
+locally. The DeepEval metrics need an API key; run them with
+`FAST_PATH=answer uv run python tests/run_tests.py`.
+
+Usage:
+    python benchmarks/bench_fast_path.py
+    python benchmarks/bench_fast_path.py --threshold 0.5 --ttfc 0.8
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+# Add parent directory to path to access project modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.common import percentile, write_results
+from core.backends import StandInBackend, StandInConfig
+from core.fast_path import ANSWER, OFF, SECTION, FastPathConfig, get_answerer
+from core.gemini_client import GeminiClient
+from core.model_cache import ModelSelectionCache
+from core.qa_logic import answer_question
+from core.tokens import estimate_tokens
+
+DATASET = os.path.join(os.path.dirname(__file__), "..", "tests", "data", "golden_qa_dataset.jsonl")
+NOT_IN_DOCUMENT = "does not contain the answer"
+
+
+def is_verbatim(answer: str, document: str) -> bool:
+    """True if every sentence of the answer (minus a title prefix) occurs in the document."""
+    sentences = re.split(r"(?<=[.!?])\s+", answer)
+    normalized = " ".join(document.split())
+    return all(sentence.split(": ", 1)[-1] in normalized or sentence in normalized for sentence in sentences)
+
+
+def run_mode(mode: str, goldens: list[dict], model_cache, args) -> dict:
+    config = StandInConfig(time_to_first_chunk_s=args.ttfc, prefill_s_per_1k_tokens=args.prefill_per_1k,
+                           inter_chunk_delay_s=0.005)
+    backend = StandInBackend(config)
+    client = GeminiClient(model_cache=model_cache, backend=backend)
+    fast_path = FastPathConfig(mode=mode, threshold=args.threshold)
+
+    latencies, hits, local, prompt_tokens = [], 0, [], []
+    stream = client.get_streaming_response
+
+    def recording_stream(prompt, **kwargs):
+        prompt_tokens.append(estimate_tokens(prompt))
+        return stream(prompt, **kwargs)
+
+    client.get_streaming_response = recording_stream
+    for golden in goldens:
+        document = golden["retrieval_context"]
+        requests_before = backend.requests
+        start = time.perf_counter()
+        answer = "".join(answer_question(client, document, golden["input"], fast_path=fast_path))
+        latencies.append((time.perf_counter() - start) * 1000)
+        if mode != OFF and get_answerer(document, args.threshold).match(golden["input"]) is not None:
+            hits += 1
+            if backend.requests == requests_before:
+                local.append((golden, answer))
+
+    row = {
+        "mode": mode,
+        "questions": len(goldens),
+        "hit_rate": round(hits / len(goldens), 3),
+        "upstream_requests": backend.requests,
+        "latency_ms_p50": round(percentile(latencies, 50), 2),
+        "latency_ms_mean": round(sum(latencies) / len(latencies), 2),
+        "prompt_tokens_mean": round(sum(prompt_tokens) / len(prompt_tokens), 1) if prompt_tokens else 0,
+    }
+    if local:
+        row["local_answers"] = len(local)
+        row["local_verbatim"] = sum(is_verbatim(answer, golden["retrieval_context"]) for golden, answer in local)
+        row["local_on_unanswerable"] = sum(NOT_IN_DOCUMENT in golden["expected_output"] for golden, _ in local)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threshold", type=float, default=FastPathConfig().threshold)
+    parser.add_argument("--ttfc", type=float, default=0.4, help="Stand-in time to first chunk (s)")
+    parser.add_argument("--prefill-per-1k", type=float, default=0.05,
+                        help="Stand-in extra TTFC per 1k prompt tokens (s)")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "fast_path.json"))
+    args = parser.parse_args()
+
+    with open(DATASET) as f:
+        goldens = [json.loads(line) for line in f if line.strip()]
+
+    # Confidence of every question, for threshold tuning
+    scored = []
+    start = time.perf_counter()
+    for golden in goldens:
+        found = get_answerer(golden["retrieval_context"], args.threshold).score(golden["input"])
+        scored.append({"input": golden["input"], "confidence": found.confidence if found else 0.0,
+                       "answerable": NOT_IN_DOCUMENT not in golden["expected_output"]})
+    scoring_us = (time.perf_counter() - start) / len(goldens) * 1e6
+
+    print(f"Fast path benchmark: {len(goldens)} golden questions, threshold {args.threshold}")
+    print("=" * 60)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        model_cache = ModelSelectionCache(path=os.path.join(tmp, "models.json"))
+        # Resolve the model outside the measurements
+        GeminiClient(model_cache=model_cache, backend=StandInBackend(StandInConfig(time_to_first_chunk_s=0))).model
+        for mode in (OFF, SECTION, ANSWER):
+            row = run_mode(mode, goldens, model_cache, args)
+            results.append(row)
+            print(f"  {mode:<8} hit rate {row['hit_rate']:>5.0%}  upstream {row['upstream_requests']:>3}  "
+                  f"latency p50 {row['latency_ms_p50']:>7.1f}ms mean {row['latency_ms_mean']:>7.1f}ms  "
+                  f"prompt {row['prompt_tokens_mean']:>5.0f} tok")
+
+    answer = results[-1]
+    unanswerable = [s["confidence"] for s in scored if not s["answerable"]]
+    answerable = [s["confidence"] for s in scored if s["answerable"]]
+    print(f"\n  local scoring: {scoring_us:.0f}us/question")
+    print(f"  confidence: answerable min/max {min(answerable):.2f}/{max(answerable):.2f}, "
+          f"unanswerable max {max(unanswerable):.2f}")
+    print(f"  local answers verbatim in the document: {answer.get('local_verbatim', 0)}/{answer.get('local_answers', 0)}, "
+          f"given to unanswerable questions: {answer.get('local_on_unanswerable', 0)}")
+    print(f"\n✅ {answer['hit_rate']:.0%} answered locally; mean latency "
+          f"{results[0]['latency_ms_mean']:.0f}ms -> {answer['latency_ms_mean']:.0f}ms")
+
+    write_results(args.output, "fast_path", vars(args), results + [{"scoring_us": round(scoring_us, 1),
+                                                                    "confidences": scored}])
+    print(f"\n📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
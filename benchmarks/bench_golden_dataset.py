@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+File size, load time, memory and prompt formatting time of a large golden
+dataset, inline vs. deduplicated.
+
+Builds a `--rows` dataset from the golden rows (questions numbered to make
+them distinct, spread over `--contexts` documents), converts it with
+`tests/golden_dataset.py`, and measures:
+
+- `inline_json`: the previous loader, `json.loads` of every line into a list
+  (each row holds its own copy of its context),
+- `inline_stream`: `iter_goldens` over the inline file (copies dropped),
+- `dedup_stream`: `iter_goldens` over the deduplicated file,
+
+reporting the best of three load times and the memory the loaded rows
+retain (tracemalloc). Then formats every row's prompt with `format_prompt`
+and with one `ContextPrompter` per context.
+
+Usage:
+    python benchmarks/bench_golden_dataset.py
+    python benchmarks/bench_golden_dataset.py --rows 100000 --contexts 20
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add parent directory to path to access project modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+
+from benchmarks.common import write_results
+from core.qa_logic import ContextPrompter, format_prompt
+from golden_dataset import convert, iter_goldens
+
+DATASET = os.path.join(os.path.dirname(__file__), "..", "tests", "data", "golden_qa_dataset.jsonl")
+
+
+def build_inline(path: str, rows: int, contexts: int):
+    """Writes a `rows`-row inline dataset cycling the golden rows over `contexts` documents."""
+    with open(DATASET) as f:
+        goldens = [json.loads(line) for line in f if line.strip()]
+    with open(path, "w") as out:
+        for number in range(rows):
+            golden = goldens[number % len(goldens)]
+            variant = number % contexts
+            out.write(json.dumps({
+                "input": f"{golden['input']} (#{number})",
+                "retrieval_context": golden["retrieval_context"] + (f"\n\nRevision {variant}." if variant else ""),
+                "expected_output": golden["expected_output"],
+            }) + "\n")
+
+
+def load_inline_json(path: str) -> list[dict]:
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def measure(load, repeats: int = 3) -> tuple[float, float, list]:
+    """Returns (best seconds of `repeats` loads, MB retained by the result, the rows)."""
+    timings = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        rows = load()
+        timings.append(time.perf_counter() - start)
+        del rows
+    gc.collect()
+    tracemalloc.start()
+    rows = load()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return min(timings), retained / (1024 * 1024), rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="Dataset rows")
+    parser.add_argument("--contexts", type=int, default=1, help="Distinct contexts (documents)")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "golden_dataset.json"))
+    args = parser.parse_args()
+
+    print(f"Golden dataset benchmark: {args.rows} rows, {args.contexts} distinct context(s)")
+    print("=" * 60)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        inline_path = os.path.join(tmp, "inline.jsonl")
+        dedup_path = os.path.join(tmp, "dedup.jsonl")
+        build_inline(inline_path, args.rows, args.contexts)
+        start = time.perf_counter()
+        convert(inline_path, dedup_path)
+        convert_s = time.perf_counter() - start
+        sizes = {"inline": os.path.getsize(inline_path), "dedup": os.path.getsize(dedup_path)}
+        print(f"  File size: inline {sizes['inline'] / 1e6:.2f} MB, deduplicated {sizes['dedup'] / 1e6:.2f} MB "
+              f"(converted in {convert_s:.2f}s)")
+
+        loaders = {
+            "inline_json": lambda: load_inline_json(inline_path),
+            "inline_stream": lambda: list(iter_goldens(inline_path)),
+            "dedup_stream": lambda: list(iter_goldens(dedup_path)),
+        }
+        goldens = None
+        for name, load in loaders.items():
+            load_s, retained_mb, goldens = measure(load)
+            file_mb = sizes["dedup" if name.startswith("dedup") else "inline"] / 1e6
+            results.append({"mode": name, "rows": len(goldens), "file_mb": round(file_mb, 2),
+                            "load_s": round(load_s, 3), "retained_mb": round(retained_mb, 2)})
+            print(f"  {name:<14} load {load_s * 1000:>7.0f}ms  retained {retained_mb:>7.2f} MB")
+
+    # Prompt formatting for every row
+    start = time.perf_counter()
+    baseline = [format_prompt(golden["retrieval_context"], golden["input"]) for golden in goldens]
+    per_row_s = time.perf_counter() - start
+    start = time.perf_counter()
+    prompters = {}
+    reused = []
+    for golden in goldens:
+        prompter = prompters.get(golden["context_id"])
+        if prompter is None:
+            prompter = prompters[golden["context_id"]] = ContextPrompter(golden["retrieval_context"])
+        reused.append(prompter.format(golden["input"]))
+    prefix_s = time.perf_counter() - start
+    assert reused == baseline
+    results.append({"mode": "format_prompt", "rows": len(goldens), "format_s": round(per_row_s, 3)})
+    results.append({"mode": "context_prompter", "rows": len(goldens), "format_s": round(prefix_s, 3)})
+    print(f"  Prompts: format_prompt {per_row_s * 1000:.0f}ms, ContextPrompter {prefix_s * 1000:.0f}ms "
+          f"(identical prompts)")
+
+    before, after = results[0], results[2]
+    print(f"\n✅ Deduplicated: {sizes['dedup'] / sizes['inline']:.0%} of the file size, load "
+          f"{before['load_s'] * 1000:.0f}ms -> {after['load_s'] * 1000:.0f}ms, retained memory "
+          f"{before['retained_mb']:.1f} MB -> {after['retained_mb']:.1f} MB; prompt formatting "
+          f"{per_row_s / prefix_s:.1f}x faster with prefix reuse")
+
+    write_results(args.output, "golden_dataset", vars(args), results)
+    print(f"\n📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
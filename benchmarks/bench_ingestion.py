@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Throughput and peak memory of streaming document ingestion.
+
+Generates large text (UTF-8 and Windows-1252), HTML and DOCX inputs (and a
+PDF if pypdf is installed) and extracts each one:
+
+- `streaming`: `core.ingestion.extract_to_file` (chunked reads, incremental
+  decoding/parsing, text spooled to disk), as the ingestion pool runs it,
+- `whole-file`: the file read and decoded/parsed in one go, as the app
+  did with `getvalue()` + `decode()`.
+
+Each run happens in a fresh worker process, so its peak RSS is its own
+(the idle worker's RSS is reported for reference). Finally all inputs are
+extracted together through an `IngestionPool`, with progress relayed.
+
+Usage:
+    python benchmarks/bench_ingestion.py
+    python benchmarks/bench_ingestion.py --size-mb 100 --pdf-mb 10 --workers 4
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from xml.etree import ElementTree
+
+# Add parent directory to path to access project modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.common import make_document, write_results
+from core.ingestion import IngestionPool, extract_to_file
+
+MB = 1024 * 1024
+
+
+def _peak_rss_mb() -> float:
+    """Peak RSS of this process in MB (VmHWM on Linux: ru_maxrss survives exec,
+    so a spawned worker would report its parent's peak)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+
+def sections(size_bytes: int) -> list[str]:
+    # Some non-ASCII text, so the decoders have real work to do
+    text = make_document(size_bytes).replace("Policy", "Richtlinie für Rückerstattung", size_bytes // 4000)
+    return [section for section in text.split("\n\n") if section]
+
+
+def write_inputs(directory: str, size_mb: int, pdf_mb: int) -> dict[str, str]:
+    """Writes one input per format; returns {name: path}."""
+    parts = sections(size_mb * MB)
+    paths = {}
+
+    paths["utf8.txt"] = os.path.join(directory, "utf8.txt")
+    with open(paths["utf8.txt"], "w", encoding="utf-8") as f:
+        f.writelines(part + "\n\n" for part in parts)
+
+    paths["cp1252.txt"] = os.path.join(directory, "cp1252.txt")
+    with open(paths["cp1252.txt"], "w", encoding="cp1252", newline="\r\n") as f:
+        f.writelines(part + "\n\n" for part in parts)
+
+    paths["page.html"] = os.path.join(directory, "page.html")
+    with open(paths["page.html"], "w", encoding="utf-8") as f:
+        f.write("<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>FAQ</title>"
+                "<style>p { margin: 0 }</style></head><body>\n")
+        f.writelines(f"<div class=\"faq\"><p>{part}</p></div>\n" for part in parts)
+        f.write("</body></html>\n")
+
+    paths["report.docx"] = os.path.join(directory, "report.docx")
+    with zipfile.ZipFile(paths["report.docx"], "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", '<?xml version="1.0"?><Types/>')
+        with archive.open("word/document.xml", "w", force_zip64=True) as xml:
+            xml.write(b'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w='
+                      b'"http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>')
+            for part in parts:
+                xml.write(f"<w:p><w:pPr/><w:r><w:rPr/><w:t>{part}</w:t></w:r></w:p>".encode("utf-8"))
+            xml.write(b"<w:sectPr/></w:body></w:document>")
+
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        return paths
+    paths["scan.pdf"] = os.path.join(directory, "scan.pdf")
+    write_pdf(paths["scan.pdf"], sections(pdf_mb * MB))
+    return paths
+
+
+def write_pdf(path: str, parts: list[str], lines_per_page: int = 40):
+    """Writes a simple PDF: Helvetica text lines, `lines_per_page` per page."""
+    lines = [part[i:i + 90] for part in parts for i in range(0, len(part), 90)]
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+    first_page = 4
+    out, offsets = io.BytesIO(), []
+
+    def add(body: bytes):
+        offsets.append(out.tell())
+        out.write(f"{len(offsets)} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    out.write(b"%PDF-1.4\n")
+    add(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{first_page + 2 * i} 0 R" for i in range(len(pages)))
+    add(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    for number, page in enumerate(pages):
+        escaped = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in page]
+        stream = ("BT /F1 9 Tf 11 TL 40 760 Td " + " ".join(f"({line}) '" for line in escaped) + " ET")
+        stream = stream.encode("cp1252")
+        add(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {first_page + 2 * number + 1} 0 R >>".encode())
+        add(f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+    xref = out.tell()
+    out.write(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode())
+    out.write("".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode())
+    out.write(f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    with open(path, "wb") as f:
+        f.write(out.getvalue())
+
+
+def idle() -> float:
+    return _peak_rss_mb()
+
+
+def streaming(name: str, path: str, output_path: str) -> tuple[float, int, float]:
+    start = time.perf_counter()
+    document = extract_to_file(0, name, path, output_path)
+    return time.perf_counter() - start, document.chars, _peak_rss_mb()
+
+
+def whole_file(name: str, path: str) -> tuple[float, int, float]:
+    start = time.perf_counter()
+    if name.endswith(".txt"):
+        with open(path, "rb") as f:
+            data = f.read()
+        text = data.decode("utf-8" if name.startswith("utf8") else "cp1252")
+    elif name.endswith(".html"):
+        with open(path, "rb") as f:
+            data = f.read()
+        pieces = []
+        parser = HTMLParser()
+        parser.handle_data = pieces.append
+        parser.feed(data.decode("utf-8"))
+        text = "".join(pieces)
+    elif name.endswith(".docx"):
+        with zipfile.ZipFile(path) as archive:
+            root = ElementTree.fromstring(archive.read("word/document.xml"))
+        text = "\n\n".join("".join(t.text or "" for t in p.iter() if t.tag.endswith("}t"))
+                           for p in root.iter() if p.tag.endswith("}p"))
+    else:
+        from pypdf import PdfReader
+        text = "\n\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    return time.perf_counter() - start, len(text), _peak_rss_mb()
+
+
+def in_fresh_process(fn, *args):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, max_tasks_per_child=1) as executor:
+        return executor.submit(fn, *args).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=100, help="Size of the text, HTML and DOCX text")
+    parser.add_argument("--pdf-mb", type=int, default=10, help="Text in the PDF (pypdf is much slower)")
+    parser.add_argument("--workers", type=int, default=4, help="Ingestion pool size for the parallel run")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "ingestion.json"))
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        paths = write_inputs(tmp, args.size_mb, args.pdf_mb)
+        print(f"Ingestion benchmark: inputs written in {time.perf_counter() - start:.1f}s")
+        print("=" * 60)
+        baseline = in_fresh_process(idle)
+        print(f"  idle worker RSS: {baseline:.0f} MB")
+
+        for name, path in paths.items():
+            size_mb = os.path.getsize(path) / MB
+            stream_s, chars, stream_rss = in_fresh_process(streaming, name, path, os.path.join(tmp, "out.txt"))
+            whole_s, whole_chars, whole_rss = in_fresh_process(whole_file, name, path)
+            row = {
+                "input": name,
+                "size_mb": round(size_mb, 1),
+                "chars": chars,
+                "streaming_s": round(stream_s, 2),
+                "streaming_mb_per_s": round(size_mb / stream_s, 1),
+                "streaming_peak_rss_mb": round(stream_rss, 1),
+                "whole_file_s": round(whole_s, 2),
+                "whole_file_peak_rss_mb": round(whole_rss, 1),
+            }
+            results.append(row)
+            print(f"  {name:<12} {size_mb:>6.1f} MB  streaming {stream_s:>6.2f}s ({row['streaming_mb_per_s']:>5.1f} MB/s) "
+                  f"peak {stream_rss:>5.0f} MB  |  whole-file {whole_s:>6.2f}s peak {whole_rss:>6.0f} MB")
+
+        events = []
+        start = time.perf_counter()
+        with IngestionPool(max_workers=args.workers, spool_dir=tmp) as pool:
+            for _, future in pool.extract_many(paths.items(), on_progress=events.append):
+                future.result().discard()
+        parallel_s = time.perf_counter() - start
+        total_mb = sum(row["size_mb"] for row in results)
+        sequential_s = sum(row["streaming_s"] for row in results)
+        results.append({"pool_workers": args.workers, "pool_s": round(parallel_s, 2),
+                        "pool_mb_per_s": round(total_mb / parallel_s, 1), "sequential_s": round(sequential_s, 2),
+                        "progress_events": len(events), "baseline_rss_mb": round(baseline, 1)})
+        print(f"\n  pool ({args.workers} workers): {total_mb:.0f} MB in {parallel_s:.1f}s "
+              f"({total_mb / parallel_s:.0f} MB/s; {sequential_s:.1f}s one at a time), "
+              f"{len(events)} progress updates")
+
+    worst = max(results[:-1], key=lambda row: row["streaming_peak_rss_mb"])
+    print(f"\n✅ Peak worker memory while streaming: {worst['streaming_peak_rss_mb']:.0f} MB "
+          f"({worst['input']}) for inputs up to {max(row['size_mb'] for row in results[:-1]):.0f} MB")
+
+    write_results(args.output, "ingestion", vars(args), results)
+    print(f"\n📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: cost of a log call on the request path.
+
+Compares the previous setup (RotatingFileHandler + StreamHandler attached
+directly to the logger, so the calling thread formats and writes) with the
+queue-based setup in `helpers/logger.py` (the calling thread only enqueues;
+a listener thread formats JSON and writes). Reports per-call latency
+percentiles at several thread counts, plus records dropped under overload.
+
+The console handler writes to /dev/null in both setups so the numbers
+reflect logging overhead rather than terminal speed; a real terminal makes
+the direct setup slower still.
+
+Usage:
+    python benchmarks/bench_logging.py
+    python benchmarks/bench_logging.py --calls 50000 --threads 1 8
+"""
+import argparse
+import logging
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+# Add parent directory to path to access project modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.common import percentile, write_results
+from helpers.logger import BoundedQueueHandler, DrainingQueueListener, JsonFormatter
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def make_handlers(log_dir: str, json_file: bool) -> list[logging.Handler]:
+    """Builds the file + console handlers used by both setups."""
+    file_handler = RotatingFileHandler(
+        os.path.join(log_dir, "app.log"), maxBytes=10 * 1024 * 1024, backupCount=5
+    )
+    file_handler.setFormatter(JsonFormatter() if json_file else logging.Formatter(TEXT_FORMAT))
+    console_handler = logging.StreamHandler(open(os.devnull, "w"))
+    console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    return [file_handler, console_handler]
+
+
+def make_logger(name: str, handlers: list[logging.Handler]) -> logging.Logger:
+    logger = logging.getLogger(f"bench_logging.{name}")
+    logger.handlers = handlers
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def run_calls(logger: logging.Logger, calls: int, threads: int) -> list[float]:
+    """Logs `calls` messages per thread and returns per-call latencies in µs."""
+    samples: list[list[float]] = [[] for _ in range(threads)]
+
+    def worker(slot: int):
+        latencies = samples[slot]
+        for i in range(calls):
+            start = time.perf_counter()
+            logger.info(f"Streaming response chunk {i} for request {slot}")
+            latencies.append((time.perf_counter() - start) * 1e6)
+
+    workers = [threading.Thread(target=worker, args=(slot,)) for slot in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return [latency for latencies in samples for latency in latencies]
+
+
+def summarize(setup: str, threads: int, latencies: list[float], wall_s: float, dropped: int = 0) -> dict:
+    return {
+        "setup": setup,
+        "threads": threads,
+        "calls": len(latencies),
+        "us_p50": round(percentile(latencies, 50), 2),
+        "us_p99": round(percentile(latencies, 99), 2),
+        "us_max": round(max(latencies), 1),
+        "wall_s": round(wall_s, 3),
+        "dropped": dropped,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000, help="Log calls per thread")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--drop-policy", default="drop_new")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "logging.json"))
+    args = parser.parse_args()
+
+    print("Log call overhead on the request path")
+    print("=" * 60)
+    results = []
+    for threads in args.threads:
+        with tempfile.TemporaryDirectory() as tmp:
+            handlers = make_handlers(tmp, json_file=False)
+            logger = make_logger(f"direct{threads}", handlers)
+            start = time.perf_counter()
+            latencies = run_calls(logger, args.calls, threads)
+            results.append(summarize("direct", threads, latencies, time.perf_counter() - start))
+            for handler in handlers:
+                handler.close()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            handlers = make_handlers(tmp, json_file=True)
+            log_queue = queue.Queue(maxsize=args.queue_size)
+            queue_handler = BoundedQueueHandler(log_queue, args.drop_policy)
+            listener = DrainingQueueListener(log_queue, *handlers)
+            listener.start()
+            logger = make_logger(f"queued{threads}", [queue_handler])
+            start = time.perf_counter()
+            latencies = run_calls(logger, args.calls, threads)
+            wall_s = time.perf_counter() - start
+            listener.stop()  # drain outside the request-path measurement
+            results.append(summarize("queued", threads, latencies, wall_s, queue_handler.dropped))
+            for handler in handlers:
+                handler.close()
+
+        for row in results[-2:]:
+            print(
+                f"  {row['setup']:<7} threads={threads:<3} p50 {row['us_p50']:>7.2f}µs  "
+                f"p99 {row['us_p99']:>8.2f}µs  max {row['us_max']:>9.1f}µs  dropped {row['dropped']}"
+            )
+
+    write_results(args.output, "logging", vars(args), results)
+    print(f"\n📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
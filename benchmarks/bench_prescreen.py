@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Judge calls the local pre-screen saves on the golden dataset, and its speed.
+
+The DeepEval suite settles clear passes and fails with local lexical
+metrics (`tests/prescreen.py`) and sends only the rest to the LLM judges.
+Live answers need an API key, so this runs the pre-screen over the golden
+questions answered by offline stand-ins for a model:
+
+- `golden`: the expected answers themselves,
+- `fast_path`: the local extractive fast path (refusing when it has no match),
+- `refusal`: always the not-found message,
+- `other_row`: the expected answer of another question,
+- `off_topic`: an unrelated sentence,
+
+and reports, per answer set, how many rows pass, fail or go to the judges
+and the metric runs and judge LLM calls saved. The live suite logs the same
+numbers for real answers. Finally the whole dataset is repeated to `--rows`
+rows to time the one-pass scoring at scale.
+
+Usage:
+    python benchmarks/bench_prescreen.py
+    python benchmarks/bench_prescreen.py --rows 100000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+# Add parent directory to path to access project modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+
+from benchmarks.common import write_results
+from core.fast_path import get_answerer
+from core.gemini_client import NOT_FOUND_MESSAGE
+from prescreen import FAIL, JUDGE, JUDGE_CALLS_PER_METRIC, PASS, screen_dataset
+
+DATASET = os.path.join(os.path.dirname(__file__), "..", "tests", "data", "golden_qa_dataset.jsonl")
+METRIC_NAMES = list(JUDGE_CALLS_PER_METRIC)
+
+
+def answer_sets(goldens: list[dict]) -> dict:
+    """Builds each stand-in model's answers to the golden questions."""
+    expected = [golden["expected_output"] for golden in goldens]
+    fast_path = []
+    for golden in goldens:
+        found = get_answerer(golden["retrieval_context"]).match(golden["input"])
+        fast_path.append(found.answer if found is not None else NOT_FOUND_MESSAGE)
+    return {
+        "golden": expected,
+        "fast_path": fast_path,
+        "refusal": [NOT_FOUND_MESSAGE] * len(goldens),
+        "other_row": expected[1:] + expected[:1],
+        "off_topic": ["Penguins huddle together through the long Antarctic winter."] * len(goldens),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="Rows in the scale run")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "prescreen.json"))
+    args = parser.parse_args()
+
+    with open(DATASET) as f:
+        goldens = [json.loads(line) for line in f if line.strip()]
+    expected = [golden["expected_output"] for golden in goldens]
+    contexts = [golden["retrieval_context"] for golden in goldens]
+
+    print(f"Pre-screen benchmark: {len(goldens)} golden rows x {len(METRIC_NAMES)} LLM-judged metrics")
+    print("=" * 60)
+    results = []
+    for name, actual in answer_sets(goldens).items():
+        start = time.perf_counter()
+        screen = screen_dataset(actual, expected, contexts)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        metric_runs, judge_calls = screen.judge_calls_saved(METRIC_NAMES)
+        row = {
+            "answers": name,
+            "rows": len(goldens),
+            "passed": screen.count(PASS),
+            "failed": screen.count(FAIL),
+            "judged": screen.count(JUDGE),
+            "metric_runs_saved": metric_runs,
+            "judge_calls_saved": judge_calls,
+            "judge_calls_total": len(goldens) * sum(JUDGE_CALLS_PER_METRIC.values()),
+            "screen_ms": round(elapsed_ms, 2),
+        }
+        results.append(row)
+        print(f"  {name:<10} pass {row['passed']:>3}  fail {row['failed']:>3}  judge {row['judged']:>3}  "
+              f"saved {row['metric_runs_saved']:>3}/{len(goldens) * len(METRIC_NAMES)} metric runs, "
+              f"{row['judge_calls_saved']:>3}/{row['judge_calls_total']} judge calls  ({elapsed_ms:.1f}ms)")
+
+    # Scale run: every answer set, repeated to --rows rows
+    sets = list(answer_sets(goldens).values())
+    repeats = -(-args.rows // (len(goldens) * len(sets)))
+    actual = [answer for answers in sets for answer in answers] * repeats
+    start = time.perf_counter()
+    screen = screen_dataset(actual[:args.rows], (expected * len(sets) * repeats)[:args.rows],
+                            (contexts * len(sets) * repeats)[:args.rows])
+    scale_s = time.perf_counter() - start
+    results.append({"answers": "scale", "rows": args.rows, "judged": screen.count(JUDGE),
+                    "screen_ms": round(scale_s * 1000, 1), "rows_per_s": round(args.rows / scale_s)})
+    print(f"  scale      {args.rows} rows screened in {scale_s * 1000:.0f}ms ({args.rows / scale_s:,.0f} rows/s)")
+
+    golden_rows = [row for row in results if row["answers"] != "scale"]
+    saved = sum(row["judge_calls_saved"] for row in golden_rows)
+    total = sum(row["judge_calls_total"] for row in golden_rows)
+    print(f"\n✅ Pre-screen settled {sum(r['rows'] - r['judged'] for r in golden_rows)}/"
+          f"{sum(r['rows'] for r in golden_rows)} rows locally, saving {saved}/{total} judge calls ({saved / total:.0%})")
+
+    write_results(args.output, "prescreen", vars(args), results)
+    print(f"\n📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
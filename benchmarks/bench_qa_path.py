@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency benchmark for the QA request path.
+
+Drives `format_prompt` + `GeminiClient.get_streaming_response` (the same
+calls `app.py` makes) against the local stand-in backend, across document
+sizes, concurrency levels and context modes (full document vs. retrieval),
+and reports per scenario:
+
+  * time-to-first-chunk (TTFC) and total latency p50/p95/p99
+  * streamed chunks/sec per request and requests/sec overall
+  * prompt bytes
+  * peak RSS of the benchmark process (high-water mark, cumulative)
+
+Results are written as JSON so runs can be compared between commits:
+
+    python benchmarks/bench_qa_path.py --output benchmarks/results/before.json
+    ... change code ...
+    python benchmarks/bench_qa_path.py --output benchmarks/results/after.json \\
+        --compare benchmarks/results/before.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path to access project modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.common import make_document, make_queries, peak_rss_mb, percentile, write_results
+from core.backends import StandInBackend, StandInConfig
+from core.gemini_client import GeminiClient
+from core.model_cache import ModelSelectionCache
+from core.qa_logic import format_prompt
+from core.retrieval import DocumentIndex
+
+
+def run_request(client: GeminiClient, document: str, query: str, index) -> dict:
+    """Runs one question end to end and returns its timings."""
+    start = time.perf_counter()
+    prompt = format_prompt(document, query, index=index)
+    prompt_ready = time.perf_counter()
+
+    first_chunk = None
+    chunks = 0
+    for _ in client.get_streaming_response(prompt):
+        if first_chunk is None:
+            first_chunk = time.perf_counter()
+        chunks += 1
+    end = time.perf_counter()
+
+    first_chunk = first_chunk or end
+    streaming_s = end - first_chunk
+    return {
+        "format_s": prompt_ready - start,
+        "ttfc_s": first_chunk - start,
+        "total_s": end - start,
+        "chunks": chunks,
+        "chunks_per_s": (chunks - 1) / streaming_s if chunks > 1 and streaming_s > 0 else 0.0,
+        "prompt_bytes": len(prompt.encode("utf-8")),
+    }
+
+
+def run_scenario(client, document: str, queries: list[str], concurrency: int, index) -> dict:
+    """Runs all queries at the given concurrency and aggregates the timings."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = list(executor.map(lambda q: run_request(client, document, q, index), queries))
+    wall_s = time.perf_counter() - start
+
+    ttfc = [s["ttfc_s"] * 1000 for s in samples]
+    total = [s["total_s"] * 1000 for s in samples]
+    return {
+        "requests": len(samples),
+        "format_ms_p50": round(percentile([s["format_s"] * 1000 for s in samples], 50), 3),
+        "ttfc_ms_p50": round(percentile(ttfc, 50), 1),
+        "ttfc_ms_p95": round(percentile(ttfc, 95), 1),
+        "ttfc_ms_p99": round(percentile(ttfc, 99), 1),
+        "total_ms_p50": round(percentile(total, 50), 1),
+        "total_ms_p95": round(percentile(total, 95), 1),
+        "total_ms_p99": round(percentile(total, 99), 1),
+        "chunks_per_s": round(statistics.mean(s["chunks_per_s"] for s in samples), 1),
+        "requests_per_s": round(len(samples) / wall_s, 2),
+        "prompt_bytes": round(statistics.mean(s["prompt_bytes"] for s in samples)),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def scenario_key(row: dict) -> tuple:
+    return row["document_bytes"], row["concurrency"], row["mode"]
+
+
+def print_comparison(baseline_path: str, results: list[dict]):
+    """Prints p50/p95 latency deltas against a previous results file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {scenario_key(row): row for row in baseline["results"]}
+
+    print(f"\nComparison against {baseline_path} (commit {baseline.get('commit')})")
+    print("-" * 60)
+    for row in results:
+        old = previous.get(scenario_key(row))
+        if old is None:
+            continue
+        label = f"{row['document_bytes'] // 1024}KB c={row['concurrency']} {row['mode']}"
+        deltas = []
+        for metric in ("ttfc_ms_p50", "total_ms_p50", "total_ms_p95", "prompt_bytes"):
+            if old[metric]:
+                deltas.append(f"{metric} {100 * (row[metric] - old[metric]) / old[metric]:+.1f}%")
+        print(f"  {label:<28} " + ", ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[10, 100, 1024, 5120],
+                        help="Document sizes in KB")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--modes", nargs="+", choices=["full", "retrieval"], default=["full", "retrieval"])
+    parser.add_argument("--requests", type=int, default=32, help="Requests per scenario")
+    parser.add_argument("--ttfc", type=float, default=0.2, help="Stand-in base time-to-first-chunk (s)")
+    parser.add_argument("--prefill-per-1k", type=float, default=0.002,
+                        help="Stand-in extra TTFC per 1k prompt tokens (s)")
+    parser.add_argument("--inter-chunk", type=float, default=0.01, help="Stand-in delay between chunks (s)")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "qa_path.json"))
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    config = StandInConfig(
+        time_to_first_chunk_s=args.ttfc,
+        prefill_s_per_1k_tokens=args.prefill_per_1k,
+        inter_chunk_delay_s=args.inter_chunk,
+    )
+    queries = make_queries(args.requests)
+
+    print("QA request path benchmark (stand-in backend)")
+    print("=" * 60)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        client = GeminiClient(
+            model_cache=ModelSelectionCache(path=os.path.join(tmp, "models.json")),
+            backend=StandInBackend(config),
+        )
+        client.model  # resolve the model outside the measurements
+
+        for size_kb in args.sizes_kb:
+            document = make_document(size_kb * 1024)
+            index = DocumentIndex(document) if "retrieval" in args.modes else None
+            for mode in args.modes:
+                for concurrency in args.concurrency:
+                    row = {
+                        "document_bytes": len(document.encode("utf-8")),
+                        "concurrency": concurrency,
+                        "mode": mode,
+                    }
+                    row.update(run_scenario(
+                        client, document, queries, concurrency, index if mode == "retrieval" else None
+                    ))
+                    results.append(row)
+                    print(
+                        f"  {size_kb:>6}KB c={concurrency:<3} {mode:<9} "
+                        f"TTFC p50 {row['ttfc_ms_p50']:>7.1f}ms  "
+                        f"total p50/p95/p99 {row['total_ms_p50']:.0f}/{row['total_ms_p95']:.0f}/"
+                        f"{row['total_ms_p99']:.0f}ms  {row['requests_per_s']:>6.2f} req/s  "
+                        f"{row['prompt_bytes']:>9,} B  RSS {row['peak_rss_mb']:.0f}MB"
+                    )
+
+    write_results(args.output, "qa_path", vars(args), results)
+    print(f"\n📝 Results written to {args.output}")
+
+    if args.compare:
+        print_comparison(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Interactive latency and quota errors when sessions, a batch job and an
+evaluation run share one API key.
+
+A stand-in backend enforces a rolling-window request quota (429s beyond
+it, like the live API). Against it run at once:
+
+- `interactive`: a user asking a question every `--interactive-every` seconds,
+- `batch`: a batch job answering `--batch` questions with 8 workers,
+- `eval`: an evaluation run generating `--eval` answers with 8 workers,
+
+first uncoordinated (each client on its own, with the default retries),
+then through one shared `RateScheduler` with the same quota. Reports
+per-class errors, latency and queue wait, and the quota errors upstream.
+The quota window is shortened (`--window-s`) to keep the run short.
+
+Usage:
+    python benchmarks/bench_rate_scheduler.py
+    python benchmarks/bench_rate_scheduler.py --quota 60 --window-s 10 --batch 100 --eval 100
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path to access project modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.common import make_queries, percentile, write_results
+from core.backends import StandInBackend, StandInConfig
+from core.gemini_client import STREAMING_ERROR_MESSAGE, GeminiClient
+from core.model_cache import ModelSelectionCache
+from core.rate_scheduler import BATCH, EVAL, INTERACTIVE, PRIORITIES, RateScheduler, RateSchedulerConfig
+
+
+def run(mode: str, model_cache, args) -> list[dict]:
+    backend = StandInBackend(StandInConfig(time_to_first_chunk_s=args.ttfc, inter_chunk_delay_s=0.002,
+                                           quota_rpm=args.quota, quota_window_s=args.window_s))
+    scheduler = None
+    if mode == "scheduled":
+        scheduler = RateScheduler(RateSchedulerConfig(requests_per_minute=args.quota, window_s=args.window_s,
+                                                      quota_backoff_s=args.window_s / 6))
+    clients = {priority: GeminiClient(model_cache=model_cache, backend=backend, scheduler=scheduler,
+                                      priority=priority) for priority in PRIORITIES}
+    samples = {priority: [] for priority in PRIORITIES}
+
+    def ask(priority: str, question: str):
+        start = time.perf_counter()
+        answer = "".join(clients[priority].get_streaming_response(question))
+        samples[priority].append({"ok": answer != STREAMING_ERROR_MESSAGE, "s": time.perf_counter() - start})
+
+    def bulk(priority: str, count: int):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda q: ask(priority, q), make_queries(count, seed=len(priority))))
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=bulk, args=(BATCH, args.batch)),
+               threading.Thread(target=bulk, args=(EVAL, args.eval))]
+    for worker in workers:
+        worker.start()
+    # The user keeps asking while the bulk jobs run
+    for question in make_queries(args.interactive, seed=1):
+        ask(INTERACTIVE, question)
+        time.sleep(args.interactive_every)
+    for worker in workers:
+        worker.join()
+    wall_s = time.perf_counter() - start
+
+    rows = []
+    for priority in PRIORITIES:
+        latencies = [sample["s"] * 1000 for sample in samples[priority]]
+        stats = scheduler.stats[priority] if scheduler else None
+        rows.append({
+            "mode": mode,
+            "priority": priority,
+            "requests": len(latencies),
+            "errors": sum(not sample["ok"] for sample in samples[priority]),
+            "latency_ms_p50": round(percentile(latencies, 50), 1),
+            "latency_ms_p95": round(percentile(latencies, 95), 1),
+            "queue_wait_ms_mean": round(stats["wait_s_total"] / max(1, stats["admitted"]) * 1000, 1) if stats else 0.0,
+            "queue_wait_ms_max": round(stats["wait_s_max"] * 1000, 1) if stats else 0.0,
+            "upstream_quota_errors": backend.quota_errors,
+            "wall_s": round(wall_s, 2),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quota", type=float, default=30, help="Requests allowed per quota window")
+    parser.add_argument("--window-s", type=float, default=5.0, help="Quota window (60 upstream)")
+    parser.add_argument("--batch", type=int, default=40, help="Batch job questions")
+    parser.add_argument("--eval", type=int, default=40, help="Evaluation run questions")
+    parser.add_argument("--interactive", type=int, default=10, help="Questions the user asks")
+    parser.add_argument("--interactive-every", type=float, default=0.5, help="Pause between user questions (s)")
+    parser.add_argument("--ttfc", type=float, default=0.1, help="Stand-in time to first chunk (s)")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "rate_scheduler.json"))
+    args = parser.parse_args()
+
+    print(f"Rate scheduler benchmark: quota {args.quota:.0f} requests / {args.window_s}s, "
+          f"{args.batch} batch + {args.eval} eval + {args.interactive} interactive requests")
+    print("=" * 60)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        model_cache = ModelSelectionCache(path=os.path.join(tmp, "models.json"))
+        # Resolve the model outside the measurements
+        GeminiClient(model_cache=model_cache, backend=StandInBackend(StandInConfig(time_to_first_chunk_s=0))).model
+        for mode in ("uncoordinated", "scheduled"):
+            rows = run(mode, model_cache, args)
+            results += rows
+            print(f"  {mode} ({rows[0]['wall_s']:.1f}s, {rows[0]['upstream_quota_errors']} upstream 429s):")
+            for row in rows:
+                print(f"    {row['priority']:<12} errors {row['errors']:>3}/{row['requests']:<3} "
+                      f"latency p50 {row['latency_ms_p50']:>7.0f}ms p95 {row['latency_ms_p95']:>7.0f}ms  "
+                      f"queue wait mean {row['queue_wait_ms_mean']:>7.0f}ms max {row['queue_wait_ms_max']:>7.0f}ms")
+
+    before = {row["priority"]: row for row in results if row["mode"] == "uncoordinated"}
+    after = {row["priority"]: row for row in results if row["mode"] == "scheduled"}
+    print(f"\n✅ Interactive errors {before[INTERACTIVE]['errors']} -> {after[INTERACTIVE]['errors']}, "
+          f"p95 {before[INTERACTIVE]['latency_ms_p95']:.0f}ms -> {after[INTERACTIVE]['latency_ms_p95']:.0f}ms; "
+          f"upstream 429s {before[INTERACTIVE]['upstream_quota_errors']} -> "
+          f"{after[INTERACTIVE]['upstream_quota_errors']}")
+
+    write_results(args.output, "rate_scheduler", vars(args), results)
+    print(f"\n📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Tail-latency and error-rate benchmark for retries, hedging and failover.
+
+Runs the same question load through `GeminiClient.get_streaming_response`
+against a stand-in backend that injects latency spikes and transient
+errors, once per resilience policy:
+
+  * baseline:      one attempt, no hedging (the old behaviour)
+  * retries:       retries with backoff on transient errors
+  * retries+hedge: retries, plus a hedged request when the first chunk is late
+
+and an outage scenario where the selected model fails every request, with
+and without the circuit breaker failing over to the next model. Reports
+total latency p50/p95/p99, error rate and upstream requests (hedging and
+retries cost extra calls).
+
+Usage:
+    python benchmarks/bench_resilience.py
+    python benchmarks/bench_resilience.py --requests 400 --spike-rate 0.05 --error-rate 0.05
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path to access project modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.common import make_queries, percentile, write_results
+from core.backends import StandInBackend, StandInConfig
+from core.gemini_client import STREAMING_ERROR_MESSAGE, GeminiClient
+from core.model_cache import ModelSelectionCache
+from core.resilience import ResilienceConfig
+
+
+def run_request(client: GeminiClient, prompt: str) -> dict:
+    start = time.perf_counter()
+    chunks = list(client.get_streaming_response(prompt))
+    return {"ok": chunks != [STREAMING_ERROR_MESSAGE], "total_s": time.perf_counter() - start}
+
+
+def run_policy(name: str, resilience: ResilienceConfig, config: StandInConfig, model_cache,
+               queries: list[str], concurrency: int, outage: bool = False) -> dict:
+    """Runs every query once under one resilience policy."""
+    backend = StandInBackend(config)
+    client = GeminiClient(model_cache=model_cache, backend=backend, resilience=resilience)
+    if outage:
+        config.model_error_rates = {client.model_name: 1.0}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = list(executor.map(lambda q: run_request(client, q), queries))
+    wall_s = time.perf_counter() - start
+
+    total = [s["total_s"] * 1000 for s in samples]
+    return {
+        "policy": name,
+        "requests": len(samples),
+        "errors": sum(1 for s in samples if not s["ok"]),
+        "error_rate": round(sum(1 for s in samples if not s["ok"]) / len(samples), 4),
+        "upstream_requests": backend.requests,
+        "total_ms_p50": round(percentile(total, 50), 1),
+        "total_ms_p95": round(percentile(total, 95), 1),
+        "total_ms_p99": round(percentile(total, 99), 1),
+        "requests_per_s": round(len(samples) / wall_s, 1),
+        **client.caller.stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--ttfc", type=float, default=0.2, help="Stand-in time-to-first-chunk (s)")
+    parser.add_argument("--inter-chunk", type=float, default=0.005, help="Stand-in delay between chunks (s)")
+    parser.add_argument("--spike-rate", type=float, default=0.05, help="Share of requests hit by a spike")
+    parser.add_argument("--spike-s", type=float, default=3.0, help="Latency spike length (s)")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="Transient error rate")
+    parser.add_argument("--hedge-after", type=float, default=0.4, help="Hedge delay (s); ~p95 of normal TTFC")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "resilience.json"))
+    args = parser.parse_args()
+
+    def stand_in(**overrides) -> StandInConfig:
+        settings = dict(
+            time_to_first_chunk_s=args.ttfc, inter_chunk_delay_s=args.inter_chunk,
+            spike_rate=args.spike_rate, spike_s=args.spike_s, error_rate=args.error_rate, seed=args.seed,
+        )
+        settings.update(overrides)
+        return StandInConfig(**settings)
+
+    # Small backoff: the stand-in's errors are instantaneous, not overload
+    backoff = dict(backoff_base_s=0.05, backoff_max_s=0.5)
+    policies = [
+        ("baseline", ResilienceConfig(max_attempts=1), stand_in()),
+        ("retries", ResilienceConfig(max_attempts=3, **backoff), stand_in()),
+        ("retries+hedge", ResilienceConfig(max_attempts=3, hedge_after_s=args.hedge_after, **backoff), stand_in()),
+    ]
+    outage_policies = [
+        ("outage, no failover", ResilienceConfig(max_attempts=1, breaker_failure_threshold=10 ** 9),
+         stand_in(spike_rate=0.0, error_rate=0.0)),
+        ("outage, breaker failover", ResilienceConfig(max_attempts=3, breaker_failure_threshold=5, **backoff),
+         stand_in(spike_rate=0.0, error_rate=0.0)),
+    ]
+    queries = [f"{query} #{i}" for i, query in enumerate(make_queries(args.requests))]
+
+    print("Resilience benchmark (stand-in backend)")
+    print("=" * 60)
+    print(f"  {args.spike_rate:.0%} of requests spike by {args.spike_s}s, {args.error_rate:.0%} fail transiently\n")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        model_cache = ModelSelectionCache(path=os.path.join(tmp, "models.json"))
+        # Resolve the model outside the measurements
+        GeminiClient(model_cache=model_cache, backend=StandInBackend(stand_in(spike_rate=0.0, error_rate=0.0))).model
+
+        for outage, group in ((False, policies), (True, outage_policies)):
+            for name, resilience, config in group:
+                row = run_policy(name, resilience, config, model_cache, queries, args.concurrency, outage=outage)
+                results.append(row)
+                print(
+                    f"  {name:<26} p50/p95/p99 {row['total_ms_p50']:>5.0f}/{row['total_ms_p95']:>5.0f}/"
+                    f"{row['total_ms_p99']:>5.0f}ms  errors {row['error_rate']:>6.1%}  "
+                    f"upstream {row['upstream_requests']:>4}  retries {row['retries']:>3}  "
+                    f"hedges {row['hedges']:>3} (won {row['hedge_wins']})  failovers {row['failovers']}"
+                )
+
+    baseline, best = results[0], results[2]
+    if baseline["total_ms_p99"]:
+        change = 100 * (best["total_ms_p99"] - baseline["total_ms_p99"]) / baseline["total_ms_p99"]
+        print(f"\n✅ p99 {baseline['total_ms_p99']:.0f}ms -> {best['total_ms_p99']:.0f}ms ({change:+.0f}%), "
+              f"errors {baseline['error_rate']:.1%} -> {best['error_rate']:.1%}")
+
+    write_results(args.output, "resilience", vars(args), results)
+    print(f"\n📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
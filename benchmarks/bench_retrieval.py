@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark: full-document prompts vs. chunked retrieval prompts.
+
+Compares the prompt size and the local prompt-building latency of
+`format_prompt` with and without a `DocumentIndex`, on large text files.
+
+Usage:
+    python benchmarks/bench_retrieval.py                      # synthetic 1, 5, 10 MB documents
+    python benchmarks/bench_retrieval.py --sizes-mb 2 20
+    python benchmarks/bench_retrieval.py --file path/to/document.txt
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Add parent directory to path to access project modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.common import make_document, make_queries, write_results
+from core.qa_logic import format_prompt
+from core.retrieval import DEFAULT_TOKEN_BUDGET, DocumentIndex
+from core.tokens import estimate_tokens
+
+
+def time_calls(fn, queries: list[str]) -> tuple[list[float], list[int]]:
+    """Runs `fn` per query and returns per-call latencies (ms) and prompt sizes (bytes)."""
+    latencies = []
+    sizes = []
+    for query in queries:
+        start = time.perf_counter()
+        prompt = fn(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        sizes.append(len(prompt.encode("utf-8")))
+    return latencies, sizes
+
+
+def bench_document(label: str, text: str, queries: list[str], token_budget: int) -> dict:
+    """Benchmarks one document and returns a result row."""
+    start = time.perf_counter()
+    index = DocumentIndex(text)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    full_latencies, full_sizes = time_calls(lambda q: format_prompt(text, q), queries)
+    rag_latencies, rag_sizes = time_calls(
+        lambda q: format_prompt(text, q, index=index, token_budget=token_budget), queries
+    )
+
+    return {
+        "document": label,
+        "document_bytes": len(text.encode("utf-8")),
+        "chunks": len(index.chunks),
+        "index_build_ms": round(build_ms, 2),
+        "full_prompt_bytes": round(statistics.mean(full_sizes)),
+        "full_prompt_tokens_est": estimate_tokens(format_prompt(text, queries[0])),
+        "full_format_ms_p50": round(statistics.median(full_latencies), 3),
+        "retrieval_prompt_bytes": round(statistics.mean(rag_sizes)),
+        "retrieval_prompt_tokens_est": estimate_tokens(
+            format_prompt(text, queries[0], index=index, token_budget=token_budget)
+        ),
+        "retrieval_format_ms_p50": round(statistics.median(rag_latencies), 3),
+        "prompt_reduction_x": round(statistics.mean(full_sizes) / statistics.mean(rag_sizes), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 5, 10],
+                        help="Synthetic document sizes in MB")
+    parser.add_argument("--file", action="append", default=[], help="Benchmark a real text file (repeatable)")
+    parser.add_argument("--queries", type=int, default=50, help="Number of questions per document")
+    parser.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries)
+    documents = [(f"synthetic-{size:g}MB", make_document(int(size * 1024 * 1024))) for size in args.sizes_mb]
+    for path in args.file:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            documents.append((os.path.basename(path), f.read()))
+
+    print("Retrieval vs. full-document prompt benchmark")
+    print("=" * 60)
+    results = []
+    for label, text in documents:
+        row = bench_document(label, text, queries, args.token_budget)
+        results.append(row)
+        print(f"\n📄 {label} ({row['document_bytes']:,} bytes, {row['chunks']:,} chunks)")
+        print(f"  Index build (once per upload): {row['index_build_ms']:.1f} ms")
+        print(f"  Full document : {row['full_prompt_bytes']:>12,} bytes/prompt, "
+              f"format p50 {row['full_format_ms_p50']:.3f} ms")
+        print(f"  Retrieval     : {row['retrieval_prompt_bytes']:>12,} bytes/prompt, "
+              f"format p50 {row['retrieval_format_ms_p50']:.3f} ms")
+        print(f"  Prompt size reduction: {row['prompt_reduction_x']}x")
+
+    if args.output:
+        write_results(args.output, "retrieval", vars(args), results)
+        print(f"\n📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
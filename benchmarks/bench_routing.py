@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Fixed vs. adaptive model routing on a stand-in with uneven model latency.
+
+Each fallback model gets its own time-to-first-chunk (the resolved model
+is the slowest; a lighter one is fast), plus a prefill cost per prompt
+token. A mix of short and long prompts is sent through
+`GeminiClient.get_streaming_response` with fixed routing (resolved model,
+then the fallback list) and with the adaptive `ModelRouter`. Halfway
+through, the fast model starts failing, to show the router moving away
+from it. Reports TTFC p50/p95 per prompt size, error rate and where
+requests went, and exports the adaptive run's decisions as JSON lines.
+
+Usage:
+    python benchmarks/bench_routing.py
+    python benchmarks/bench_routing.py --requests 400 --concurrency 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path to access project modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.common import make_document, make_queries, percentile, write_results
+from core.backends import StandInBackend, StandInConfig
+from core.gemini_client import STREAMING_ERROR_MESSAGE, GeminiClient
+from core.model_cache import ModelSelectionCache
+from core.model_router import ModelRouter, RouterConfig
+from core.qa_logic import format_prompt
+from core.resilience import ResilienceConfig
+
+MODEL_TTFC_S = {
+    "models/gemini-2.5-flash-preview-05-20": 0.40,
+    "gemini-1.5-flash": 0.12,
+    "gemini-1.5-flash-002": 0.25,
+    "gemini-1.5-flash-latest": 0.30,
+    "gemini-pro": 0.60,
+}
+FLAKY_MODEL = "gemini-1.5-flash"
+
+
+def run_request(client: GeminiClient, prompt: str) -> dict:
+    start = time.perf_counter()
+    first_chunk = None
+    chunks = []
+    for chunk in client.get_streaming_response(prompt):
+        if first_chunk is None:
+            first_chunk = time.perf_counter()
+        chunks.append(chunk)
+    end = time.perf_counter()
+    return {"ok": chunks != [STREAMING_ERROR_MESSAGE], "ttfc_s": (first_chunk or end) - start}
+
+
+def run_mode(mode: str, prompts: list[tuple[str, str]], model_cache, args, export_path: str) -> dict:
+    config = StandInConfig(
+        time_to_first_chunk_s=0.3, prefill_s_per_1k_tokens=args.prefill_per_1k, inter_chunk_delay_s=0.002,
+        model_time_to_first_chunk_s=dict(MODEL_TTFC_S), seed=args.seed,
+    )
+    router = ModelRouter(RouterConfig(window=20, short_prompt_tokens=args.short_tokens)) if mode == "adaptive" else None
+    client = GeminiClient(model_cache=model_cache, backend=StandInBackend(config),
+                          resilience=ResilienceConfig(max_attempts=2, backoff_base_s=0.02), router=router)
+
+    samples = []
+    half = len(prompts) // 2
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for phase, batch in enumerate((prompts[:half], prompts[half:])):
+            if phase == 1:
+                # The fast model degrades halfway through
+                config.model_error_rates = {FLAKY_MODEL: 0.5}
+            results = executor.map(lambda item: (item[0], run_request(client, item[1])), batch)
+            samples.extend(results)
+
+    row = {"mode": mode, "requests": len(samples),
+           "error_rate": round(sum(1 for _, s in samples if not s["ok"]) / len(samples), 4)}
+    for size in ("short", "long"):
+        ttfc = [s["ttfc_s"] * 1000 for kind, s in samples if kind == size]
+        row[f"{size}_ttfc_ms_p50"] = round(percentile(ttfc, 50), 1)
+        row[f"{size}_ttfc_ms_p95"] = round(percentile(ttfc, 95), 1)
+    if router is not None:
+        row["served_by"] = dict(Counter(d.served_by for d in router.decisions))
+        row["served_by_after_degradation"] = dict(Counter(d.served_by for d in list(router.decisions)[half:]))
+        router.export_decisions(export_path)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--long-share", type=float, default=0.3, help="Share of long (large-document) prompts")
+    parser.add_argument("--long-document-kb", type=int, default=64)
+    parser.add_argument("--short-tokens", type=int, default=2000, help="Router short-prompt threshold")
+    parser.add_argument("--prefill-per-1k", type=float, default=0.01,
+                        help="Stand-in extra TTFC per 1k prompt tokens (s)")
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "routing.json"))
+    args = parser.parse_args()
+
+    short_document = make_document(2 * 1024)
+    long_document = make_document(args.long_document_kb * 1024)
+    queries = make_queries(args.requests)
+    every_long = max(1, round(1 / args.long_share)) if args.long_share else 0
+    prompts = []
+    for i, query in enumerate(queries):
+        kind = "long" if every_long and i % every_long == 0 else "short"
+        document = long_document if kind == "long" else short_document
+        prompts.append((kind, format_prompt(document, f"{query} #{i}")))
+
+    export_path = os.path.join(os.path.dirname(args.output) or ".", "routing_decisions.jsonl")
+    print("Model routing benchmark (stand-in backend)")
+    print("=" * 60)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        model_cache = ModelSelectionCache(path=os.path.join(tmp, "models.json"))
+        # Resolve the model outside the measurements
+        GeminiClient(model_cache=model_cache, backend=StandInBackend(StandInConfig(time_to_first_chunk_s=0))).model
+        for mode in ("fixed", "adaptive"):
+            row = run_mode(mode, prompts, model_cache, args, export_path)
+            results.append(row)
+            print(f"  {mode:<9} short TTFC p50/p95 {row['short_ttfc_ms_p50']:>5.0f}/{row['short_ttfc_ms_p95']:>5.0f}ms  "
+                  f"long TTFC p50/p95 {row['long_ttfc_ms_p50']:>5.0f}/{row['long_ttfc_ms_p95']:>5.0f}ms  "
+                  f"errors {row['error_rate']:.1%}")
+            if "served_by" in row:
+                print(f"            served by: {row['served_by']}")
+                print(f"            after degradation: {row['served_by_after_degradation']}")
+
+    fixed, adaptive = results
+    change = 100 * (adaptive["short_ttfc_ms_p50"] - fixed["short_ttfc_ms_p50"]) / fixed["short_ttfc_ms_p50"]
+    print(f"\n✅ Short-prompt TTFC p50 {fixed['short_ttfc_ms_p50']:.0f}ms -> "
+          f"{adaptive['short_ttfc_ms_p50']:.0f}ms ({change:+.0f}%)")
+
+    write_results(args.output, "routing", vars(args), results)
+    print(f"\n📝 Results written to {args.output} (decisions: {export_path})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Load test for the HTTP API (`core/server.py`) against the stand-in backend.
+
+Starts the server as a subprocess (GEMINI_BACKEND=standin, so no API key is
+needed), uploads one document, then runs closed-loop SSE clients at each
+concurrency level for a fixed duration. Reports requests/sec with TTFC and
+total latency percentiles, and the highest throughput whose p95 latency
+stays within the `--slo-ms` target ("requests/sec at fixed latency").
+
+Usage:
+    python benchmarks/bench_server.py
+    python benchmarks/bench_server.py --workers 1 4 --concurrency 8 32 128 --duration 10
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+# Add parent directory to path to access project modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.common import make_document, make_queries, percentile, write_results
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+# Shared across levels and runs so no question is ever repeated
+_question_ids = itertools.count()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int, tmp: str, args) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        GEMINI_BACKEND="standin",
+        STANDIN_TTFC=str(args.ttfc),
+        STANDIN_INTER_CHUNK=str(args.inter_chunk),
+        GEMINI_MAX_CONCURRENCY=str(args.max_concurrency),
+        GEMINI_MODEL_CACHE_PATH=os.path.join(tmp, "models.json"),
+        DOCUMENT_STORE_DIR=os.path.join(tmp, "documents"),
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "core.server", "--port", str(port), "--workers", str(workers)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_until_ready(session: aiohttp.ClientSession, base: str, timeout_s: float = 30.0):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{base}/healthz") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def ask(session: aiohttp.ClientSession, url: str, question: str) -> dict:
+    """Sends one question and reads the SSE stream to the end."""
+    start = time.perf_counter()
+    first_chunk = None
+    ok = False
+    async with session.post(url, json={"question": question}) as response:
+        async for line in response.content:
+            if line.startswith(b"event: chunk") and first_chunk is None:
+                first_chunk = time.perf_counter()
+            elif line.startswith(b"event: done"):
+                ok = True
+    end = time.perf_counter()
+    return {"ok": ok, "ttfc_s": (first_chunk or end) - start, "total_s": end - start}
+
+
+async def run_level(session, url: str, concurrency: int, duration_s: float, queries: list[str]) -> dict:
+    """Runs `concurrency` closed-loop clients for `duration_s` seconds."""
+    samples = []
+    deadline = time.perf_counter() + duration_s
+
+    async def client_loop():
+        while time.perf_counter() < deadline:
+            # Unique questions, so the response cache never short-circuits a request
+            question_id = next(_question_ids)
+            samples.append(await ask(session, url, f"{queries[question_id % len(queries)]} #{question_id}"))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    wall_s = time.perf_counter() - start
+
+    ttfc = [s["ttfc_s"] * 1000 for s in samples]
+    total = [s["total_s"] * 1000 for s in samples]
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "errors": sum(1 for s in samples if not s["ok"]),
+        "requests_per_s": round(len(samples) / wall_s, 1),
+        "ttfc_ms_p50": round(percentile(ttfc, 50), 1),
+        "ttfc_ms_p95": round(percentile(ttfc, 95), 1),
+        "total_ms_p50": round(percentile(total, 50), 1),
+        "total_ms_p95": round(percentile(total, 95), 1),
+        "total_ms_p99": round(percentile(total, 99), 1),
+    }
+
+
+async def run_workers(workers: int, args, document: str, queries: list[str]) -> list[dict]:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as tmp:
+        server = start_server(port, workers, tmp, args)
+        try:
+            connector = aiohttp.TCPConnector(limit=0)
+            async with aiohttp.ClientSession(connector=connector) as session:
+                await wait_until_ready(session, base)
+                async with session.post(f"{base}/documents", data=document.encode("utf-8")) as response:
+                    doc_hash = (await response.json())["doc_hash"]
+                url = f"{base}/documents/{doc_hash}/questions"
+                # Warm every worker (model resolution, document load)
+                await asyncio.gather(*(ask(session, url, f"warm up {i}") for i in range(workers * 4)))
+
+                rows = []
+                for concurrency in args.concurrency:
+                    row = {"workers": workers}
+                    row.update(await run_level(session, url, concurrency, args.duration, queries))
+                    rows.append(row)
+                    print(
+                        f"  workers={workers:<2} c={concurrency:<4} {row['requests_per_s']:>7.1f} req/s  "
+                        f"TTFC p50 {row['ttfc_ms_p50']:>6.0f}ms  total p50/p95/p99 "
+                        f"{row['total_ms_p50']:.0f}/{row['total_ms_p95']:.0f}/{row['total_ms_p99']:.0f}ms  "
+                        f"errors {row['errors']}"
+                    )
+                return rows
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per concurrency level")
+    parser.add_argument("--document-kb", type=int, default=100)
+    parser.add_argument("--ttfc", type=float, default=0.2, help="Stand-in time-to-first-chunk (s)")
+    parser.add_argument("--inter-chunk", type=float, default=0.01, help="Stand-in delay between chunks (s)")
+    parser.add_argument("--max-concurrency", type=int, default=8,
+                        help="GEMINI_MAX_CONCURRENCY per worker (upstream requests in flight)")
+    parser.add_argument("--slo-ms", type=float, default=1000.0, help="p95 total latency target")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "server.json"))
+    args = parser.parse_args()
+
+    document = make_document(args.document_kb * 1024)
+    queries = make_queries(64)
+
+    print("HTTP API load test (stand-in backend)")
+    print("=" * 60)
+    results = []
+    for workers in args.workers:
+        results.extend(asyncio.run(run_workers(workers, args, document, queries)))
+
+    print(f"\nThroughput at p95 <= {args.slo_ms:.0f}ms:")
+    for workers in args.workers:
+        within = [r for r in results if r["workers"] == workers and r["total_ms_p95"] <= args.slo_ms and not r["errors"]]
+        if within:
+            best = max(within, key=lambda r: r["requests_per_s"])
+            print(f"  ✅ workers={workers}: {best['requests_per_s']} req/s (c={best['concurrency']}, "
+                  f"p95 {best['total_ms_p95']:.0f}ms)")
+        else:
+            print(f"  ❌ workers={workers}: no concurrency level met the target")
+
+    write_results(args.output, "server", vars(args), results)
+    print(f"\n📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
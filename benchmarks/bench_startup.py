@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark: GeminiClient startup cost.
+
+Measures what an app cold start (or a pytest session) waits on before it
+can serve a request:
+
+  * eager sequential probing  - the previous behaviour: one live
+                                "Hello" call per candidate, in order
+  * lazy construction         - `GeminiClient()` with no API calls
+  * cold model resolution     - first request with an empty model cache
+                                (candidates probed concurrently)
+  * warm model resolution     - first request with a cached model name
+  * pytest collection         - `pytest --collect-only` of the eval suite
+
+Requires GOOGLE_API_KEY (live API).
+
+Usage:
+    python benchmarks/bench_startup.py [--skip-pytest] [--output results.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add parent directory to path to access project modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dotenv import load_dotenv
+
+from core.gemini_client import GeminiClient
+from core.model_cache import ModelSelectionCache
+
+
+def timed(fn):
+    """Runs `fn` and returns (result, elapsed seconds)."""
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def eager_sequential_probe(client: GeminiClient) -> str:
+    """Reproduces the old __init__ behaviour: probe candidates one by one."""
+    for model_name in client.model_names_to_try:
+        try:
+            client._build_model(model_name).generate_content("Hello")
+            return model_name
+        except Exception:
+            continue
+    raise ValueError("No candidate model worked")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--skip-pytest", action="store_true", help="Do not time pytest collection")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    project_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    load_dotenv(os.path.join(project_root, '.env'))
+    if not os.getenv("GOOGLE_API_KEY"):
+        print("ERROR: GOOGLE_API_KEY not found in environment")
+        return 1
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "gemini_model.json")
+
+        client, results["lazy_init_s"] = timed(
+            lambda: GeminiClient(model_cache=ModelSelectionCache(path=cache_path))
+        )
+        _, results["eager_sequential_probe_s"] = timed(lambda: eager_sequential_probe(client))
+        _, results["cold_resolve_s"] = timed(lambda: client.model)
+
+        warm_client = GeminiClient(model_cache=ModelSelectionCache(path=cache_path))
+        _, results["warm_resolve_s"] = timed(lambda: warm_client.model)
+        results["model_name"] = warm_client.model_name
+
+    if not args.skip_pytest:
+        cmd = [sys.executable, "-m", "pytest", "--collect-only", "-q", "-o", "addopts=",
+               os.path.join(project_root, "tests", "test_qa_evaluation.py")]
+        _, results["pytest_collect_s"] = timed(
+            lambda: subprocess.run(cmd, cwd=project_root, capture_output=True, check=False)
+        )
+
+    print("GeminiClient startup benchmark")
+    print("=" * 60)
+    for key, value in results.items():
+        print(f"  {key:<28} {value:.3f}" if isinstance(value, float) else f"  {key:<28} {value}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n📝 Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Throughput of the local token estimator and latency of prompt packing.
+
+Measures `TokenEstimator.estimate` on multi-megabyte documents with the
+default (length-only) coefficients and with calibrated (per character
+class) coefficients, on ASCII and on mixed non-ASCII text, against
+`len(text.split())` as a reference point. Then times `format_prompt`
+packing a large document plus a long conversation history into a budget.
+
+With `--cassette`, also reports how far each estimator is from the token
+counts the model reported in that recording (mean absolute % error).
+
+Usage:
+    python benchmarks/bench_tokens.py
+    python benchmarks/bench_tokens.py --sizes-mb 1 16 64 --cassette cassettes/live.jsonl
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+# Add parent directory to path to access project modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.common import make_document, write_results
+from core.qa_logic import format_prompt
+from core.retrieval import DocumentIndex
+from core.tokens import TokenEstimator
+
+# Plausible calibrated coefficients (digits and punctuation cost a token each)
+CALIBRATED = TokenEstimator(letters=0.21, whitespace=0.02, digits=1.0, punctuation=0.9, non_ascii=0.7)
+
+
+def throughput(fn, text: str, repeats: int) -> float:
+    """Best-of-`repeats` throughput of `fn(text)` in MB/s."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(text)
+        times.append(time.perf_counter() - start)
+    return len(text.encode("utf-8")) / (1024 * 1024) / max(min(times), 1e-9)
+
+
+def cassette_error(path: str, estimators: dict) -> dict:
+    """Mean absolute % error of each estimator against a cassette's recorded prompt tokens."""
+    errors = {name: [] for name in estimators}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line) if line.strip() else {}
+            if not record.get("prompt_tokens") or not record.get("prompt_features"):
+                continue
+            for name, estimator in estimators.items():
+                estimate = estimator.estimate_features(record["prompt_features"])
+                errors[name].append(abs(estimate - record["prompt_tokens"]) / record["prompt_tokens"] * 100)
+    return {name: round(statistics.mean(values), 2) if values else None for name, values in errors.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=8000, help="Prompt token budget for the packing test")
+    parser.add_argument("--cassette", help="Cassette with recorded token counts to measure accuracy against")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "tokens.json"))
+    args = parser.parse_args()
+
+    default = TokenEstimator()
+    print("Token estimator benchmark")
+    print("=" * 60)
+    results = []
+    for size_mb in args.sizes_mb:
+        ascii_text = make_document(size_mb * 1024 * 1024)
+        # Every tenth section in another script
+        mixed_text = ascii_text.replace("Policy", "Richtlinie für Rückerstattung 返金ポリシー", size_mb * 500)
+        row = {
+            "size_mb": size_mb,
+            "default_mb_per_s": round(throughput(default.estimate, ascii_text, args.repeats), 1),
+            "calibrated_mb_per_s": round(throughput(CALIBRATED.estimate, ascii_text, args.repeats), 1),
+            "calibrated_non_ascii_mb_per_s": round(throughput(CALIBRATED.estimate, mixed_text, args.repeats), 1),
+            "split_words_mb_per_s": round(throughput(lambda t: len(t.split()), ascii_text, args.repeats), 1),
+        }
+        results.append(row)
+        print(f"  {size_mb:>3} MB  default {row['default_mb_per_s']:>9.0f} MB/s  "
+              f"calibrated {row['calibrated_mb_per_s']:>6.0f} MB/s "
+              f"(non-ASCII {row['calibrated_non_ascii_mb_per_s']:>5.0f})  "
+              f"str.split {row['split_words_mb_per_s']:>5.0f} MB/s")
+
+    document = make_document(max(args.sizes_mb[0], 1) * 1024 * 1024)
+    index = DocumentIndex(document)
+    history = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"Turn {i}: " + "context words " * 80}
+               for i in range(50)]
+    packing = {}
+    for label, kwargs in (("no_index", {}), ("index", {"index": index})):
+        latencies = []
+        for i in range(20):
+            start = time.perf_counter()
+            format_prompt(document, f"What is the refund policy {i} about term{i}?", history=history,
+                          prompt_budget=args.budget, system_prompt="You answer from the document.", **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+        packing[f"pack_{label}_ms_p50"] = round(statistics.median(latencies), 2)
+    results.append({"packing_document_mb": max(args.sizes_mb[0], 1), "history_turns": len(history), **packing})
+    print(f"\n  format_prompt packing ({len(history)} turns, {args.budget}-token budget): "
+          f"{packing['pack_no_index_ms_p50']:.2f}ms without index, {packing['pack_index_ms_p50']:.2f}ms with index")
+
+    if args.cassette:
+        errors = cassette_error(args.cassette, {
+            "default": default, "calibrated": TokenEstimator.from_cassette(args.cassette),
+        })
+        results.append({"cassette": args.cassette, "mean_abs_pct_error": errors})
+        print(f"  estimate error vs. {args.cassette}: {errors}")
+
+    largest = results[len(args.sizes_mb) - 1]
+    print(f"\n✅ Calibrated estimate of a {largest['size_mb']} MB document: "
+          f"{largest['size_mb'] / largest['calibrated_mb_per_s'] * 1000:.0f}ms "
+          f"({largest['calibrated_mb_per_s']:.0f} MB/s)")
+
+    write_results(args.output, "tokens", vars(args), results)
+    print(f"\n📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
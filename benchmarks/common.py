@@ -0,0 +1,88 @@
+"""Shared helpers for the benchmark scripts."""
+import json
+import math
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+
+
+TOPICS = [
+    "refund", "warranty", "shipping", "support", "billing", "security",
+    "privacy", "onboarding", "licensing", "hardware", "software", "subscription",
+]
+
+
+def make_document(size_bytes: int, seed: int = 42) -> str:
+    """Builds a deterministic FAQ-style document of roughly `size_bytes`."""
+    rng = random.Random(seed)
+    words = [f"term{i}" for i in range(5000)]
+    sections = []
+    total = 0
+    number = 1
+    while total < size_bytes:
+        topic = rng.choice(TOPICS)
+        body = " ".join(rng.choices(words, k=120))
+        section = f"{number}. {topic.title()} Policy {number}: {body}.\n\n"
+        sections.append(section)
+        total += len(section)
+        number += 1
+    return "".join(sections)
+
+
+def make_queries(count: int, seed: int = 7) -> list[str]:
+    """Builds a deterministic list of questions."""
+    rng = random.Random(seed)
+    return [
+        f"What is the {rng.choice(TOPICS)} policy {rng.randint(1, 500)} about term{rng.randint(0, 4999)}?"
+        for _ in range(count)
+    ]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Returns the `pct` percentile (0-100) using nearest-rank."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def peak_rss_mb() -> float:
+    """Returns the process's peak resident set size so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_commit() -> str:
+    """Returns the current git commit (short hash), or 'unknown'."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_results(path: str, benchmark: str, config: dict, results: list[dict]):
+    """Writes benchmark results with run metadata as JSON."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    payload = {
+        "benchmark": benchmark,
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import weakref
+from typing import AsyncIterator
+
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+class AsyncModelRunner:
+    """
+    Runs asyncio-native Gemini calls under a shared concurrency cap.
+
+    Every call made through one runner competes for the same semaphore,
+    so a single runner can be shared by the app, batch jobs and the
+    evaluation wrapper without exceeding `max_concurrency` upstream
+    requests. Calls go through `GenerativeModel.generate_content_async`,
+    which reuses genai's process-wide async transport (one connection
+    pool) instead of opening a connection per request.
+    """
+
+    def __init__(self, max_concurrency: int = None):
+        """
+        Initializes the runner.
+
+        Args:
+            max_concurrency: Maximum number of in-flight requests. Defaults
+                to the `GEMINI_MAX_CONCURRENCY` env var or 8.
+        """
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("GEMINI_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        # asyncio primitives are bound to one event loop, so keep one per loop
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    def _enter(self):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _exit(self):
+        self.in_flight -= 1
+
+    async def stream(self, model, prompt_content: str, **kwargs) -> AsyncIterator[str]:
+        """
+        Streams a response, holding a concurrency slot until it completes.
+
+        Args:
+            model: A `GenerativeModel` (or compatible object).
+            prompt_content: The prompt to send.
+            **kwargs: Extra arguments for `generate_content_async`.
+
+        Yields:
+            str: Chunks of the response text as they arrive.
+        """
+        async with self._semaphore():
+            self._enter()
+            try:
+                response = await model.generate_content_async(prompt_content, stream=True, **kwargs)
+                async for chunk in response:
+                    if chunk.text:
+                        yield chunk.text
+            finally:
+                self._exit()
+
+    async def generate(self, model, prompt_content: str, **kwargs) -> str:
+        """
+        Generates a complete (non-streamed) response.
+
+        Args:
+            model: A `GenerativeModel` (or compatible object).
+            prompt_content: The prompt to send.
+            **kwargs: Extra arguments for `generate_content_async`.
+
+        Returns:
+            str: The response text.
+        """
+        async with self._semaphore():
+            self._enter()
+            try:
+                response = await model.generate_content_async(prompt_content, **kwargs)
+                return response.text
+            finally:
+                self._exit()
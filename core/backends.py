@@ -0,0 +1,635 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from google.generativeai import caching
+
+from core.tokens import estimate_tokens, text_features
+from helpers.logger import Logger
+
+
+# Global singleton instance
+logger = Logger().get_logger()
+
+
+class GeminiBackend:
+    """
+    The real backend: creates `genai.GenerativeModel` instances.
+
+    A backend is what `GeminiClient` uses to obtain model objects. Any
+    backend must provide `configure(api_key)` and `create_model(...)`;
+    the returned model must support `generate_content` (optionally with
+    `stream=True`), `generate_content_async` and expose `model_name`.
+    """
+
+    name = "gemini"
+    requires_api_key = True
+
+    def configure(self, api_key: str):
+        """Configures the genai module with the API key."""
+        genai.configure(api_key=api_key)
+
+    def create_model(self, model_name: str, system_instruction: str = None, safety_settings=None):
+        """Creates a live GenerativeModel."""
+        return genai.GenerativeModel(
+            model_name=model_name,
+            system_instruction=system_instruction,
+            safety_settings=safety_settings
+        )
+
+    def create_cache(self, model_name: str, system_instruction: str, contents: str, ttl_s: float):
+        """Caches a system instruction and document upstream (see `core.context_cache`)."""
+        return caching.CachedContent.create(
+            model=model_name,
+            system_instruction=system_instruction,
+            contents=[contents],
+            ttl=datetime.timedelta(seconds=ttl_s),
+        )
+
+    def model_from_cache(self, cache, safety_settings=None):
+        """Creates a GenerativeModel whose requests are prefixed by a cached content."""
+        return genai.GenerativeModel.from_cached_content(cache, safety_settings=safety_settings)
+
+    def extend_cache(self, cache, ttl_s: float):
+        cache.update(ttl=datetime.timedelta(seconds=ttl_s))
+
+    def delete_cache(self, cache):
+        cache.delete()
+
+
+def prompt_fingerprint(system_instruction: Optional[str], contents) -> str:
+    """
+    Identifies a request for cassette lookup, independent of the model used.
+
+    Args:
+        system_instruction: The model's system instruction, if any.
+        contents: The prompt sent to `generate_content`.
+
+    Returns:
+        str: The hex SHA-256 digest of the request.
+    """
+    material = (system_instruction or "") + "\x00" + str(contents)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class _UsageMetadata:
+    """Mimics the `usage_metadata` field of a Gemini response."""
+
+    def __init__(self, prompt_token_count: int, candidates_token_count: int, cached_content_token_count: int = 0):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.cached_content_token_count = cached_content_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class StandInChunk:
+    """A response (or streamed chunk) with the fields the app reads."""
+
+    def __init__(self, text: str, usage_metadata: _UsageMetadata = None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+@dataclass
+class ResponsePlan:
+    """What a stand-in request will return and how fast."""
+
+    chunks: list[str]
+    time_to_first_chunk_s: float
+    inter_chunk_delay_s: float
+    prompt_tokens: int
+    output_tokens: int
+    error: Optional[Exception] = None
+    cached_tokens: int = 0
+    mid_stream_error: Optional[Exception] = None  # raised after the first chunk
+
+
+@dataclass
+class StandInConfig:
+    """
+    Timing and failure knobs for synthesized responses.
+
+    Attributes:
+        time_to_first_chunk_s: Delay before the first chunk is emitted.
+        prefill_s_per_1k_tokens: Extra first-chunk delay per 1,000 prompt
+            tokens, modelling upstream prompt processing time.
+        inter_chunk_delay_s: Delay between subsequent chunks.
+        chunk_size: Characters per streamed chunk.
+        response_chars: Length of a synthesized answer.
+        error_rate: Probability that a request fails before its first chunk.
+        mid_stream_error_rate: Probability that a request fails after its
+            first chunk (a dropped or stalled stream).
+        seed: Seed for the error-injection RNG (deterministic runs).
+        available_models: If set, only these model names "exist"; any other
+            name fails like an unknown model does upstream.
+        spike_rate: Probability that a request's first chunk is delayed by
+            an extra `spike_s` (a latency spike).
+        spike_s: Length of a latency spike.
+        model_error_rates: Per-model overrides of `error_rate` (e.g. to
+            simulate one model having an outage).
+        model_time_to_first_chunk_s: Per-model overrides of
+            `time_to_first_chunk_s` (e.g. a lighter, faster model).
+        context_cache: Whether context caching is supported.
+        cache_min_tokens: Smallest content that can be cached.
+        cached_token_price: Price of a cached input token relative to an
+            uncached one (cached tokens also skip the prefill delay).
+        quota_rpm: Requests accepted per rolling quota window; beyond it
+            requests fail with 429 `ResourceExhausted`, like the live quota.
+        quota_tpm: Input tokens accepted per rolling quota window (likewise).
+        quota_window_s: Length of the quota window (a minute upstream).
+    """
+
+    time_to_first_chunk_s: float = 0.3
+    prefill_s_per_1k_tokens: float = 0.0
+    inter_chunk_delay_s: float = 0.02
+    chunk_size: int = 40
+    response_chars: int = 400
+    error_rate: float = 0.0
+    mid_stream_error_rate: float = 0.0
+    seed: int = 0
+    available_models: Optional[list[str]] = None
+    spike_rate: float = 0.0
+    spike_s: float = 0.0
+    model_error_rates: Optional[dict[str, float]] = None
+    model_time_to_first_chunk_s: Optional[dict[str, float]] = None
+    context_cache: bool = True
+    cache_min_tokens: int = 1024
+    cached_token_price: float = 0.25
+    quota_rpm: Optional[float] = None
+    quota_tpm: Optional[float] = None
+    quota_window_s: float = 60.0
+
+    @classmethod
+    def from_env(cls) -> "StandInConfig":
+        """Builds a config from `STANDIN_*` environment variables."""
+        models = os.getenv("STANDIN_MODELS")
+        model_error_rates = os.getenv("STANDIN_MODEL_ERROR_RATES")
+        model_ttfc = os.getenv("STANDIN_MODEL_TTFC")
+        quota_rpm = os.getenv("STANDIN_QUOTA_RPM")
+        quota_tpm = os.getenv("STANDIN_QUOTA_TPM")
+        return cls(
+            time_to_first_chunk_s=float(os.getenv("STANDIN_TTFC", cls.time_to_first_chunk_s)),
+            prefill_s_per_1k_tokens=float(os.getenv("STANDIN_PREFILL_PER_1K", cls.prefill_s_per_1k_tokens)),
+            inter_chunk_delay_s=float(os.getenv("STANDIN_INTER_CHUNK", cls.inter_chunk_delay_s)),
+            chunk_size=int(os.getenv("STANDIN_CHUNK_SIZE", cls.chunk_size)),
+            response_chars=int(os.getenv("STANDIN_RESPONSE_CHARS", cls.response_chars)),
+            error_rate=float(os.getenv("STANDIN_ERROR_RATE", cls.error_rate)),
+            mid_stream_error_rate=float(os.getenv("STANDIN_MID_STREAM_ERROR_RATE", cls.mid_stream_error_rate)),
+            seed=int(os.getenv("STANDIN_SEED", cls.seed)),
+            available_models=models.split(",") if models else None,
+            spike_rate=float(os.getenv("STANDIN_SPIKE_RATE", cls.spike_rate)),
+            spike_s=float(os.getenv("STANDIN_SPIKE_S", cls.spike_s)),
+            model_error_rates={
+                name: float(rate)
+                for name, rate in (item.rsplit("=", 1) for item in model_error_rates.split(","))
+            } if model_error_rates else None,
+            model_time_to_first_chunk_s={
+                name: float(seconds)
+                for name, seconds in (item.rsplit("=", 1) for item in model_ttfc.split(","))
+            } if model_ttfc else None,
+            context_cache=os.getenv("STANDIN_CONTEXT_CACHE", "on").lower() in ("1", "true", "on"),
+            cached_token_price=float(os.getenv("STANDIN_CACHED_TOKEN_PRICE", cls.cached_token_price)),
+            quota_rpm=float(quota_rpm) if quota_rpm else None,
+            quota_tpm=float(quota_tpm) if quota_tpm else None,
+        )
+
+
+@dataclass
+class StandInCachedContent:
+    """A `caching.CachedContent` look-alike held by a `StandInBackend`."""
+
+    name: str
+    model: str
+    system_instruction: Optional[str]
+    contents: str
+    tokens: int
+    expire_time: float
+    deleted: bool = False
+
+    @property
+    def expired(self) -> bool:
+        return self.deleted or time.time() >= self.expire_time
+
+
+@dataclass
+class CassetteRecord:
+    """One recorded request/response pair."""
+
+    prompt_sha256: str
+    model: str
+    chunks: list[str]
+    time_to_first_chunk_s: float
+    inter_chunk_delay_s: float
+    prompt_chars: int
+    prompt_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    recorded_at: float = field(default_factory=time.time)
+    # `core.tokens.text_features` of the prompt, for estimator calibration
+    prompt_features: Optional[list[int]] = None
+
+
+def load_cassette(path: str) -> dict[str, CassetteRecord]:
+    """
+    Loads a cassette file (JSONL, one `CassetteRecord` per line).
+
+    Args:
+        path: The cassette path.
+
+    Returns:
+        dict: Records keyed by prompt fingerprint (later lines win).
+    """
+    records = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = CassetteRecord(**json.loads(line))
+                records[record.prompt_sha256] = record
+    return records
+
+
+class StandInBackend:
+    """
+    Local, network-free stand-in for the Gemini API.
+
+    Requests are answered from a cassette of recorded responses when one
+    matches the prompt, and otherwise synthesized with configurable
+    time-to-first-chunk, inter-chunk delay, chunk size and error rate.
+    Synthesized and replayed responses report token usage, so callers
+    can account cost exactly as they would against the live API.
+
+    Input tokens are billed per request (`billed_input_tokens`, in
+    uncached-token units); tokens served from a cached content
+    (`create_cache`) cost `cached_token_price` each and add no prefill time.
+    """
+
+    name = "standin"
+    requires_api_key = False
+
+    def __init__(self, config: StandInConfig = None, cassette_path: str = None,
+                 replay_timing: bool = True, synthesize_on_miss: bool = True):
+        """
+        Initializes the stand-in.
+
+        Args:
+            config: Timing/failure settings for synthesized responses.
+            cassette_path: Optional JSONL cassette to replay.
+            replay_timing: Use recorded timings for cassette hits (otherwise
+                the `config` timings are used for every response).
+            synthesize_on_miss: Synthesize a response when the cassette has
+                no match; if False, a cassette miss raises NotFound.
+        """
+        self.config = config or StandInConfig()
+        self.cassette = load_cassette(cassette_path) if cassette_path else {}
+        self.replay_timing = replay_timing
+        self.synthesize_on_miss = synthesize_on_miss
+        self.requests = 0
+        self.cassette_hits = 0
+        self.injected_errors = 0
+        self.input_tokens = 0
+        self.cached_input_tokens = 0
+        self.billed_input_tokens = 0.0
+        self.quota_errors = 0
+        # (time, input tokens) of the requests accepted in the current quota window
+        self._quota_window: deque[tuple[float, int]] = deque()
+        self.caches: dict[str, StandInCachedContent] = {}
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+
+    def configure(self, api_key: str):
+        """No-op: the stand-in needs no credentials."""
+
+    def create_model(self, model_name: str, system_instruction: str = None, safety_settings=None):
+        """Creates a stand-in model object."""
+        return StandInModel(self, model_name, system_instruction)
+
+    def create_cache(self, model_name: str, system_instruction: str, contents: str,
+                     ttl_s: float) -> StandInCachedContent:
+        """Caches content like `caching.CachedContent.create`; the content is billed once."""
+        if not self.config.context_cache:
+            raise google_exceptions.InvalidArgument(f"{model_name} does not support context caching (stand-in)")
+        available = self.config.available_models
+        if available is not None and model_name not in available:
+            raise google_exceptions.NotFound(f"models/{model_name} is not found (stand-in)")
+        tokens = estimate_tokens((system_instruction or "") + contents)
+        if tokens < self.config.cache_min_tokens:
+            raise google_exceptions.InvalidArgument(
+                f"Cached content is too small: {tokens} < {self.config.cache_min_tokens} tokens (stand-in)"
+            )
+        time.sleep(self.config.prefill_s_per_1k_tokens * tokens / 1000)
+        with self._lock:
+            name = f"cachedContents/standin-{len(self.caches) + 1}"
+            cache = self.caches[name] = StandInCachedContent(
+                name, model_name, system_instruction, contents, tokens, time.time() + ttl_s
+            )
+            self.input_tokens += tokens
+            self.billed_input_tokens += tokens
+        return cache
+
+    def model_from_cache(self, cache: StandInCachedContent, safety_settings=None):
+        """Creates a model whose requests are prefixed by `cache`."""
+        return StandInModel(self, cache.model, cache.system_instruction, cache=cache)
+
+    def extend_cache(self, cache: StandInCachedContent, ttl_s: float):
+        if cache.expired:
+            raise google_exceptions.NotFound(f"{cache.name} not found (stand-in)")
+        cache.expire_time = time.time() + ttl_s
+
+    def delete_cache(self, cache: StandInCachedContent):
+        cache.deleted = True
+
+    def _synthesize_text(self, model_name: str, contents) -> str:
+        words = str(contents).split()[-40:] or ["answer"]
+        text = f"[stand-in {model_name}]"
+        i = 0
+        while len(text) < self.config.response_chars:
+            text += " " + words[i % len(words)]
+            i += 1
+        return text[:self.config.response_chars]
+
+    def _over_quota(self, tokens: int) -> bool:
+        """Checks a request against the rolling-window quota, recording it if accepted (lock held)."""
+        if self.config.quota_rpm is None and self.config.quota_tpm is None:
+            return False
+        now = time.monotonic()
+        window = self._quota_window
+        while window and now - window[0][0] >= self.config.quota_window_s:
+            window.popleft()
+        if self.config.quota_rpm is not None and len(window) + 1 > self.config.quota_rpm:
+            return True
+        if self.config.quota_tpm is not None and sum(t for _, t in window) + tokens > self.config.quota_tpm:
+            return True
+        window.append((now, tokens))
+        return False
+
+    def _split(self, text: str) -> list[str]:
+        size = max(1, self.config.chunk_size)
+        return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+    def plan_response(self, model_name: str, system_instruction: Optional[str], contents,
+                      cache: Optional[StandInCachedContent] = None) -> ResponsePlan:
+        """
+        Decides the content, timing and fate of one request.
+
+        Args:
+            model_name: The requested model.
+            system_instruction: The model's system instruction.
+            contents: The prompt.
+            cache: The cached content the request is prefixed by, if any.
+
+        Returns:
+            ResponsePlan: The planned response.
+        """
+        if cache is not None and cache.expired:
+            return ResponsePlan([], 0.0, 0.0, 0, 0, error=google_exceptions.NotFound(
+                f"{cache.name} not found (stand-in)"
+            ))
+        cached_tokens = cache.tokens if cache is not None else 0
+        prompt_tokens = estimate_tokens(("" if cache else system_instruction or "") + str(contents))
+        error_rate = self.config.error_rate
+        if self.config.model_error_rates and model_name in self.config.model_error_rates:
+            error_rate = self.config.model_error_rates[model_name]
+        with self._lock:
+            self.requests += 1
+            if self._over_quota(prompt_tokens + cached_tokens):
+                self.quota_errors += 1
+                return ResponsePlan([], 0.0, 0.0, prompt_tokens, 0, error=google_exceptions.ResourceExhausted(
+                    "Quota exceeded for requests or input tokens per minute (stand-in)"
+                ))
+            self.input_tokens += prompt_tokens + cached_tokens
+            self.cached_input_tokens += cached_tokens
+            self.billed_input_tokens += prompt_tokens + cached_tokens * self.config.cached_token_price
+            fail = self._rng.random() < error_rate
+            if fail:
+                self.injected_errors += 1
+            # Only drawn when enabled, so seeded error sequences are unchanged
+            spike = 0.0
+            if self.config.spike_rate and self._rng.random() < self.config.spike_rate:
+                spike = self.config.spike_s
+            drop = bool(self.config.mid_stream_error_rate) and self._rng.random() < self.config.mid_stream_error_rate
+            if drop:
+                self.injected_errors += 1
+
+        available = self.config.available_models
+        if available is not None and model_name not in available:
+            error = google_exceptions.NotFound(f"models/{model_name} is not found (stand-in)")
+            return ResponsePlan([], 0.0, 0.0, prompt_tokens, 0, error=error)
+
+        record = self.cassette.get(prompt_fingerprint(system_instruction, contents))
+        if record is not None:
+            with self._lock:
+                self.cassette_hits += 1
+            chunks = list(record.chunks)
+            ttfc = record.time_to_first_chunk_s if self.replay_timing else self.config.time_to_first_chunk_s
+            inter = record.inter_chunk_delay_s if self.replay_timing else self.config.inter_chunk_delay_s
+            prompt_tokens = record.prompt_tokens or prompt_tokens
+            output_tokens = record.output_tokens or estimate_tokens("".join(chunks))
+        elif self.synthesize_on_miss:
+            chunks = self._split(self._synthesize_text(model_name, contents))
+            ttfc = self.config.time_to_first_chunk_s
+            if self.config.model_time_to_first_chunk_s and model_name in self.config.model_time_to_first_chunk_s:
+                ttfc = self.config.model_time_to_first_chunk_s[model_name]
+            ttfc += self.config.prefill_s_per_1k_tokens * prompt_tokens / 1000
+            ttfc += spike
+            inter = self.config.inter_chunk_delay_s
+            output_tokens = estimate_tokens("".join(chunks))
+        else:
+            error = google_exceptions.NotFound("No cassette entry for this prompt (stand-in)")
+            return ResponsePlan([], 0.0, 0.0, prompt_tokens, 0, error=error)
+
+        error = None
+        if fail:
+            error = google_exceptions.ServiceUnavailable("Injected stand-in failure")
+        mid_stream_error = None
+        if drop and len(chunks) > 1:
+            mid_stream_error = google_exceptions.ServiceUnavailable("Injected stand-in failure mid-stream")
+        # Like upstream usage metadata, the prompt count includes cached tokens
+        return ResponsePlan(chunks, ttfc, inter, prompt_tokens + cached_tokens, output_tokens, error=error,
+                            cached_tokens=cached_tokens, mid_stream_error=mid_stream_error)
+
+
+class StandInModel:
+    """A `GenerativeModel` look-alike served by a `StandInBackend`."""
+
+    def __init__(self, backend: StandInBackend, model_name: str, system_instruction: str = None,
+                 cache: Optional[StandInCachedContent] = None):
+        self.backend = backend
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.cache = cache
+
+    def _usage(self, plan: ResponsePlan) -> _UsageMetadata:
+        return _UsageMetadata(plan.prompt_tokens, plan.output_tokens, plan.cached_tokens)
+
+    def _stream(self, plan: ResponsePlan):
+        for i, text in enumerate(plan.chunks):
+            if i:
+                time.sleep(plan.inter_chunk_delay_s)
+                if plan.mid_stream_error is not None:
+                    raise plan.mid_stream_error
+            last = i == len(plan.chunks) - 1
+            yield StandInChunk(text, self._usage(plan) if last else None)
+
+    def generate_content(self, contents, stream: bool = False, **kwargs):
+        """Returns a stand-in response (an iterator of chunks when streaming)."""
+        plan = self.backend.plan_response(self.model_name, self.system_instruction, contents, self.cache)
+        time.sleep(plan.time_to_first_chunk_s)
+        if plan.error is not None:
+            raise plan.error
+        if stream:
+            return self._stream(plan)
+        time.sleep(plan.inter_chunk_delay_s * max(0, len(plan.chunks) - 1))
+        return StandInChunk("".join(plan.chunks), self._usage(plan))
+
+    async def _astream(self, plan: ResponsePlan):
+        for i, text in enumerate(plan.chunks):
+            if i:
+                await asyncio.sleep(plan.inter_chunk_delay_s)
+                if plan.mid_stream_error is not None:
+                    raise plan.mid_stream_error
+            last = i == len(plan.chunks) - 1
+            yield StandInChunk(text, self._usage(plan) if last else None)
+
+    async def generate_content_async(self, contents, stream: bool = False, **kwargs):
+        """Async counterpart of `generate_content`."""
+        plan = self.backend.plan_response(self.model_name, self.system_instruction, contents, self.cache)
+        await asyncio.sleep(plan.time_to_first_chunk_s)
+        if plan.error is not None:
+            raise plan.error
+        if stream:
+            return self._astream(plan)
+        await asyncio.sleep(plan.inter_chunk_delay_s * max(0, len(plan.chunks) - 1))
+        return StandInChunk("".join(plan.chunks), self._usage(plan))
+
+
+class RecordingBackend:
+    """
+    Wraps another backend and appends every sync response to a cassette.
+
+    Run the app or test suite once against the live API with this backend
+    to produce a cassette for `StandInBackend` to replay offline.
+    """
+
+    def __init__(self, inner, cassette_path: str):
+        """
+        Initializes the recorder.
+
+        Args:
+            inner: The backend that actually answers (normally `GeminiBackend`).
+            cassette_path: JSONL file to append records to.
+        """
+        self.inner = inner
+        self.cassette_path = cassette_path
+        self.name = f"record:{inner.name}"
+        self.requires_api_key = inner.requires_api_key
+        self._lock = threading.Lock()
+        directory = os.path.dirname(cassette_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def configure(self, api_key: str):
+        self.inner.configure(api_key)
+
+    def create_model(self, model_name: str, system_instruction: str = None, safety_settings=None):
+        model = self.inner.create_model(model_name, system_instruction, safety_settings)
+        return RecordingModel(self, model, system_instruction)
+
+    def record(self, record: CassetteRecord):
+        """Appends a record to the cassette file."""
+        with self._lock:
+            with open(self.cassette_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record.__dict__) + "\n")
+
+
+class RecordingModel:
+    """Proxies a model and records its responses and timings."""
+
+    def __init__(self, recorder: RecordingBackend, model, system_instruction: str = None):
+        self.recorder = recorder
+        self.model = model
+        self.system_instruction = system_instruction
+
+    @property
+    def model_name(self) -> str:
+        return self.model.model_name
+
+    def _save(self, contents, chunks, ttfc, inter, usage):
+        prompt_text = (self.system_instruction or "") + str(contents)
+        self.recorder.record(CassetteRecord(
+            prompt_sha256=prompt_fingerprint(self.system_instruction, contents),
+            model=self.model_name,
+            chunks=chunks,
+            time_to_first_chunk_s=round(ttfc, 4),
+            inter_chunk_delay_s=round(inter, 4),
+            prompt_chars=len(prompt_text),
+            prompt_tokens=getattr(usage, "prompt_token_count", None),
+            output_tokens=getattr(usage, "candidates_token_count", None),
+            prompt_features=list(text_features(prompt_text)),
+        ))
+
+    def _record_stream(self, contents, response, start):
+        chunks = []
+        times = []
+        usage = None
+        for chunk in response:
+            times.append(time.perf_counter())
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            if chunk.text:
+                chunks.append(chunk.text)
+            yield chunk
+        ttfc = (times[0] - start) if times else 0.0
+        inter = (times[-1] - times[0]) / (len(times) - 1) if len(times) > 1 else 0.0
+        self._save(contents, chunks, ttfc, inter, usage)
+
+    def generate_content(self, contents, stream: bool = False, **kwargs):
+        start = time.perf_counter()
+        response = self.model.generate_content(contents, stream=stream, **kwargs)
+        if stream:
+            return self._record_stream(contents, response, start)
+        try:
+            text = response.text
+        except ValueError:
+            # e.g. probes capped at one token have no text part
+            return response
+        self._save(contents, [text], time.perf_counter() - start, 0.0, getattr(response, "usage_metadata", None))
+        return response
+
+    async def generate_content_async(self, contents, stream: bool = False, **kwargs):
+        # Async calls are passed through without recording
+        return await self.model.generate_content_async(contents, stream=stream, **kwargs)
+
+
+def create_backend_from_env():
+    """
+    Creates the backend selected by the `GEMINI_BACKEND` env var.
+
+    * `gemini` (default): the live API.
+    * `standin`: the local stand-in; `STANDIN_CASSETTE` optionally points
+      to a cassette to replay and `STANDIN_*` vars tune synthesized streams.
+    * `record`: the live API, recording responses to `STANDIN_CASSETTE`.
+
+    Returns:
+        The backend instance.
+    """
+    kind = os.getenv("GEMINI_BACKEND", "gemini").lower()
+    cassette_path = os.getenv("STANDIN_CASSETTE")
+    if kind == "gemini":
+        return GeminiBackend()
+    if kind == "standin":
+        logger.info(f"Using stand-in Gemini backend (cassette: {cassette_path or 'none'})")
+        return StandInBackend(StandInConfig.from_env(), cassette_path=cassette_path)
+    if kind == "record":
+        if not cassette_path:
+            raise ValueError("GEMINI_BACKEND=record requires STANDIN_CASSETTE")
+        logger.info(f"Recording Gemini responses to {cassette_path}")
+        return RecordingBackend(GeminiBackend(), cassette_path)
+    raise ValueError(f"Unknown GEMINI_BACKEND: {kind}")
@@ -0,0 +1,240 @@
+"""
+Batch question answering over a single document.
+
+Runs many questions against one document through `format_prompt` and
+`GeminiClient` using a thread pool, an optional requests-per-minute
+limit, and streams each result out as soon as it completes.
+
+Usage:
+    python -m core.batch document.txt questions.txt -o results.jsonl --workers 8 --rpm 120
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional
+
+from dotenv import load_dotenv
+
+from core.gemini_client import STREAMING_ERROR_MESSAGE, GeminiClient
+from core.qa_logic import format_prompt
+from core.rate_scheduler import BATCH
+from core.response_cache import ResponseCache, hash_document
+from core.retrieval import DocumentIndex
+from helpers.logger import Logger
+from helpers.telemetry import Telemetry
+
+
+# Global singleton instances
+logger = Logger().get_logger()
+telemetry = Telemetry()
+
+DEFAULT_MAX_WORKERS = 8
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter spacing out calls to at most `rate_per_minute`.
+
+    Callers block in `acquire` until their slot comes up, so bursts are
+    smoothed into an even request rate.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        """
+        Initializes the limiter.
+
+        Args:
+            rate_per_minute: Maximum number of `acquire` calls per minute.
+        """
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+        self.interval = 60.0 / rate_per_minute
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until the caller may issue its next request."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+@dataclass
+class BatchStats:
+    """Throughput summary of a batch run."""
+
+    total: int = 0
+    completed: int = 0
+    errors: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: Optional[float] = None
+
+    @property
+    def elapsed_s(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return end - self.started_at
+
+    @property
+    def questions_per_s(self) -> float:
+        elapsed = self.elapsed_s
+        return self.completed / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "total": self.total,
+            "completed": self.completed,
+            "errors": self.errors,
+            "elapsed_s": round(self.elapsed_s, 3),
+            "questions_per_s": round(self.questions_per_s, 3),
+        }
+
+
+def answer_questions(
+    client: GeminiClient,
+    document: str,
+    questions: Iterable[str],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    requests_per_minute: Optional[float] = None,
+    index: Optional[DocumentIndex] = None,
+    stats: Optional[BatchStats] = None,
+) -> Iterator[dict]:
+    """
+    Answers many questions about one document in parallel.
+
+    The document is chunked and indexed once for the whole batch (unless
+    an existing `index` is passed in). Results are yielded in completion
+    order, not input order; each carries the question's input `index`.
+
+    Args:
+        client: The Gemini client to use.
+        document: The document text.
+        questions: The questions to answer.
+        max_workers: Number of worker threads (concurrent requests).
+        requests_per_minute: Optional upstream request rate limit.
+        index: Optional prebuilt retrieval index for `document`.
+        stats: Optional `BatchStats` updated as results complete.
+
+    Yields:
+        dict: One result per question with `index`, `question`, `answer`,
+        `error` and `latency_s` keys.
+    """
+    questions = list(questions)
+    if index is None:
+        index = DocumentIndex(document)
+    # Hashed once for the response cache keys of every question
+    document_hash = hash_document(document)
+    limiter = RateLimiter(requests_per_minute) if requests_per_minute else None
+    if stats is None:
+        stats = BatchStats()
+    stats.total = len(questions)
+
+    def answer(position: int, question: str) -> dict:
+        if limiter is not None:
+            limiter.acquire()
+        start = time.perf_counter()
+        with telemetry.request(), telemetry.span("request", source="batch"):
+            prompt = format_prompt(document, question, index=index)
+            chunks = []
+            failed = False
+            for chunk in client.get_streaming_response(prompt, document=document, question=question,
+                                                       document_hash=document_hash):
+                # Sent alone, or after the partial text if the request failed mid-stream
+                failed = failed or chunk == STREAMING_ERROR_MESSAGE
+                chunks.append(chunk)
+        return {
+            "index": position,
+            "question": question,
+            "answer": "".join(chunks),
+            "error": failed,
+            "latency_s": round(time.perf_counter() - start, 3),
+        }
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(answer, position, question) for position, question in enumerate(questions)]
+        for future in as_completed(futures):
+            result = future.result()
+            stats.completed += 1
+            if result["error"]:
+                stats.errors += 1
+            yield result
+
+    stats.finished_at = time.perf_counter()
+
+
+def load_questions(path: str) -> list[str]:
+    """
+    Loads questions from a text file (one per line) or a JSONL file.
+
+    JSONL rows may use either a `question` or an `input` key, so the
+    golden dataset can be used directly.
+
+    Args:
+        path: Path to the questions file.
+
+    Returns:
+        list[str]: The non-empty questions, in file order.
+    """
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                row = json.loads(line)
+                questions.append(row.get("question") or row["input"])
+            else:
+                questions.append(line)
+    return questions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m core.batch",
+        description="Answer many questions about one document and write JSONL results.",
+    )
+    parser.add_argument("document", help="Path to the document (.txt)")
+    parser.add_argument("questions", help="Questions file: one per line, or JSONL with 'question'/'input'")
+    parser.add_argument("-o", "--output", help="Output JSONL path (default: stdout)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help="Concurrent requests")
+    parser.add_argument("--rpm", type=float, default=None, help="Max upstream requests per minute")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    with open(args.document, encoding="utf-8") as f:
+        document = f.read()
+    questions = load_questions(args.questions)
+    # Yields to interactive sessions sharing the quota (GEMINI_RPM/GEMINI_TPM)
+    client = GeminiClient(response_cache=ResponseCache.from_env(), priority=BATCH)
+
+    stats = BatchStats()
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for result in answer_questions(client, document, questions, args.workers, args.rpm, stats=stats):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            print(
+                f"\r{stats.completed}/{stats.total} answered, "
+                f"{stats.questions_per_s:.2f} q/s, {stats.errors} errors",
+                end="", file=sys.stderr,
+            )
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(file=sys.stderr)
+    print(json.dumps(stats.as_dict()), file=sys.stderr)
+    logger.info(f"Batch finished: {stats.as_dict()}")
+    return 1 if stats.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
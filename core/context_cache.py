@@ -0,0 +1,247 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from google.api_core import exceptions as google_exceptions
+
+from core.response_cache import hash_document
+from core.tokens import estimate_tokens
+from helpers.logger import Logger
+from helpers.telemetry import Telemetry
+
+
+# Global singleton instances
+logger = Logger().get_logger()
+telemetry = Telemetry()
+
+DEFAULT_TTL_S = 60 * 60
+# Upstream rejects small caches (Gemini 2.5 Flash needs 1,024 tokens, 1.5 models 32,768),
+# and below a few thousand tokens caching saves little
+DEFAULT_MIN_TOKENS = 4096
+DEFAULT_MAX_ENTRIES = 16
+# Entries this close to expiry are extended before use
+REFRESH_MARGIN_S = 60
+# After a model fails to create a cache, it is not asked again for this long
+UNSUPPORTED_RETRY_S = 10 * 60
+# Locks serializing cache creation, shared by keys with the same hash
+LOCK_STRIPES = 64
+
+# Errors from a request against a cache that mean the cache itself is gone
+# or unusable (expired, deleted, wrong model); the request is retried inline
+CACHE_ERRORS = (
+    google_exceptions.NotFound,
+    google_exceptions.FailedPrecondition,
+    google_exceptions.PermissionDenied,
+    google_exceptions.InvalidArgument,
+)
+
+
+@dataclass
+class ContextCacheConfig:
+    """
+    Settings of upstream context caching.
+
+    Attributes:
+        enabled: Whether documents sent whole are cached upstream.
+        ttl_s: Lifetime of a cached document; extended while in use.
+        min_tokens: Smallest document (in estimated tokens) worth caching.
+        max_entries: Cached documents kept at once; the least recently
+            used is deleted upstream when a new one is needed.
+    """
+
+    enabled: bool = False
+    ttl_s: float = DEFAULT_TTL_S
+    min_tokens: int = DEFAULT_MIN_TOKENS
+    max_entries: int = DEFAULT_MAX_ENTRIES
+
+    @classmethod
+    def from_env(cls) -> "ContextCacheConfig":
+        """Builds a config from the `CONTEXT_CACHE*` environment variables."""
+        return cls(
+            enabled=os.getenv("CONTEXT_CACHE", "off").lower() in ("1", "true", "on"),
+            ttl_s=float(os.getenv("CONTEXT_CACHE_TTL_S", DEFAULT_TTL_S)),
+            min_tokens=int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", DEFAULT_MIN_TOKENS)),
+            max_entries=int(os.getenv("CONTEXT_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+        )
+
+
+@dataclass(frozen=True)
+class CachedPrompt:
+    """
+    A prompt split for context caching: the document, cached upstream once,
+    and the part sent with every request (history and question).
+    """
+
+    context: str
+    prompt: str
+    context_hash: Optional[str] = None  # content hash of `context`, if already known
+
+
+@dataclass
+class _Entry:
+    handle: object
+    model: object
+    expires_at: float
+    tokens: int
+    uses: int = 0
+
+
+class ContextCache:
+    """
+    Local bookkeeping of documents cached upstream.
+
+    One cached-content handle is created per (document, model, system
+    prompt) through the backend, and reused by every later request for
+    that document until it expires. Entries about to expire are extended
+    on use; the least recently used entries beyond `max_entries` are
+    deleted upstream. Backends without caching support (and models that
+    fail to create a cache) get no handle, and the caller sends the
+    document inline instead.
+    """
+
+    def __init__(self, backend, config: Optional[ContextCacheConfig] = None, clock=time.time):
+        """
+        Args:
+            backend: Creates the caches; needs `create_cache`,
+                `model_from_cache`, `extend_cache` and `delete_cache`.
+            config: Caching settings. Defaults to `ContextCacheConfig.from_env()`.
+            clock: Wall-clock time source (for tests).
+        """
+        self.backend = backend
+        self.config = config or ContextCacheConfig.from_env()
+        self._clock = clock
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._unsupported: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self.stats = {"hits": 0, "creations": 0, "refreshes": 0, "invalidations": 0, "fallbacks": 0}
+
+    @property
+    def supported(self) -> bool:
+        return hasattr(self.backend, "create_cache")
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.enabled and self.supported
+
+    @staticmethod
+    def make_key(document: str, model_name: str, system_prompt: str, document_hash: Optional[str] = None) -> str:
+        parts = [document_hash or hash_document(document), model_name.removeprefix("models/"),
+                 hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()]
+        return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+        telemetry.inc(f"qa_context_cache_{stat}_total")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def model_for(self, model_name: str, document: str, system_prompt: str, safety_settings=None,
+                  document_hash: Optional[str] = None):
+        """
+        Returns a model bound to the cached document, creating the cache if needed.
+
+        Args:
+            model_name: The model the request goes to.
+            document: The document to cache.
+            system_prompt: The system instruction (cached with the document).
+            safety_settings: Safety settings of the returned model.
+            document_hash: A content hash identifying the document, if
+                already known (otherwise `hash_document(document)` is computed).
+
+        Returns:
+            The cache-bound model, or None if the document should be sent
+            inline (caching disabled or unsupported, document too small,
+            or creating the cache failed).
+        """
+        if not self.enabled or estimate_tokens(document) < self.config.min_tokens:
+            return None
+        if self._unsupported.get(model_name, 0) > self._clock():
+            return None
+
+        key = self.make_key(document, model_name, system_prompt, document_hash)
+        # Concurrent first requests for a document create one cache; a fixed
+        # set of striped locks keeps this bounded however many documents pass
+        with self._key_locks[int(key[:8], 16) % LOCK_STRIPES]:
+            entry = self._entries.get(key)
+            now = self._clock()
+            if entry is not None and entry.expires_at - now < REFRESH_MARGIN_S:
+                entry = self._refresh(key, entry, now)
+            if entry is None:
+                entry = self._create(key, model_name, document, system_prompt, safety_settings)
+                if entry is None:
+                    return None
+            else:
+                self._count("hits")
+            with self._lock:
+                entry.uses += 1
+                self._entries.move_to_end(key)
+            return entry.model
+
+    def _refresh(self, key: str, entry: _Entry, now: float) -> Optional[_Entry]:
+        """Extends an entry about to expire; drops it if that fails or it already expired."""
+        if entry.expires_at > now:
+            try:
+                self.backend.extend_cache(entry.handle, self.config.ttl_s)
+                entry.expires_at = now + self.config.ttl_s
+                self._count("refreshes")
+                return entry
+            except Exception as e:
+                logger.info(f"Extending a context cache failed ({e}); creating a new one")
+        with self._lock:
+            self._entries.pop(key, None)
+        return None
+
+    def _create(self, key: str, model_name: str, document: str, system_prompt: str,
+                safety_settings) -> Optional[_Entry]:
+        with telemetry.span("context_cache_create", model=model_name) as span:
+            try:
+                handle = self.backend.create_cache(model_name, system_prompt, document, self.config.ttl_s)
+                model = self.backend.model_from_cache(handle, safety_settings)
+            except Exception as e:
+                # e.g. the model doesn't support caching, or the document is
+                # below its minimum size; don't ask this model again for a while
+                logger.info(f"Context caching unavailable for {model_name}: {e}")
+                self._unsupported[model_name] = self._clock() + UNSUPPORTED_RETRY_S
+                self._count("fallbacks")
+                span.set(outcome="unsupported")
+                return None
+            span.set(outcome="created")
+        entry = _Entry(handle, model, self._clock() + self.config.ttl_s, estimate_tokens(document))
+        evicted = []
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.config.max_entries:
+                evicted.append(self._entries.popitem(last=False)[1])
+        for old in evicted:
+            self._delete(old)
+        self._count("creations")
+        logger.info(f"Cached a {entry.tokens}-token document upstream for {model_name}")
+        return entry
+
+    def _delete(self, entry: _Entry):
+        try:
+            self.backend.delete_cache(entry.handle)
+        except Exception as e:
+            logger.info(f"Deleting a context cache failed: {e}")
+
+    def invalidate(self, model_name: str, document: str, system_prompt: str, document_hash: Optional[str] = None):
+        """Forgets the cache of a document (e.g. after the upstream reports it gone)."""
+        with self._lock:
+            entry = self._entries.pop(self.make_key(document, model_name, system_prompt, document_hash), None)
+        if entry is not None:
+            self._count("invalidations")
+
+    def clear(self):
+        """Deletes every cache created through this instance."""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            self._delete(entry)
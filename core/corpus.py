@@ -0,0 +1,454 @@
+import copy
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional, Union
+
+from core.fast_path import release_answerers
+from core.retrieval import (
+    DEFAULT_CHUNK_TOKENS,
+    DEFAULT_OVERLAP_TOKENS,
+    DEFAULT_TOKEN_BUDGET,
+    DEFAULT_TOP_K,
+    EXCERPT_SEPARATOR,
+    chunk_document,
+    tokenize,
+)
+from core.tokens import CHARS_PER_TOKEN, estimate_tokens
+from helpers.logger import Logger
+
+
+# Global singleton instance
+logger = Logger().get_logger()
+
+DEFAULT_CORPUS_PATH = os.path.join(".cache", "corpus.db")
+
+# Placed before each document's text when several documents share a prompt
+DOCUMENT_HEADER = "=== Document: {name} ==="
+
+
+@dataclass(frozen=True)
+class CorpusDocument:
+    """Metadata of one document in the corpus."""
+
+    name: str
+    content_hash: str
+    size_bytes: int
+    tokens: int
+    chunk_count: int
+    updated_at: float
+
+
+@dataclass
+class IngestResult:
+    """What ingesting one document changed."""
+
+    name: str
+    content_hash: str
+    status: str  # "added", "updated" or "unchanged"
+    chunks_added: int = 0
+    chunks_kept: int = 0
+    chunks_removed: int = 0
+
+
+@dataclass(frozen=True)
+class CorpusHit:
+    """A chunk matching a query."""
+
+    name: str
+    chunk_index: int
+    start: int
+    end: int
+    score: float
+
+
+def _fts_query(query: str) -> Optional[str]:
+    """Turns free text into an FTS5 OR-query of quoted terms (None if no terms)."""
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+class Corpus:
+    """
+    Persistent multi-document corpus: SQLite with an FTS5 index over chunks.
+
+    Documents belong to an `owner` (e.g. one user's link to the app) and
+    are identified by name within it, so users uploading files with the
+    same name don't overwrite each other; `scoped` returns the corpus as
+    another owner sees it. Each document is ingested once; re-ingesting a
+    document with the same content hash is a no-op. When the content
+    changes, chunks are matched by content hash and only those whose text
+    changed are re-indexed: the chunks before an edit (and any that line
+    up again after it) are kept, so appending to a long document touches
+    a couple of rows instead of rebuilding its index.
+    Chunk text lives only in the FTS table; full document text is kept
+    for whole-document prompts and for merging adjacent excerpts.
+    """
+
+    def __init__(self, path: str = DEFAULT_CORPUS_PATH, chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+                 overlap_tokens: int = DEFAULT_OVERLAP_TOKENS, owner: str = ""):
+        """
+        Opens (and if needed creates) the corpus database.
+
+        Args:
+            path: Location of the SQLite database file (":memory:" for tests).
+            chunk_tokens: Target size of each chunk in tokens.
+            overlap_tokens: Number of tokens shared by consecutive chunks.
+            owner: Whose documents this corpus reads and writes.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.owner = owner
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " owner TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " content_hash TEXT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " size_bytes INTEGER NOT NULL,"
+            " tokens INTEGER NOT NULL,"
+            " chunk_count INTEGER NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (owner, name))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " id INTEGER PRIMARY KEY,"
+            " owner TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " chunk_index INTEGER NOT NULL,"
+            " start_char INTEGER NOT NULL,"
+            " end_char INTEGER NOT NULL,"
+            " chunk_hash TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_owner_name ON chunks (owner, name)")
+        # rowid = chunks.id
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(text, tokenize='porter unicode61')"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> "Corpus":
+        """Opens the corpus at `CORPUS_DB` (default `.cache/corpus.db`)."""
+        return cls(os.getenv("CORPUS_DB", DEFAULT_CORPUS_PATH))
+
+    def scoped(self, owner: str) -> "Corpus":
+        """
+        Returns the corpus as seen by another owner: a view sharing this
+        corpus's connection, so closing either closes both.
+        """
+        view = copy.copy(self)
+        view.owner = owner
+        return view
+
+    def ingest(self, name: str, data: Union[bytes, str]) -> IngestResult:
+        """
+        Adds or updates one document.
+
+        Args:
+            name: The document's name (e.g. its file name).
+            data: UTF-8 bytes or text.
+
+        Returns:
+            IngestResult: Whether the document was added, updated or unchanged.
+
+        Raises:
+            UnicodeDecodeError: If `data` is bytes but not valid UTF-8.
+        """
+        return self.ingest_many([(name, data)])[0]
+
+    def ingest_many(self, documents: Iterable[tuple[str, Union[bytes, str]]]) -> list[IngestResult]:
+        """
+        Adds or updates many documents in a single transaction.
+
+        Args:
+            documents: (name, UTF-8 bytes or text) pairs.
+
+        Returns:
+            list[IngestResult]: One result per document, in order.
+        """
+        results = []
+        with self._lock:
+            try:
+                for name, data in documents:
+                    results.append(self._ingest(name, data))
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        changed = [result for result in results if result.status != "unchanged"]
+        if changed:
+            logger.info(f"Corpus: indexed {len(changed)} document(s), "
+                        f"{sum(r.chunks_added for r in changed)} new chunk(s)")
+        return results
+
+    def _ingest(self, name: str, data: Union[bytes, str]) -> IngestResult:
+        raw = data if isinstance(data, bytes) else data.encode("utf-8")
+        content_hash = hashlib.sha256(raw).hexdigest()
+        row = self._conn.execute("SELECT content_hash FROM documents WHERE owner = ? AND name = ?",
+                                 (self.owner, name)).fetchone()
+        if row is not None and row[0] == content_hash:
+            return IngestResult(name, content_hash, "unchanged")
+
+        text = raw.decode("utf-8")
+        if row is not None:
+            release_answerers(row[0])
+        chunks = chunk_document(text, self.chunk_tokens, self.overlap_tokens)
+        existing: dict[str, list[int]] = {}
+        for chunk_id, chunk_hash in self._conn.execute(
+                "SELECT id, chunk_hash FROM chunks WHERE owner = ? AND name = ?", (self.owner, name)):
+            existing.setdefault(chunk_hash, []).append(chunk_id)
+
+        result = IngestResult(name, content_hash, "added" if row is None else "updated")
+        moved = []
+        new_rows = []
+        for chunk in chunks:
+            chunk_hash = hashlib.sha1(chunk.text.encode("utf-8")).hexdigest()
+            ids = existing.get(chunk_hash)
+            if ids:
+                # Same text: keep its FTS entry, only its position may have moved
+                moved.append((chunk.index, chunk.start, chunk.end, ids.pop()))
+                result.chunks_kept += 1
+            else:
+                new_rows.append((chunk, chunk_hash))
+
+        stale = [chunk_id for ids in existing.values() for chunk_id in ids]
+        if stale:
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", ((i,) for i in stale))
+            self._conn.executemany("DELETE FROM chunks_fts WHERE rowid = ?", ((i,) for i in stale))
+            result.chunks_removed = len(stale)
+        if moved:
+            self._conn.executemany(
+                "UPDATE chunks SET chunk_index = ?, start_char = ?, end_char = ? WHERE id = ?", moved
+            )
+        for chunk, chunk_hash in new_rows:
+            cursor = self._conn.execute(
+                "INSERT INTO chunks (owner, name, chunk_index, start_char, end_char, chunk_hash)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (self.owner, name, chunk.index, chunk.start, chunk.end, chunk_hash),
+            )
+            self._conn.execute("INSERT INTO chunks_fts (rowid, text) VALUES (?, ?)", (cursor.lastrowid, chunk.text))
+        result.chunks_added = len(new_rows)
+
+        self._conn.execute(
+            "INSERT OR REPLACE INTO documents"
+            " (owner, name, content_hash, text, size_bytes, tokens, chunk_count, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.owner, name, content_hash, text, len(raw), estimate_tokens(text), len(chunks), time.time()),
+        )
+        return result
+
+    def remove(self, name: str) -> bool:
+        """
+        Deletes a document and its chunks.
+
+        Returns:
+            bool: True if the document existed.
+        """
+        with self._lock:
+            key = (self.owner, name)
+            row = self._conn.execute("SELECT content_hash FROM documents WHERE owner = ? AND name = ?",
+                                     key).fetchone()
+            if row is not None:
+                release_answerers(row[0])
+            ids = [(row[0],) for row in self._conn.execute("SELECT id FROM chunks WHERE owner = ? AND name = ?", key)]
+            self._conn.executemany("DELETE FROM chunks_fts WHERE rowid = ?", ids)
+            self._conn.execute("DELETE FROM chunks WHERE owner = ? AND name = ?", key)
+            deleted = self._conn.execute("DELETE FROM documents WHERE owner = ? AND name = ?", key).rowcount
+            self._conn.commit()
+        return bool(deleted)
+
+    def documents(self) -> list[CorpusDocument]:
+        """Returns all of the owner's documents, sorted by name."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, content_hash, size_bytes, tokens, chunk_count, updated_at"
+                " FROM documents WHERE owner = ? ORDER BY name", (self.owner,)
+            ).fetchall()
+        return [CorpusDocument(*row) for row in rows]
+
+    def get(self, name: str) -> Optional[CorpusDocument]:
+        """Returns a document's metadata, or None if it is not in the corpus."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, content_hash, size_bytes, tokens, chunk_count, updated_at"
+                " FROM documents WHERE owner = ? AND name = ?", (self.owner, name)
+            ).fetchone()
+        return CorpusDocument(*row) if row else None
+
+    def text(self, name: str) -> Optional[str]:
+        """Returns a document's full text, or None if it is not in the corpus."""
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM documents WHERE owner = ? AND name = ?",
+                                     (self.owner, name)).fetchone()
+        return row[0] if row else None
+
+    def excerpt(self, name: str, start: int, end: int) -> str:
+        """Returns characters [start, end) of a document."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT substr(text, ?, ?) FROM documents WHERE owner = ? AND name = ?",
+                (start + 1, end - start, self.owner, name)
+            ).fetchone()
+        return row[0] if row else ""
+
+    def search(self, query: str, names: Optional[list[str]] = None, top_k: int = DEFAULT_TOP_K) -> list[CorpusHit]:
+        """
+        Ranks chunks against a query with FTS5's BM25.
+
+        Args:
+            query: The free-text query.
+            names: Only search these documents (all documents if None).
+            top_k: Maximum number of hits.
+
+        Returns:
+            list[CorpusHit]: The best-matching chunks, best first.
+        """
+        match = _fts_query(query)
+        if match is None:
+            return []
+        sql = (
+            "SELECT c.name, c.chunk_index, c.start_char, c.end_char, bm25(chunks_fts) AS score"
+            " FROM chunks_fts JOIN chunks c ON c.id = chunks_fts.rowid"
+            " WHERE chunks_fts MATCH ? AND c.owner = ?"
+        )
+        params: list = [match, self.owner]
+        if names is not None:
+            sql += f" AND c.name IN ({','.join('?' * len(names))})"
+            params.extend(names)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(top_k)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        # FTS5's bm25() is lower-is-better; flip it so higher means more relevant
+        return [CorpusHit(name, index, start, end, -score) for name, index, start, end, score in rows]
+
+    def leading_hits(self, names: list[str], top_k: int = DEFAULT_TOP_K) -> list[CorpusHit]:
+        """The first chunks of each document: the fallback when a query matches nothing."""
+        per_document = max(1, top_k // max(1, len(names)))
+        hits = []
+        with self._lock:
+            for name in names:
+                rows = self._conn.execute(
+                    "SELECT chunk_index, start_char, end_char FROM chunks WHERE owner = ? AND name = ?"
+                    " ORDER BY chunk_index LIMIT ?", (self.owner, name, per_document)
+                ).fetchall()
+                hits.extend(CorpusHit(name, index, start, end, 0.0) for index, start, end in rows)
+        return hits[:top_k]
+
+    def select(self, names: list[str]) -> "CorpusSelection":
+        """Returns a view over some documents, to be queried together."""
+        return CorpusSelection(self, names)
+
+    def close(self):
+        """Closes the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+class CorpusSelection:
+    """
+    Several corpus documents asked about together.
+
+    Has the same `build_context` as `DocumentIndex`, so it can be passed
+    to `format_prompt` / `answer_question` as the retrieval `index`.
+    """
+
+    def __init__(self, corpus: Corpus, names: list[str]):
+        """
+        Creates the view.
+
+        Args:
+            corpus: The corpus holding the documents.
+            names: The selected document names (unknown names are ignored).
+        """
+        self.corpus = corpus
+        self.documents = [document for document in map(corpus.get, names) if document is not None]
+        self.names = [document.name for document in self.documents]
+        self.total_tokens = sum(document.tokens for document in self.documents)
+        self._text = None
+
+    @property
+    def content_hash(self) -> str:
+        """
+        Identifies the selection's `text` without loading it: the document's
+        content hash, or a hash of every selected name and content hash.
+        """
+        if len(self.documents) == 1:
+            return self.documents[0].content_hash
+        parts = (f"{document.name}\x00{document.content_hash}" for document in self.documents)
+        return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+    @property
+    def text(self) -> str:
+        """All selected documents' text, each under a header (loaded on first use)."""
+        if self._text is None:
+            self._text = self._join((name, self.corpus.text(name) or "") for name in self.names)
+        return self._text
+
+    def _join(self, parts: Iterable[tuple[str, str]]) -> str:
+        parts = list(parts)
+        if len(self.names) == 1:
+            return parts[0][1] if parts else ""
+        return "\n\n".join(f"{DOCUMENT_HEADER.format(name=name)}\n{body}" for name, body in parts)
+
+    def build_context(self, query: str, top_k: int = DEFAULT_TOP_K,
+                      token_budget: int = DEFAULT_TOKEN_BUDGET) -> str:
+        """
+        Builds the document context for a question across the selection.
+
+        Selections that fit within the budget are returned whole. Otherwise
+        the best chunks across all selected documents are fetched from the
+        FTS index, trimmed to the budget, merged per document (overlapping
+        or adjacent chunks become one excerpt) and grouped under each
+        document's header.
+
+        Args:
+            query: The user's question.
+            top_k: Maximum number of chunks to consider.
+            token_budget: Maximum total estimated tokens of the context.
+
+        Returns:
+            str: The context text.
+        """
+        if not self.names:
+            return ""
+        if self.total_tokens <= token_budget:
+            return self.text
+
+        hits = self.corpus.search(query, self.names, top_k) or self.corpus.leading_hits(self.names, top_k)
+        spans: dict[str, list[list[int]]] = {}
+        used = 0
+        for hit in hits:
+            cost = -(-(hit.end - hit.start) // CHARS_PER_TOKEN)
+            if used + cost > token_budget:
+                continue
+            used += cost
+            spans.setdefault(hit.name, []).append([hit.start, hit.end])
+
+        parts = []
+        for name in self.names:
+            if name not in spans:
+                continue
+            merged: list[list[int]] = []
+            for start, end in sorted(spans[name]):
+                if merged and start <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            excerpts = (self.corpus.excerpt(name, start, end).strip() for start, end in merged)
+            parts.append((name, EXCERPT_SEPARATOR.join(excerpts)))
+        return self._join(parts)
@@ -0,0 +1,239 @@
+import hashlib
+import os
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Optional
+
+from core.fast_path import release_answerers
+from core.response_cache import hash_document
+from core.retrieval import DocumentIndex
+from helpers.logger import Logger
+
+
+# Global singleton instance
+logger = Logger().get_logger()
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512MB
+
+
+def hash_bytes(data: bytes) -> str:
+    """
+    Returns the content hash documents are stored under.
+
+    Args:
+        data: The raw uploaded file content.
+
+    Returns:
+        str: The hex SHA-256 digest.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+@dataclass
+class StoredDocument:
+    """A decoded document and its retrieval index, held once per process."""
+
+    doc_hash: str
+    text: str
+    index: DocumentIndex
+    size_bytes: int
+    text_hash: str = ""  # hash_document(text), passed on as the cache keys' document_hash
+    refcount: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class DocumentHandle:
+    """
+    A session's reference to a stored document.
+
+    Holds only the content hash. The reference is released when `close`
+    is called or, for sessions that simply go away, when the handle is
+    garbage collected along with the session state.
+    """
+
+    def __init__(self, store: "DocumentStore", doc_hash: str):
+        self.doc_hash = doc_hash
+        self._store = store
+        self._finalizer = weakref.finalize(self, store.release, doc_hash)
+
+    @property
+    def document(self) -> StoredDocument:
+        """The stored document; it cannot be evicted while this handle is open."""
+        return self._store.get(self.doc_hash)
+
+    def close(self):
+        """Releases the reference (idempotent)."""
+        self._finalizer()
+
+
+class DocumentStore:
+    """
+    Process-wide, content-addressed store of uploaded documents.
+
+    Identical uploads from any number of sessions are decoded and indexed
+    once and share a single copy. Documents are reference counted by the
+    sessions holding them; unreferenced documents are kept for reuse and
+    evicted least-recently-used once the total size exceeds `max_bytes`.
+
+    With a `directory`, uploaded bytes are also written there under their
+    hash, so other processes (e.g. API server workers) and later runs can
+    `load` a document by hash alone.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, directory: Optional[str] = None):
+        """
+        Initializes an empty store.
+
+        Args:
+            max_bytes: Total size (of the uploaded bytes) above which
+                unreferenced documents are evicted.
+            directory: Optional directory persisting uploads by hash.
+        """
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._documents: dict[str, StoredDocument] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "DocumentStore":
+        """Builds a store from DOCUMENT_STORE_MAX_BYTES and DOCUMENT_STORE_DIR."""
+        return cls(
+            max_bytes=int(os.getenv("DOCUMENT_STORE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+            directory=os.getenv("DOCUMENT_STORE_DIR") or None,
+        )
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __contains__(self, doc_hash: str) -> bool:
+        return doc_hash in self._documents
+
+    def open(self, data: bytes, doc_hash: Optional[str] = None, encoding: str = "utf-8") -> DocumentHandle:
+        """
+        Stores an uploaded file (if not already present) and references it.
+
+        Decoding and indexing only happen the first time a given content
+        hash is seen; afterwards this is a dictionary lookup.
+
+        Args:
+            data: The raw file content.
+            doc_hash: The content hash, if the caller already computed it.
+            encoding: The text encoding of `data`.
+
+        Returns:
+            DocumentHandle: A reference to be kept in the session.
+
+        Raises:
+            UnicodeDecodeError: If `data` cannot be decoded.
+        """
+        doc_hash = doc_hash or hash_bytes(data)
+        with self._lock:
+            document = self._documents.get(doc_hash)
+            if document is not None:
+                self.hits += 1
+                document.refcount += 1
+                document.last_used = time.monotonic()
+                return DocumentHandle(self, doc_hash)
+            self.misses += 1
+
+        # Decode and index outside the lock so other sessions aren't blocked
+        text = data.decode(encoding)
+        candidate = StoredDocument(doc_hash, text, DocumentIndex(text), len(data), hash_document(text))
+        self._persist(doc_hash, data)
+
+        with self._lock:
+            # Another session may have stored the same upload in the meantime
+            document = self._documents.setdefault(doc_hash, candidate)
+            if document is candidate:
+                self.total_bytes += document.size_bytes
+                logger.info(f"Stored document {doc_hash[:12]} ({document.size_bytes:,} bytes)")
+            document.refcount += 1
+            document.last_used = time.monotonic()
+            self._evict()
+        return DocumentHandle(self, doc_hash)
+
+    def _path(self, doc_hash: str) -> Optional[str]:
+        if self.directory is None or not all(c in "0123456789abcdef" for c in doc_hash):
+            return None
+        return os.path.join(self.directory, doc_hash)
+
+    def _persist(self, doc_hash: str, data: bytes):
+        """Writes the upload to the store directory (atomically, once per hash)."""
+        path = self._path(doc_hash)
+        if path is None or os.path.exists(path):
+            return
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def load(self, doc_hash: str) -> Optional[StoredDocument]:
+        """
+        Returns a document by hash, reading it from the store directory if
+        it is not held in memory (e.g. it was uploaded to another process).
+
+        Args:
+            doc_hash: The content hash returned at upload.
+
+        Returns:
+            Optional[StoredDocument]: The document, or None if unknown.
+        """
+        document = self.get(doc_hash)
+        if document is not None:
+            return document
+        path = self._path(doc_hash)
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+        handle = self.open(data, doc_hash=doc_hash)
+        document = handle.document
+        handle.close()
+        return document
+
+    def get(self, doc_hash: str) -> Optional[StoredDocument]:
+        """Returns the stored document for a hash, or None if it is not held."""
+        with self._lock:
+            document = self._documents.get(doc_hash)
+            if document is not None:
+                document.last_used = time.monotonic()
+            return document
+
+    def release(self, doc_hash: str):
+        """Drops one reference to a document, evicting if over budget."""
+        with self._lock:
+            document = self._documents.get(doc_hash)
+            if document is None:
+                return
+            document.refcount = max(0, document.refcount - 1)
+            self._evict()
+
+    def _evict(self):
+        """Evicts unreferenced documents, oldest first, until within budget."""
+        if self.total_bytes <= self.max_bytes:
+            return
+        idle = sorted(
+            (doc for doc in self._documents.values() if doc.refcount == 0),
+            key=lambda doc: doc.last_used,
+        )
+        for document in idle:
+            if self.total_bytes <= self.max_bytes:
+                break
+            del self._documents[document.doc_hash]
+            self.total_bytes -= document.size_bytes
+            self.evictions += 1
+            release_answerers(document.text_hash)
+            logger.info(f"Evicted document {document.doc_hash[:12]} ({document.size_bytes:,} bytes)")
+        if self.total_bytes > self.max_bytes:
+            logger.warning(
+                f"Document store over budget ({self.total_bytes:,} > {self.max_bytes:,} bytes); "
+                f"all remaining documents are in use"
+            )
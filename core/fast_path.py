@@ -0,0 +1,301 @@
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional, Union
+
+from core.response_cache import hash_document
+from core.retrieval import BM25Index, tokenize
+from helpers.logger import Logger
+from helpers.telemetry import Telemetry
+
+
+# Global singleton instances
+logger = Logger().get_logger()
+telemetry = Telemetry()
+
+# Fast-path modes
+OFF = "off"
+ANSWER = "answer"    # answer confident matches locally from the matched section
+SECTION = "section"  # send only the matched section upstream
+MODES = (OFF, ANSWER, SECTION)
+
+DEFAULT_THRESHOLD = 0.62
+
+# Numbered section starts: "2. Refund Policy: ..." or "2) ..." at the start of a line
+_SECTION_PATTERN = re.compile(r"^[ \t]*(\d{1,3})[.)][ \t]+", re.MULTILINE)
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9'\"(])")
+_MAX_TITLE_CHARS = 80
+# Sections ranked by BM25 that are then compared by coverage
+_CANDIDATES = 3
+# Indexed documents kept for reuse by `get_answerer`
+ANSWERER_CACHE_SIZE = 8
+
+# Words that shape a question but never occur in the answer
+_QUESTION_WORDS = frozenset(
+    "summarize summarise summary describe explain tell list give me please "
+    "can could do does did there their they many much long".split()
+)
+
+# Sentences starting with these need their section's title to make sense
+_PRONOUNS = frozenset("it its this these they those".split())
+
+
+def _stem(term: str) -> str:
+    """Folds plural forms together ("credits" -> "credit")."""
+    if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+        return term[:-1]
+    return term
+
+
+def _terms(text: str) -> list[str]:
+    return [_stem(term) for term in tokenize(text) if len(term) > 1 and term not in _QUESTION_WORDS]
+
+
+@dataclass(frozen=True)
+class Section:
+    """One numbered section of an FAQ-style document."""
+
+    number: int
+    title: str
+    body: str
+    start: int
+    end: int
+    text: str
+
+
+@dataclass(frozen=True)
+class FastPathMatch:
+    """The section that best matches a question, and the extracted answer."""
+
+    section: Section
+    confidence: float
+    answer: str
+
+
+@dataclass
+class FastPathConfig:
+    """
+    Settings of the local extractive fast path.
+
+    Attributes:
+        mode: `off`, `answer` (confident matches are answered locally from
+            the matched section) or `section` (only the matched section is
+            sent upstream instead of the document).
+        threshold: Minimum confidence (0-1) to take the fast path.
+    """
+
+    mode: str = OFF
+    threshold: float = DEFAULT_THRESHOLD
+
+    def __post_init__(self):
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown fast path mode: {self.mode}")
+
+    @classmethod
+    def from_env(cls) -> "FastPathConfig":
+        """Builds a config from the `FAST_PATH` and `FAST_PATH_THRESHOLD` env vars."""
+        return cls(
+            mode=os.getenv("FAST_PATH", OFF).lower(),
+            threshold=float(os.getenv("FAST_PATH_THRESHOLD", DEFAULT_THRESHOLD)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != OFF
+
+
+def split_sections(text: str) -> list[Section]:
+    """
+    Splits a document into its numbered sections.
+
+    A section runs from a line starting with "N." (or "N)") to the next
+    one. Its title is the text before the last colon of the first
+    sentence, if short ("4. Product: 'ChromaKey' Keyboard: This is ...").
+
+    Args:
+        text: The document text.
+
+    Returns:
+        list[Section]: The sections, in document order (empty if none).
+    """
+    starts = list(_SECTION_PATTERN.finditer(text))
+    sections = []
+    for position, found in enumerate(starts):
+        end = starts[position + 1].start() if position + 1 < len(starts) else len(text)
+        content = text[found.end():end].strip()
+        head = _SENTENCE_PATTERN.split(content, maxsplit=1)[0][:_MAX_TITLE_CHARS]
+        colon = head.rfind(":")
+        title, body = (content[:colon].strip(), content[colon + 1:].strip()) if colon > 0 else ("", content)
+        sections.append(Section(
+            number=int(found.group(1)), title=title, body=body,
+            start=found.start(), end=end, text=text[found.start():end].strip(),
+        ))
+    return sections
+
+
+class ExtractiveAnswerer:
+    """
+    Local answerer for FAQ-style documents made of numbered sections.
+
+    Sections are ranked against the question with BM25. Confidence is the
+    share of the question's (IDF-weighted) terms the best section contains:
+    terms found nowhere in the document count the most, so questions about
+    things the document doesn't cover fall below the threshold and go to
+    the model. Terms of the document's title line (e.g. the company name)
+    name the document rather than a section and are ignored. Among equally
+    covering sections, the one whose title matches more of the question
+    wins; if that doesn't separate them the match is ambiguous and its
+    confidence is halved.
+
+    The answer is extracted verbatim: the whole section body when the
+    question is about the section's subject, else the sentences carrying
+    the matched terms.
+    """
+
+    def __init__(self, text: str, threshold: float = DEFAULT_THRESHOLD):
+        """
+        Splits and indexes the document.
+
+        Args:
+            text: The document text.
+            threshold: Minimum confidence for `match` to return a section.
+        """
+        self.threshold = threshold
+        self.sections = split_sections(text)
+        preamble = text[:self.sections[0].start] if self.sections else text
+        title_line = next((line for line in preamble.splitlines() if line.strip()), "")
+        self._document_terms = set(_terms(title_line))
+        self._section_terms = [set(_terms(section.text)) for section in self.sections]
+        self._title_terms = [set(_terms(section.title)) for section in self.sections]
+        # Pre-stemmed passages, so the index matches plural and singular forms
+        self._bm25 = BM25Index([" ".join(_terms(section.text)) for section in self.sections])
+        count = len(self.sections)
+        frequencies = Counter(term for terms in self._section_terms for term in terms)
+        self._idf = {
+            term: math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in frequencies.items()
+        }
+        # Terms absent from every section are the most informative of all
+        self._missing_idf = math.log(1 + (count + 0.5) / 0.5)
+
+    def _query_terms(self, query: str) -> set[str]:
+        return set(_terms(query)) - self._document_terms
+
+    def _weight(self, term: str) -> float:
+        return self._idf.get(term, self._missing_idf)
+
+    def score(self, query: str) -> Optional[FastPathMatch]:
+        """
+        Finds the best-matching section, however low its confidence.
+
+        Args:
+            query: The user's question.
+
+        Returns:
+            FastPathMatch or None if the document has fewer than two
+            sections or no section shares a term with the question.
+        """
+        if len(self.sections) < 2:
+            return None
+        terms = self._query_terms(query)
+        candidates = self._bm25.search(" ".join(terms), top_k=_CANDIDATES)
+        if not candidates:
+            return None
+
+        total = sum(self._weight(term) for term in terms)
+
+        def rank(candidate):
+            section_id, bm25_score = candidate
+            coverage = sum(self._weight(term) for term in terms & self._section_terms[section_id]) / total
+            return coverage, len(terms & self._title_terms[section_id]), bm25_score
+
+        ranked = sorted(((rank(candidate), candidate[0]) for candidate in candidates), reverse=True)
+        confidence = ranked[0][0][0]
+        if len(ranked) > 1 and ranked[1][0][:2] == ranked[0][0][:2]:
+            confidence /= 2
+
+        best = ranked[0][1]
+        matched = terms & self._section_terms[best]
+        answer = self._extract(self.sections[best], matched, self._title_terms[best])
+        return FastPathMatch(self.sections[best], round(confidence, 4), answer)
+
+    def _extract(self, section: Section, matched: set[str], title_terms: set[str]) -> str:
+        if not section.body or matched <= title_terms:
+            return section.text if not section.body else section.body
+        sentences = _SENTENCE_PATTERN.split(section.body)
+        scores = [sum(self._weight(term) for term in matched & set(_terms(sentence))) for sentence in sentences]
+        best = max(scores)
+        if best == 0:
+            return section.body
+        kept = [sentence for sentence, score in zip(sentences, scores) if score >= best / 2]
+        answer = " ".join(kept)
+        first_word = answer.split(maxsplit=1)[0].lower().strip("'\"")
+        if section.title and first_word in _PRONOUNS:
+            answer = f"{section.title}: {answer}"
+        return answer
+
+    def match(self, query: str) -> Optional[FastPathMatch]:
+        """
+        Returns the best-matching section if the match is confident enough.
+
+        Args:
+            query: The user's question.
+
+        Returns:
+            FastPathMatch or None if the question should go to the model.
+        """
+        found = self.score(query)
+        if found is None or found.confidence < self.threshold:
+            return None
+        return found
+
+
+# (document hash, threshold) -> answerer, least recently used first
+_answerers: OrderedDict = OrderedDict()
+_answerers_lock = threading.Lock()
+
+
+def get_answerer(text: Union[str, Callable[[], str]], threshold: float = DEFAULT_THRESHOLD,
+                 document_hash: Optional[str] = None) -> ExtractiveAnswerer:
+    """
+    Returns a (cached) answerer for a document, so it is indexed once.
+
+    Answerers are cached by the document's content hash rather than its
+    text, at most `ANSWERER_CACHE_SIZE` of them, and dropped early by
+    `release_answerers` when their document goes away.
+
+    Args:
+        text: The document text, or a function loading it, called only when
+            the answerer isn't cached (e.g. a corpus selection's full text).
+        threshold: Minimum confidence for `match` to return a section.
+        document_hash: A content hash identifying the document, if already
+            known (otherwise `hash_document(text)` is computed).
+
+    Returns:
+        ExtractiveAnswerer: The document's answerer.
+    """
+    if document_hash is None:
+        text = text() if callable(text) else text
+        document_hash = hash_document(text)
+    key = (document_hash, threshold)
+    with _answerers_lock:
+        answerer = _answerers.get(key)
+        if answerer is not None:
+            _answerers.move_to_end(key)
+            return answerer
+    answerer = ExtractiveAnswerer(text() if callable(text) else text, threshold)
+    with _answerers_lock:
+        _answerers[key] = answerer
+        while len(_answerers) > ANSWERER_CACHE_SIZE:
+            _answerers.popitem(last=False)
+    return answerer
+
+
+def release_answerers(document_hash: str):
+    """Drops the cached answerers of a document (e.g. once it was removed or evicted)."""
+    with _answerers_lock:
+        for key in [key for key in _answerers if key[0] == document_hash]:
+            del _answerers[key]
@@ -1,11 +1,42 @@
+import asyncio
+import contextlib
 import os
-import google.generativeai as genai
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
+from core.async_client import AsyncModelRunner
+from core.backends import create_backend_from_env
+from core.context_cache import CACHE_ERRORS, CachedPrompt, ContextCache, ContextCacheConfig
+from core.model_cache import ModelSelectionCache
+from core.model_router import create_router_from_env
+from core.rate_scheduler import INTERACTIVE, PRIORITIES, RateLimitTimeoutError, create_scheduler_from_env
+from core.resilience import RETRIABLE_ERRORS, ResilienceConfig, ResilientCaller
+from core.response_cache import ResponseCache, make_cache_key
+from core.single_flight import AsyncSingleFlight, SingleFlight
+from core.tokens import estimate_tokens
 from helpers.logger import Logger
+from helpers.telemetry import Telemetry
 
 
-# Global singleton instance
+# Global singleton instances
 logger = Logger().get_logger()
+telemetry = Telemetry()
+
+# Shown to the user (in place of an answer) when a request fails
+STREAMING_ERROR_MESSAGE = "An error occurred while processing your request. Please check the logs."
+
+# The exact refusal the system prompt asks for when the document lacks the answer
+NOT_FOUND_MESSAGE = "I am sorry, but the provided document does not contain the answer to this question."
+
+
+def failed_response(text: str) -> bool:
+    """
+    Whether a streamed response failed: it ends with `STREAMING_ERROR_MESSAGE`,
+    which is sent alone before the first chunk or after the partial text
+    already streamed when a request fails mid-stream.
+    """
+    return text.endswith(STREAMING_ERROR_MESSAGE)
+
 
 class GeminiClient:
     """
@@ -14,22 +45,75 @@ class GeminiClient:
     This class encapsulates API configuration, model initialization,
     and response generation, including a critical system prompt
     to ensure the model adheres to its role as a QA analyst.
+
+    The model itself is resolved lazily on the first request: a model
+    name cached on disk is reused without any network call, and only
+    when the cache is cold are the candidates probed (concurrently).
     """
 
-    def __init__(self):
+    # Try different model names as some may not be available on all API keys.
+    # The list is in priority order: the first working model wins.
+    MODEL_NAMES_TO_TRY = [
+        "models/gemini-2.5-flash-preview-05-20",
+        "gemini-1.5-flash",
+        "gemini-1.5-flash-002",
+        "gemini-1.5-flash-latest",
+        "gemini-pro",
+    ]
+
+    def __init__(self, model_cache: ModelSelectionCache = None, response_cache: ResponseCache = None,
+                 max_concurrency: int = None, backend=None, resilience: ResilienceConfig = None,
+                 router=None, pinned_model: str = None, context_cache: ContextCacheConfig = None,
+                 scheduler=None, priority: str = None):
         """
         Initializes the Gemini client.
 
-        Loads the API key, configures the 'genai' module, defines
-        the system instruction, and initializes the GenerativeModel.
+        Loads the API key, configures the backend and defines the system
+        instruction. No API call is made here; the GenerativeModel is
+        created on first use (see `model`).
+
+        Args:
+            model_cache: Optional cache of the selected model name.
+                Defaults to the on-disk `ModelSelectionCache`.
+            response_cache: Optional cache of complete responses, consulted
+                when `get_streaming_response` is told the document and question.
+            max_concurrency: Cap on concurrent requests made through the
+                async API (see `AsyncModelRunner`).
+            backend: Where models come from. Defaults to the backend chosen
+                by the `GEMINI_BACKEND` env var (the live API unless set to
+                the local stand-in; see `core.backends`).
+            resilience: Deadlines, retries, hedging and circuit breaking
+                for upstream calls. Defaults to `ResilienceConfig.from_env()`.
+            router: Optional `ModelRouter` choosing the model per request
+                from observed latency and health. Defaults to the router
+                selected by the `GEMINI_ROUTING` env var (none: requests go
+                to the resolved model, then down the fallback list).
+            pinned_model: If set, every request goes to this model, with
+                no routing or failover (`GEMINI_PINNED_MODEL`). Evaluation
+                runs pin the model so all answers come from one model.
+            context_cache: Upstream caching of documents sent whole, so
+                repeated questions about one document don't resend it.
+                Defaults to `ContextCacheConfig.from_env()` (off unless
+                `CONTEXT_CACHE` is set; see `core.context_cache`).
+            scheduler: Optional `RateScheduler` admitting upstream requests
+                within a shared RPM/TPM quota. Defaults to the process-wide
+                scheduler configured by `GEMINI_RPM`/`GEMINI_TPM` (none if
+                unset; see `core.rate_scheduler`).
+            priority: The scheduling class of this client's requests:
+                "interactive" (default), "batch" or "eval"
+                (`GEMINI_PRIORITY`).
         """
         try:
+            self.backend = backend or create_backend_from_env()
+
             # Load the API key from environment variables [2, 30]
             self.api_key = os.getenv("GOOGLE_API_KEY")
             if not self.api_key:
-                raise ValueError("GOOGLE_API_KEY not found in.env file.")
+                if self.backend.requires_api_key:
+                    raise ValueError("GOOGLE_API_KEY not found in.env file.")
+                self.api_key = ""
 
-            genai.configure(api_key=self.api_key)
+            self.backend.configure(self.api_key)
 
         except Exception as e:
             logger.info(f"Error configuring Gemini: {e}")
@@ -38,13 +122,12 @@ class GeminiClient:
         # This is the core reliability layer for the QA bot.
         # It instructs the model to be faithful to the context.
         # Gemini 1.5+ models support this 'system_instruction' [35]
-        system_prompt = (
+        self.system_prompt = (
             "You are an expert Question-Answering Analyst. You will be given a Document "
             "Context followed by a Question. Your task is to answer the Question "
             "based *only* on the information provided in the Document Context. "
             "Do not use any outside knowledge. If the answer is not found in the "
-            "Document Context, you must state: 'I am sorry, but the provided "
-            "document does not contain the answer to this question.'"
+            f"Document Context, you must state: '{NOT_FOUND_MESSAGE}'"
         )
 
         # Safety settings to block harmful content
@@ -55,61 +138,484 @@ class GeminiClient:
             HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
         }
 
-        # Initialize the model with fallback mechanism
-        # Try different model names as some may not be available on all API keys
-        model_names_to_try = [
-            "models/gemini-2.5-flash-preview-05-20",
-            "gemini-1.5-flash",
-            "gemini-1.5-flash-002",
-            "gemini-1.5-flash-latest",
-            "gemini-pro",
-        ]
-
-        self.model = None
+        self.model_names_to_try = list(self.MODEL_NAMES_TO_TRY)
+        self.model_cache = model_cache or ModelSelectionCache()
+        self._model_cache_key = ModelSelectionCache.make_key(
+            f"{self.backend.name}:{self.api_key}", self.model_names_to_try
+        )
+        self._model = None
+        self._model_from_cache = False
+        self._model_lock = threading.Lock()
+        self.response_cache = response_cache
+        self.async_runner = AsyncModelRunner(max_concurrency)
+        self.single_flight = SingleFlight()
+        self.async_single_flight = AsyncSingleFlight()
+        self.resilience = resilience or ResilienceConfig.from_env()
+        self.caller = ResilientCaller(self.resilience, self._build_model)
+        self.router = router or create_router_from_env()
+        self.pinned_model = pinned_model or os.getenv("GEMINI_PINNED_MODEL")
+        self.context_cache = ContextCache(self.backend, context_cache or ContextCacheConfig.from_env())
+        self.scheduler = scheduler or create_scheduler_from_env()
+        self.priority = priority or os.getenv("GEMINI_PRIORITY", INTERACTIVE)
+        if self.priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {self.priority} (expected one of {', '.join(PRIORITIES)})")
+
+    def _build_model(self, model_name: str):
+        """Creates a model with the client's system prompt and safety settings."""
+        return self.backend.create_model(
+            model_name,
+            system_instruction=self.system_prompt,
+            safety_settings=self.safety_settings
+        )
+
+    def _probe_model(self, model_name: str):
+        """
+        Checks that a model works with a minimal live request.
+
+        Returns:
+            The initialized GenerativeModel. Raises if the model is unusable.
+        """
+        logger.info(f"Trying to initialize model: {model_name}")
+        model = self._build_model(model_name)
+        # Test the model with a simple query, asking for a single token
+        model.generate_content("Hello", generation_config={"max_output_tokens": 1})
+        return model
+
+    def _resolve_model(self):
+        """
+        Picks the model to use, preferring the on-disk cache.
+
+        On a cache miss all candidates are probed concurrently; the
+        highest-priority candidate that succeeds is selected, so the
+        result matches the old sequential fallback but costs roughly one
+        round-trip instead of one per failing candidate.
+        """
+        cached_name = self.model_cache.get(self._model_cache_key)
+        if cached_name:
+            logger.info(f"Using cached model selection: {cached_name}")
+            self._model_from_cache = True
+            return self._build_model(cached_name)
+
         last_error = None
+        executor = ThreadPoolExecutor(max_workers=len(self.model_names_to_try))
+        try:
+            futures = [
+                (model_name, executor.submit(self._probe_model, model_name))
+                for model_name in self.model_names_to_try
+            ]
+            for model_name, future in futures:
+                try:
+                    model = future.result()
+                except Exception as e:
+                    last_error = e
+                    logger.info(f"Failed to initialize {model_name}: {e}")
+                    continue
 
-        for model_name in model_names_to_try:
-            try:
-                logger.info(f"Trying to initialize model: {model_name}")
-                self.model = genai.GenerativeModel(
-                    model_name=model_name,
-                    system_instruction=system_prompt,
-                    safety_settings=self.safety_settings
-                )
-                # Test the model with a simple query
-                test_response = self.model.generate_content("Hello")
                 logger.info(f"Successfully initialized model: {model_name}")
-                break
-            except Exception as e:
-                last_error = e
-                logger.info(f"Failed to initialize {model_name}: {e}")
-                continue
+                self.model_cache.set(self._model_cache_key, model_name)
+                self._model_from_cache = False
+                return model
+        finally:
+            # Lower-priority probes are no longer needed once a winner is known
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        raise ValueError(f"Could not initialize any Gemini model. Last error: {last_error}")
+
+    @property
+    def model(self):
+        """
+        The GenerativeModel in use, resolved on first access.
+
+        Raises:
+            ValueError: If no candidate model could be initialized.
+        """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._resolve_model()
+        return self._model
+
+    @property
+    def model_name(self) -> str:
+        """The name of the model in use: the pinned one, else the resolved one."""
+        return self.pinned_model or self.model.model_name
+
+    def pin_model(self, model_name: str):
+        """Sends every following request to `model_name` only (see `pinned_model`)."""
+        self.pinned_model = model_name
+
+    def invalidate_model(self):
+        """
+        Forgets the current model so the next request resolves it again.
+
+        Used when a model taken from the cache stops working (e.g. it was
+        retired upstream); the cache entry is dropped as well.
+        """
+        with self._model_lock:
+            self._model = None
+            self._model_from_cache = False
+            self.model_cache.invalidate(self._model_cache_key)
+
+    def _model_label(self) -> str:
+        """The model name used in metrics, without forcing model resolution."""
+        model = self._model
+        return model.model_name if model is not None else "unresolved"
+
+    def _response_cache_key(self, document: str, question: str, document_hash: str = None):
+        """Returns the response cache key, or None when caching does not apply."""
+        if self.response_cache is None or document is None or question is None:
+            return None
+        return make_cache_key(document, question, self.model_name, self.system_prompt, document_hash)
+
+    def _flight_key(self, document: str, question: str, cache_key: str = None, document_hash: str = None):
+        """Returns the key identical in-flight requests share, or None."""
+        if document is None or question is None:
+            return None
+        return cache_key or make_cache_key(document, question, self.model_name, self.system_prompt, document_hash)
+
+    def _cache_writer(self, cache_key: str):
+        """Returns the callback storing a completed response, or None."""
+        if cache_key is None:
+            return None
+
+        def write(chunks: list[str]):
+            # Only complete, successful responses are cached
+            if chunks:
+                self.response_cache.set(cache_key, chunks)
+        return write
+
+    @property
+    def coalesced_requests(self) -> int:
+        """Requests that shared another identical request's upstream stream."""
+        return self.single_flight.coalesced + self.async_single_flight.coalesced
+
+    def candidate_models(self) -> list[str]:
+        """The model in use followed by the other fallbacks, in priority order."""
+        primary = self.model_name
+        if self.pinned_model:
+            return [primary]
+        bare = primary.removeprefix("models/")
+        return [primary] + [name for name in self.model_names_to_try if name.removeprefix("models/") != bare]
+
+    def _route(self, prompt_content: str):
+        """
+        Returns the models to try for one request, in order, and the
+        `on_attempt` callback recording the outcome (None without a router).
+        """
+        candidates = self.candidate_models()
+        if self.router is None:
+            ranking, on_attempt = candidates, None
+        else:
+            decision = self.router.route(candidates, estimate_tokens(prompt_content), pinned=self.pinned_model)
+            ranking, on_attempt = decision.ranking, self.router.observer(decision)
+        if self.scheduler is None:
+            return ranking, on_attempt
+        observe_quota = self.scheduler.observer()
+        if on_attempt is None:
+            return ranking, observe_quota
+
+        def observe_both(model_name, ttfc_s, error):
+            on_attempt(model_name, ttfc_s, error)
+            observe_quota(model_name, ttfc_s, error)
+        return ranking, observe_both
+
+    @staticmethod
+    def _text_chunks(model, prompt_content: str):
+        """Yields the non-empty text chunks of one upstream streaming call."""
+        # Call the model, 'stream=True' is key for the interactive UI [2]
+        response_stream = model.generate_content(
+            prompt_content,
+            stream=True
+        )
+        for chunk in response_stream:
+            if chunk.text:
+                yield chunk.text
 
-        if self.model is None:
-            raise ValueError(f"Could not initialize any Gemini model. Last error: {last_error}")
+    def _cached_text_chunks(self, model, prompt_content: str, cached_prompt: CachedPrompt):
+        """
+        Yields the text chunks of one call that reuses the document cached
+        upstream for `model`, or sends `prompt_content` whole if there is
+        no usable cache.
+        """
+        cached_model = self.context_cache.model_for(
+            model.model_name, cached_prompt.context, self.system_prompt, self.safety_settings,
+            cached_prompt.context_hash,
+        )
+        if cached_model is None:
+            yield from self._text_chunks(model, prompt_content)
+            return
+        stream = self._text_chunks(cached_model, cached_prompt.prompt)
+        try:
+            first = next(stream, None)
+        except CACHE_ERRORS as e:
+            # The cache expired or was deleted upstream; forget it and send the document inline
+            logger.info(f"Cached context unusable ({e}); sending the document inline")
+            self.context_cache.invalidate(model.model_name, cached_prompt.context, self.system_prompt,
+                                              cached_prompt.context_hash)
+            yield from self._text_chunks(model, prompt_content)
+            return
+        if first is not None:
+            yield first
+            yield from stream
+
+    async def _acached_text_chunks(self, model, prompt_content: str, cached_prompt: CachedPrompt):
+        """Async counterpart of `_cached_text_chunks`."""
+        # Creating a cache is a blocking upstream call; keep it off the event loop
+        cached_model = await asyncio.to_thread(
+            self.context_cache.model_for,
+            model.model_name, cached_prompt.context, self.system_prompt, self.safety_settings,
+            cached_prompt.context_hash,
+        )
+        if cached_model is not None:
+            stream = self.async_runner.stream(cached_model, cached_prompt.prompt)
+            try:
+                first = await anext(stream, None)
+            except CACHE_ERRORS as e:
+                logger.info(f"Cached context unusable ({e}); sending the document inline")
+                self.context_cache.invalidate(model.model_name, cached_prompt.context, self.system_prompt,
+                                              cached_prompt.context_hash)
+            else:
+                if first is not None:
+                    yield first
+                    async for text in stream:
+                        yield text
+                return
+        async for text in self.async_runner.stream(model, prompt_content):
+            yield text
+
+    def _stream_text(self, prompt_content: str, cached_prompt: CachedPrompt = None):
+        """
+        Streams a response with deadlines, retries, hedging and failover
+        across the fallback models (see `core.resilience`), each attempt
+        once the rate scheduler (if any) has admitted it.
+        """
+        admit = None
+        if self.scheduler is not None:
+            tokens = estimate_tokens(prompt_content)
+
+            def admit(model_name):
+                self.scheduler.acquire(tokens, self.priority)
+        candidates, on_attempt = self._route(prompt_content)
+        if cached_prompt is not None and self.context_cache.enabled:
+            def open_stream(model):
+                return self._cached_text_chunks(model, prompt_content, cached_prompt)
+        else:
+            def open_stream(model):
+                return self._text_chunks(model, prompt_content)
+        yield from self.caller.stream(candidates, open_stream, on_attempt, admit)
+
+    async def _astream_text(self, prompt_content: str, cached_prompt: CachedPrompt = None):
+        """Async counterpart of `_stream_text`, limited by the `AsyncModelRunner`."""
+        admit = None
+        if self.scheduler is not None:
+            tokens = estimate_tokens(prompt_content)
+
+            async def admit(model_name):
+                await self.scheduler.acquire_async(tokens, self.priority)
+        candidates, on_attempt = self._route(prompt_content)
+        if cached_prompt is not None and self.context_cache.enabled:
+            def open_stream(model):
+                return self._acached_text_chunks(model, prompt_content, cached_prompt)
+        else:
+            def open_stream(model):
+                return self.async_runner.stream(model, prompt_content)
+        stream = self.caller.astream(candidates, open_stream, on_attempt, admit)
+        # Closing this stream early must cancel the upstream attempts at once
+        async with contextlib.aclosing(stream):
+            async for text in stream:
+                yield text
 
-    def get_streaming_response(self, prompt_content: str):
+    def get_streaming_response(self, prompt_content: str, document: str = None, question: str = None,
+                               cached_prompt: CachedPrompt = None, document_hash: str = None):
         """
         Generates a response from the Gemini model in a streaming fashion.
 
+        When a response cache is configured and both `document` and
+        `question` are given, a cached answer is replayed chunk by chunk
+        instead of calling the API, and fresh answers are stored once
+        they have streamed completely. Concurrent identical requests
+        (same document, normalized question and model) share a single
+        upstream stream; each receives every chunk from the start.
+
+        Upstream calls are retried (with backoff) on transient errors
+        before the first chunk, optionally hedged, bounded by a deadline,
+        and fail over to the next model when a model's circuit breaker
+        opens (see `core.resilience`).
+
+        Given a `cached_prompt` (the same prompt split into the document
+        and the rest) and with context caching enabled, the document is
+        cached upstream on first use and later requests send only the
+        rest; if the cache is unusable the whole prompt is sent.
+
+        With a rate scheduler, every upstream attempt (retries, hedges and
+        failovers included) first waits for admission in the client's
+        priority class (cache hits and coalesced requests don't); upstream
+        quota errors pause admissions, and the request then waits for
+        admission again rather than retrying.
+
+        Each call is recorded as a `generate` span with time-to-first-chunk
+        and per-model request, cache-hit and error counters (see
+        `helpers.telemetry`; no-ops unless telemetry is enabled).
+
         Args:
             prompt_content: The formatted prompt (context + query).
+            document: Optional document text the prompt was built from.
+            question: Optional raw user question the prompt was built from.
+            cached_prompt: Optional split of the prompt for context caching.
+            document_hash: Optional content hash of `document`, computed once
+                where the document was loaded; saves re-hashing it per question.
 
         Yields:
             str: Chunks of the response text as they are generated.
         """
+        cache_key = None
+        span = telemetry.span("generate", prompt_chars=len(prompt_content))
+        status = "ok"
         try:
-            # Call the model, 'stream=True' is key for the interactive UI [2]
-            response_stream = self.model.generate_content(
-                prompt_content,
-                stream=True
-            )
+            cache_key = self._response_cache_key(document, question, document_hash)
+            if cache_key is not None:
+                cached_chunks = self.response_cache.get(cache_key)
+                if cached_chunks is not None:
+                    logger.info("Serving response from cache")
+                    status = "cache_hit"
+                    telemetry.inc("qa_cache_hits_total", model=self._model_label())
+                    yield from cached_chunks
+                    return
+
+            flight_key = self._flight_key(document, question, cache_key, document_hash)
+            if flight_key is None:
+                stream = self._stream_text(prompt_content, cached_prompt)
+            else:
+                # Identical questions in flight share one upstream stream
+                stream, joined = self.single_flight.stream(
+                    flight_key, lambda: self._stream_text(prompt_content, cached_prompt), self._cache_writer(cache_key)
+                )
+                if joined:
+                    status = "coalesced"
+                    telemetry.inc("qa_coalesced_total", model=self._model_label())
 
             # Yield each text chunk
-            for chunk in response_stream:
-                if chunk.text:
-                    yield chunk.text
+            first_chunk = True
+            for text in stream:
+                if first_chunk:
+                    telemetry.observe("qa_time_to_first_chunk_seconds", span.elapsed(),
+                                      model=self._model_label())
+                    first_chunk = False
+                yield text
+
+        except GeneratorExit:
+            # The consumer stopped reading mid-stream
+            status = "cancelled"
+            raise
 
         except Exception as e:
+            status = "rate_limited" if isinstance(e, RateLimitTimeoutError) else "error"
             logger.info(f"Error generating streaming response: {e}")
-            yield "An error occurred while processing your request. Please check the logs."
+            telemetry.inc("qa_errors_total", model=self._model_label())
+            if self._model_from_cache and not isinstance(e, RETRIABLE_ERRORS):
+                # The cached selection may be stale; re-probe on the next request
+                self.invalidate_model()
+            yield STREAMING_ERROR_MESSAGE
+
+        finally:
+            model_label = self._model_label()
+            telemetry.inc("qa_requests_total", model=model_label, status=status)
+            span.end(model=model_label, status=status)
+
+    async def get_streaming_response_async(self, prompt_content: str, document: str = None,
+                                           question: str = None, cached_prompt: CachedPrompt = None,
+                                           document_hash: str = None):
+        """
+        Asyncio-native counterpart of `get_streaming_response`.
+
+        Requests are limited by the client's `AsyncModelRunner`, so many
+        questions can be awaited concurrently without exceeding the
+        configured concurrency cap. Caching behaves as in the sync API.
+
+        Args:
+            prompt_content: The formatted prompt (context + query).
+            document: Optional document text the prompt was built from.
+            question: Optional raw user question the prompt was built from.
+            cached_prompt: Optional split of the prompt for context caching.
+            document_hash: Optional content hash of `document`, computed once
+                where the document was loaded; saves re-hashing it per question.
+
+        Yields:
+            str: Chunks of the response text as they are generated.
+        """
+        cache_key = None
+        span = telemetry.span("generate", prompt_chars=len(prompt_content), api="async")
+        status = "ok"
+        try:
+            if self._model is None:
+                # Model resolution may probe the API; keep it off the event loop
+                await asyncio.to_thread(lambda: self.model)
+
+            cache_key = self._response_cache_key(document, question, document_hash)
+            if cache_key is not None:
+                cached_chunks = self.response_cache.get(cache_key)
+                if cached_chunks is not None:
+                    logger.info("Serving response from cache")
+                    status = "cache_hit"
+                    telemetry.inc("qa_cache_hits_total", model=self._model_label())
+                    for chunk in cached_chunks:
+                        yield chunk
+                    return
+
+            flight_key = self._flight_key(document, question, cache_key, document_hash)
+            if flight_key is None:
+                stream = self._astream_text(prompt_content, cached_prompt)
+            else:
+                # Identical questions in flight share one upstream stream
+                stream, joined = self.async_single_flight.stream(
+                    flight_key, lambda: self._astream_text(prompt_content, cached_prompt),
+                    self._cache_writer(cache_key),
+                )
+                if joined:
+                    status = "coalesced"
+                    telemetry.inc("qa_coalesced_total", model=self._model_label())
+
+            first_chunk = True
+            async for chunk in stream:
+                if first_chunk:
+                    telemetry.observe("qa_time_to_first_chunk_seconds", span.elapsed(),
+                                      model=self._model_label())
+                    first_chunk = False
+                yield chunk
+
+        except GeneratorExit:
+            # The consumer stopped reading mid-stream
+            status = "cancelled"
+            raise
+
+        except Exception as e:
+            status = "rate_limited" if isinstance(e, RateLimitTimeoutError) else "error"
+            logger.info(f"Error generating streaming response: {e}")
+            telemetry.inc("qa_errors_total", model=self._model_label())
+            if self._model_from_cache and not isinstance(e, RETRIABLE_ERRORS):
+                # The cached selection may be stale; re-probe on the next request
+                self.invalidate_model()
+            yield STREAMING_ERROR_MESSAGE
+
+        finally:
+            model_label = self._model_label()
+            telemetry.inc("qa_requests_total", model=model_label, status=status)
+            span.end(model=model_label, status=status)
+
+    async def get_response_async(self, prompt_content: str, document: str = None,
+                                 question: str = None) -> str:
+        """
+        Generates a complete response asynchronously.
+
+        Args:
+            prompt_content: The formatted prompt (context + query).
+            document: Optional document text the prompt was built from.
+            question: Optional raw user question the prompt was built from.
+
+        Returns:
+            str: The full response text.
+        """
+        chunks = []
+        async for chunk in self.get_streaming_response_async(prompt_content, document, question):
+            chunks.append(chunk)
+        return "".join(chunks)
@@ -0,0 +1,609 @@
+import codecs
+import hashlib
+import multiprocessing
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import BinaryIO, Callable, Iterable, Iterator, Optional
+from xml.etree import ElementTree
+
+from helpers.logger import Logger
+
+
+# Global singleton instance
+logger = Logger().get_logger()
+
+DEFAULT_CHUNK_BYTES = 1024 * 1024
+DEFAULT_WORKERS = 2
+# Encodings are detected from the start of the file only
+SNIFF_BYTES = 64 * 1024
+
+# Document formats
+TEXT = "text"
+HTML = "html"
+DOCX = "docx"
+PDF = "pdf"
+
+EXTENSIONS = {
+    ".txt": TEXT, ".md": TEXT, ".csv": TEXT, ".log": TEXT,
+    ".html": HTML, ".htm": HTML,
+    ".docx": DOCX,
+    ".pdf": PDF,
+}
+# For `st.file_uploader(type=...)`
+SUPPORTED_EXTENSIONS = sorted(extension.lstrip(".") for extension in EXTENSIONS)
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+# Bytes cp1252 leaves undefined; text containing them is decoded as latin-1
+_CP1252_UNDEFINED = frozenset(b"\x81\x8d\x8f\x90\x9d")
+_META_CHARSET = re.compile(rb"<meta[^>]+charset=[\"']?([A-Za-z0-9_.:-]+)", re.IGNORECASE)
+
+_WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+class UnsupportedFormatError(ValueError):
+    """Raised when a file's text can't be extracted."""
+
+
+@dataclass(frozen=True)
+class IngestProgress:
+    """How far the extraction of one file has got."""
+
+    name: str
+    fraction: float
+    chars: int = 0
+
+
+@dataclass(frozen=True)
+class ExtractedDocument:
+    """
+    Text extracted from one file, spooled to disk as UTF-8.
+
+    Attributes:
+        name: The document's name (e.g. its file name).
+        text_path: Where the extracted text was written.
+        format: `text`, `html`, `docx` or `pdf`.
+        encoding: The detected encoding (text and HTML only).
+        size_bytes: Size of the source file.
+        chars: Characters of extracted text.
+        seconds: Time the extraction took.
+    """
+
+    name: str
+    text_path: str
+    format: str
+    encoding: Optional[str]
+    size_bytes: int
+    chars: int
+    seconds: float
+
+    def read_text(self) -> str:
+        with open(self.text_path, encoding="utf-8", newline="") as f:
+            return f.read()
+
+    def discard(self):
+        """Deletes the spooled text."""
+        try:
+            os.remove(self.text_path)
+        except FileNotFoundError:
+            pass
+
+
+def detect_format(name: str, head: bytes) -> str:
+    """
+    Decides how to extract a file's text, from its extension or its first bytes.
+
+    Args:
+        name: The file name.
+        head: The first bytes of the file.
+
+    Returns:
+        str: `text`, `html`, `docx` or `pdf`.
+    """
+    extension = os.path.splitext(name)[1].lower()
+    if extension in EXTENSIONS:
+        return EXTENSIONS[extension]
+    if head.startswith(b"%PDF-"):
+        return PDF
+    if head.startswith(b"PK\x03\x04"):
+        return DOCX
+    start = head[:1024].lstrip().lower()
+    if start.startswith((b"<!doctype html", b"<html")):
+        return HTML
+    return TEXT
+
+
+def detect_encoding(head: bytes, html: bool = False) -> str:
+    """
+    Detects the encoding of a text file from its first bytes.
+
+    Checks, in order: a byte order mark, an HTML `<meta charset>` (if
+    `html`), UTF-16 without a BOM (every other byte zero), UTF-8 validity
+    (a multi-byte character cut off at the end of `head` is fine), and
+    falls back to Windows-1252, or Latin-1 if the bytes aren't valid
+    Windows-1252.
+
+    Args:
+        head: The first bytes of the file (`SNIFF_BYTES` is plenty).
+        html: Whether to look for a `<meta charset>` declaration.
+
+    Returns:
+        str: A Python codec name.
+    """
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    if html:
+        declared = _META_CHARSET.search(head)
+        if declared:
+            try:
+                return codecs.lookup(declared.group(1).decode("ascii")).name
+            except LookupError:
+                pass
+    if len(head) >= 4:
+        half = len(head) // 2
+        if head[1::2].count(0) > 0.4 * half and head[0::2].count(0) < 0.1 * half:
+            return "utf-16-le"
+        if head[0::2].count(0) > 0.4 * half and head[1::2].count(0) < 0.1 * half:
+            return "utf-16-be"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    return "latin-1" if _CP1252_UNDEFINED.intersection(head) else "cp1252"
+
+
+def _read_chunks(stream: BinaryIO, chunk_bytes: int, total: int,
+                 report: Callable[[float], None]) -> Iterator[bytes]:
+    done = 0
+    while True:
+        data = stream.read(chunk_bytes)
+        if not data:
+            return
+        done += len(data)
+        yield data
+        report(done / total if total else 1.0)
+
+
+def _decode(chunks: Iterable[bytes], encoding: str) -> Iterator[str]:
+    """Decodes byte chunks incrementally, normalizing newlines to "\\n"."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    carry = ""
+    for data in chunks:
+        text = carry + decoder.decode(data)
+        # A "\r\n" may be split across chunks
+        carry = "\r" if text.endswith("\r") else ""
+        text = text[:-1] if carry else text
+        if text:
+            yield text.replace("\r\n", "\n").replace("\r", "\n")
+    text = carry + decoder.decode(b"", final=True)
+    if text:
+        yield text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _extract_plain(path: str, encoding: str, chunk_bytes: int, report) -> Iterator[str]:
+    with open(path, "rb") as f:
+        yield from _decode(_read_chunks(f, chunk_bytes, os.path.getsize(path), report), encoding)
+
+
+class _HTMLTextParser(HTMLParser):
+    """Collects the visible text of an HTML document as it is fed."""
+
+    SKIPPED = frozenset({"script", "style", "noscript", "template"})
+    BLOCKS = frozenset({
+        "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "figcaption",
+        "footer", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol",
+        "p", "pre", "section", "table", "td", "th", "title", "tr", "ul",
+    })
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pieces: list[str] = []
+        self._skipping = 0
+        self._preformatted = 0
+        self._at_line_start = True
+        self._space = False
+        self._newlines = 2
+
+    def _break(self):
+        if self._newlines < 2:
+            self.pieces.append("\n")
+            self._newlines += 1
+        self._at_line_start = True
+        self._space = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED:
+            self._skipping += 1
+        elif tag == "pre":
+            self._preformatted += 1
+        if tag in self.BLOCKS:
+            self._break()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag == "pre":
+            self._preformatted = max(0, self._preformatted - 1)
+        if tag in self.BLOCKS:
+            self._break()
+
+    def handle_data(self, data):
+        if self._skipping or not data:
+            return
+        if self._preformatted:
+            self._emit(data)
+            return
+        # Whitespace runs collapse to one space, also across calls
+        words = " ".join(data.split())
+        if data[0].isspace() and not self._at_line_start:
+            self._space = True
+        if words:
+            self._emit((" " if self._space else "") + words)
+            self._space = data[-1].isspace()
+
+    def _emit(self, text: str):
+        self.pieces.append(text)
+        self._newlines = 0
+        self._at_line_start = text.endswith("\n")
+
+    def take(self) -> str:
+        text = "".join(self.pieces)
+        self.pieces = []
+        return text
+
+
+def _extract_html(path: str, encoding: str, chunk_bytes: int, report) -> Iterator[str]:
+    parser = _HTMLTextParser()
+    for text in _extract_plain(path, encoding, chunk_bytes, report):
+        parser.feed(text)
+        text = parser.take()
+        if text:
+            yield text
+    parser.close()
+    text = parser.take()
+    if text:
+        yield text
+
+
+def _extract_docx(path: str, chunk_bytes: int, report) -> Iterator[str]:
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile as e:
+        raise UnsupportedFormatError(f"Not a DOCX file: {e}") from e
+    with archive:
+        try:
+            member = archive.getinfo("word/document.xml")
+        except KeyError:
+            raise UnsupportedFormatError("Not a DOCX file: no word/document.xml") from None
+        with archive.open(member) as xml:
+            # iterparse pulls the XML through in chunks; paragraphs are
+            # dropped from the tree as soon as their text is out
+            stream = _ChunkedReader(_read_chunks(xml, chunk_bytes, member.file_size, report))
+            depth, body, pieces = 0, None, []
+            for event, element in ElementTree.iterparse(stream, events=("start", "end")):
+                if event == "start":
+                    depth += 1
+                    if depth == 2:
+                        body = element
+                    continue
+                depth -= 1
+                tag = element.tag
+                if tag == f"{_WORD_NAMESPACE}t":
+                    pieces.append(element.text or "")
+                elif tag == f"{_WORD_NAMESPACE}tab":
+                    pieces.append("\t")
+                elif tag in (f"{_WORD_NAMESPACE}br", f"{_WORD_NAMESPACE}cr"):
+                    pieces.append("\n")
+                elif tag == f"{_WORD_NAMESPACE}p":
+                    text = "".join(pieces)
+                    pieces = []
+                    if text.strip():
+                        yield text + "\n\n"
+                if depth == 2 and body is not None:
+                    body.clear()
+
+
+class _ChunkedReader:
+    """Minimal file-like view over an iterator of byte chunks (for `iterparse`)."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buffer = b""
+        self._position = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if self._position >= len(self._buffer):
+            self._buffer, self._position = next(self._chunks, b""), 0
+        if size < 0:
+            size = len(self._buffer) - self._position
+        data = self._buffer[self._position:self._position + size]
+        self._position += len(data)
+        return data
+
+
+def _extract_pdf(path: str, report) -> Iterator[str]:
+    try:
+        from pypdf import PdfReader
+        from pypdf.errors import PdfReadError
+    except ImportError as e:
+        raise UnsupportedFormatError("PDF support requires the pypdf package (pip install pypdf)") from e
+    with open(path, "rb") as f:
+        # Given a file object (not a path), pypdf reads pages on demand
+        # instead of loading the whole file
+        try:
+            pages = PdfReader(f).pages
+            for number, page in enumerate(pages, start=1):
+                text = page.extract_text() or ""
+                if text.strip():
+                    yield text.strip() + "\n\n"
+                report(number / len(pages))
+        except PdfReadError as e:
+            raise UnsupportedFormatError(f"Unreadable PDF: {e}") from e
+
+
+def sniff(path: str, name: Optional[str] = None) -> tuple[str, Optional[str]]:
+    """
+    Detects a file's format and (for text and HTML) encoding from its first bytes.
+
+    Args:
+        path: The file to inspect.
+        name: The name to take the extension from (defaults to `path`).
+
+    Returns:
+        tuple: (format, encoding or None).
+    """
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+    document_format = detect_format(name or path, head)
+    if document_format in (TEXT, HTML):
+        return document_format, detect_encoding(head, html=document_format == HTML)
+    return document_format, None
+
+
+def extract_text(
+    path: str,
+    name: Optional[str] = None,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    report: Optional[Callable[[float], None]] = None,
+) -> Iterator[str]:
+    """
+    Extracts a document's text incrementally, a chunk at a time.
+
+    Only about `chunk_bytes` of the source is held in memory at once (PDF
+    pages are read one at a time), so multi-hundred-megabyte files can be
+    processed in constant memory.
+
+    Args:
+        path: The file to read.
+        name: The document's name, for the format (defaults to `path`).
+        chunk_bytes: How much of the file to read at a time.
+        report: Optional callback given the fraction of the file processed.
+
+    Yields:
+        str: Consecutive pieces of the document's text.
+
+    Raises:
+        UnsupportedFormatError: If the file is damaged, or is a PDF and
+            pypdf isn't installed.
+    """
+    report = report or (lambda fraction: None)
+    document_format, encoding = sniff(path, name)
+    if document_format == TEXT:
+        return _extract_plain(path, encoding, chunk_bytes, report)
+    if document_format == HTML:
+        return _extract_html(path, encoding, chunk_bytes, report)
+    if document_format == DOCX:
+        return _extract_docx(path, chunk_bytes, report)
+    return _extract_pdf(path, report)
+
+
+# Set in pool workers by `_init_worker`
+_progress_queue = None
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def extract_to_file(job_id: int, name: str, path: str, output_path: str,
+                    chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> ExtractedDocument:
+    """
+    Extracts a document's text into `output_path` (pool worker entry point).
+
+    Progress is sent to the pool's progress queue as (job_id, fraction,
+    chars) at most once per percent.
+    """
+    start = time.perf_counter()
+    chars = 0
+    last = -1.0
+
+    def report(fraction: float):
+        nonlocal last
+        if _progress_queue is not None and fraction - last >= 0.01:
+            last = fraction
+            _progress_queue.put((job_id, fraction, chars))
+
+    document_format, encoding = sniff(path, name)
+    try:
+        with open(output_path, "w", encoding="utf-8", newline="") as out:
+            for text in extract_text(path, name, chunk_bytes, report):
+                out.write(text)
+                chars += len(text)
+    except BaseException:
+        os.remove(output_path)
+        raise
+    if _progress_queue is not None:
+        _progress_queue.put((job_id, 1.0, chars))
+    return ExtractedDocument(name, output_path, document_format, encoding, os.path.getsize(path), chars,
+                             time.perf_counter() - start)
+
+
+def spool(stream: BinaryIO, directory: Optional[str] = None,
+          chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> tuple[str, str]:
+    """
+    Copies a file-like object to a temporary file, hashing it on the way.
+
+    Args:
+        stream: The binary stream to copy (e.g. a Streamlit upload).
+        directory: Where to create the file (default: the temp directory).
+        chunk_bytes: How much to copy at a time.
+
+    Returns:
+        tuple: (path of the copy, hex SHA-256 of the content). The caller
+        deletes the file.
+    """
+    digest = hashlib.sha256()
+    descriptor, path = tempfile.mkstemp(prefix="upload-", dir=directory)
+    with os.fdopen(descriptor, "wb") as f:
+        while True:
+            data = stream.read(chunk_bytes)
+            if not data:
+                break
+            digest.update(data)
+            f.write(data)
+    return path, digest.hexdigest()
+
+
+class IngestionPool:
+    """
+    Extracts documents' text in a pool of worker processes.
+
+    Extraction (decoding, HTML parsing, DOCX/PDF text extraction) is CPU
+    bound, so running it in separate processes keeps it off the caller's
+    thread (e.g. the Streamlit script) and lets several files be
+    extracted in parallel. Workers stream their output to spool files and
+    report progress through a queue, which `extract_many` relays to the
+    caller while it waits.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                 spool_dir: Optional[str] = None):
+        """
+        Args:
+            max_workers: Number of worker processes.
+            chunk_bytes: How much of a file workers read at a time.
+            spool_dir: Where extracted text is written (default: temp directory).
+        """
+        # Spawned, not forked: the parent runs threads (Streamlit, the logger)
+        context = multiprocessing.get_context("spawn")
+        self.chunk_bytes = chunk_bytes
+        self.spool_dir = spool_dir
+        self._progress = context.Queue()
+        self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                             initializer=_init_worker, initargs=(self._progress,))
+        self._lock = threading.Lock()
+        self._next_job = 0
+        self._latest: dict[int, tuple[float, int]] = {}
+        self._closed = False
+        self._drainer = threading.Thread(target=self._drain, name="ingestion-progress", daemon=True)
+        self._drainer.start()
+
+    @classmethod
+    def from_env(cls) -> "IngestionPool":
+        """Builds a pool sized by the `INGEST_WORKERS` env var."""
+        return cls(max_workers=int(os.getenv("INGEST_WORKERS", DEFAULT_WORKERS)))
+
+    def _drain(self):
+        while not self._closed:
+            try:
+                job_id, fraction, chars = self._progress.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                self._latest[job_id] = (fraction, chars)
+
+    def submit(self, name: str, path: str) -> tuple[int, Future]:
+        """
+        Starts extracting one file.
+
+        Args:
+            name: The document's name (its extension selects the format).
+            path: The file to extract.
+
+        Returns:
+            tuple: (job id, future of the `ExtractedDocument`).
+        """
+        with self._lock:
+            job_id = self._next_job
+            self._next_job += 1
+        descriptor, output_path = tempfile.mkstemp(prefix="extracted-", suffix=".txt", dir=self.spool_dir)
+        os.close(descriptor)
+        future = self._executor.submit(extract_to_file, job_id, name, path, output_path, self.chunk_bytes)
+        return job_id, future
+
+    def progress(self, job_id: int) -> tuple[float, int]:
+        """The latest (fraction, chars extracted) reported for a job."""
+        with self._lock:
+            return self._latest.get(job_id, (0.0, 0))
+
+    def extract_many(
+        self,
+        files: Iterable[tuple[str, str]],
+        on_progress: Optional[Callable[[IngestProgress], None]] = None,
+        poll_s: float = 0.1,
+    ) -> Iterator[tuple[str, Future]]:
+        """
+        Extracts several files in parallel, relaying progress as they run.
+
+        Args:
+            files: (name, path) pairs.
+            on_progress: Called (on the caller's thread) with each file's
+                progress while waiting.
+            poll_s: How often progress is relayed.
+
+        Yields:
+            tuple: (name, completed future) in completion order; the future's
+            `result()` is the `ExtractedDocument` or raises the extraction error.
+        """
+        jobs = {}
+        for name, path in files:
+            job_id, future = self.submit(name, path)
+            jobs[future] = (job_id, name)
+        pending = set(jobs)
+        while pending:
+            done, pending = wait(pending, timeout=poll_s, return_when=FIRST_COMPLETED)
+            if on_progress is not None:
+                for future in pending:
+                    job_id, name = jobs[future]
+                    on_progress(IngestProgress(name, *self.progress(job_id)))
+            for future in done:
+                job_id, name = jobs[future]
+                if future.exception() is None:
+                    document = future.result()
+                    logger.info(f"Extracted {name} ({document.format}, {document.size_bytes} bytes): "
+                                f"{document.chars} chars in {document.seconds:.2f}s")
+                    if on_progress is not None:
+                        on_progress(IngestProgress(name, 1.0, document.chars))
+                with self._lock:
+                    self._latest.pop(job_id, None)
+                yield name, future
+
+    def shutdown(self):
+        self._closed = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._drainer.join(timeout=1)
+        self._progress.close()
+
+    def __enter__(self) -> "IngestionPool":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
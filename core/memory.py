@@ -0,0 +1,233 @@
+import os
+import re
+import threading
+from typing import Callable, Optional
+
+from core.gemini_client import NOT_FOUND_MESSAGE, failed_response
+from core.packing import truncate_to_tokens, turn_tokens
+from core.qa_logic import format_history, format_prompt
+from core.tokens import estimate_tokens
+from helpers.logger import Logger
+from helpers.telemetry import Telemetry
+
+
+# Global singleton instances
+logger = Logger().get_logger()
+telemetry = Telemetry()
+
+# Recent turns are sent verbatim up to this many tokens; older ones are
+# folded into a running summary of at most DEFAULT_SUMMARY_TOKENS
+DEFAULT_RECENT_TOKENS = 2000
+DEFAULT_SUMMARY_TOKENS = 400
+# The last exchange always stays verbatim, however long
+MIN_RECENT_TURNS = 2
+
+# Role of the summary turn in the history handed to `format_prompt`
+SUMMARY_ROLE = "summary"
+
+SUMMARY_INSTRUCTION = (
+    "Summarize the conversation above in at most {words} words, as notes for "
+    "answering follow-up questions: keep every question asked, the facts given "
+    "in the answers (numbers, names, conditions) and what the questions refer to."
+)
+
+_FIRST_SENTENCE = re.compile(r"(?<=[.!?])\s")
+
+# (previous summary, turns to fold in, token limit) -> new summary
+Summarizer = Callable[[str, list[dict], int], str]
+
+
+def summarize_locally(summary: str, turns: list[dict], max_tokens: int) -> str:
+    """
+    Extractive summary: one line per turn, appended to the previous summary.
+
+    Questions are kept whole and answers by their first sentence; when the
+    result exceeds `max_tokens`, the oldest lines go first. No API call.
+
+    Args:
+        summary: The summary of the turns before `turns` ("" if none).
+        turns: The turns to fold in, oldest first.
+        max_tokens: Token limit of the new summary.
+
+    Returns:
+        str: The new summary.
+    """
+    lines = summary.splitlines() if summary else []
+    for turn in turns:
+        content = " ".join(turn["content"].split())
+        if turn["role"] == "user":
+            lines.append(f"- Asked: {content}")
+        else:
+            lines.append(f"- Answered: {_FIRST_SENTENCE.split(content, 1)[0]}")
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return truncate_to_tokens("\n".join(lines), max_tokens)
+
+
+def model_summarizer(client) -> Summarizer:
+    """
+    Summarizer asking the model to fold turns into the running summary.
+
+    Falls back to `summarize_locally` if the request fails (even partway
+    through) or the model declines.
+
+    Args:
+        client: The `GeminiClient` to use.
+
+    Returns:
+        Summarizer: The summarizer function.
+    """
+    def summarize(summary: str, turns: list[dict], max_tokens: int) -> str:
+        previous = [{"role": SUMMARY_ROLE, "content": summary}] if summary else []
+        conversation = format_history(previous + turns)
+        prompt = format_prompt(conversation, SUMMARY_INSTRUCTION.format(words=max(20, max_tokens * 3 // 4)))
+        text = "".join(client.get_streaming_response(prompt)).strip()
+        # A request failing mid-stream leaves partial text before the error message
+        if not text or failed_response(text) or NOT_FOUND_MESSAGE in text:
+            logger.info("History summary request failed, summarizing locally")
+            return summarize_locally(summary, turns, max_tokens)
+        return text
+
+    return summarize
+
+
+class ConversationMemory:
+    """
+    Bounded conversation history for follow-up questions.
+
+    The most recent turns are kept verbatim; once they exceed
+    `recent_tokens`, the oldest are folded into a running summary by the
+    `summarizer`. Compaction is incremental: each turn is summarized once,
+    together with the previous summary, and the summary is reused for
+    every later question. Folding down to half of `recent_tokens` means
+    a summary request is only needed every few turns, and the history
+    sent with each question stays within `recent_tokens + summary_tokens`
+    however long the conversation gets.
+
+    The memory only tracks positions in the caller's list of messages
+    (e.g. `st.session_state.messages`), which remains the full record
+    shown in the UI. `compact_in_background` summarizes on a worker
+    thread; `history` waits for it, so the next question still sees the
+    new summary.
+    """
+
+    def __init__(
+        self,
+        summarizer: Optional[Summarizer] = None,
+        recent_tokens: int = DEFAULT_RECENT_TOKENS,
+        summary_tokens: int = DEFAULT_SUMMARY_TOKENS,
+    ):
+        """
+        Args:
+            summarizer: Folds turns into the summary. Defaults to the local
+                extractive `summarize_locally`; see `model_summarizer`.
+            recent_tokens: Token budget of the turns kept verbatim.
+            summary_tokens: Token limit of the running summary.
+        """
+        self.summarizer = summarizer or summarize_locally
+        self.recent_tokens = recent_tokens
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self.summarized_turns = 0
+        self.compactions = 0
+        self._pending: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, summarizer: Optional[Summarizer] = None) -> "ConversationMemory":
+        """Builds a memory sized by the `HISTORY_RECENT_TOKENS` and `HISTORY_SUMMARY_TOKENS` env vars."""
+        return cls(
+            summarizer,
+            recent_tokens=int(os.getenv("HISTORY_RECENT_TOKENS", DEFAULT_RECENT_TOKENS)),
+            summary_tokens=int(os.getenv("HISTORY_SUMMARY_TOKENS", DEFAULT_SUMMARY_TOKENS)),
+        )
+
+    def reset(self):
+        """Forgets the summary and counters (e.g. when the conversation is cleared)."""
+        self.wait()
+        self.summary = ""
+        self.summarized_turns = 0
+        self.compactions = 0
+
+    def wait(self):
+        """Waits for a compaction started by `compact_in_background`, if any."""
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            pending.join()
+
+    def _sync(self, messages: list[dict]):
+        # The conversation was cleared or replaced
+        if len(messages) < self.summarized_turns:
+            self.reset()
+
+    def history(self, messages: list[dict]) -> list[dict]:
+        """
+        The history to send with the next question.
+
+        Args:
+            messages: The whole conversation so far, oldest first, as
+                {"role", "content"} dicts.
+
+        Returns:
+            list[dict]: The summary (as a `SUMMARY_ROLE` turn, if any) followed
+            by the turns not yet summarized.
+        """
+        self.wait()
+        self._sync(messages)
+        recent = list(messages[self.summarized_turns:])
+        if self.summary:
+            return [{"role": SUMMARY_ROLE, "content": self.summary}] + recent
+        return recent
+
+    def compact(self, messages: list[dict]) -> bool:
+        """
+        Folds the oldest verbatim turns into the summary if they exceed the budget.
+
+        Call it after an answer has been shown, so summarizing never delays
+        an answer (or use `compact_in_background`).
+
+        Args:
+            messages: The whole conversation so far, oldest first.
+
+        Returns:
+            bool: True if turns were summarized.
+        """
+        self._sync(messages)
+        recent = messages[self.summarized_turns:]
+        costs = [turn_tokens(turn) for turn in recent]
+        remaining = sum(costs)
+        if remaining <= self.recent_tokens:
+            return False
+
+        fold = 0
+        while fold < len(recent) - MIN_RECENT_TURNS and remaining > self.recent_tokens // 2:
+            remaining -= costs[fold]
+            fold += 1
+        if not fold:
+            return False
+
+        with telemetry.span("compact_history", turns=fold) as span:
+            summary = self.summarizer(self.summary, list(recent[:fold]), self.summary_tokens)
+            self.summary = truncate_to_tokens(summary, self.summary_tokens)
+            span.set(summary_tokens=estimate_tokens(self.summary))
+        self.summarized_turns += fold
+        self.compactions += 1
+        telemetry.inc("qa_history_compactions_total")
+        logger.info(f"Summarized {fold} conversation turns ({self.summarized_turns} in total)")
+        return True
+
+    def compact_in_background(self, messages: list[dict]) -> threading.Thread:
+        """
+        Runs `compact` on a worker thread, so a summary request doesn't hold
+        up the caller (e.g. a Streamlit rerun); `history` waits for it.
+
+        Args:
+            messages: The whole conversation so far, oldest first (copied).
+
+        Returns:
+            threading.Thread: The started worker.
+        """
+        self.wait()
+        self._pending = threading.Thread(target=self.compact, args=(list(messages),),
+                                         name="compact-history", daemon=True)
+        self._pending.start()
+        return self._pending
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import time
+from typing import Optional
+
+from helpers.logger import Logger
+
+
+# Global singleton instance
+logger = Logger().get_logger()
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "gemini_model.json")
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+
+class ModelSelectionCache:
+    """
+    A small on-disk cache remembering which Gemini model name works.
+
+    Entries are keyed by a hash of the API key and the candidate list, so
+    switching keys or editing the fallback list never reuses a stale
+    answer. Each entry expires after `ttl_seconds`.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_seconds: Optional[float] = None):
+        """
+        Initializes the cache.
+
+        Args:
+            path: Location of the JSON cache file. Defaults to the
+                `GEMINI_MODEL_CACHE_PATH` env var or `.cache/gemini_model.json`.
+            ttl_seconds: How long a cached selection stays valid. Defaults to
+                the `GEMINI_MODEL_CACHE_TTL` env var or 24 hours.
+        """
+        self.path = path or os.getenv("GEMINI_MODEL_CACHE_PATH", DEFAULT_CACHE_PATH)
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("GEMINI_MODEL_CACHE_TTL", DEFAULT_TTL_SECONDS))
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def make_key(api_key: str, candidates: list[str]) -> str:
+        """
+        Builds the cache key for an API key and candidate list.
+
+        Args:
+            api_key: The Gemini API key (only its hash is stored).
+            candidates: The ordered list of model names to try.
+
+        Returns:
+            str: A hex digest identifying the combination.
+        """
+        material = api_key + "\n" + "\n".join(candidates)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError, OSError):
+            return {}
+
+    def _write(self, entries: dict):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Write atomically so concurrent processes never read a partial file
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.info(f"Could not write model cache {self.path}: {e}")
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the cached model name for a key, if present and fresh.
+
+        Args:
+            key: The cache key from `make_key`.
+
+        Returns:
+            Optional[str]: The model name, or None on a miss or expiry.
+        """
+        entry = self._read().get(key)
+        if not entry:
+            return None
+        if time.time() - entry.get("saved_at", 0) > self.ttl_seconds:
+            return None
+        return entry.get("model_name")
+
+    def set(self, key: str, model_name: str):
+        """
+        Stores the working model name for a key.
+
+        Args:
+            key: The cache key from `make_key`.
+            model_name: The model name that succeeded.
+        """
+        entries = self._read()
+        entries[key] = {"model_name": model_name, "saved_at": time.time()}
+        self._write(entries)
+
+    def invalidate(self, key: str):
+        """
+        Removes the entry for a key, forcing the next lookup to re-probe.
+
+        Args:
+            key: The cache key from `make_key`.
+        """
+        entries = self._read()
+        if entries.pop(key, None) is not None:
+            self._write(entries)
@@ -0,0 +1,280 @@
+import atexit
+import json
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from helpers.logger import Logger
+from helpers.telemetry import Telemetry, current_request_id
+
+
+# Global singleton instances
+logger = Logger().get_logger()
+telemetry = Telemetry()
+
+SHORT = "short"
+LONG = "long"
+
+
+@dataclass
+class RouterConfig:
+    """
+    Tuning for adaptive model routing.
+
+    Attributes:
+        window: Samples kept per model and prompt size class.
+        window_s: Samples older than this (seconds) are forgotten, so a
+            model that was slow or failing gets re-explored eventually.
+        min_samples: Below this many samples a model is considered
+            unexplored and is tried before measured models.
+        short_prompt_tokens: Prompts up to this size are "short" and go to
+            the fastest healthy model; longer prompts also weigh quality.
+        quality_weight: For long prompts, the latency penalty per step down
+            the fallback list (0.5: the second model must be 1.5x faster
+            than the first to be preferred).
+        max_error_rate: Models failing more often than this are routed last.
+        max_decisions: Routing decisions kept in memory for export.
+    """
+
+    window: int = 50
+    window_s: float = 600.0
+    min_samples: int = 3
+    short_prompt_tokens: int = 2000
+    quality_weight: float = 0.5
+    max_error_rate: float = 0.5
+    max_decisions: int = 10000
+
+    @classmethod
+    def from_env(cls) -> "RouterConfig":
+        """Builds a config from `GEMINI_ROUTER_*` environment variables."""
+        return cls(
+            window=int(os.getenv("GEMINI_ROUTER_WINDOW", cls.window)),
+            window_s=float(os.getenv("GEMINI_ROUTER_WINDOW_S", cls.window_s)),
+            short_prompt_tokens=int(os.getenv("GEMINI_ROUTER_SHORT_PROMPT_TOKENS", cls.short_prompt_tokens)),
+            quality_weight=float(os.getenv("GEMINI_ROUTER_QUALITY_WEIGHT", cls.quality_weight)),
+        )
+
+
+@dataclass
+class RoutingDecision:
+    """One request's routing decision and what was then observed."""
+
+    request_id: Optional[str]
+    timestamp: float
+    prompt_tokens: int
+    size_class: str
+    ranking: list[str]
+    scores: dict[str, float]
+    pinned: bool = False
+    served_by: Optional[str] = None
+    ttfc_s: Optional[float] = None
+    attempts: list[dict] = field(default_factory=list)
+
+    @property
+    def chosen(self) -> str:
+        return self.ranking[0]
+
+
+class _Window:
+    """Rolling (time, ttfc or None on error) samples for one model and size class."""
+
+    def __init__(self, size: int):
+        self.samples = deque(maxlen=size)
+
+    def prune(self, cutoff: float):
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+
+    def ttfc_p50(self) -> Optional[float]:
+        latencies = [ttfc for _, ttfc in self.samples if ttfc is not None]
+        return statistics.median(latencies) if latencies else None
+
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ttfc in self.samples if ttfc is None) / len(self.samples)
+
+
+class ModelRouter:
+    """
+    Chooses the model for each request from observed latency and health.
+
+    Per model (and per prompt size class) the router keeps a rolling window
+    of time-to-first-chunk and failures. Candidates are ranked by expected
+    time to a first chunk: the median TTFC inflated by the error rate (a
+    failure costs a retry). Short prompts go to the fastest healthy model;
+    for long prompts the fallback list's priority order also counts, so a
+    lighter model only wins if it is clearly faster. Unexplored models are
+    tried first so every candidate gets measured. The ranking is handed to
+    `ResilientCaller`, which still fails over along it.
+    """
+
+    def __init__(self, config: RouterConfig = None, clock=time.monotonic):
+        """
+        Initializes the router.
+
+        Args:
+            config: Routing settings. Defaults to `RouterConfig()`.
+            clock: Time source for sample expiry (tests inject a fake one).
+        """
+        self.config = config or RouterConfig()
+        self._clock = clock
+        self._windows: dict[tuple, _Window] = {}
+        self._lock = threading.Lock()
+        self.decisions = deque(maxlen=self.config.max_decisions)
+
+    def size_class(self, prompt_tokens: int) -> str:
+        return SHORT if prompt_tokens <= self.config.short_prompt_tokens else LONG
+
+    def _window(self, model_name: str, size_class: str) -> _Window:
+        key = (model_name, size_class)
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = _Window(self.config.window)
+        window.prune(self._clock() - self.config.window_s)
+        return window
+
+    def observe(self, model_name: str, prompt_tokens: int, ttfc_s: Optional[float] = None):
+        """
+        Records how an attempt on a model went.
+
+        Args:
+            model_name: The model the attempt went to.
+            prompt_tokens: The prompt size (selects the size class).
+            ttfc_s: Time to the first chunk, or None if the attempt failed.
+        """
+        with self._lock:
+            self._window(model_name, self.size_class(prompt_tokens)).samples.append((self._clock(), ttfc_s))
+
+    def stats(self, model_name: str, size_class: str) -> dict:
+        """Returns the rolling sample count, median TTFC and error rate of a model."""
+        with self._lock:
+            window = self._window(model_name, size_class)
+            return {
+                "samples": len(window.samples),
+                "ttfc_p50_s": window.ttfc_p50(),
+                "error_rate": round(window.error_rate(), 4),
+            }
+
+    def _score(self, window: _Window, priority: int, size_class: str) -> float:
+        if len(window.samples) < self.config.min_samples:
+            return 0.0  # unexplored: try it
+        error_rate = window.error_rate()
+        ttfc = window.ttfc_p50()
+        if ttfc is None:
+            return float("inf")
+        # Each failure costs roughly another attempt
+        expected = ttfc / max(0.05, 1.0 - error_rate)
+        if error_rate > self.config.max_error_rate:
+            expected += 1e6
+        if size_class == LONG:
+            expected *= 1.0 + self.config.quality_weight * priority
+        return expected
+
+    def route(self, candidates: list[str], prompt_tokens: int, pinned: Optional[str] = None) -> RoutingDecision:
+        """
+        Ranks the candidate models for one request.
+
+        Args:
+            candidates: Model names in fallback-list priority order.
+            prompt_tokens: The prompt size.
+            pinned: If set, the only model to use (e.g. in evaluation runs,
+                where answers must all come from one model).
+
+        Returns:
+            RoutingDecision: The ranking, best first. Pass
+            `observer(decision)` to the caller to record the outcome.
+        """
+        size_class = self.size_class(prompt_tokens)
+        if pinned:
+            ranking, scores = [pinned], {}
+        else:
+            with self._lock:
+                scores = {
+                    name: self._score(self._window(name, size_class), priority, size_class)
+                    for priority, name in enumerate(candidates)
+                }
+            # Stable sort: ties keep the fallback-list order
+            ranking = sorted(candidates, key=lambda name: scores[name])
+        decision = RoutingDecision(
+            request_id=current_request_id(),
+            timestamp=time.time(),
+            prompt_tokens=prompt_tokens,
+            size_class=size_class,
+            ranking=ranking,
+            # inf (no successful sample yet) is exported as null
+            scores={name: round(score, 4) if score != float("inf") else None for name, score in scores.items()},
+            pinned=bool(pinned),
+        )
+        with self._lock:
+            self.decisions.append(decision)
+        telemetry.inc("qa_routed_total", model=decision.chosen, size=size_class)
+        return decision
+
+    def observer(self, decision: RoutingDecision):
+        """
+        Returns the `on_attempt` callback for `ResilientCaller` that feeds
+        a request's attempts into the rolling stats and its decision.
+        """
+        def on_attempt(model_name: str, ttfc_s: Optional[float], error: Optional[Exception]):
+            self.observe(model_name, decision.prompt_tokens, ttfc_s)
+            decision.attempts.append({
+                "model": model_name,
+                "ttfc_s": round(ttfc_s, 4) if ttfc_s is not None else None,
+                "error": type(error).__name__ if error is not None else None,
+            })
+            if ttfc_s is not None:
+                decision.served_by = model_name
+                decision.ttfc_s = round(ttfc_s, 4)
+        return on_attempt
+
+    def export_decisions(self, path: str) -> int:
+        """
+        Writes the routing decisions kept in memory as JSON lines.
+
+        Args:
+            path: Destination file (`{pid}` is replaced by the process ID).
+
+        Returns:
+            int: The number of decisions written.
+        """
+        path = path.replace("{pid}", str(os.getpid()))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            decisions = [asdict(decision) for decision in self.decisions]
+        with open(path, "w", encoding="utf-8") as f:
+            for decision in decisions:
+                f.write(json.dumps(decision) + "\n")
+        logger.info(f"Routing decisions written to {path} ({len(decisions)} decisions)")
+        return len(decisions)
+
+
+def create_router_from_env() -> Optional[ModelRouter]:
+    """
+    Creates the router selected by the `GEMINI_ROUTING` env var.
+
+    * `fixed` (default): no router; the fallback list's order is used.
+    * `adaptive`: a `ModelRouter` configured from `GEMINI_ROUTER_*` vars.
+      With `GEMINI_ROUTER_EXPORT_PATH` set, decisions are written there
+      (JSON lines) at exit.
+
+    Returns:
+        The router, or None for fixed routing.
+    """
+    kind = os.getenv("GEMINI_ROUTING", "fixed").lower()
+    if kind == "fixed":
+        return None
+    if kind != "adaptive":
+        raise ValueError(f"Unknown GEMINI_ROUTING: {kind}")
+    router = ModelRouter(RouterConfig.from_env())
+    export_path = os.getenv("GEMINI_ROUTER_EXPORT_PATH")
+    if export_path:
+        atexit.register(router.export_decisions, export_path)
+    logger.info("Using adaptive model routing")
+    return router
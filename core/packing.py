@@ -0,0 +1,128 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+from core.retrieval import DEFAULT_TOP_K
+from core.tokens import estimate_tokens, tokens_to_chars
+
+# Share of the budget conversation history may take when the document
+# wants the rest; history can use more when the document is small
+DEFAULT_HISTORY_SHARE = 0.25
+
+# How the document context was fitted into the budget
+FULL = "full"              # the whole document
+RETRIEVAL = "retrieval"    # the most relevant excerpts (via the index)
+TRUNCATED = "truncated"    # the document's beginning (no index to select with)
+NONE = "none"              # no room left for the document
+
+
+@dataclass
+class PackedPrompt:
+    """The parts of a prompt chosen to fit a token budget, with their sizes."""
+
+    budget_tokens: int
+    fixed_tokens: int
+    context: str = ""
+    context_tokens: int = 0
+    strategy: str = NONE
+    history: list[dict] = field(default_factory=list)
+    history_tokens: int = 0
+    dropped_turns: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        """Estimated tokens of the whole request (system prompt included)."""
+        return self.fixed_tokens + self.history_tokens + self.context_tokens
+
+    @property
+    def remaining_tokens(self) -> int:
+        return self.budget_tokens - self.total_tokens
+
+
+def turn_tokens(turn: dict) -> int:
+    """Estimated tokens of one conversation turn ({"role", "content"}) as rendered."""
+    return estimate_tokens(turn["content"]) + 2  # role label and separator
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """The start of `text` within about `tokens` tokens, cut at whitespace."""
+    limit = tokens_to_chars(tokens)
+    while limit > 0:
+        cut = text[:limit]
+        if limit < len(text):
+            space = cut.rfind(" ", limit // 2)
+            cut = cut[:space] if space > 0 else cut
+        if estimate_tokens(cut) <= tokens:
+            return cut
+        limit = int(limit * 0.9)
+    return ""
+
+
+def pack_prompt(
+    query: str,
+    budget_tokens: int,
+    context: str = "",
+    index=None,
+    system_prompt: str = "",
+    history: Optional[list[dict]] = None,
+    context_budget_tokens: Optional[int] = None,
+    history_share: float = DEFAULT_HISTORY_SHARE,
+    overhead_tokens: int = 0,
+    top_k: int = DEFAULT_TOP_K,
+) -> PackedPrompt:
+    """
+    Fits system prompt, question, conversation history and document
+    content into a token budget.
+
+    The system prompt, question and template are always sent. Of what is
+    left, the document gets what it needs up to `context_budget_tokens`,
+    but recent history is guaranteed `history_share` of it; history is
+    kept newest first and older turns are dropped whole. The document is
+    then fitted into the remaining space: whole if it fits, otherwise its
+    most relevant excerpts if an `index` is given, else its beginning.
+
+    Args:
+        query: The user's question.
+        budget_tokens: Total input token budget of the request.
+        context: The full document text.
+        index: Optional retrieval index over `context` (anything with
+            `build_context` and `total_tokens`, e.g. `DocumentIndex`).
+        system_prompt: The model's system instruction.
+        history: Earlier turns, oldest first, as {"role", "content"} dicts.
+        context_budget_tokens: Optional cap on the document's share.
+        history_share: Share of the free budget reserved for history.
+        overhead_tokens: Tokens of the prompt template itself.
+        top_k: Maximum number of chunks to retrieve when using the index.
+
+    Returns:
+        PackedPrompt: The chosen context and history, with token counts.
+    """
+    history = history or []
+    fixed = estimate_tokens(system_prompt) + estimate_tokens(query) + overhead_tokens
+    packed = PackedPrompt(budget_tokens=budget_tokens, fixed_tokens=fixed)
+    available = max(0, budget_tokens - fixed)
+
+    document_cap = available if context_budget_tokens is None else min(context_budget_tokens, available)
+    document_tokens = index.total_tokens if index is not None else estimate_tokens(context)
+    history_cap = max(int(available * history_share), available - min(document_tokens, document_cap))
+
+    for position in range(len(history) - 1, -1, -1):
+        cost = turn_tokens(history[position])
+        if packed.history_tokens + cost > history_cap:
+            packed.dropped_turns = position + 1
+            break
+        packed.history_tokens += cost
+    packed.history = history[packed.dropped_turns:]
+
+    context_budget = min(document_cap, available - packed.history_tokens)
+    if (not context and index is None) or context_budget <= 0:
+        return packed
+    if index is not None:
+        packed.context = index.build_context(query, top_k=top_k, token_budget=context_budget)
+        packed.strategy = FULL if document_tokens <= context_budget else RETRIEVAL
+        packed.context_tokens = estimate_tokens(packed.context)
+    elif document_tokens <= context_budget:
+        packed.context, packed.context_tokens, packed.strategy = context, document_tokens, FULL
+    else:
+        packed.context, packed.strategy = truncate_to_tokens(context, context_budget), TRUNCATED
+        packed.context_tokens = estimate_tokens(packed.context)
+    return packed
@@ -1,4 +1,52 @@
-def format_prompt(context: str, query: str) -> str:
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Iterator, Optional
+
+from core.context_cache import CachedPrompt
+from core.fast_path import ANSWER, FastPathConfig, get_answerer
+from core.gemini_client import NOT_FOUND_MESSAGE, failed_response
+from core.packing import DEFAULT_HISTORY_SHARE, FULL, PackedPrompt, pack_prompt
+from core.retrieval import DEFAULT_TOKEN_BUDGET, DEFAULT_TOP_K, DocumentIndex, chunk_document
+from core.tokens import estimate_tokens
+from helpers.logger import Logger
+from helpers.telemetry import Telemetry
+
+
+# Global singleton instances
+logger = Logger().get_logger()
+telemetry = Telemetry()
+
+# Gemini Flash models accept ~1M input tokens; keep headroom for the
+# system prompt, the question and the estimate's error margin.
+DEFAULT_CONTEXT_WINDOW_TOKENS = int(os.getenv("MODEL_CONTEXT_WINDOW_TOKENS", 1_000_000))
+PROMPT_RESERVE_TOKENS = 4000
+DEFAULT_MAP_WORKERS = 4
+
+# Labels of conversation turns in the prompt, by `st.session_state.messages` role
+ROLE_LABELS = {"user": "User", "assistant": "Assistant", "summary": "Summary of earlier turns"}
+
+
+def format_history(history: list[dict]) -> str:
+    """Renders earlier conversation turns for the prompt ("" if there are none)."""
+    if not history:
+        return ""
+    turns = "\n".join(f"{ROLE_LABELS.get(turn['role'], turn['role'])}: {turn['content']}" for turn in history)
+    return f"Conversation so far:\n{turns}\n\n"
+
+
+def format_prompt(
+    context: str,
+    query: str,
+    index: Optional[DocumentIndex] = None,
+    top_k: int = DEFAULT_TOP_K,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    history: Optional[list[dict]] = None,
+    system_prompt: str = "",
+    prompt_budget: int = DEFAULT_CONTEXT_WINDOW_TOKENS,
+) -> str:
     """
     Constructs the final prompt string to be sent to the Gemini API.
 
@@ -6,24 +54,474 @@ def format_prompt(context: str, query: str) -> str:
     which improves the model's ability to differentiate between the two
     and adhere to the system instructions.
 
+    When a retrieval `index` is given, only the document excerpts most
+    relevant to the query (up to `token_budget` tokens) are included
+    instead of the full document. Everything is fitted into
+    `prompt_budget` tokens by `pack_prompt`: the system prompt and the
+    question always, then recent conversation history and the document.
+
     Args:
         context: The full text of the uploaded document.
         query: The user's question.
+        index: Optional retrieval index built from `context` at upload time:
+            a `DocumentIndex`, or a `CorpusSelection` over several
+            documents of the persistent corpus.
+        top_k: Maximum number of chunks to retrieve when using the index.
+        token_budget: Maximum estimated tokens of document context.
+        history: Earlier turns, oldest first, as {"role", "content"} dicts.
+        system_prompt: The system instruction sent with the prompt (only
+            counted against the budget).
+        prompt_budget: Maximum estimated input tokens of the request.
 
     Returns:
         str: The fully formatted prompt.
     """
+    return _pack_and_render(context, query, index, top_k, token_budget, history, system_prompt,
+                            prompt_budget)[0]
+
+
+class ContextPrompter:
+    """
+    Formats prompts for many questions about one document.
+
+    The document is measured and rendered into the prompt prefix once;
+    each question then only renders the short suffix. Prompts are the
+    same as `format_prompt(context, query, ...)` without an index or
+    history, which a question falls back to if the whole document would
+    not fit beside it.
+    """
+
+    def __init__(self, context: str, system_prompt: str = "",
+                 prompt_budget: int = DEFAULT_CONTEXT_WINDOW_TOKENS):
+        """
+        Args:
+            context: The full text of the document.
+            system_prompt: The system instruction sent with the prompts
+                (only counted against the budget).
+            prompt_budget: Maximum estimated input tokens of a request.
+        """
+        self.context = context
+        self.system_prompt = system_prompt
+        self.prompt_budget = prompt_budget
+        self.prefix = _render_prefix(context)
+        # Everything but the question, as `pack_prompt` counts it
+        self._fixed_tokens = estimate_tokens(system_prompt) + _template_tokens() + estimate_tokens(context)
+
+    def format(self, query: str) -> str:
+        """Returns the prompt for one question about the document."""
+        if self._fixed_tokens + estimate_tokens(query) <= self.prompt_budget:
+            return self.prefix + _render_suffix(query)
+        return format_prompt(self.context, query, system_prompt=self.system_prompt,
+                             prompt_budget=self.prompt_budget)
+
+
+def split_for_context_cache(packed: PackedPrompt, query: str,
+                            context_hash: Optional[str] = None) -> Optional[CachedPrompt]:
+    """
+    Splits a prompt into the document and the rest, for upstream context
+    caching (see `core.context_cache`).
+
+    Only prompts carrying the whole document are split: retrieved
+    excerpts and truncated documents change from question to question,
+    so caching them would not be reused.
+
+    Args:
+        packed: How the prompt was packed.
+        query: The user's question.
+        context_hash: A content hash of `packed.context`, if known.
+
+    Returns:
+        Optional[CachedPrompt]: The split prompt, or None if it isn't cacheable.
+    """
+    if packed.strategy != FULL or not packed.context:
+        return None
+    # The template puts the document first, so the rest renders without it
+    return CachedPrompt(packed.context, _render_prompt("", query, format_history(packed.history)), context_hash)
+
 
+def _pack_and_render(context, query, index, top_k, token_budget, history, system_prompt,
+                     prompt_budget) -> tuple[str, PackedPrompt]:
+    with telemetry.span("format_prompt", retrieval=index is not None) as span:
+        packed = pack_prompt(
+            query,
+            prompt_budget,
+            context=context,
+            index=index,
+            system_prompt=system_prompt,
+            history=history,
+            context_budget_tokens=token_budget if index is not None else None,
+            history_share=DEFAULT_HISTORY_SHARE,
+            overhead_tokens=_template_tokens(),
+            top_k=top_k,
+        )
+        prompt = _render_prompt(packed.context, query, format_history(packed.history))
+        span.set(prompt_chars=len(prompt), prompt_tokens=packed.total_tokens, strategy=packed.strategy,
+                 dropped_turns=packed.dropped_turns)
+    return prompt, packed
+
+
+def _render_prompt(context: str, query: str, conversation: str = "") -> str:
     # Structured prompting is crucial for accuracy [7, 8]
-    prompt = f"""
+    return _render_prefix(context) + _render_suffix(query, conversation)
+
+
+def _render_prefix(context: str) -> str:
+    """The part of the prompt before the conversation and question: the document."""
+    return f"""
 
 {context}
 
 
 
-{query}
+"""
+
+
+def _render_suffix(query: str, conversation: str = "") -> str:
+    """The rest of the prompt: the conversation, the question and the answer cue."""
+    return f"""{conversation}{query}
 
 
 Answer:
 """
-    return prompt
\ No newline at end of file
+
+
+def _template_tokens() -> int:
+    """Estimated tokens the prompt template adds around its parts."""
+    return estimate_tokens(_render_prompt("", ""))
+
+
+@dataclass
+class MapReduceTimings:
+    """Per-stage timings of a map-reduce answer, filled in as it runs."""
+
+    sections: int = 0
+    sections_with_answer: int = 0
+    split_s: float = 0.0
+    map_s: float = 0.0
+    reduce_first_chunk_s: float = 0.0
+    reduce_s: float = 0.0
+    total_s: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "sections": self.sections,
+            "sections_with_answer": self.sections_with_answer,
+            "split_s": round(self.split_s, 3),
+            "map_s": round(self.map_s, 3),
+            "reduce_first_chunk_s": round(self.reduce_first_chunk_s, 3),
+            "reduce_s": round(self.reduce_s, 3),
+            "total_s": round(self.total_s, 3),
+        }
+
+
+def needs_map_reduce(context: Optional[str], context_window_tokens: int = DEFAULT_CONTEXT_WINDOW_TOKENS,
+                     index: Optional[DocumentIndex] = None) -> bool:
+    """
+    Decides, from a local token estimate, whether a document is too large
+    to be sent to the model in a single prompt.
+
+    Args:
+        context: The full document text (None to use the `index`'s size).
+        context_window_tokens: The model's input limit in tokens.
+        index: Optional retrieval index over the document.
+
+    Returns:
+        bool: True if the document must be answered with map-reduce.
+    """
+    tokens = index.total_tokens if context is None else estimate_tokens(context)
+    return tokens > context_window_tokens - PROMPT_RESERVE_TOKENS
+
+
+def format_reduce_prompt(partial_answers: list[tuple[int, str]], query: str) -> str:
+    """
+    Builds the final prompt that merges per-section answers.
+
+    Args:
+        partial_answers: (section number, answer) pairs from the map step.
+        query: The user's question.
+
+    Returns:
+        str: The formatted prompt.
+    """
+    context = "\n\n".join(
+        f"Partial answer from document section {number}:\n{answer.strip()}"
+        for number, answer in partial_answers
+    )
+    return format_prompt(context, query)
+
+
+def answer_map_reduce(
+    client,
+    context: str,
+    query: str,
+    context_window_tokens: int = DEFAULT_CONTEXT_WINDOW_TOKENS,
+    max_workers: int = DEFAULT_MAP_WORKERS,
+    timings: Optional[MapReduceTimings] = None,
+) -> Iterator[str]:
+    """
+    Answers a question about a document larger than the context window.
+
+    Map: the document is split into window-sized sections and the question
+    is asked against each section concurrently. Reduce: the sections that
+    produced an answer are merged in one final call, which is streamed.
+
+    Args:
+        client: The `GeminiClient` to use.
+        context: The full document text.
+        query: The user's question.
+        context_window_tokens: The model's input limit in tokens.
+        max_workers: Number of concurrent map requests.
+        timings: Optional `MapReduceTimings` filled in per stage.
+
+    Yields:
+        str: Chunks of the final (reduced) answer.
+    """
+    if timings is None:
+        timings = MapReduceTimings()
+    start = time.perf_counter()
+    partial_answers = _map_sections(client, context, query, context_window_tokens, max_workers, timings)
+
+    reduce_start = time.perf_counter()
+    if not partial_answers:
+        yield NOT_FOUND_MESSAGE
+    else:
+        first = True
+        for chunk in client.get_streaming_response(format_reduce_prompt(partial_answers, query)):
+            if first:
+                timings.reduce_first_chunk_s = time.perf_counter() - reduce_start
+                first = False
+            yield chunk
+    _finish_map_reduce(timings, start, reduce_start)
+
+
+async def answer_map_reduce_async(
+    client,
+    context: str,
+    query: str,
+    context_window_tokens: int = DEFAULT_CONTEXT_WINDOW_TOKENS,
+    max_workers: int = DEFAULT_MAP_WORKERS,
+    timings: Optional[MapReduceTimings] = None,
+) -> AsyncIterator[str]:
+    """
+    Asyncio counterpart of `answer_map_reduce`: the map step runs in a
+    worker thread and the reduce step is streamed with
+    `get_streaming_response_async`, chunk by chunk.
+
+    Args:
+        client: The `GeminiClient` to use.
+        context: The full document text.
+        query: The user's question.
+        context_window_tokens: The model's input limit in tokens.
+        max_workers: Number of concurrent map requests.
+        timings: Optional `MapReduceTimings` filled in per stage.
+
+    Yields:
+        str: Chunks of the final (reduced) answer.
+    """
+    if timings is None:
+        timings = MapReduceTimings()
+    start = time.perf_counter()
+    partial_answers = await asyncio.to_thread(_map_sections, client, context, query, context_window_tokens,
+                                              max_workers, timings)
+
+    reduce_start = time.perf_counter()
+    if not partial_answers:
+        yield NOT_FOUND_MESSAGE
+    else:
+        first = True
+        async for chunk in client.get_streaming_response_async(format_reduce_prompt(partial_answers, query)):
+            if first:
+                timings.reduce_first_chunk_s = time.perf_counter() - reduce_start
+                first = False
+            yield chunk
+    _finish_map_reduce(timings, start, reduce_start)
+
+
+def _map_sections(client, context, query, context_window_tokens, max_workers,
+                  timings: MapReduceTimings) -> list[tuple[int, str]]:
+    """The map step: asks every section concurrently, returns the (number, answer) pairs worth reducing."""
+    start = time.perf_counter()
+    section_tokens = context_window_tokens - PROMPT_RESERVE_TOKENS
+    sections = chunk_document(context, section_tokens, overlap_tokens=min(200, section_tokens // 10))
+    timings.sections = len(sections)
+    timings.split_s = time.perf_counter() - start
+
+    def ask(section) -> str:
+        prompt = format_prompt(section.text, query)
+        return "".join(client.get_streaming_response(prompt, document=section.text, question=query))
+
+    map_start = time.perf_counter()
+    map_span = telemetry.span("map", sections=len(sections))
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sections)))) as executor:
+        answers = list(executor.map(ask, sections))
+    timings.map_s = time.perf_counter() - map_start
+    map_span.end()
+
+    # Sections that don't contain the answer reply with the standard refusal;
+    # failed sections (including ones cut off mid-stream) are dropped rather
+    # than fed into the reduce step
+    partial_answers = [
+        (number, answer) for number, answer in enumerate(answers, start=1)
+        if answer.strip() and NOT_FOUND_MESSAGE not in answer and not failed_response(answer)
+    ]
+    timings.sections_with_answer = len(partial_answers)
+    return partial_answers
+
+
+def _finish_map_reduce(timings: MapReduceTimings, start: float, reduce_start: float):
+    timings.reduce_s = time.perf_counter() - reduce_start
+    timings.total_s = time.perf_counter() - start
+    logger.info(f"Map-reduce answer timings: {timings.as_dict()}")
+
+
+@dataclass
+class _AnswerPlan:
+    """How `answer_question` answers: locally, with map-reduce, or with one streamed call."""
+
+    answer: Optional[str] = None            # answered by the fast path
+    map_reduce_text: Optional[str] = None   # too large: map-reduce over this text
+    prompt: str = ""
+    request: dict = field(default_factory=dict)  # the streaming call's other arguments
+
+
+def answer_question(
+    client,
+    context: Optional[str],
+    query: str,
+    index: Optional[DocumentIndex] = None,
+    context_window_tokens: int = DEFAULT_CONTEXT_WINDOW_TOKENS,
+    timings: Optional[MapReduceTimings] = None,
+    fast_path: Optional[FastPathConfig] = None,
+    history: Optional[list[dict]] = None,
+    document_hash: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Answers a question, choosing the strategy from the document size.
+
+    Documents that fit the context window go through `format_prompt`
+    (with retrieval if an `index` is given) in a single streamed call;
+    larger ones are answered with `answer_map_reduce`.
+
+    With the `fast_path` enabled, FAQ-style documents are first matched
+    locally (`core.fast_path`): a confident match is answered from the
+    matched section directly, or only that section is sent upstream.
+    Questions with a `history` skip the fast path.
+
+    Earlier turns in `history` (e.g. from `ConversationMemory.history`)
+    are sent with the question so follow-ups can refer to them; they are
+    part of the response cache key, since the same follow-up means
+    different things in different conversations.
+
+    When the whole document is sent and the client has context caching
+    enabled, the document is cached upstream once and later questions
+    about it send only the history and the question. The HTTP API
+    answers the same way through `answer_question_async`.
+
+    With an `index`, `context` may be None: the prompt is then built from
+    the index alone and the full text (`index.text`) is only loaded when
+    map-reduce or the fast path needs it, which for a `CorpusSelection`
+    saves reading every selected document on each question.
+
+    Args:
+        client: The `GeminiClient` to use.
+        context: The full document text (or None if an `index` is given).
+        query: The user's question.
+        index: Optional retrieval index built from `context` (a
+            `DocumentIndex` or a `CorpusSelection`).
+        context_window_tokens: The model's input limit in tokens.
+        timings: Optional `MapReduceTimings`, filled in if map-reduce is used.
+        fast_path: Optional local fast-path settings (off if None).
+        history: Earlier turns, oldest first, as {"role", "content"} dicts.
+        document_hash: Optional content hash of `context`, computed once where
+            the document was loaded, for the cache keys.
+
+    Yields:
+        str: Chunks of the answer.
+    """
+    plan = _plan_answer(client, context, query, index, context_window_tokens, fast_path, history, document_hash)
+    if plan.answer is not None:
+        yield plan.answer
+    elif plan.map_reduce_text is not None:
+        yield from answer_map_reduce(client, plan.map_reduce_text, query, context_window_tokens, timings=timings)
+    else:
+        yield from client.get_streaming_response(plan.prompt, **plan.request)
+
+
+async def answer_question_async(
+    client,
+    context: Optional[str],
+    query: str,
+    index: Optional[DocumentIndex] = None,
+    context_window_tokens: int = DEFAULT_CONTEXT_WINDOW_TOKENS,
+    timings: Optional[MapReduceTimings] = None,
+    fast_path: Optional[FastPathConfig] = None,
+    history: Optional[list[dict]] = None,
+    document_hash: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    Asyncio counterpart of `answer_question`, with the same strategy
+    choice: the fast path, prompt packing and retrieval run in a worker
+    thread, then the answer (including a map-reduce's reduce step) is
+    streamed with `get_streaming_response_async`.
+
+    Args:
+        client: The `GeminiClient` to use.
+        context: The full document text (or None if an `index` is given).
+        query: The user's question.
+        index: Optional retrieval index built from `context`.
+        context_window_tokens: The model's input limit in tokens.
+        timings: Optional `MapReduceTimings`, filled in if map-reduce is used.
+        fast_path: Optional local fast-path settings (off if None).
+        history: Earlier turns, oldest first, as {"role", "content"} dicts.
+        document_hash: Optional content hash of `context`, for the cache keys.
+
+    Yields:
+        str: Chunks of the answer.
+    """
+    plan = await asyncio.to_thread(_plan_answer, client, context, query, index, context_window_tokens, fast_path,
+                                   history, document_hash)
+    if plan.answer is not None:
+        yield plan.answer
+        return
+    if plan.map_reduce_text is not None:
+        chunks = answer_map_reduce_async(client, plan.map_reduce_text, query, context_window_tokens, timings=timings)
+    else:
+        chunks = client.get_streaming_response_async(plan.prompt, **plan.request)
+    async for chunk in chunks:
+        yield chunk
+
+
+def _plan_answer(client, context, query, index, context_window_tokens, fast_path, history,
+                 document_hash) -> _AnswerPlan:
+    # A follow-up may only make sense with the history; it goes to the model
+    if fast_path is not None and fast_path.enabled and not history:
+        with telemetry.span("fast_path", mode=fast_path.mode) as span:
+            text = (lambda: index.text) if context is None else context
+            found = get_answerer(text, fast_path.threshold, document_hash).match(query)
+            outcome = "fallback" if found is None else fast_path.mode
+            span.set(outcome=outcome, confidence=found.confidence if found else None)
+        telemetry.inc("qa_fast_path_total", outcome=outcome)
+        if found is not None:
+            logger.info(f"Fast path: section {found.section.number} matched (confidence {found.confidence})")
+            if fast_path.mode == ANSWER:
+                return _AnswerPlan(answer=found.answer)
+            context, index, document_hash = found.section.text, None, None
+
+    if needs_map_reduce(context, context_window_tokens, index):
+        logger.info("Document exceeds the context window, answering with map-reduce")
+        return _AnswerPlan(map_reduce_text=index.text if context is None else context)
+
+    prompt, packed = _pack_and_render(context, query, index, DEFAULT_TOP_K, DEFAULT_TOKEN_BUDGET, history,
+                                      getattr(client, "system_prompt", ""), context_window_tokens)
+    request = {
+        "document": packed.context if context is None else context,
+        "question": format_history(history) + query if history else query,
+        "document_hash": document_hash,
+    }
+    context_cache = getattr(client, "context_cache", None)
+    if context_cache is not None and context_cache.enabled:
+        # The hash identifies the whole document, which is what a FULL prompt carries
+        cached_prompt = split_for_context_cache(packed, query, document_hash if packed.strategy == FULL else None)
+        if cached_prompt is not None:
+            request["cached_prompt"] = cached_prompt
+    return _AnswerPlan(prompt=prompt, request=request)
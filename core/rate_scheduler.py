@@ -0,0 +1,429 @@
+"""
+Shared upstream rate scheduling with priority classes.
+
+Every Streamlit session, batch job and evaluation run in a process (and,
+with `GEMINI_RATE_DB`, in every process on the machine) draws from the
+same requests-per-minute and tokens-per-minute token buckets, so they
+stay under the API key's quota together instead of tripping it.
+
+Waiting requests are admitted in priority order (interactive > batch >
+eval). Across processes, where there is no shared queue, lower classes
+additionally leave a share of each bucket untouched for the classes
+above them, so an eval run elsewhere cannot drain the quota an
+interactive user is about to need.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from google.api_core import exceptions as google_exceptions
+
+from helpers.logger import Logger
+from helpers.telemetry import Telemetry
+
+
+# Global singleton instances
+logger = Logger().get_logger()
+telemetry = Telemetry()
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+EVAL = "eval"
+# Highest priority first
+PRIORITIES = (INTERACTIVE, BATCH, EVAL)
+
+# Share of each bucket a class must leave for the classes above it
+DEFAULT_RESERVES = {INTERACTIVE: 0.0, BATCH: 0.1, EVAL: 0.3}
+# Share of the quota that may be spent in a burst; the rest refills evenly
+DEFAULT_BURST_SHARE = 0.1
+# After an upstream quota error, nothing is admitted for this long
+DEFAULT_QUOTA_BACKOFF_S = 10.0
+# Longest a waiter sleeps before checking the buckets again (other
+# processes, and async waiters, aren't woken up explicitly)
+POLL_INTERVAL_S = 0.05
+
+REQUESTS = "requests"
+TOKENS = "tokens"
+
+
+class RateLimitTimeoutError(TimeoutError):
+    """A request waited longer than `max_wait_s` for its turn."""
+
+
+@dataclass
+class RateSchedulerConfig:
+    """
+    Upstream quota shared by every client of the scheduler.
+
+    Buckets hold `burst_share` of the quota and refill at the rest of it
+    evenly over the window, so no window ever admits more than the
+    quota (a full bucket plus one window of refill), while bursts of up
+    to `burst_share` go through at once.
+
+    Attributes:
+        requests_per_minute: Requests admitted per window (None: unlimited).
+        tokens_per_minute: Estimated input tokens admitted per window
+            (None: unlimited). A request larger than the bucket waits for
+            a full bucket and leaves it in debt.
+        window_s: Length of the quota window (Gemini quotas are per minute).
+        burst_share: Share of the quota a bucket holds.
+        shared_path: SQLite file holding the buckets, to share them
+            between processes. None keeps them in this process.
+        max_wait_s: Longest a request may wait for admission before it
+            fails with `RateLimitTimeoutError` (None: no limit).
+        quota_backoff_s: Pause in admissions after an upstream quota error.
+        reserves: Share of each bucket each class leaves for the classes
+            above it.
+    """
+
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+    window_s: float = 60.0
+    burst_share: float = DEFAULT_BURST_SHARE
+    shared_path: Optional[str] = None
+    max_wait_s: Optional[float] = None
+    quota_backoff_s: float = DEFAULT_QUOTA_BACKOFF_S
+    reserves: Optional[dict[str, float]] = None
+
+    @classmethod
+    def from_env(cls) -> "RateSchedulerConfig":
+        """Builds a config from the `GEMINI_RPM`/`GEMINI_TPM`/`GEMINI_RATE_*` environment variables."""
+        rpm = os.getenv("GEMINI_RPM")
+        tpm = os.getenv("GEMINI_TPM")
+        max_wait = os.getenv("GEMINI_RATE_MAX_WAIT_S")
+        return cls(
+            requests_per_minute=float(rpm) if rpm else None,
+            tokens_per_minute=float(tpm) if tpm else None,
+            burst_share=float(os.getenv("GEMINI_RATE_BURST_SHARE", DEFAULT_BURST_SHARE)),
+            shared_path=os.getenv("GEMINI_RATE_DB") or None,
+            max_wait_s=float(max_wait) if max_wait else None,
+            quota_backoff_s=float(os.getenv("GEMINI_RATE_QUOTA_BACKOFF_S", DEFAULT_QUOTA_BACKOFF_S)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.requests_per_minute or self.tokens_per_minute)
+
+    def buckets(self) -> dict[str, "_Bucket"]:
+        """The configured buckets by name."""
+        buckets = {}
+        for name, quota in ((REQUESTS, self.requests_per_minute), (TOKENS, self.tokens_per_minute)):
+            if quota:
+                buckets[name] = _Bucket(quota * self.burst_share, quota * (1 - self.burst_share) / self.window_s)
+        return buckets
+
+
+@dataclass(frozen=True)
+class _Bucket:
+    capacity: float
+    rate_per_s: float
+
+    def refill(self, level: float, elapsed_s: float) -> float:
+        return min(self.capacity, level + max(0.0, elapsed_s) * self.rate_per_s)
+
+
+def _take(levels: dict[str, float], buckets: dict[str, _Bucket], amounts: dict[str, float],
+          reserve: float) -> float:
+    """
+    Takes `amounts` from `levels` (in place) if every bucket can give them
+    and still keep `reserve` of its capacity.
+
+    Returns:
+        float: 0 if taken, else the seconds until the buckets will have refilled enough.
+    """
+    wait = 0.0
+    for name, bucket in buckets.items():
+        # A request larger than the bucket can never fit: it waits for a
+        # full bucket and is then charged in full, leaving the bucket in debt
+        needed = min(amounts.get(name, 0.0), bucket.capacity * (1 - reserve)) + bucket.capacity * reserve
+        shortfall = needed - levels[name]
+        if shortfall > 1e-9:
+            wait = max(wait, shortfall / bucket.rate_per_s)
+    if wait:
+        return wait
+    for name in buckets:
+        levels[name] -= amounts.get(name, 0.0)
+    return 0.0
+
+
+class _LocalBuckets:
+    """Token buckets held in this process."""
+
+    def __init__(self, buckets: dict[str, _Bucket]):
+        self.buckets = buckets
+        self._levels = {name: bucket.capacity for name, bucket in buckets.items()}
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def take(self, amounts: dict[str, float], reserve: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            for name, bucket in self.buckets.items():
+                self._levels[name] = bucket.refill(self._levels[name], now - self._updated)
+            self._updated = now
+            return _take(self._levels, self.buckets, amounts, reserve)
+
+    def block(self, seconds: float):
+        with self._lock:
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + seconds)
+            # Refill from empty afterwards rather than admitting a burst
+            self._levels = {name: min(0.0, level) for name, level in self._levels.items()}
+            self._updated = self._blocked_until
+
+
+class _SQLiteBuckets:
+    """
+    Token buckets in a SQLite file, shared by every process using it.
+
+    Each take is one `BEGIN IMMEDIATE` transaction, so concurrent
+    processes serialize on the database's write lock. Times are wall
+    clock, as monotonic clocks aren't comparable between processes.
+    """
+
+    def __init__(self, path: str, buckets: dict[str, _Bucket]):
+        self.buckets = buckets
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, level REAL NOT NULL, "
+                "updated REAL NOT NULL, blocked_until REAL NOT NULL DEFAULT 0)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _load(self, conn: sqlite3.Connection, now: float) -> tuple[dict[str, float], float]:
+        rows = {name: (level, updated, blocked) for name, level, updated, blocked
+                in conn.execute("SELECT name, level, updated, blocked_until FROM buckets")}
+        levels, blocked_until = {}, 0.0
+        for name, bucket in self.buckets.items():
+            level, updated, blocked = rows.get(name, (bucket.capacity, now, 0.0))
+            levels[name] = bucket.refill(level, now - updated)
+            blocked_until = max(blocked_until, blocked)
+        return levels, blocked_until
+
+    def _store(self, conn: sqlite3.Connection, levels: dict[str, float], now: float, blocked_until: float):
+        conn.executemany(
+            "INSERT INTO buckets (name, level, updated, blocked_until) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET level = excluded.level, updated = excluded.updated, "
+            "blocked_until = excluded.blocked_until",
+            [(name, level, now, blocked_until) for name, level in levels.items()],
+        )
+
+    def take(self, amounts: dict[str, float], reserve: float) -> float:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            levels, blocked_until = self._load(conn, now)
+            if now < blocked_until:
+                wait = blocked_until - now
+            else:
+                wait = _take(levels, self.buckets, amounts, reserve)
+                self._store(conn, levels, now, blocked_until)
+            conn.execute("COMMIT")
+            return wait
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def block(self, seconds: float):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            levels, blocked_until = self._load(conn, now)
+            blocked_until = max(blocked_until, now + seconds)
+            # Refill starts from empty once the pause is over
+            self._store(conn, {name: min(0.0, level) for name, level in levels.items()}, blocked_until,
+                        blocked_until)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class RateScheduler:
+    """
+    Admits upstream requests within a shared RPM/TPM quota, by priority.
+
+    Callers `acquire` (or `acquire_async`) before each upstream request;
+    waiting requests are queued by priority class, then arrival, and the
+    head of the queue is admitted as soon as both buckets allow it.
+    Upstream quota errors reported through `on_quota_error` pause
+    admissions for everyone sharing the buckets.
+
+    Queue waits are recorded per class (`stats`, and the
+    `qa_rate_queue_wait_seconds` metric).
+    """
+
+    def __init__(self, config: Optional[RateSchedulerConfig] = None):
+        """
+        Args:
+            config: The quota. Defaults to `RateSchedulerConfig.from_env()`.
+        """
+        self.config = config or RateSchedulerConfig.from_env()
+        buckets = self.config.buckets()
+        if self.config.shared_path:
+            self.buckets = _SQLiteBuckets(self.config.shared_path, buckets)
+        else:
+            self.buckets = _LocalBuckets(buckets)
+        self.reserves = dict(DEFAULT_RESERVES, **(self.config.reserves or {}))
+        self._cond = threading.Condition()
+        self._queue: list[tuple[int, int]] = []
+        self._tickets = itertools.count()
+        self.quota_errors = 0
+        self.stats = {
+            priority: {"admitted": 0, "timeouts": 0, "wait_s_total": 0.0, "wait_s_max": 0.0}
+            for priority in PRIORITIES
+        }
+
+    @staticmethod
+    def _rank(priority: str) -> int:
+        try:
+            return PRIORITIES.index(priority)
+        except ValueError:
+            raise ValueError(f"Unknown priority: {priority} (expected one of {', '.join(PRIORITIES)})")
+
+    def _enqueue(self, priority: str) -> tuple[int, int]:
+        ticket = (self._rank(priority), next(self._tickets))
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+        return ticket
+
+    def _dequeue(self, ticket: tuple[int, int]):
+        with self._cond:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+            self._cond.notify_all()
+
+    def _try(self, ticket: tuple[int, int], tokens: int, priority: str) -> float:
+        """Admits `ticket` if it heads the queue and the buckets allow; else returns how long to wait."""
+        if self._queue[0] != ticket:
+            return POLL_INTERVAL_S
+        return self.buckets.take({REQUESTS: 1, TOKENS: tokens}, self.reserves.get(priority, 0.0))
+
+    def _check_deadline(self, start: float, priority: str):
+        max_wait = self.config.max_wait_s
+        if max_wait is not None and time.monotonic() - start >= max_wait:
+            self.stats[priority]["timeouts"] += 1
+            telemetry.inc("qa_rate_timeouts_total", priority=priority)
+            raise RateLimitTimeoutError(f"No upstream quota for a {priority} request within {max_wait}s")
+
+    def _admitted(self, priority: str, wait_s: float) -> float:
+        stats = self.stats[priority]
+        stats["admitted"] += 1
+        stats["wait_s_total"] += wait_s
+        stats["wait_s_max"] = max(stats["wait_s_max"], wait_s)
+        telemetry.inc("qa_rate_admitted_total", priority=priority)
+        telemetry.observe("qa_rate_queue_wait_seconds", wait_s, priority=priority)
+        return wait_s
+
+    def acquire(self, tokens: int = 0, priority: str = INTERACTIVE) -> float:
+        """
+        Blocks until one request of `tokens` estimated input tokens may go upstream.
+
+        Args:
+            tokens: Estimated input tokens of the request.
+            priority: The request's class (`INTERACTIVE`, `BATCH` or `EVAL`).
+
+        Returns:
+            float: Seconds spent waiting.
+
+        Raises:
+            RateLimitTimeoutError: If not admitted within `max_wait_s`.
+        """
+        start = time.monotonic()
+        ticket = self._enqueue(priority)
+        try:
+            with self._cond:
+                while True:
+                    wait = self._try(ticket, tokens, priority)
+                    if not wait:
+                        break
+                    self._check_deadline(start, priority)
+                    self._cond.wait(min(wait, POLL_INTERVAL_S))
+        finally:
+            self._dequeue(ticket)
+        return self._admitted(priority, time.monotonic() - start)
+
+    async def acquire_async(self, tokens: int = 0, priority: str = INTERACTIVE) -> float:
+        """Async counterpart of `acquire`; waits without blocking the event loop."""
+        start = time.monotonic()
+        ticket = self._enqueue(priority)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try(ticket, tokens, priority)
+                if not wait:
+                    break
+                self._check_deadline(start, priority)
+                await asyncio.sleep(min(wait, POLL_INTERVAL_S))
+        finally:
+            self._dequeue(ticket)
+        return self._admitted(priority, time.monotonic() - start)
+
+    def on_quota_error(self):
+        """Pauses admissions after the upstream rejected a request for quota."""
+        self.quota_errors += 1
+        telemetry.inc("qa_rate_quota_errors_total")
+        logger.info(f"Upstream quota exceeded; pausing admissions for {self.config.quota_backoff_s}s")
+        self.buckets.block(self.config.quota_backoff_s)
+
+    def observer(self):
+        """
+        Returns an `on_attempt` callback for `ResilientCaller` that reports
+        quota errors (HTTP 429) to the scheduler.
+        """
+        def on_attempt(model_name: str, ttfc_s: Optional[float], error: Optional[Exception]):
+            if isinstance(error, google_exceptions.TooManyRequests):
+                self.on_quota_error()
+        return on_attempt
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+
+_shared_scheduler: Optional[RateScheduler] = None
+_shared_lock = threading.Lock()
+
+
+def create_scheduler_from_env() -> Optional[RateScheduler]:
+    """
+    Returns the process-wide scheduler configured by `GEMINI_RPM` and/or
+    `GEMINI_TPM` (created on first use), or None if neither is set.
+
+    Every `GeminiClient` in the process shares it, so sessions, batch jobs
+    and evaluation runs draw from one quota.
+    """
+    global _shared_scheduler
+    config = RateSchedulerConfig.from_env()
+    if not config.enabled:
+        return None
+    with _shared_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = RateScheduler(config)
+            logger.info(f"Upstream rate scheduling: {config.requests_per_minute} requests and "
+                        f"{config.tokens_per_minute} tokens per minute"
+                        + (f", shared via {config.shared_path}" if config.shared_path else ""))
+        return _shared_scheduler
@@ -0,0 +1,602 @@
+import asyncio
+import itertools
+import math
+import os
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+from google.api_core import exceptions as google_exceptions
+
+from helpers.logger import Logger
+from helpers.telemetry import Telemetry
+
+
+# Global singleton instances
+logger = Logger().get_logger()
+telemetry = Telemetry()
+
+# Transient upstream failures: worth retrying (and counted against the model)
+RETRIABLE_ERRORS = (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.TooManyRequests,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.GatewayTimeout,
+    ConnectionError,
+    TimeoutError,
+)
+
+# The model itself cannot serve requests: open its circuit and fail over at once
+MODEL_ERRORS = (
+    google_exceptions.NotFound,
+    google_exceptions.PermissionDenied,
+)
+
+
+class DeadlineExceededError(TimeoutError):
+    """No response (or no next chunk) arrived within the configured deadline."""
+
+
+class AllModelsUnavailableError(RuntimeError):
+    """Every candidate model's circuit breaker is open."""
+
+
+@dataclass
+class ResilienceConfig:
+    """
+    Deadlines, retries, hedging and circuit breaking for upstream calls.
+
+    Attributes:
+        deadline_s: Budget for the first chunk of a request, across all
+            retries, hedges and failovers.
+        attempt_timeout_s: Time an attempt may take to produce its first
+            chunk; also the longest allowed gap between later chunks.
+        max_attempts: Attempts per request (the first call plus retries).
+            Retries only happen before any chunk has been emitted.
+        backoff_base_s: First retry delay; doubles per retry (with jitter).
+        backoff_max_s: Cap on the retry delay.
+        hedge_after_s: If set, a second (hedged) request is started when
+            the first has produced nothing after this long; the first to
+            stream wins and the other is abandoned. None disables hedging.
+        max_hedges: Hedged requests allowed per request.
+        breaker_failure_threshold: Consecutive failures that open a
+            model's circuit, failing requests over to the next model.
+        breaker_reset_s: How long a circuit stays open before one trial
+            request is let through.
+    """
+
+    deadline_s: float = 60.0
+    attempt_timeout_s: float = 30.0
+    max_attempts: int = 3
+    backoff_base_s: float = 0.25
+    backoff_max_s: float = 2.0
+    hedge_after_s: Optional[float] = None
+    max_hedges: int = 1
+    breaker_failure_threshold: int = 5
+    breaker_reset_s: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "ResilienceConfig":
+        """Builds a config from `GEMINI_*` environment variables."""
+        hedge_after = os.getenv("GEMINI_HEDGE_AFTER_S")
+        return cls(
+            deadline_s=float(os.getenv("GEMINI_DEADLINE_S", cls.deadline_s)),
+            attempt_timeout_s=float(os.getenv("GEMINI_ATTEMPT_TIMEOUT_S", cls.attempt_timeout_s)),
+            max_attempts=int(os.getenv("GEMINI_MAX_ATTEMPTS", cls.max_attempts)),
+            hedge_after_s=float(hedge_after) if hedge_after else None,
+            breaker_failure_threshold=int(os.getenv("GEMINI_BREAKER_THRESHOLD", cls.breaker_failure_threshold)),
+            breaker_reset_s=float(os.getenv("GEMINI_BREAKER_RESET_S", cls.breaker_reset_s)),
+        )
+
+    def backoff(self, retry: int, rng: random.Random) -> float:
+        """Delay before the given retry (1-based): exponential, half jittered."""
+        delay = min(self.backoff_max_s, self.backoff_base_s * 2 ** (retry - 1))
+        return delay / 2 + rng.uniform(0, delay / 2)
+
+
+class CircuitBreaker:
+    """
+    Per-model circuit breaker.
+
+    Closed: requests flow. After `failure_threshold` consecutive failures
+    the circuit opens and requests are refused (callers fail over). After
+    `reset_timeout_s` it is half-open: a single trial request is allowed,
+    and its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_s: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.failures = 0
+        self._clock = clock
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at >= self.reset_timeout_s:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        """Returns True if a request may be sent (claiming the trial slot when half-open)."""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_in_flight = False
+
+    def trip(self):
+        """Opens the circuit immediately (e.g. the model does not exist)."""
+        with self._lock:
+            self.failures = max(self.failures, self.failure_threshold)
+            self._opened_at = self._clock()
+            self._trial_in_flight = False
+
+    def release(self):
+        """Gives back a trial slot whose request ended without a verdict."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class _Attempt:
+    __slots__ = ("id", "model_name", "started", "hedge", "cancelled", "admitted")
+
+    def __init__(self, attempt_id: int, model_name: str, hedge: bool, admitted: bool = True):
+        self.id = attempt_id
+        self.model_name = model_name
+        self.started = time.monotonic()
+        self.hedge = hedge
+        self.cancelled = False
+        # Attempts waiting for admission haven't gone upstream: no timeouts apply
+        self.admitted = admitted
+
+
+class _RequestPlan:
+    """Decides, for one request, when to retry, hedge, fail over or give up."""
+
+    def __init__(self, caller: "ResilientCaller", candidates: list[str], on_attempt=None, admission: bool = False,
+                 on_drop=None):
+        self.caller = caller
+        self.config = caller.config
+        self.candidates = candidates
+        self.on_attempt = on_attempt
+        # Told when an attempt is abandoned, so its pump can be stopped
+        self.on_drop = on_drop
+        # With admission control, the deadline starts once the first attempt is admitted
+        self.admission = admission
+        self.deadline = None if admission else time.monotonic() + self.config.deadline_s
+        self.active: dict[int, _Attempt] = {}
+        self.retries = 0
+        self.hedges_left = self.config.max_hedges if self.config.hedge_after_s is not None else 0
+        self.retry_at = None
+        self.last_error = None
+        self._ids = itertools.count(1)
+
+    def start(self, hedge: bool = False) -> _Attempt:
+        model_name = self.caller.choose_model(self.candidates)
+        if model_name is None:
+            raise AllModelsUnavailableError(
+                f"All candidate models are unavailable (circuits open). Last error: {self.last_error}"
+            )
+        attempt = _Attempt(next(self._ids), model_name, hedge, admitted=not self.admission)
+        self.active[attempt.id] = attempt
+        return attempt
+
+    def _hedge_at(self) -> Optional[float]:
+        if self.hedges_left <= 0 or len(self.active) != 1:
+            return None
+        attempt = next(iter(self.active.values()))
+        return attempt.started + self.config.hedge_after_s if attempt.admitted else None
+
+    def wait_timeout(self) -> float:
+        """Seconds until the next thing the plan must act on."""
+        wake = [self.deadline if self.deadline is not None else math.inf]
+        wake.extend(a.started + self.config.attempt_timeout_s for a in self.active.values() if a.admitted)
+        for moment in (self.retry_at, self._hedge_at()):
+            if moment is not None:
+                wake.append(moment)
+        timeout = max(0.0, min(wake) - time.monotonic())
+        return None if timeout == math.inf else timeout
+
+    def _schedule_retry(self, error: Exception):
+        if self.active or self.retry_at is not None:
+            return
+        if self.retries + 1 >= self.config.max_attempts:
+            raise error
+        self.retry_at = time.monotonic() + self.config.backoff(self.retries + 1, self.caller.rng)
+
+    def _drop(self, attempt: _Attempt):
+        attempt.cancelled = True
+        self.active.pop(attempt.id, None)
+        if self.on_drop is not None:
+            self.on_drop(attempt)
+
+    def _report(self, attempt: _Attempt, ttfc_s: Optional[float] = None, error: Exception = None):
+        if self.on_attempt is not None:
+            self.on_attempt(attempt.model_name, ttfc_s, error)
+
+    def on_tick(self) -> list[_Attempt]:
+        """Handles deadlines and due retries/hedges; returns attempts to launch."""
+        now = time.monotonic()
+        if self.deadline is not None and now >= self.deadline:
+            error = DeadlineExceededError(
+                f"No response within {self.config.deadline_s}s. Last error: {self.last_error}"
+            )
+            for attempt in list(self.active.values()):
+                if attempt.admitted:
+                    self.caller.breaker(attempt.model_name).record_failure()
+                    self._report(attempt, error=error)
+                else:
+                    # Still waiting for admission: not the model's fault
+                    self.caller.breaker(attempt.model_name).release()
+                self._drop(attempt)
+            self.caller.count("deadlines_exceeded")
+            raise error
+
+        for attempt in list(self.active.values()):
+            if attempt.admitted and now >= attempt.started + self.config.attempt_timeout_s:
+                logger.info(f"Attempt on {attempt.model_name} produced nothing in "
+                            f"{self.config.attempt_timeout_s}s, abandoning it")
+                self.caller.breaker(attempt.model_name).record_failure()
+                self._drop(attempt)
+                self.last_error = DeadlineExceededError(f"{attempt.model_name} timed out")
+                self._report(attempt, error=self.last_error)
+                self._schedule_retry(self.last_error)
+
+        launches = []
+        if self.retry_at is not None and now >= self.retry_at:
+            self.retry_at = None
+            self.retries += 1
+            self.caller.count("retries")
+            launches.append(self.start())
+        elif self._hedge_at() is not None and now >= self._hedge_at():
+            self.hedges_left -= 1
+            self.caller.count("hedges")
+            launches.append(self.start(hedge=True))
+        return launches
+
+    def on_admitted(self, attempt: _Attempt):
+        """Starts an attempt's clocks (and the request's deadline) once it may go upstream."""
+        attempt.admitted = True
+        attempt.started = time.monotonic()
+        if self.deadline is None:
+            self.deadline = attempt.started + self.config.deadline_s
+
+    def on_rejected(self, attempt: _Attempt, error: Exception) -> list[_Attempt]:
+        """Handles an attempt refused admission (e.g. it waited too long); raises if none is left."""
+        self.active.pop(attempt.id, None)
+        self.caller.breaker(attempt.model_name).release()
+        if not self.active and self.retry_at is None:
+            raise error
+        return []
+
+    def on_error(self, attempt: _Attempt, error: Exception) -> list[_Attempt]:
+        """Handles a failed attempt; raises if the request must give up."""
+        self.active.pop(attempt.id, None)
+        self.last_error = error
+        breaker = self.caller.breaker(attempt.model_name)
+        if self.admission and isinstance(error, google_exceptions.TooManyRequests):
+            # Over quota, not a failing model: the report pauses admissions, and
+            # the next attempt waits for them (bounded by the deadline)
+            logger.info(f"Quota exceeded on {attempt.model_name}, waiting for admission")
+            breaker.release()
+            self._report(attempt, error=error)
+            self.caller.count("quota_waits")
+            if not self.active and self.retry_at is None:
+                return [self.start()]
+            return []
+        if isinstance(error, MODEL_ERRORS):
+            logger.info(f"Model {attempt.model_name} is unavailable ({error}), failing over")
+            breaker.trip()
+            self._report(attempt, error=error)
+            if not self.active and self.retry_at is None:
+                # Failing over doesn't use up the retry budget: the request is fine
+                return [self.start()]
+        elif isinstance(error, RETRIABLE_ERRORS):
+            logger.info(f"Retriable error from {attempt.model_name}: {error}")
+            breaker.record_failure()
+            self._report(attempt, error=error)
+            self._schedule_retry(error)
+        else:
+            # A problem with the request itself; retrying won't help
+            breaker.release()
+            if not self.active:
+                raise error
+        return []
+
+    def on_first_chunk(self, winner: _Attempt):
+        """Commits to the attempt that streamed first and abandons the rest."""
+        for attempt in list(self.active.values()):
+            if attempt is not winner:
+                self.caller.breaker(attempt.model_name).release()
+                self._drop(attempt)
+        self.caller.breaker(winner.model_name).record_success()
+        self._report(winner, ttfc_s=time.monotonic() - winner.started)
+        if winner.hedge:
+            self.caller.count("hedge_wins")
+        if winner.model_name != self.candidates[0]:
+            self.caller.count("failovers")
+
+    def cancel_all(self):
+        for attempt in list(self.active.values()):
+            self._drop(attempt)
+
+
+class ResilientCaller:
+    """
+    Streams a response with deadlines, retries, hedging and failover.
+
+    Each attempt runs on its own pump (a thread, or a task in the async
+    API) feeding a shared event queue, so the caller can time out, hedge
+    or move on without being blocked by a slow upstream call. Retries,
+    hedges and failovers only happen before the first chunk is emitted;
+    after that the winning stream is followed to the end.
+    """
+
+    def __init__(self, config: ResilienceConfig, build_model: Callable[[str], object]):
+        """
+        Initializes the caller.
+
+        Args:
+            config: Deadlines, retry, hedging and breaker settings.
+            build_model: Creates a model object from a model name.
+        """
+        self.config = config
+        self._build_model = build_model
+        self._models: dict[str, object] = {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self.rng = random.Random()
+        self.stats = {"retries": 0, "hedges": 0, "hedge_wins": 0, "failovers": 0, "deadlines_exceeded": 0,
+                      "quota_waits": 0}
+
+    def count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+        telemetry.inc(f"qa_{stat}_total")
+
+    def model(self, model_name: str):
+        """Returns the (cached) model object for a name."""
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is None:
+                model = self._models[model_name] = self._build_model(model_name)
+            return model
+
+    def breaker(self, model_name: str) -> CircuitBreaker:
+        """Returns the circuit breaker for a model."""
+        with self._lock:
+            breaker = self._breakers.get(model_name)
+            if breaker is None:
+                breaker = self._breakers[model_name] = CircuitBreaker(
+                    self.config.breaker_failure_threshold, self.config.breaker_reset_s
+                )
+            return breaker
+
+    def choose_model(self, candidates: list[str]) -> Optional[str]:
+        """Returns the highest-priority candidate whose circuit allows a request."""
+        for model_name in candidates:
+            if self.breaker(model_name).allow():
+                return model_name
+        return None
+
+    def stream(self, candidates: list[str], open_stream: Callable[[object], Iterator[str]],
+               on_attempt: Callable = None, admit: Callable[[str], None] = None) -> Iterator[str]:
+        """
+        Streams a response from the first candidate model able to serve it.
+
+        With `admit` (e.g. a rate scheduler's `acquire`), every attempt,
+        including retries, hedges and failovers, is admitted separately
+        before it goes upstream. Its timeouts, and the request's deadline,
+        start once admitted, and a 429 is not retried with backoff or held
+        against the model: the next attempt waits for admission instead.
+
+        Args:
+            candidates: Model names in priority order.
+            open_stream: Starts a streaming call on a model object and
+                returns an iterator of text chunks.
+            on_attempt: Optional callback `(model_name, ttfc_s, error)`
+                told how each attempt went: the time to its first chunk,
+                or the error (including timeouts) that ended it.
+            admit: Optional callback `(model_name)` run on each attempt's
+                pump, blocking until it may go upstream; an exception it
+                raises ends the request (once no other attempt is left).
+
+        Yields:
+            str: Response text chunks.
+
+        Raises:
+            DeadlineExceededError, AllModelsUnavailableError, or the last
+            upstream error if all attempts failed.
+        """
+        plan = _RequestPlan(self, candidates, on_attempt, admission=admit is not None)
+        events = queue.Queue()
+
+        def pump(attempt: _Attempt):
+            if admit is not None:
+                try:
+                    admit(attempt.model_name)
+                except Exception as e:
+                    events.put(("rejected", attempt, e))
+                    return
+                if attempt.cancelled:
+                    return
+                events.put(("admitted", attempt, None))
+            try:
+                for text in open_stream(self.model(attempt.model_name)):
+                    if attempt.cancelled:
+                        return
+                    events.put(("chunk", attempt, text))
+                events.put(("done", attempt, None))
+            except Exception as e:
+                events.put(("error", attempt, e))
+
+        def launch(attempts: list[_Attempt]):
+            for attempt in attempts:
+                threading.Thread(target=pump, args=(attempt,), name="upstream-attempt", daemon=True).start()
+
+        winner = None
+        try:
+            launch([plan.start()])
+            while True:
+                try:
+                    kind, attempt, payload = events.get(timeout=plan.wait_timeout())
+                except queue.Empty:
+                    launch(plan.on_tick())
+                    continue
+                if attempt.id not in plan.active:
+                    continue  # late event from an abandoned attempt
+                if kind == "admitted":
+                    plan.on_admitted(attempt)
+                    continue
+                if kind == "rejected":
+                    launch(plan.on_rejected(attempt, payload))
+                    continue
+                if kind == "error":
+                    launch(plan.on_error(attempt, payload))
+                    continue
+                plan.on_first_chunk(attempt)
+                winner = attempt
+                break
+
+            while kind == "chunk":
+                yield payload
+                while True:
+                    try:
+                        kind, attempt, payload = events.get(timeout=self.config.attempt_timeout_s)
+                    except queue.Empty:
+                        raise DeadlineExceededError(
+                            f"{winner.model_name} stalled for {self.config.attempt_timeout_s}s mid-stream"
+                        )
+                    if attempt is winner:
+                        break
+            if kind == "error":
+                raise payload
+        finally:
+            plan.cancel_all()
+            if winner is not None:
+                # Stops the pump if the consumer closed the stream early
+                winner.cancelled = True
+
+    async def astream(self, candidates: list[str], open_stream: Callable[[object], AsyncIterator[str]],
+                      on_attempt: Callable = None, admit: Callable = None) -> AsyncIterator[str]:
+        """
+        Async counterpart of `stream`; attempts run as tasks.
+
+        Args:
+            candidates: Model names in priority order.
+            open_stream: Starts a streaming call on a model object and
+                returns an async iterator of text chunks.
+            on_attempt: Optional per-attempt callback (see `stream`).
+            admit: Optional coroutine function `(model_name)` admitting
+                each attempt (see `stream`).
+
+        Yields:
+            str: Response text chunks.
+        """
+        tasks = {}
+
+        def stop(attempt: _Attempt):
+            # An abandoned attempt may still be waiting for admission: don't let it take a slot
+            task = tasks.pop(attempt.id, None)
+            if task is not None:
+                task.cancel()
+
+        plan = _RequestPlan(self, candidates, on_attempt, admission=admit is not None, on_drop=stop)
+        events = asyncio.Queue()
+
+        async def pump(attempt: _Attempt):
+            if admit is not None:
+                try:
+                    await admit(attempt.model_name)
+                except Exception as e:
+                    events.put_nowait(("rejected", attempt, e))
+                    return
+                if attempt.cancelled:
+                    return
+                events.put_nowait(("admitted", attempt, None))
+            try:
+                async for text in open_stream(self.model(attempt.model_name)):
+                    if attempt.cancelled:
+                        return
+                    events.put_nowait(("chunk", attempt, text))
+                events.put_nowait(("done", attempt, None))
+            except Exception as e:
+                events.put_nowait(("error", attempt, e))
+
+        def launch(attempts: list[_Attempt]):
+            for attempt in attempts:
+                tasks[attempt.id] = asyncio.ensure_future(pump(attempt))
+
+        winner = None
+        try:
+            launch([plan.start()])
+            while True:
+                try:
+                    kind, attempt, payload = await asyncio.wait_for(events.get(), plan.wait_timeout())
+                except asyncio.TimeoutError:
+                    launch(plan.on_tick())
+                    continue
+                if attempt.id not in plan.active:
+                    continue
+                if kind == "admitted":
+                    plan.on_admitted(attempt)
+                    continue
+                if kind == "rejected":
+                    launch(plan.on_rejected(attempt, payload))
+                    continue
+                if kind == "error":
+                    launch(plan.on_error(attempt, payload))
+                    continue
+                plan.on_first_chunk(attempt)
+                winner = attempt
+                break
+
+            while kind == "chunk":
+                yield payload
+                while True:
+                    try:
+                        kind, attempt, payload = await asyncio.wait_for(
+                            events.get(), self.config.attempt_timeout_s
+                        )
+                    except asyncio.TimeoutError:
+                        raise DeadlineExceededError(
+                            f"{winner.model_name} stalled for {self.config.attempt_timeout_s}s mid-stream"
+                        )
+                    if attempt is winner:
+                        break
+            if kind == "error":
+                raise payload
+        finally:
+            plan.cancel_all()
+            # Abandoned attempts, and the winner if the consumer stopped early
+            for task in tasks.values():
+                task.cancel()
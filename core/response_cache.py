@@ -0,0 +1,278 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from helpers.logger import Logger
+
+
+# Global singleton instance
+logger = Logger().get_logger()
+
+DEFAULT_MEMORY_ENTRIES = 256
+DEFAULT_DISK_MAX_BYTES = 100 * 1024 * 1024  # 100MB
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalizes a question so trivially different phrasings share a cache entry.
+
+    Lowercases, collapses whitespace and strips trailing punctuation.
+
+    Args:
+        question: The user's question.
+
+    Returns:
+        str: The normalized question.
+    """
+    return _WHITESPACE.sub(" ", question.lower()).strip().rstrip("?!. ")
+
+
+def hash_document(document: str) -> str:
+    """
+    Returns a stable content hash of a document.
+
+    Callers that ask many questions about one document compute this once
+    where the document is loaded and pass it on as `document_hash`, so
+    the (multi-MB) text is not re-hashed per question.
+
+    Args:
+        document: The document text.
+
+    Returns:
+        str: The hex SHA-256 digest.
+    """
+    return hashlib.sha256(document.encode("utf-8")).hexdigest()
+
+
+def make_cache_key(document: str, question: str, model_name: str, system_prompt: str,
+                   document_hash: Optional[str] = None) -> str:
+    """
+    Builds the response cache key for a question about a document.
+
+    Args:
+        document: The document text the question is asked against.
+        question: The user's question (normalized before hashing).
+        model_name: The model answering the question.
+        system_prompt: The system instruction given to the model.
+        document_hash: A content hash identifying the document, if already
+            known (otherwise `hash_document(document)` is computed).
+
+    Returns:
+        str: A hex digest uniquely identifying the request.
+    """
+    parts = [
+        document_hash or hash_document(document),
+        normalize_question(question),
+        model_name,
+        hashlib.sha256(system_prompt.encode("utf-8")).hexdigest(),
+    ]
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+class SQLiteResponseStore:
+    """
+    On-disk response tier backed by SQLite.
+
+    Entries expire after `ttl_seconds`; when the stored responses exceed
+    `max_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_DISK_MAX_BYTES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        """
+        Opens (and if needed creates) the cache database.
+
+        Args:
+            path: Location of the SQLite database file.
+            max_bytes: Maximum total size of stored responses.
+            ttl_seconds: Lifetime of an entry.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " chunks TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[list[str]]:
+        """Returns the stored chunks for a key, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT chunks, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            chunks, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(chunks)
+
+    def set(self, key: str, chunks: list[str]):
+        """Stores the chunks for a key and evicts old entries if over budget."""
+        payload = json.dumps(chunks)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, chunks, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """Drops expired entries, then least recently used ones until under `max_bytes`."""
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def close(self):
+        """Closes the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """
+    Two-tier cache of streamed model responses.
+
+    Responses are stored as the list of chunks the model produced, so a
+    hit can be replayed as a stream with the same chunk boundaries. The
+    first tier is an in-memory LRU; the optional second tier persists
+    responses across restarts (see `SQLiteResponseStore`).
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MEMORY_ENTRIES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 disk_store: Optional[SQLiteResponseStore] = None):
+        """
+        Initializes the cache.
+
+        Args:
+            max_entries: Capacity of the in-memory LRU tier.
+            ttl_seconds: Lifetime of an in-memory entry.
+            disk_store: Optional persistent second tier.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_store = disk_store
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, list[str]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        """
+        Builds a cache configured from environment variables.
+
+        `RESPONSE_CACHE_ENTRIES` sizes the memory tier, `RESPONSE_CACHE_TTL`
+        sets the lifetime in seconds, and setting `RESPONSE_CACHE_DB` to a
+        file path enables the SQLite tier (capped at `RESPONSE_CACHE_MAX_BYTES`).
+        """
+        ttl_seconds = float(os.getenv("RESPONSE_CACHE_TTL", DEFAULT_TTL_SECONDS))
+        disk_store = None
+        db_path = os.getenv("RESPONSE_CACHE_DB")
+        if db_path:
+            disk_store = SQLiteResponseStore(
+                db_path,
+                max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", DEFAULT_DISK_MAX_BYTES)),
+                ttl_seconds=ttl_seconds,
+            )
+        return cls(
+            max_entries=int(os.getenv("RESPONSE_CACHE_ENTRIES", DEFAULT_MEMORY_ENTRIES)),
+            ttl_seconds=ttl_seconds,
+            disk_store=disk_store,
+        )
+
+    def get(self, key: str) -> Optional[list[str]]:
+        """
+        Looks up a response, promoting disk hits into memory.
+
+        Args:
+            key: The key from `make_cache_key`.
+
+        Returns:
+            Optional[list[str]]: The cached chunks, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, chunks = entry
+                if time.time() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return chunks
+                del self._entries[key]
+
+        chunks = None
+        if self.disk_store is not None:
+            try:
+                chunks = self.disk_store.get(key)
+            except sqlite3.Error as e:
+                logger.info(f"Response cache disk read failed: {e}")
+
+        with self._lock:
+            if chunks is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._put_memory(key, chunks)
+        return chunks
+
+    def set(self, key: str, chunks: list[str]):
+        """
+        Stores a complete response in both tiers.
+
+        Args:
+            key: The key from `make_cache_key`.
+            chunks: The response chunks, in order.
+        """
+        chunks = list(chunks)
+        with self._lock:
+            self._put_memory(key, chunks)
+        if self.disk_store is not None:
+            try:
+                self.disk_store.set(key, chunks)
+            except sqlite3.Error as e:
+                logger.info(f"Response cache disk write failed: {e}")
+
+    def _put_memory(self, key: str, chunks: list[str]):
+        self._entries[key] = (time.time(), chunks)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
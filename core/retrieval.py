@@ -0,0 +1,258 @@
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+from core.tokens import estimate_tokens, tokens_to_chars
+
+
+# Chunking and retrieval defaults, expressed in (estimated) model tokens
+DEFAULT_CHUNK_TOKENS = 400
+DEFAULT_OVERLAP_TOKENS = 50
+DEFAULT_TOP_K = 8
+DEFAULT_TOKEN_BUDGET = 4000
+
+# Separator placed between non-contiguous document excerpts in a prompt
+EXCERPT_SEPARATOR = "\n\n[...]\n\n"
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+# Very common English words carry almost no signal for lexical ranking
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or "
+    "that the this to was what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Splits text into lowercase lexical terms for indexing and querying.
+
+    Args:
+        text: The text to tokenize.
+
+    Returns:
+        list[str]: The terms, with stopwords removed.
+    """
+    return [
+        term for term in _TOKEN_PATTERN.findall(text.lower())
+        if term not in _STOPWORDS
+    ]
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """A contiguous slice of the source document."""
+
+    index: int
+    start: int
+    end: int
+    text: str
+
+
+def chunk_document(
+    text: str,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+) -> list[Chunk]:
+    """
+    Splits a document into overlapping, roughly token-sized chunks.
+
+    Chunk boundaries are moved back to the nearest whitespace where
+    possible so that words are not cut in half.
+
+    Args:
+        text: The full document text.
+        chunk_tokens: Target size of each chunk in tokens.
+        overlap_tokens: Number of tokens shared by consecutive chunks.
+
+    Returns:
+        list[Chunk]: The chunks, in document order.
+    """
+    if overlap_tokens >= chunk_tokens:
+        raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+
+    chunk_chars = tokens_to_chars(chunk_tokens)
+    overlap_chars = tokens_to_chars(overlap_tokens)
+
+    chunks = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(start + chunk_chars, length)
+        if end < length:
+            # Prefer to break on whitespace in the second half of the window
+            boundary = text.rfind(" ", start + chunk_chars // 2, end)
+            newline = text.rfind("\n", start + chunk_chars // 2, end)
+            boundary = max(boundary, newline)
+            if boundary > start:
+                end = boundary + 1
+
+        chunks.append(Chunk(index=len(chunks), start=start, end=end, text=text[start:end]))
+        if end >= length:
+            break
+        start = max(end - overlap_chars, start + 1)
+
+    return chunks
+
+
+class BM25Index:
+    """
+    An in-memory Okapi BM25 index over a list of text passages.
+
+    Postings are stored per term, so a query only touches the passages
+    that contain at least one of its terms.
+    """
+
+    def __init__(self, passages: list[str], k1: float = 1.5, b: float = 0.75):
+        """
+        Builds the index.
+
+        Args:
+            passages: The texts to index; their list positions become ids.
+            k1: BM25 term-frequency saturation parameter.
+            b: BM25 length-normalization parameter.
+        """
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, list[tuple[int, int]]] = defaultdict(list)
+
+        lengths = []
+        for passage_id, passage in enumerate(passages):
+            counts = Counter(tokenize(passage))
+            lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                self.postings[term].append((passage_id, frequency))
+
+        count = len(passages)
+        average_length = (sum(lengths) / count) if count else 1.0
+        average_length = average_length or 1.0
+
+        # Pre-compute the per-passage length normalization term
+        self._norms = [k1 * (1 - b + b * length / average_length) for length in lengths]
+        self.idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def search(self, query: str, top_k: int = DEFAULT_TOP_K) -> list[tuple[int, float]]:
+        """
+        Ranks passages against a query.
+
+        Args:
+            query: The free-text query.
+            top_k: Maximum number of results to return.
+
+        Returns:
+            list[tuple[int, float]]: (passage id, score) pairs, best first.
+        """
+        scores: dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            for passage_id, frequency in postings:
+                scores[passage_id] += idf * frequency * (self.k1 + 1) / (
+                    frequency + self._norms[passage_id]
+                )
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+
+class DocumentIndex:
+    """
+    Chunked retrieval index for a single uploaded document.
+
+    Build it once when the document is loaded, then call
+    `build_context` per question to get only the relevant excerpts.
+    """
+
+    def __init__(
+        self,
+        text: str,
+        chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+        overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+    ):
+        """
+        Chunks and indexes the document.
+
+        Args:
+            text: The full document text.
+            chunk_tokens: Target size of each chunk in tokens.
+            overlap_tokens: Number of tokens shared by consecutive chunks.
+        """
+        self.text = text
+        self.total_tokens = estimate_tokens(text)
+        self.chunks = chunk_document(text, chunk_tokens, overlap_tokens)
+        self.bm25 = BM25Index([chunk.text for chunk in self.chunks])
+
+    def retrieve(
+        self,
+        query: str,
+        top_k: int = DEFAULT_TOP_K,
+        token_budget: int = DEFAULT_TOKEN_BUDGET,
+    ) -> list[Chunk]:
+        """
+        Returns the best-matching chunks that fit within a token budget.
+
+        If no chunk shares a term with the query, the leading chunks of
+        the document are returned instead so the model still sees
+        something (typically the title and introduction).
+
+        Args:
+            query: The user's question.
+            top_k: Maximum number of chunks to consider.
+            token_budget: Maximum total estimated tokens of the result.
+
+        Returns:
+            list[Chunk]: The selected chunks, in document order.
+        """
+        ranked = [self.chunks[chunk_id] for chunk_id, _ in self.bm25.search(query, top_k)]
+        if not ranked:
+            ranked = self.chunks[:top_k]
+
+        selected = []
+        used = 0
+        for chunk in ranked:
+            cost = estimate_tokens(chunk.text)
+            if used + cost > token_budget:
+                continue
+            selected.append(chunk)
+            used += cost
+
+        return sorted(selected, key=lambda chunk: chunk.index)
+
+    def build_context(
+        self,
+        query: str,
+        top_k: int = DEFAULT_TOP_K,
+        token_budget: int = DEFAULT_TOKEN_BUDGET,
+    ) -> str:
+        """
+        Builds the document context to send to the model for a question.
+
+        Documents that already fit within the budget are returned whole.
+        Otherwise the retrieved chunks are merged (overlapping or adjacent
+        chunks become one excerpt) and joined with a visible separator.
+
+        Args:
+            query: The user's question.
+            top_k: Maximum number of chunks to consider.
+            token_budget: Maximum total estimated tokens of the context.
+
+        Returns:
+            str: The context text.
+        """
+        if self.total_tokens <= token_budget:
+            return self.text
+
+        spans: list[list[int]] = []
+        for chunk in self.retrieve(query, top_k, token_budget):
+            if spans and chunk.start <= spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], chunk.end)
+            else:
+                spans.append([chunk.start, chunk.end])
+
+        return EXCERPT_SEPARATOR.join(self.text[start:end].strip() for start, end in spans)
@@ -0,0 +1,240 @@
+"""
+Headless HTTP API for the document analyst, built on aiohttp.
+
+Endpoints:
+    POST /documents                         upload a UTF-8 text document (raw body
+                                            or multipart "file"); returns its hash
+    GET  /documents/{doc_hash}              document metadata
+    POST /documents/{doc_hash}/questions    {"question": "..."}; the answer is
+                                            streamed as server-sent events
+    GET  /healthz                           liveness
+    GET  /metrics                           Prometheus text metrics (see helpers.telemetry)
+
+SSE stream: one `chunk` event per text chunk (`{"text": ...}`), then a final
+`done` event with the request ID and timings, or an `error` event.
+
+Usage:
+    python -m core.server --host 127.0.0.1 --port 8080 --workers 4
+
+With more than one worker, each worker is a separate process listening on
+the same port (SO_REUSEPORT). Uploads are shared between workers through
+the document store directory (DOCUMENT_STORE_DIR, default .cache/documents).
+Set GEMINI_BACKEND=standin to serve without an API key (see core.backends).
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from typing import Optional
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from core.document_store import DocumentStore, hash_bytes
+from core.fast_path import FastPathConfig
+from core.gemini_client import STREAMING_ERROR_MESSAGE, GeminiClient
+from core.qa_logic import DEFAULT_CONTEXT_WINDOW_TOKENS, answer_question_async
+from core.response_cache import ResponseCache
+from helpers.logger import Logger
+from helpers.telemetry import Telemetry
+
+
+# Global singleton instances
+logger = Logger().get_logger()
+telemetry = Telemetry()
+
+DEFAULT_PORT = 8080
+DEFAULT_DOCUMENT_DIR = os.path.join(".cache", "documents")
+MAX_UPLOAD_BYTES = 100 * 1024 * 1024  # 100MB
+
+CLIENT_KEY = web.AppKey("client", GeminiClient)
+STORE_KEY = web.AppKey("store", DocumentStore)
+CONTEXT_WINDOW_KEY = web.AppKey("context_window_tokens", int)
+
+
+def sse_event(event: str, data: dict) -> bytes:
+    """Encodes one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+def json_error(status: int, message: str) -> web.Response:
+    return web.json_response({"error": message}, status=status)
+
+
+async def upload_document(request: web.Request) -> web.Response:
+    """Stores an uploaded document and returns its content hash."""
+    if request.content_type.startswith("multipart/"):
+        reader = await request.multipart()
+        field = await reader.next()
+        while field is not None and field.name != "file":
+            field = await reader.next()
+        if field is None:
+            return json_error(400, "multipart upload needs a 'file' field")
+        data = await field.read()
+    else:
+        data = await request.read()
+    if not data:
+        return json_error(400, "empty document")
+
+    store = request.app[STORE_KEY]
+    doc_hash = hash_bytes(data)
+    created = store.get(doc_hash) is None
+    try:
+        # Decoding and indexing are CPU work; keep them off the event loop
+        handle = await asyncio.to_thread(store.open, data, doc_hash)
+    except UnicodeDecodeError:
+        return json_error(415, "document must be UTF-8 text")
+    # The API holds no sessions: the document stays in the store (and on
+    # disk) until evicted, and questions reference it by hash
+    handle.close()
+    return web.json_response({"doc_hash": doc_hash, "bytes": len(data), "created": created},
+                             status=201 if created else 200)
+
+
+async def get_document(request: web.Request) -> web.Response:
+    """Returns metadata for a stored document."""
+    document = await asyncio.to_thread(request.app[STORE_KEY].load, request.match_info["doc_hash"])
+    if document is None:
+        return json_error(404, "unknown document; upload it first")
+    return web.json_response({
+        "doc_hash": document.doc_hash,
+        "bytes": document.size_bytes,
+        "tokens": document.index.total_tokens,
+        "chunks": len(document.index.chunks),
+    })
+
+
+async def ask_question(request: web.Request) -> web.StreamResponse:
+    """Answers a question about a stored document, streamed as SSE."""
+    try:
+        body = await request.json()
+        question = body["question"].strip()
+    except (ValueError, KeyError, AttributeError):
+        return json_error(400, 'expected a JSON body like {"question": "..."}')
+    if not question:
+        return json_error(400, "empty question")
+
+    document = await asyncio.to_thread(request.app[STORE_KEY].load, request.match_info["doc_hash"])
+    if document is None:
+        return json_error(404, "unknown document; upload it first")
+    client = request.app[CLIENT_KEY]
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    await response.prepare(request)
+
+    with telemetry.request(request.headers.get("X-Request-ID")) as request_id, \
+            telemetry.span("request", source="api"):
+        start = time.perf_counter()
+        first_chunk_s = None
+        failed = False
+
+        # The same answering path as the UI (fast path, retrieval, context
+        # caching, map-reduce for oversized documents), streamed as it's generated
+        chunks = answer_question_async(client, document.text, question, index=document.index,
+                                       context_window_tokens=request.app[CONTEXT_WINDOW_KEY],
+                                       fast_path=FastPathConfig.from_env(), document_hash=document.text_hash)
+
+        async for chunk in chunks:
+            if chunk == STREAMING_ERROR_MESSAGE:
+                failed = True
+                await response.write(sse_event("error", {"message": chunk, "request_id": request_id}))
+                break
+            if first_chunk_s is None:
+                first_chunk_s = time.perf_counter() - start
+            await response.write(sse_event("chunk", {"text": chunk}))
+
+        if not failed:
+            await response.write(sse_event("done", {
+                "request_id": request_id,
+                "ttfc_s": round(first_chunk_s or 0.0, 4),
+                "total_s": round(time.perf_counter() - start, 4),
+            }))
+
+    await response.write_eof()
+    return response
+
+
+async def healthz(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok", "pid": os.getpid()})
+
+
+async def metrics(request: web.Request) -> web.Response:
+    return web.Response(text=telemetry.render_prometheus(), content_type="text/plain")
+
+
+def create_app(client: Optional[GeminiClient] = None, store: Optional[DocumentStore] = None,
+               context_window_tokens: int = DEFAULT_CONTEXT_WINDOW_TOKENS) -> web.Application:
+    """
+    Builds the aiohttp application.
+
+    Args:
+        client: The Gemini client to answer with. Defaults to one built
+            from the environment (backend, response cache).
+        store: The document store. Defaults to one built from the
+            environment, persisting uploads under DOCUMENT_STORE_DIR.
+        context_window_tokens: The model's input limit; larger documents
+            are answered with map-reduce.
+
+    Returns:
+        web.Application: The application, ready for `web.run_app`.
+    """
+    if store is None:
+        store = DocumentStore.from_env()
+        if store.directory is None:
+            store = DocumentStore(store.max_bytes, directory=DEFAULT_DOCUMENT_DIR)
+
+    app = web.Application(client_max_size=MAX_UPLOAD_BYTES)
+    app[CLIENT_KEY] = client or GeminiClient(response_cache=ResponseCache.from_env())
+    app[STORE_KEY] = store
+    app[CONTEXT_WINDOW_KEY] = context_window_tokens
+    app.router.add_post("/documents", upload_document)
+    app.router.add_get("/documents/{doc_hash}", get_document)
+    app.router.add_post("/documents/{doc_hash}/questions", ask_question)
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+def run_worker(host: str, port: int, reuse_port: bool):
+    """Runs one server process."""
+    load_dotenv()
+    telemetry.configure_from_env()
+    web.run_app(create_app(), host=host, port=port, reuse_port=reuse_port, print=None)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m core.server", description="Document analyst HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=1, help="Server processes sharing the port")
+    args = parser.parse_args(argv)
+
+    logger.info(f"Serving on http://{args.host}:{args.port} with {args.workers} worker(s)")
+    if args.workers == 1:
+        run_worker(args.host, args.port, reuse_port=False)
+        return 0
+
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(args.host, args.port, True), daemon=True)
+        for _ in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+import asyncio
+import threading
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+
+class _Flight:
+    """One upstream stream and the chunks it has produced so far."""
+
+    def __init__(self):
+        self.chunks: list[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.condition = threading.Condition()
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight streaming requests (thread-based).
+
+    The first request for a key starts the upstream stream on a pump
+    thread; requests for the same key arriving while it is in flight
+    subscribe to it instead of starting their own. Chunks are buffered,
+    so every subscriber receives the full response from the first chunk
+    regardless of when it joined, and a subscriber that stops reading
+    does not affect the others.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self.started = 0
+        self._flights: dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self) -> int:
+        """Number of upstream streams currently running."""
+        return len(self._flights)
+
+    def stream(self, key: str, produce: Callable[[], Iterator[str]],
+               on_complete: Optional[Callable[[list[str]], None]] = None) -> tuple[Iterator[str], bool]:
+        """
+        Subscribes to the stream for `key`, starting it if needed.
+
+        Args:
+            key: Identifies identical requests.
+            produce: Starts the upstream stream (called once per flight).
+            on_complete: Called once with all chunks if the stream succeeds.
+
+        Returns:
+            tuple: An iterator of chunks, and whether this request joined
+            an existing flight. The iterator re-raises an upstream error.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            joined = flight is not None
+            if joined:
+                self.coalesced += 1
+            else:
+                flight = self._flights[key] = _Flight()
+                self.started += 1
+
+        if not joined:
+            threading.Thread(
+                target=self._pump, args=(key, flight, produce, on_complete),
+                name="single-flight", daemon=True,
+            ).start()
+        return self._subscribe(flight), joined
+
+    def _pump(self, key: str, flight: _Flight, produce, on_complete):
+        try:
+            for chunk in produce():
+                with flight.condition:
+                    flight.chunks.append(chunk)
+                    flight.condition.notify_all()
+        except BaseException as e:
+            flight.error = e
+        finally:
+            # New requests start a fresh flight (or hit the response cache)
+            with self._lock:
+                self._flights.pop(key, None)
+            with flight.condition:
+                flight.done = True
+                flight.condition.notify_all()
+        if flight.error is None and on_complete is not None:
+            on_complete(list(flight.chunks))
+
+    @staticmethod
+    def _subscribe(flight: _Flight) -> Iterator[str]:
+        position = 0
+        while True:
+            with flight.condition:
+                while position == len(flight.chunks) and not flight.done:
+                    flight.condition.wait()
+                pending = flight.chunks[position:]
+                finished = flight.done
+            yield from pending
+            position += len(pending)
+            if finished and position == len(flight.chunks):
+                if flight.error is not None:
+                    raise flight.error
+                return
+
+
+class _AsyncFlight:
+    def __init__(self):
+        self.chunks: list[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of `SingleFlight`: the upstream stream runs as a
+    task and subscribers on the same event loop share it.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self.started = 0
+        self._flights: dict[tuple, _AsyncFlight] = {}
+
+    def in_flight(self) -> int:
+        """Number of upstream streams currently running."""
+        return len(self._flights)
+
+    def stream(self, key: str, produce: Callable[[], AsyncIterator[str]],
+               on_complete: Optional[Callable[[list[str]], None]] = None) -> tuple[AsyncIterator[str], bool]:
+        """
+        Subscribes to the stream for `key`, starting it if needed.
+
+        Must be called from a running event loop; flights are never
+        shared across loops.
+
+        Args:
+            key: Identifies identical requests.
+            produce: Starts the upstream async stream (called once per flight).
+            on_complete: Called once with all chunks if the stream succeeds.
+
+        Returns:
+            tuple: An async iterator of chunks, and whether this request
+            joined an existing flight.
+        """
+        loop_key = (id(asyncio.get_running_loop()), key)
+        flight = self._flights.get(loop_key)
+        joined = flight is not None
+        if joined:
+            self.coalesced += 1
+        else:
+            flight = self._flights[loop_key] = _AsyncFlight()
+            self.started += 1
+            flight.task = asyncio.ensure_future(self._pump(loop_key, flight, produce, on_complete))
+        return self._subscribe(flight), joined
+
+    async def _pump(self, loop_key: tuple, flight: _AsyncFlight, produce, on_complete):
+        try:
+            async for chunk in produce():
+                async with flight.changed:
+                    flight.chunks.append(chunk)
+                    flight.changed.notify_all()
+        except BaseException as e:
+            # Cancellation included: subscribers must not take a cut-off
+            # stream for a complete answer
+            flight.error = e
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            self._flights.pop(loop_key, None)
+            async with flight.changed:
+                flight.done = True
+                flight.changed.notify_all()
+        if flight.error is None and on_complete is not None:
+            on_complete(list(flight.chunks))
+
+    @staticmethod
+    async def _subscribe(flight: _AsyncFlight) -> AsyncIterator[str]:
+        position = 0
+        while True:
+            async with flight.changed:
+                while position == len(flight.chunks) and not flight.done:
+                    await flight.changed.wait()
+                pending = flight.chunks[position:]
+                finished = flight.done
+            for chunk in pending:
+                yield chunk
+            position += len(pending)
+            if finished and position == len(flight.chunks):
+                if flight.error is not None:
+                    raise flight.error
+                return
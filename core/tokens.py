@@ -0,0 +1,276 @@
+import argparse
+import json
+import math
+import os
+import sys
+from dataclasses import asdict, dataclass
+from typing import Iterable, Optional
+
+# Gemini tokenizers average roughly four characters per token on English prose
+CHARS_PER_TOKEN = 4
+
+# Character classes, as bytes for `bytes.translate` deletion counting.
+# Punctuation and symbols usually become tokens of their own.
+_PUNCTUATION = b"!\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~"
+_DIGITS = b"0123456789"
+_WHITESPACE = b" \n\t\r"
+_NON_ASCII = bytes(range(128, 256))
+
+# Features of a text, in `TokenEstimator` coefficient order
+FEATURES = ("letters", "whitespace", "digits", "punctuation", "non_ascii")
+
+
+def text_features(text: str) -> tuple[int, int, int, int, int]:
+    """
+    Counts the character classes token counts depend on.
+
+    Counts by deleting each class with `bytes.translate` (a few C-speed
+    passes), so multi-megabyte documents take milliseconds.
+
+    Args:
+        text: The text to measure.
+
+    Returns:
+        tuple: (letters, whitespace, digits, punctuation, non-ASCII) character
+        counts; "letters" is everything else, so the counts sum to `len(text)`.
+    """
+    data = text.encode("utf-8")
+    if not text.isascii():
+        data = data.translate(None, _NON_ASCII)
+    non_ascii = len(text) - len(data)
+    whitespace = len(data) - len(data.translate(None, _WHITESPACE))
+    digits = len(data) - len(data.translate(None, _DIGITS))
+    punctuation = len(data) - len(data.translate(None, _PUNCTUATION))
+    letters = len(data) - whitespace - digits - punctuation
+    return letters, whitespace, digits, punctuation, non_ascii
+
+
+@dataclass(frozen=True)
+class TokenEstimator:
+    """
+    Linear token-count model over character classes.
+
+    Each coefficient is the tokens contributed per character of its class.
+    The default (every class at 1/CHARS_PER_TOKEN) is the plain
+    characters-per-token heuristic; `calibrate` fits the coefficients to
+    token counts reported by the model (e.g. recorded in a cassette), which
+    captures that digits and punctuation cost more than letters and that
+    non-English text tokenizes very differently.
+    """
+
+    letters: float = 1 / CHARS_PER_TOKEN
+    whitespace: float = 1 / CHARS_PER_TOKEN
+    digits: float = 1 / CHARS_PER_TOKEN
+    punctuation: float = 1 / CHARS_PER_TOKEN
+    non_ascii: float = 1 / CHARS_PER_TOKEN
+
+    @property
+    def coefficients(self) -> tuple[float, ...]:
+        return tuple(getattr(self, name) for name in FEATURES)
+
+    @property
+    def uniform(self) -> bool:
+        """True if every character costs the same (only the length matters)."""
+        return len(set(self.coefficients)) == 1
+
+    def estimate(self, text: str) -> int:
+        """
+        Estimates the number of model tokens in a piece of text.
+
+        Args:
+            text: The text to measure.
+
+        Returns:
+            int: The estimated token count (always >= 0).
+        """
+        if not text:
+            return 0
+        if self.uniform:
+            return math.ceil(len(text) * self.letters)
+        return self.estimate_features(text_features(text))
+
+    def estimate_features(self, features: Iterable[int]) -> int:
+        """Estimates tokens from precomputed `text_features`."""
+        return max(0, math.ceil(sum(c * f for c, f in zip(self.coefficients, features))))
+
+    @classmethod
+    def calibrate(cls, samples: Iterable[tuple[Iterable[int], int]], ridge: float = 1e-6) -> "TokenEstimator":
+        """
+        Fits the coefficients to observed token counts (least squares).
+
+        Args:
+            samples: (text_features, actual token count) pairs.
+            ridge: Regularization towards the default coefficients, which
+                keeps classes that barely occur in the samples sensible.
+
+        Returns:
+            TokenEstimator: The fitted estimator.
+
+        Raises:
+            ValueError: If there are no samples.
+        """
+        size = len(FEATURES)
+        prior = cls().coefficients
+        # Normal equations (X'X + rI) w = X'y + r * prior, with r relative to the data's scale
+        xtx = [[0.0] * size for _ in range(size)]
+        xty = [0.0] * size
+        count = 0
+        for features, tokens in samples:
+            features = list(features)
+            for i in range(size):
+                xty[i] += features[i] * tokens
+                for j in range(size):
+                    xtx[i][j] += features[i] * features[j]
+            count += 1
+        if not count:
+            raise ValueError("No calibration samples")
+        scale = ridge * max(xtx[i][i] for i in range(size))
+        for i in range(size):
+            xtx[i][i] += scale
+            xty[i] += scale * prior[i]
+        weights = _solve(xtx, xty)
+        return cls(*(max(0.0, weight) for weight in weights))
+
+    @classmethod
+    def from_cassette(cls, path: str) -> "TokenEstimator":
+        """
+        Calibrates against the token counts recorded in a cassette.
+
+        Records with `prompt_features` fit every coefficient; older records
+        only have the prompt length, and fit a single characters-per-token
+        ratio.
+
+        Args:
+            path: A cassette written by `RecordingBackend`.
+
+        Returns:
+            TokenEstimator: The fitted estimator.
+
+        Raises:
+            ValueError: If no record carries a token count.
+        """
+        with_features, lengths = [], []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if not record.get("prompt_tokens"):
+                    continue
+                if record.get("prompt_features"):
+                    with_features.append((record["prompt_features"], record["prompt_tokens"]))
+                else:
+                    lengths.append((record["prompt_chars"], record["prompt_tokens"]))
+        if with_features:
+            return cls.calibrate(with_features)
+        if lengths:
+            ratio = sum(tokens for _, tokens in lengths) / max(1, sum(chars for chars, _ in lengths))
+            return cls(*([ratio] * len(FEATURES)))
+        raise ValueError(f"No token counts recorded in {path}")
+
+    def save(self, path: str):
+        """Writes the coefficients as JSON."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "TokenEstimator":
+        """Reads coefficients written by `save`."""
+        with open(path, encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+
+def _solve(matrix: list[list[float]], vector: list[float]) -> list[float]:
+    """Solves a small linear system by Gaussian elimination with partial pivoting."""
+    size = len(vector)
+    rows = [row[:] + [value] for row, value in zip(matrix, vector)]
+    for column in range(size):
+        pivot = max(range(column, size), key=lambda r: abs(rows[r][column]))
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        if abs(rows[column][column]) < 1e-12:
+            raise ValueError("Calibration samples do not determine the coefficients")
+        for r in range(column + 1, size):
+            factor = rows[r][column] / rows[column][column]
+            for c in range(column, size + 1):
+                rows[r][c] -= factor * rows[column][c]
+    solution = [0.0] * size
+    for r in reversed(range(size)):
+        solution[r] = (rows[r][size] - sum(rows[r][c] * solution[c] for c in range(r + 1, size))) / rows[r][r]
+    return solution
+
+
+# Loaded on first use, so TOKEN_ESTIMATOR_PATH may come from a .env file
+_default_estimator: Optional[TokenEstimator] = None
+
+
+def get_estimator() -> TokenEstimator:
+    """Returns the estimator used by `estimate_tokens`."""
+    global _default_estimator
+    if _default_estimator is None:
+        path = os.getenv("TOKEN_ESTIMATOR_PATH")
+        _default_estimator = TokenEstimator.load(path) if path and os.path.exists(path) else TokenEstimator()
+    return _default_estimator
+
+
+def set_estimator(estimator: Optional[TokenEstimator]):
+    """Replaces the estimator used by `estimate_tokens` (None restores the default)."""
+    global _default_estimator
+    _default_estimator = estimator or TokenEstimator()
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of model tokens in a piece of text.
+
+    Uses the calibrated estimator at `TOKEN_ESTIMATOR_PATH` if there is
+    one, otherwise about four characters per token.
+
+    Args:
+        text: The text to measure.
+
+    Returns:
+        int: The estimated token count (always >= 0).
+    """
+    return (_default_estimator or get_estimator()).estimate(text)
+
+
+def tokens_to_chars(tokens: int) -> int:
+    """
+    Converts a token budget into an approximate character budget.
+
+    Args:
+        tokens: The number of tokens.
+
+    Returns:
+        int: The equivalent number of characters.
+    """
+    return max(0, tokens) * CHARS_PER_TOKEN
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Command-line entry point: calibrate an estimator from a cassette."""
+    parser = argparse.ArgumentParser(
+        prog="python -m core.tokens",
+        description="Calibrate the local token estimator from a recorded cassette.",
+    )
+    parser.add_argument("cassette", help="Cassette recorded with GEMINI_BACKEND=record")
+    parser.add_argument("-o", "--output", default=os.path.join(".cache", "token_estimator.json"),
+                        help="Where to write the coefficients (point TOKEN_ESTIMATOR_PATH here)")
+    args = parser.parse_args(argv)
+
+    try:
+        estimator = TokenEstimator.from_cassette(args.cassette)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    estimator.save(args.output)
+    print(json.dumps(asdict(estimator), indent=2))
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,123 @@
+import atexit
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from threading import Lock
 
+DEFAULT_QUEUE_SIZE = 10000
+DROP_POLICIES = ("drop_new", "drop_oldest", "block")
+
+# Attributes every LogRecord has; anything else was passed via `extra=`
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as single-line JSON objects.
+
+    Fields passed through `extra=` are included as top-level keys.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler with a bounded queue and an overload policy.
+
+    The request thread only snapshots the record and enqueues it; all
+    formatting and I/O happen on the listener thread. When the queue is
+    full, `drop_policy` decides what happens:
+
+      * "drop_new": discard the incoming record (never blocks)
+      * "drop_oldest": discard the oldest queued record to make room
+      * "block": wait for room (lossless, but may stall the caller)
+    """
+
+    def __init__(self, log_queue: queue.Queue, drop_policy: str = "drop_new"):
+        """
+        Initializes the handler.
+
+        Args:
+            log_queue: The bounded queue shared with the listener.
+            drop_policy: One of DROP_POLICIES.
+        """
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"drop_policy must be one of {DROP_POLICIES}, got {drop_policy!r}")
+        super().__init__(log_queue)
+        self.drop_policy = drop_policy
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Snapshots a record so it can be handled on another thread.
+
+        Unlike the base class, the message is not pre-formatted: only the
+        arguments are merged and the traceback rendered, so the listener's
+        formatters (text or JSON) still see the original fields.
+        """
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.drop_policy == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self.drop_policy == "drop_oldest":
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    self.queue.put_nowait(record)
+                except queue.Full:
+                    pass
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """QueueListener whose stop sentinel waits for room in a full queue."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
 
 class Logger:
     """
     Singleton logger class that ensures only one logger instance exists throughout the application.
     Provides centralized logging with both file and console handlers.
+
+    Log calls only enqueue the record; a background listener thread does
+    the formatting, file writes and rotation, so logging never does I/O
+    on the request path. File records are written as JSON lines.
     """
     _instance = None
     _lock = Lock()
@@ -28,8 +138,12 @@ class Logger:
 
     def __init__(self):
         """
-        Initializes the logger instance with file and console handlers.
+        Initializes the logger instance with file and console handlers
+        behind a bounded queue and a background listener.
         This method is only executed once due to the singleton pattern.
+
+        The queue is configured with LOG_QUEUE_SIZE (default 10000) and
+        LOG_DROP_POLICY ("drop_new", "drop_oldest" or "block").
         """
         if self._initialized:
             return
@@ -57,16 +171,24 @@ class Logger:
             backupCount=5
         )
         file_handler.setLevel(logging.INFO)
-        file_handler.setFormatter(formatter)
+        file_handler.setFormatter(JsonFormatter())
 
         # Console handler
         console_handler = logging.StreamHandler()
         console_handler.setLevel(logging.INFO)
         console_handler.setFormatter(formatter)
 
-        # Add handlers to logger
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        # Both handlers run on the listener thread, fed by a bounded queue
+        self.handlers = [file_handler, console_handler]
+        log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)))
+        self.queue_handler = BoundedQueueHandler(log_queue, os.getenv("LOG_DROP_POLICY", "drop_new"))
+        self.listener = DrainingQueueListener(log_queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+        self._stopped = False
+
+        # Add the queue handler to logger
+        self.logger.addHandler(self.queue_handler)
+        atexit.register(self.shutdown)
 
         self._initialized = True
 
@@ -87,5 +209,31 @@ class Logger:
             level (int): Logging level (e.g., logging.DEBUG, logging.INFO, logging.ERROR).
         """
         self.logger.setLevel(level)
-        for handler in self.logger.handlers:
+        for handler in [self.queue_handler, *self.handlers]:
             handler.setLevel(level)
+
+    def shutdown(self):
+        """
+        Drains the queue, stops the listener and flushes the handlers.
+
+        Registered with `atexit`; safe to call more than once.
+        """
+        if self._stopped:
+            return
+        self._stopped = True
+        if self.queue_handler.dropped:
+            dropped = logging.makeLogRecord({
+                "name": self.logger.name,
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": f"{self.queue_handler.dropped} log records were dropped under load",
+            })
+            self.queue_handler.queue.put(dropped)
+        self.listener.stop()
+        for handler in self.handlers:
+            try:
+                handler.flush()
+            except (OSError, ValueError):
+                # The stream may already be closed at interpreter exit,
+                # as `logging.shutdown` also tolerates
+                pass
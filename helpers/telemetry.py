@@ -0,0 +1,373 @@
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+from typing import Optional
+
+from helpers.logger import Logger
+
+
+# Global singleton instance
+logger = Logger().get_logger()
+
+# Latency buckets in seconds, from prompt formatting up to slow upstream calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DEFAULT_MAX_SPANS = 10000
+
+METRIC_HELP = {
+    "qa_requests_total": ("counter", "QA generation requests, by model and status."),
+    "qa_cache_hits_total": ("counter", "Requests answered from the response cache, by model."),
+    "qa_errors_total": ("counter", "Failed generation requests, by model."),
+    "qa_coalesced_total": ("counter", "Requests that shared an identical in-flight request's stream, by model."),
+    "qa_retries_total": ("counter", "Upstream attempts retried after a retriable error or timeout."),
+    "qa_hedges_total": ("counter", "Hedged (duplicate) upstream requests started."),
+    "qa_hedge_wins_total": ("counter", "Requests answered by the hedged request."),
+    "qa_failovers_total": ("counter", "Requests answered by a fallback model."),
+    "qa_deadlines_exceeded_total": ("counter", "Requests that got no response within the deadline."),
+    "qa_routed_total": ("counter", "Requests routed to each model first, by model and prompt size class."),
+    "qa_fast_path_total": ("counter", "Questions seen by the local fast path, by outcome (answer, section or fallback)."),
+    "qa_span_seconds": ("histogram", "Duration of instrumented request stages, by span name."),
+    "qa_time_to_first_chunk_seconds": ("histogram", "Time from request start to the first streamed chunk."),
+}
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    """Returns the request ID of the surrounding `Telemetry.request` block, if any."""
+    return _request_id.get()
+
+
+class Span:
+    """A timed stage of a request; recorded when `end` is called."""
+
+    __slots__ = ("_telemetry", "name", "request_id", "attributes", "start", "_ended")
+
+    def __init__(self, telemetry: "Telemetry", name: str, attributes: dict):
+        self._telemetry = telemetry
+        self.name = name
+        self.request_id = _request_id.get()
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self._ended = False
+
+    def elapsed(self) -> float:
+        """Seconds since the span started."""
+        return time.perf_counter() - self.start
+
+    def set(self, **attributes):
+        """Adds attributes to the span."""
+        self.attributes.update(attributes)
+
+    def end(self, **attributes):
+        """Records the span (idempotent)."""
+        if self._ended:
+            return
+        self._ended = True
+        self.attributes.update(attributes)
+        self._telemetry._record_span(self, self.elapsed())
+
+    def __enter__(self) -> "Span":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attributes.setdefault("status", "error")
+        self.end()
+
+
+class _NoOpSpan:
+    """Shared stand-in returned while telemetry is disabled."""
+
+    __slots__ = ()
+
+    def elapsed(self) -> float:
+        return 0.0
+
+    def set(self, **attributes):
+        pass
+
+    def end(self, **attributes):
+        pass
+
+    def __enter__(self) -> "_NoOpSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NOOP_SPAN = _NoOpSpan()
+
+
+class Telemetry:
+    """
+    Singleton collecting request spans, counters and latency histograms.
+
+    Disabled unless TELEMETRY_ENABLED=1; while disabled every call returns
+    after a single flag check, so instrumented code pays ~nothing. When
+    enabled, metrics can be scraped in Prometheus text format (see
+    `start_http_server`, or TELEMETRY_PORT) and everything recorded can be
+    dumped to JSON at exit (TELEMETRY_DUMP_PATH, with `{pid}` replaced by
+    the process ID so concurrent runs don't overwrite each other).
+    """
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls):
+        """
+        Ensures only one instance of the Telemetry class is created (Singleton pattern).
+
+        Returns:
+            Telemetry: The singleton Telemetry instance.
+        """
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        """
+        Initializes empty metric stores from the TELEMETRY_* env vars.
+        This method is only executed once due to the singleton pattern.
+        """
+        if self._initialized:
+            return
+
+        self.enabled = False
+        self.buckets = DEFAULT_BUCKETS
+        self._data_lock = threading.Lock()
+        self._counters: dict[tuple, float] = {}
+        self._histograms: dict[tuple, list] = {}
+        self.spans = deque(maxlen=int(os.getenv("TELEMETRY_MAX_SPANS", DEFAULT_MAX_SPANS)))
+        self._server = None
+        self._dump_path = None
+        self.configure_from_env()
+
+        self._initialized = True
+
+    def configure_from_env(self):
+        """
+        Applies TELEMETRY_ENABLED, TELEMETRY_DUMP_PATH and TELEMETRY_PORT.
+
+        Runs at construction; call it again after loading a `.env` file,
+        since the singleton is usually created at import time.
+        """
+        self.enabled = os.getenv("TELEMETRY_ENABLED", "").lower() in ("1", "true", "yes")
+        if not self.enabled:
+            return
+
+        dump_path = os.getenv("TELEMETRY_DUMP_PATH")
+        if dump_path and self._dump_path is None:
+            atexit.register(lambda: self.dump(self._dump_path))
+        self._dump_path = dump_path or self._dump_path
+
+        port = os.getenv("TELEMETRY_PORT")
+        if port:
+            self.start_http_server(int(port))
+
+    def enable(self):
+        """Starts recording."""
+        self.enabled = True
+
+    def disable(self):
+        """Stops recording; already recorded data is kept."""
+        self.enabled = False
+
+    def reset(self):
+        """Drops all recorded spans and metrics."""
+        with self._data_lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.spans.clear()
+
+    @contextmanager
+    def request(self, request_id: Optional[str] = None):
+        """
+        Scopes a request: spans started inside carry its request ID.
+
+        Args:
+            request_id: The ID to use; a random one is generated if omitted.
+
+        Yields:
+            str: The request ID.
+        """
+        request_id = request_id or uuid.uuid4().hex[:16]
+        token = _request_id.set(request_id)
+        try:
+            yield request_id
+        finally:
+            _request_id.reset(token)
+
+    def span(self, name: str, **attributes):
+        """
+        Starts a span. Use as a context manager, or call `end()` on it
+        (e.g. from a generator's `finally`).
+
+        Args:
+            name: The stage name (e.g. "format_prompt").
+            **attributes: Extra fields recorded with the span.
+
+        Returns:
+            Span: The started span (a no-op span while disabled).
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Increments a counter."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._data_lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        """Records a value (in seconds) in a histogram."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._data_lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts (non-cumulative), then sum and count
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+                    break
+            histogram[1] += value
+            histogram[2] += 1
+
+    def _record_span(self, span: Span, duration: float):
+        self.observe("qa_span_seconds", duration, span=span.name)
+        record = {
+            "name": span.name,
+            "request_id": span.request_id,
+            "start": round(span.start, 6),
+            "duration_s": round(duration, 6),
+        }
+        record.update(span.attributes)
+        with self._data_lock:
+            self.spans.append(record)
+
+    def counter_value(self, name: str, **labels) -> float:
+        """Returns the current value of a counter (0 if never incremented)."""
+        with self._data_lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def render_prometheus(self) -> str:
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics page.
+        """
+        with self._data_lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(h[0]), h[1], h[2])) for key, h in self._histograms.items())
+
+        lines = []
+        described = set()
+
+        def describe(name: str, default_type: str):
+            if name in described:
+                return
+            described.add(name)
+            metric_type, help_text = METRIC_HELP.get(name, (default_type, name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), (bucket_counts, total, count) in histograms:
+            describe(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str):
+        """
+        Writes all recorded spans and the metrics page to a JSON file.
+
+        Args:
+            path: Destination file.
+        """
+        path = path.replace("{pid}", str(os.getpid()))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._data_lock:
+            spans = list(self.spans)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"spans": spans, "metrics": self.render_prometheus()}, f, indent=2, default=str)
+        logger.info(f"Telemetry written to {path} ({len(spans)} spans)")
+
+    def start_http_server(self, port: int, host: str = "127.0.0.1") -> int:
+        """
+        Serves the metrics page at http://host:port/metrics from a daemon thread.
+
+        Calling it again returns the already running server's port.
+
+        Args:
+            port: Port to listen on (0 picks a free one).
+            host: Interface to bind; local-only by default.
+
+        Returns:
+            int: The port actually bound.
+        """
+        with self._lock:
+            if self._server is None:
+                telemetry = self
+
+                class MetricsHandler(BaseHTTPRequestHandler):
+                    def do_GET(self):
+                        if self.path.split("?")[0] != "/metrics":
+                            self.send_error(404)
+                            return
+                        body = telemetry.render_prometheus().encode("utf-8")
+                        self.send_response(200)
+                        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                        self.send_header("Content-Length", str(len(body)))
+                        self.end_headers()
+                        self.wfile.write(body)
+
+                    def log_message(self, format, *args):
+                        pass
+
+                self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+                threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+                logger.info(f"Metrics endpoint listening on http://{host}:{self._server.server_port}/metrics")
+        return self._server.server_port
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
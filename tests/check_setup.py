@@ -34,6 +34,9 @@ def main():
 
     checks = []
 
+    # The offline stand-in backend needs neither a .env file nor an API key
+    standin = os.getenv("GEMINI_BACKEND", "gemini").lower() == "standin"
+
     files_to_check = [
         (project_root / "tests" / "test_qa_evaluation.py", "Main test file"),
         (project_root / "tests" / "test_gemini.py", "API test script"),
@@ -43,6 +46,7 @@ def main():
         (project_root / "tests" / "pytest.ini", "Pytest config"),
         (project_root / ".env", "Environment file"),
         (project_root / "core" / "gemini_client.py", "Gemini client"),
+        (project_root / "core" / "backends.py", "Model backends (live + stand-in)"),
         (project_root / "core" / "qa_logic.py", "QA logic"),
         (project_root / "helpers" / "logger.py", "Logger helper"),
     ]
@@ -53,7 +57,7 @@ def main():
         checks.append(exists)
         status = "✅" if exists else "❌"
         print(f"{status} {description}: {filepath.relative_to(project_root)}")
-        if not exists:
+        if not exists and not (standin and filepath.name == ".env"):
             all_good = False
 
     # Check environment
@@ -62,7 +66,14 @@ def main():
     print("=" * 70)
 
     env_file = project_root / ".env"
-    if env_file.exists():
+    if standin:
+        print("✅ GEMINI_BACKEND=standin: using the offline stand-in, no API key needed")
+        cassette = os.getenv("STANDIN_CASSETTE")
+        if cassette:
+            status = "✅" if Path(cassette).exists() else "❌"
+            print(f"{status} Cassette: {cassette}")
+            all_good = all_good and Path(cassette).exists()
+    elif env_file.exists():
         from dotenv import load_dotenv
         load_dotenv(env_file)
 
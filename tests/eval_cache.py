@@ -0,0 +1,79 @@
+"""
+On-disk cache for the DeepEval suite.
+
+Stores generated model outputs and LLM-judged metric verdicts so that
+re-running the suite only calls the model for rows whose inputs, context,
+model, prompt or metric configuration actually changed.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+def make_key(*parts) -> str:
+    """
+    Builds a cache key from any number of string-able parts.
+
+    Args:
+        *parts: The values identifying the cached item.
+
+    Returns:
+        str: A hex SHA-256 digest.
+    """
+    material = "\x00".join(str(part) for part in parts)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def hash_text(text: str) -> str:
+    """Returns the hex SHA-256 digest of a string."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EvalCache:
+    """A tiny thread-safe key/value store (JSON values) backed by SQLite."""
+
+    def __init__(self, path: str):
+        """
+        Opens (and if needed creates) the cache database.
+
+        Args:
+            path: Location of the SQLite database file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Returns the cached value for a key, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict):
+        """Stores a JSON-serializable value for a key."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time()),
+            )
+            self._conn.commit()
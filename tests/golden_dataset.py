@@ -0,0 +1,106 @@
+"""
+Golden dataset files for the DeepEval suite.
+
+Two JSONL formats are read:
+
+- inline (the original): every row carries its own copy of the context,
+  `{"input", "retrieval_context", "expected_output"}`;
+- deduplicated: each context is stored once, in a context record written
+  before the first row that uses it, and rows reference it by hash:
+
+      {"context_id": "<sha256>", "context": "..."}
+      {"input": "...", "expected_output": "...", "context_id": "<sha256>"}
+
+Both load through `iter_goldens`, which streams the file and hands every
+row of a context the same string object, so memory grows with the number
+of distinct contexts rather than rows. `convert` rewrites an inline file
+as a deduplicated one.
+
+Usage:
+    python tests/golden_dataset.py tests/data/golden_qa_dataset.jsonl golden_qa_dataset.dedup.jsonl
+"""
+import argparse
+import json
+from typing import Iterator
+
+from eval_cache import hash_text
+
+
+def context_id(context: str) -> str:
+    """Returns the id a context is referenced by (its hex SHA-256 digest)."""
+    return hash_text(context)
+
+
+def iter_goldens(path: str) -> Iterator[dict]:
+    """
+    Streams the rows of a golden dataset in either format.
+
+    Args:
+        path: The JSONL file.
+
+    Yields:
+        dict: {"input", "expected_output", "retrieval_context", "context_id"};
+            rows with the same context share one `retrieval_context` string.
+
+    Raises:
+        ValueError: A row references a context not defined before it.
+    """
+    # Context id -> (id, context): rows share both strings
+    contexts = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "context" in record:
+                contexts.setdefault(record["context_id"], (record["context_id"], record["context"]))
+                continue
+            if "retrieval_context" in record:
+                # Inline row: keep the first copy of its context, drop this one
+                key = context_id(record["retrieval_context"])
+                shared = contexts.setdefault(key, (key, record["retrieval_context"]))
+            elif record.get("context_id") in contexts:
+                shared = contexts[record["context_id"]]
+            else:
+                raise ValueError(f"{path}:{line_number}: unknown context_id {record.get('context_id')!r}")
+            record["context_id"], record["retrieval_context"] = shared
+            yield record
+
+
+def convert(source: str, destination: str) -> tuple[int, int]:
+    """
+    Rewrites a golden dataset as a deduplicated one, streaming both files.
+
+    Args:
+        source: The dataset to convert (either format).
+        destination: Where to write the deduplicated dataset.
+
+    Returns:
+        tuple[int, int]: (rows, distinct contexts) written.
+    """
+    written = set()
+    rows = 0
+    with open(destination, "w", encoding="utf-8") as out:
+        for golden in iter_goldens(source):
+            key = golden["context_id"]
+            if key not in written:
+                out.write(json.dumps({"context_id": key, "context": golden["retrieval_context"]}) + "\n")
+                written.add(key)
+            row = {name: value for name, value in golden.items() if name != "retrieval_context"}
+            out.write(json.dumps(row) + "\n")
+            rows += 1
+    return rows, len(written)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Golden dataset to convert")
+    parser.add_argument("destination", help="Deduplicated dataset to write")
+    args = parser.parse_args()
+
+    rows, contexts = convert(args.source, args.destination)
+    print(f"Wrote {rows} rows referencing {contexts} distinct contexts to {args.destination}")
+
+
+if __name__ == "__main__":
+    main()
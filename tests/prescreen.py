@@ -0,0 +1,387 @@
+"""
+Local pre-screen for the DeepEval suite.
+
+Scores every golden row at once with cheap lexical metrics (token F1 and
+ROUGE-L against the expected answer, refusal-phrase detection and n-gram
+overlap with the retrieval context) and settles the clear cases locally:
+
+- `pass`: both answers are refusals, or the answer closely matches the
+  expected one and its n-grams come from the context;
+- `fail`: a generation error, a refusal where an answer was expected (or
+  the reverse), or an answer that neither matches the expected one nor
+  shares content words with the context;
+- `judge`: everything else goes to the LLM-judged metrics, most doubtful
+  (lowest local score) first.
+
+All metrics are computed with NumPy over the whole dataset in one pass;
+tokenization is the only per-row Python work. Texts stay Python strings
+(only token ids become arrays), and each distinct context is tokenized
+once: pass the distinct contexts with a row -> context index, or let
+`score_dataset` deduplicate a per-row list.
+"""
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from core.gemini_client import NOT_FOUND_MESSAGE, STREAMING_ERROR_MESSAGE
+
+PASS = "pass"
+FAIL = "fail"
+JUDGE = "judge"
+
+# Lower-case phrases that mark an answer as "the document doesn't say"
+REFUSAL_PHRASES = (
+    NOT_FOUND_MESSAGE.lower(),
+    "does not contain the answer",
+    "does not contain information",
+    "does not contain any information",
+    "does not mention",
+    "not mentioned in the",
+    "no information about",
+    "unable to find",
+    "cannot answer",
+)
+
+# LLM calls one run of each DeepEval metric (by `metric.__name__`) makes with
+# include_reason=True and one retrieval context; used to report the judge
+# calls the pre-screen saves
+JUDGE_CALLS_PER_METRIC = {
+    "Answer Relevancy": 3,
+    "Faithfulness": 4,
+    "Contextual Relevancy": 2,
+}
+
+_TOKEN = re.compile(r"\w+")
+
+# Function words, ignored when checking whether an answer is about the context
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have i if in is it its of on or our so that the "
+    "their there they this to was we were what when which who will with you your".split()
+)
+
+# Rows per ROUGE-L batch; bounds the (rows x tokens) DP matrices
+_LCS_BATCH = 1024
+
+
+@dataclass
+class PrescreenConfig:
+    """Thresholds of the local pre-screen."""
+
+    # Set EVAL_PRESCREEN=off to send every row to the judges
+    enabled: bool = True
+    # A clear pass needs max(token F1, ROUGE-L) and context overlap at least
+    # this high (golden answers paraphrase the context: their bigram overlap
+    # runs 0.3-1.0)
+    pass_similarity: float = 0.8
+    pass_grounding: float = 0.3
+    # A clear fail has similarity and the share of content words found in
+    # the context both at most this high
+    fail_similarity: float = 0.15
+    fail_grounding: float = 0.1
+    # N-gram order of the context overlap
+    ngram: int = 2
+    # Tokens per text considered by ROUGE-L
+    max_tokens: int = 256
+
+    @classmethod
+    def from_env(cls) -> "PrescreenConfig":
+        """Builds the configuration from EVAL_PRESCREEN* environment variables."""
+        enabled = os.getenv("EVAL_PRESCREEN", "on").strip().lower() not in ("0", "off", "false", "no")
+        pass_similarity = float(os.getenv("EVAL_PRESCREEN_PASS", cls.pass_similarity))
+        fail_similarity = float(os.getenv("EVAL_PRESCREEN_FAIL", cls.fail_similarity))
+        return cls(enabled=enabled, pass_similarity=pass_similarity, fail_similarity=fail_similarity)
+
+
+@dataclass
+class ScreenResult:
+    """The pre-screen's verdict on one row."""
+
+    decision: str
+    reason: str
+    scores: dict = field(default_factory=dict)
+
+
+@dataclass
+class DatasetScreen:
+    """The pre-screen's verdicts on a whole dataset."""
+
+    # Metric name -> one value per row
+    scores: dict
+    # One of PASS, FAIL, JUDGE per row
+    decisions: np.ndarray
+    reasons: list
+    # Row indices: settled rows first, then the judged ones, most doubtful first
+    order: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.decisions)
+
+    def row(self, index: int) -> ScreenResult:
+        """Returns the verdict on one row."""
+        scores = {name: round(float(values[index]), 3) for name, values in self.scores.items()}
+        return ScreenResult(str(self.decisions[index]), self.reasons[index], scores)
+
+    def count(self, decision: str) -> int:
+        """Returns how many rows got a decision."""
+        return int(np.count_nonzero(self.decisions == decision))
+
+    def judge_calls_saved(self, metric_names: list[str]) -> tuple[int, int]:
+        """
+        Counts the judge work the settled rows skip.
+
+        Args:
+            metric_names: Names (`metric.__name__`) of the metrics each judged row runs.
+
+        Returns:
+            tuple[int, int]: (metric runs saved, estimated LLM calls saved).
+        """
+        settled = len(self) - self.count(JUDGE)
+        calls = sum(JUDGE_CALLS_PER_METRIC.get(name, 1) for name in metric_names)
+        return settled * len(metric_names), settled * calls
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cases a text and splits it into word tokens."""
+    return _TOKEN.findall(text.lower())
+
+
+def _encode(groups: list[list[str]]) -> tuple[list[str], list[tuple[np.ndarray, np.ndarray]]]:
+    """
+    Tokenizes groups of texts into one shared integer vocabulary.
+
+    Returns:
+        tuple: (vocabulary, per group (token ids, row index of each token)).
+    """
+    vocabulary = {}
+    token_lists = [[[vocabulary.setdefault(token, len(vocabulary)) for token in tokenize(text)] for text in texts]
+                   for texts in groups]
+    ids = np.fromiter((token for lists in token_lists for tokens in lists for token in tokens), dtype=np.int64)
+    encoded, start = [], 0
+    for lists in token_lists:
+        lengths = np.array([len(tokens) for tokens in lists], dtype=np.int64)
+        end = start + int(lengths.sum())
+        encoded.append((ids[start:end], np.repeat(np.arange(len(lists)), lengths)))
+        start = end
+    return list(vocabulary), encoded
+
+
+def _ngrams(ids: np.ndarray, rows: np.ndarray, n: int) -> tuple[np.ndarray, np.ndarray]:
+    """Returns (n-gram ids, row index) of every n-gram not crossing a row boundary."""
+    if n == 1:
+        return ids, rows
+    if len(ids) < n:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    windows = np.lib.stride_tricks.sliding_window_view(ids, n)
+    row_windows = np.lib.stride_tricks.sliding_window_view(rows, n)
+    within = row_windows[:, 0] == row_windows[:, -1]
+    base = int(ids.max()) + 1
+    if base ** n < 2 ** 62:
+        # Fold each n-gram into one integer: far faster to number than rows
+        keys = windows[within] @ (base ** np.arange(n - 1, -1, -1, dtype=np.int64))
+        _, gram_ids = np.unique(keys, return_inverse=True)
+    else:
+        _, gram_ids = np.unique(windows[within], axis=0, return_inverse=True)
+    return gram_ids.reshape(-1).astype(np.int64), row_windows[within, 0]
+
+
+def _bag_overlap(a: tuple, b: tuple, n_rows: int) -> np.ndarray:
+    """Clipped count of the tokens two aligned bags of rows have in common."""
+    (ids_a, rows_a), (ids_b, rows_b) = a, b
+    width = int(max(ids_a.max(initial=0), ids_b.max(initial=0))) + 1
+    keys_a, counts_a = np.unique(rows_a * width + ids_a, return_counts=True)
+    keys_b, counts_b = np.unique(rows_b * width + ids_b, return_counts=True)
+    common, in_a, in_b = np.intersect1d(keys_a, keys_b, assume_unique=True, return_indices=True)
+    return np.bincount(common // width, weights=np.minimum(counts_a[in_a], counts_b[in_b]), minlength=n_rows)
+
+
+def _found_in_context(answer: tuple, context: tuple, context_of_row: np.ndarray, n_rows: int) -> np.ndarray:
+    """Share of each row's answer (n-)grams that occur in its context (NaN if it has none)."""
+    (ids_a, rows_a), (ids_c, rows_c) = answer, context
+    width = int(max(ids_a.max(initial=0), ids_c.max(initial=0))) + 1
+    context_keys = np.unique(rows_c * width + ids_c)
+    found = np.isin(context_of_row[rows_a] * width + ids_a, context_keys, assume_unique=False)
+    totals = np.bincount(rows_a, minlength=n_rows)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.bincount(rows_a, weights=found, minlength=n_rows) / totals
+
+
+def _padded(ids: np.ndarray, rows: np.ndarray, position: np.ndarray, selected: np.ndarray, n_rows: int,
+            width: int, pad: int) -> np.ndarray:
+    """Packs the first `width` tokens of the selected rows into a padded matrix."""
+    slot = np.full(n_rows, -1)
+    slot[selected] = np.arange(len(selected))
+    keep = (slot[rows] >= 0) & (position < width)
+    matrix = np.full((len(selected), width), pad, dtype=np.int64)
+    matrix[slot[rows[keep]], position[keep]] = ids[keep]
+    return matrix
+
+
+def _lcs_lengths(a: tuple, b: tuple, n_rows: int, max_tokens: int) -> np.ndarray:
+    """
+    Longest common subsequence length of each aligned pair of rows.
+
+    Rows are processed in batches of similar length; within a batch the DP
+    advances one token of `a` at a time for all rows and all of `b` at once,
+    since row i of the table is the running maximum of
+    `where(a_i == b_j, prev[j-1] + 1, prev[j])` along j.
+    """
+    len_a = np.minimum(np.bincount(a[1], minlength=n_rows), max_tokens)
+    len_b = np.minimum(np.bincount(b[1], minlength=n_rows), max_tokens)
+    # Position of each token within its row
+    position_a = np.arange(len(a[1])) - np.searchsorted(a[1], a[1])
+    position_b = np.arange(len(b[1])) - np.searchsorted(b[1], b[1])
+    lcs = np.zeros(n_rows)
+    by_length = np.argsort(len_a + len_b, kind="stable")
+    for start in range(0, n_rows, _LCS_BATCH):
+        batch = by_length[start:start + _LCS_BATCH]
+        width_a, width_b = int(len_a[batch].max(initial=0)), int(len_b[batch].max(initial=0))
+        if not width_a or not width_b:
+            continue
+        # Distinct paddings never match each other
+        tokens_a = _padded(*a, position_a, batch, n_rows, width_a, pad=-1)
+        tokens_b = _padded(*b, position_b, batch, n_rows, width_b, pad=-2)
+        prev = np.zeros((len(batch), width_b + 1), dtype=np.int32)
+        for i in range(width_a):
+            matches = tokens_a[:, i:i + 1] == tokens_b
+            prev[:, 1:] = np.maximum.accumulate(np.where(matches, prev[:, :-1] + 1, prev[:, 1:]), axis=1)
+        lcs[batch] = prev[:, -1]
+    return lcs
+
+
+def _f_measure(overlap: np.ndarray, predicted: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    """Harmonic mean of overlap/predicted and overlap/reference (0 where undefined)."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        precision = overlap / predicted
+        recall = overlap / reference
+        f = 2 * precision * recall / (precision + recall)
+    return np.nan_to_num(f)
+
+
+def _contains_any(texts: list[str], phrases: tuple) -> np.ndarray:
+    """Whether each text contains any of the (lower-case) phrases."""
+    # Per string: a fixed-width array would pad every text to the longest
+    return np.fromiter((any(phrase in text.lower() for phrase in phrases) for text in texts),
+                       dtype=bool, count=len(texts))
+
+
+def _deduplicate(texts: list[str]) -> tuple[list[str], np.ndarray]:
+    """Returns the distinct texts, in first-seen order, and each text's index among them."""
+    index = {}
+    rows = np.fromiter((index.setdefault(text, len(index)) for text in texts), dtype=np.int64, count=len(texts))
+    return list(index), rows
+
+
+def score_dataset(actual: list[str], expected: list[str], contexts: list[str],
+                  ngram: int = 2, max_tokens: int = 256, context_of_row=None, errors=None) -> dict:
+    """
+    Computes the local metrics of every row in one pass.
+
+    Args:
+        actual: The generated answers.
+        expected: The golden answers.
+        contexts: The retrieval context of each row, or with `context_of_row`
+            the distinct contexts.
+        ngram: N-gram order of the context overlap.
+        max_tokens: Tokens per text considered by ROUGE-L.
+        context_of_row: Optional index into `contexts` of each row's context.
+        errors: Optional flag per row marking a failed generation; by
+            default only rows equal to STREAMING_ERROR_MESSAGE are errors.
+
+    Returns:
+        dict: Metric name -> np.ndarray with one value per row.
+    """
+    n_rows = len(actual)
+    if context_of_row is None:
+        # Golden datasets repeat the same context across rows: tokenize each once
+        contexts, context_of_row = _deduplicate(contexts)
+    context_of_row = np.asarray(context_of_row, dtype=np.int64)
+    vocabulary, (answer, reference, context) = _encode([actual, expected, list(contexts)])
+    if errors is None:
+        errors = [text == STREAMING_ERROR_MESSAGE for text in actual]
+
+    len_answer = np.bincount(answer[1], minlength=n_rows)
+    len_reference = np.bincount(reference[1], minlength=n_rows)
+    token_f1 = _f_measure(_bag_overlap(answer, reference, n_rows), len_answer, len_reference)
+    lcs = _lcs_lengths(answer, reference, n_rows, max_tokens)
+    rouge_l = _f_measure(lcs, np.minimum(len_answer, max_tokens), np.minimum(len_reference, max_tokens))
+
+    # Answers shorter than the n-gram order fall back to unigram overlap
+    unigram_overlap = _found_in_context(answer, context, context_of_row, n_rows)
+    stopword = np.fromiter((token in STOPWORDS for token in vocabulary), dtype=bool, count=len(vocabulary))
+    content = ~stopword[answer[0]]
+    word_overlap = _found_in_context((answer[0][content], answer[1][content]), context, context_of_row, n_rows)
+    # One n-gram vocabulary for answers and contexts: number them together
+    ids, rows = _ngrams(np.concatenate([answer[0], context[0]]),
+                        np.concatenate([answer[1], context[1] + n_rows]), ngram)
+    in_answer = rows < n_rows
+    grams = (ids[in_answer], rows[in_answer])
+    context_grams = (ids[~in_answer], rows[~in_answer] - n_rows)
+    ngram_overlap = _found_in_context(grams, context_grams, context_of_row, n_rows)
+    ngram_overlap = np.where(np.isnan(ngram_overlap), np.nan_to_num(unigram_overlap), ngram_overlap)
+
+    return {
+        "token_f1": token_f1,
+        "rouge_l": rouge_l,
+        "context_overlap": ngram_overlap,
+        "context_word_overlap": np.nan_to_num(word_overlap),
+        "refusal": _contains_any(actual, REFUSAL_PHRASES),
+        "expected_refusal": _contains_any(expected, REFUSAL_PHRASES),
+        "error": np.asarray(errors, dtype=bool),
+    }
+
+
+def screen_dataset(actual: list[str], expected: list[str], contexts: list[str],
+                   config: Optional[PrescreenConfig] = None, context_of_row=None,
+                   errors=None) -> DatasetScreen:
+    """
+    Settles the clear rows of a dataset locally and orders the rest for the judges.
+
+    Args:
+        actual: The generated answers.
+        expected: The golden answers.
+        contexts: The retrieval context of each row, or with `context_of_row`
+            the distinct contexts.
+        config: Pre-screen thresholds; defaults to PrescreenConfig().
+        context_of_row: Optional index into `contexts` of each row's context.
+        errors: Optional flag per row marking a failed generation (see
+            `score_dataset`).
+
+    Returns:
+        DatasetScreen: Scores, decisions and judging order.
+    """
+    config = config or PrescreenConfig()
+    n_rows = len(actual)
+    if not config.enabled or not n_rows:
+        return DatasetScreen({}, np.full(n_rows, JUDGE), ["pre-screen disabled"] * n_rows, np.arange(n_rows))
+
+    scores = score_dataset(actual, expected, contexts, config.ngram, config.max_tokens, context_of_row, errors)
+    similarity = np.maximum(scores["token_f1"], scores["rouge_l"])
+    grounding = scores["context_overlap"]
+    refusal, expected_refusal = scores["refusal"], scores["expected_refusal"]
+
+    # Earlier rules win: np.select takes the first matching condition
+    rules = [
+        (scores["error"], FAIL, "generation error"),
+        (refusal & expected_refusal, PASS, "refused as expected"),
+        (expected_refusal & ~refusal, FAIL, "answered where a refusal was expected"),
+        (refusal & ~expected_refusal, FAIL, "refused where an answer was expected"),
+        ((similarity >= config.pass_similarity) & (grounding >= config.pass_grounding), PASS,
+         "matches the expected answer and the context"),
+        ((similarity <= config.fail_similarity) & (scores["context_word_overlap"] <= config.fail_grounding), FAIL,
+         "matches neither the expected answer nor the context"),
+    ]
+    conditions = [condition for condition, _, _ in rules]
+    decisions = np.select(conditions, [decision for _, decision, _ in rules], default=JUDGE)
+    reason_index = np.select(conditions, np.arange(len(rules)), default=len(rules))
+    reason_names = [reason for _, _, reason in rules] + ["unclear locally"]
+    reasons = [reason_names[index] for index in reason_index]
+
+    # Settled rows first (they cost nothing), then the judged ones from the
+    # lowest local score up, so likely failures surface early
+    settled = decisions != JUDGE
+    order = np.lexsort((grounding, similarity, ~settled))
+    scores["similarity"] = similarity
+    return DatasetScreen(scores, decisions, reasons, order)
@@ -0,0 +1,81 @@
+"""Unit tests for the asyncio client API (no API access required)."""
+import asyncio
+import time
+
+import pytest
+
+from core.async_client import AsyncModelRunner
+from core.backends import StandInBackend, StandInConfig
+from core.gemini_client import GeminiClient
+from core.model_cache import ModelSelectionCache
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Async fake model: every response takes `latency` seconds."""
+
+    latency = 0.1
+
+    async def _stream(self):
+        await asyncio.sleep(self.latency)
+        yield FakeChunk("Thirty ")
+        yield FakeChunk("days.")
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        if stream:
+            return self._stream()
+        await asyncio.sleep(self.latency)
+        return FakeChunk("Thirty days.")
+
+
+def test_concurrent_requests_take_max_not_sum_latency():
+    runner = AsyncModelRunner(max_concurrency=10)
+
+    async def run():
+        return await asyncio.gather(*(runner.generate(FakeModel(), "q") for _ in range(10)))
+
+    start = time.perf_counter()
+    answers = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+
+    assert answers == ["Thirty days."] * 10
+    assert elapsed < 5 * FakeModel.latency
+    assert runner.peak_in_flight == 10
+
+
+def test_concurrency_cap_is_respected():
+    runner = AsyncModelRunner(max_concurrency=3)
+
+    async def run():
+        async def consume():
+            return [chunk async for chunk in runner.stream(FakeModel(), "q")]
+        return await asyncio.gather(*(consume() for _ in range(9)))
+
+    assert asyncio.run(run()) == [["Thirty ", "days."]] * 9
+    assert runner.peak_in_flight == 3
+    assert runner.in_flight == 0
+
+
+def test_client_async_api(tmp_path):
+    backend = StandInBackend(StandInConfig(time_to_first_chunk_s=0.05, inter_chunk_delay_s=0))
+    client = GeminiClient(
+        model_cache=ModelSelectionCache(path=str(tmp_path / "models.json")),
+        max_concurrency=4,
+        backend=backend,
+    )
+
+    async def run():
+        return await asyncio.gather(*(client.get_response_async(f"q{i}") for i in range(8)))
+
+    answers = asyncio.run(run())
+    assert len(answers) == 8 and all(answer.startswith("[stand-in") for answer in answers)
+    assert client.async_runner.peak_in_flight == 4
+
+
+def test_invalid_concurrency_is_rejected():
+    with pytest.raises(ValueError):
+        AsyncModelRunner(max_concurrency=0)
@@ -0,0 +1,86 @@
+"""Unit tests for the local stand-in and recording backends (no API access required)."""
+import asyncio
+import time
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from core.backends import (
+    RecordingBackend,
+    StandInBackend,
+    StandInConfig,
+    create_backend_from_env,
+    load_cassette,
+)
+
+
+def test_synthesized_stream_honours_chunking_and_timing():
+    config = StandInConfig(time_to_first_chunk_s=0.05, inter_chunk_delay_s=0.01, chunk_size=10, response_chars=50)
+    model = StandInBackend(config).create_model("gemini-pro")
+
+    start = time.perf_counter()
+    stream = model.generate_content("What is the refund policy?", stream=True)
+    chunks = [chunk.text for chunk in stream]
+    elapsed = time.perf_counter() - start
+
+    assert len(chunks) == 5 and all(len(chunk) == 10 for chunk in chunks)
+    assert 0.09 <= elapsed < 0.5
+
+
+def test_error_rate_is_deterministic_for_a_seed():
+    def failures(seed):
+        model = StandInBackend(StandInConfig(time_to_first_chunk_s=0, inter_chunk_delay_s=0, error_rate=0.5, seed=seed)).create_model("m")
+        result = []
+        for _ in range(20):
+            try:
+                model.generate_content("q")
+                result.append(False)
+            except google_exceptions.ServiceUnavailable:
+                result.append(True)
+        return result
+
+    assert failures(1) == failures(1)
+    assert 0 < sum(failures(1)) < 20
+
+
+def test_unavailable_models_fail_like_upstream():
+    model = StandInBackend(StandInConfig(time_to_first_chunk_s=0, available_models=["gemini-pro"])).create_model("x")
+    with pytest.raises(google_exceptions.NotFound):
+        model.generate_content("q")
+
+
+def test_recorded_cassette_is_replayed(tmp_path):
+    cassette = str(tmp_path / "cassette.jsonl")
+    live = StandInBackend(StandInConfig(time_to_first_chunk_s=0, inter_chunk_delay_s=0, chunk_size=7))
+    recorder = RecordingBackend(live, cassette)
+    recorded = [c.text for c in recorder.create_model("gemini-pro", "system").generate_content("prompt", stream=True)]
+
+    assert len(load_cassette(cassette)) == 1
+
+    replay = StandInBackend(StandInConfig(response_chars=5), cassette_path=cassette, synthesize_on_miss=False)
+    replayed = [c.text for c in replay.create_model("other-model", "system").generate_content("prompt", stream=True)]
+    assert replayed == recorded
+    assert replay.cassette_hits == 1
+    with pytest.raises(google_exceptions.NotFound):
+        replay.create_model("other-model", "system").generate_content("unrecorded prompt")
+
+
+def test_async_stream():
+    model = StandInBackend(StandInConfig(time_to_first_chunk_s=0, inter_chunk_delay_s=0)).create_model("m")
+
+    async def run():
+        response = await model.generate_content_async("q", stream=True)
+        return "".join([chunk.text async for chunk in response])
+
+    assert asyncio.run(run()).startswith("[stand-in m]")
+
+
+def test_backend_is_selected_from_env(monkeypatch):
+    monkeypatch.setenv("GEMINI_BACKEND", "standin")
+    monkeypatch.setenv("STANDIN_TTFC", "0.5")
+    backend = create_backend_from_env()
+    assert backend.name == "standin" and backend.config.time_to_first_chunk_s == 0.5
+
+    monkeypatch.setenv("GEMINI_BACKEND", "bogus")
+    with pytest.raises(ValueError):
+        create_backend_from_env()
@@ -0,0 +1,82 @@
+"""Unit tests for batch question answering (no API access required)."""
+import json
+import time
+
+import core.batch as batch
+from core.backends import StandInBackend, StandInConfig
+from core.batch import BatchStats, RateLimiter, answer_questions, load_questions
+from core.gemini_client import STREAMING_ERROR_MESSAGE, GeminiClient
+from core.model_cache import ModelSelectionCache
+
+
+class FakeClient:
+    """Answers every question after `latency` seconds; fails on 'boom'."""
+
+    latency = 0.05
+
+    def get_streaming_response(self, prompt_content, document=None, question=None, document_hash=None):
+        time.sleep(self.latency)
+        if question == "boom":
+            yield STREAMING_ERROR_MESSAGE
+            return
+        yield "Answer to "
+        yield question
+
+
+def test_questions_run_in_parallel_and_report_stats():
+    questions = [f"q{i}" for i in range(20)]
+    stats = BatchStats()
+
+    start = time.perf_counter()
+    results = list(answer_questions(FakeClient(), "document", questions + ["boom"], max_workers=21, stats=stats))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 10 * FakeClient.latency
+    assert sorted(r["index"] for r in results) == list(range(21))
+    assert {r["question"]: r["answer"] for r in results}["q7"] == "Answer to q7"
+    assert [r["question"] for r in results if r["error"]] == ["boom"]
+    assert stats.as_dict()["completed"] == 21
+    assert stats.errors == 1
+
+
+def test_questions_failing_mid_stream_are_counted_as_errors(tmp_path):
+    # Every answer streams its first chunk, then the connection drops
+    backend = StandInBackend(StandInConfig(time_to_first_chunk_s=0, inter_chunk_delay_s=0,
+                                           mid_stream_error_rate=1.0))
+    client = GeminiClient(model_cache=ModelSelectionCache(path=str(tmp_path / "models.json")), backend=backend)
+    stats = BatchStats()
+
+    results = list(answer_questions(client, "document", ["a?", "b?"], max_workers=2, stats=stats))
+
+    assert all(r["answer"].endswith(STREAMING_ERROR_MESSAGE) and r["answer"] != STREAMING_ERROR_MESSAGE
+               for r in results)
+    assert all(r["error"] for r in results)
+    assert stats.errors == 2
+
+
+def test_document_is_indexed_once_per_batch(monkeypatch):
+    built = []
+    original = batch.DocumentIndex
+    monkeypatch.setattr(batch, "DocumentIndex", lambda text: built.append(text) or original(text))
+
+    list(answer_questions(FakeClient(), "document", ["a", "b", "c"], max_workers=3))
+
+    assert built == ["document"]
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = RateLimiter(rate_per_minute=1200)  # one slot every 50ms
+    start = time.perf_counter()
+    for _ in range(5):
+        limiter.acquire()
+    assert time.perf_counter() - start >= 0.19
+
+
+def test_load_questions_accepts_text_and_jsonl(tmp_path):
+    text_file = tmp_path / "questions.txt"
+    text_file.write_text("First?\n\nSecond?\n")
+    jsonl_file = tmp_path / "questions.jsonl"
+    jsonl_file.write_text(json.dumps({"input": "Third?"}) + "\n" + json.dumps({"question": "Fourth?"}) + "\n")
+
+    assert load_questions(str(text_file)) == ["First?", "Second?"]
+    assert load_questions(str(jsonl_file)) == ["Third?", "Fourth?"]
@@ -0,0 +1,107 @@
+"""Unit tests for upstream context caching (no API access required)."""
+import asyncio
+
+from core.backends import RecordingBackend, StandInBackend, StandInConfig
+from core.context_cache import CachedPrompt, ContextCache, ContextCacheConfig
+from core.gemini_client import STREAMING_ERROR_MESSAGE, GeminiClient
+from core.model_cache import ModelSelectionCache
+from core.qa_logic import answer_question
+from core.tokens import estimate_tokens
+
+DOCUMENT = "".join(f"Section {i}: refunds for product line {i} are accepted within {i % 30 + 1} days.\n"
+                   for i in range(600))
+QUESTIONS = [f"How long is the refund window for product line {i}?" for i in range(5)]
+ENABLED = ContextCacheConfig(enabled=True, min_tokens=1024)
+
+
+def make_client(tmp_path, backend, context_cache=ENABLED):
+    model_cache = ModelSelectionCache(path=str(tmp_path / "models.json"))
+    GeminiClient(model_cache=model_cache, backend=StandInBackend(StandInConfig(time_to_first_chunk_s=0))).model
+    return GeminiClient(model_cache=model_cache, backend=backend, context_cache=context_cache)
+
+
+def standin(**overrides):
+    return StandInBackend(StandInConfig(time_to_first_chunk_s=0, inter_chunk_delay_s=0, **overrides))
+
+
+def test_document_is_cached_once_and_billed_at_the_cached_rate(tmp_path):
+    inline, cached = standin(), standin()
+    inline_client = make_client(tmp_path, inline, ContextCacheConfig(enabled=False))
+    client = make_client(tmp_path, cached)
+
+    for question in QUESTIONS:
+        assert "".join(answer_question(inline_client, DOCUMENT, question))
+        assert "".join(answer_question(client, DOCUMENT, question))
+
+    assert len(cached.caches) == 1 and len(inline.caches) == 0
+    assert client.context_cache.stats["creations"] == 1 and client.context_cache.stats["hits"] == 4
+    # Same tokens processed, but the document is billed in full only once
+    assert cached.input_tokens > inline.input_tokens
+    assert cached.billed_input_tokens < 0.5 * inline.billed_input_tokens
+
+    # The async API reuses the same cache
+    async def ask():
+        split = CachedPrompt(DOCUMENT, QUESTIONS[0])
+        return [chunk async for chunk in client.get_streaming_response_async(DOCUMENT + split.prompt,
+                                                                             cached_prompt=split)]
+
+    assert asyncio.run(ask()) and client.context_cache.stats["hits"] == 5
+
+
+def test_small_documents_and_unsupported_backends_are_sent_inline(tmp_path):
+    backend = standin()
+    client = make_client(tmp_path, backend)
+    assert "".join(answer_question(client, "Refunds within 30 days.", QUESTIONS[0]))
+    assert not backend.caches and backend.cached_input_tokens == 0
+
+    # Without caching methods (the recorder), or when upstream refuses, the request goes inline
+    recorder = make_client(tmp_path, RecordingBackend(standin(), str(tmp_path / "cassette.jsonl")))
+    assert not recorder.context_cache.enabled
+    assert "".join(answer_question(recorder, DOCUMENT, QUESTIONS[0])) != STREAMING_ERROR_MESSAGE
+
+    refusing = standin(context_cache=False)
+    client = make_client(tmp_path, refusing)
+    for question in QUESTIONS[:2]:
+        assert "".join(answer_question(client, DOCUMENT, question)) != STREAMING_ERROR_MESSAGE
+    assert refusing.cached_input_tokens == 0
+    # The model is not asked to create a cache again right away
+    assert client.context_cache.stats["fallbacks"] == 1
+
+
+def test_cache_deleted_upstream_is_replaced_without_failing_the_request(tmp_path):
+    backend = standin()
+    client = make_client(tmp_path, backend)
+    "".join(answer_question(client, DOCUMENT, QUESTIONS[0]))
+    (handle,) = backend.caches.values()
+    handle.deleted = True
+
+    answer = "".join(answer_question(client, DOCUMENT, QUESTIONS[1]))
+    assert answer and answer != STREAMING_ERROR_MESSAGE
+    assert client.context_cache.stats["invalidations"] == 1
+
+    "".join(answer_question(client, DOCUMENT, QUESTIONS[2]))
+    assert len(backend.caches) == 2 and client.context_cache.stats["creations"] == 2
+
+
+def test_entries_are_extended_before_expiry_and_evicted_least_recently_used():
+    backend = standin()
+    now = [1000.0]
+    cache = ContextCache(backend, ContextCacheConfig(enabled=True, ttl_s=600, min_tokens=1024, max_entries=2),
+                         clock=lambda: now[0])
+    documents = [DOCUMENT + f"Appendix {i}." for i in range(3)]
+    assert estimate_tokens(documents[0]) >= 1024
+
+    first = cache.model_for("gemini-pro", documents[0], "system")
+    now[0] += 590
+    assert cache.model_for("gemini-pro", documents[0], "system") is first
+    assert cache.stats["refreshes"] == 1
+
+    cache.model_for("gemini-pro", documents[1], "system")
+    cache.model_for("gemini-pro", documents[0], "system")
+    cache.model_for("gemini-pro", documents[2], "system")
+    # documents[1] was least recently used, so it was deleted upstream
+    assert len(cache) == 2
+    assert [handle.deleted for handle in backend.caches.values()] == [False, True, False]
+
+    cache.clear()
+    assert len(cache) == 0 and all(handle.deleted for handle in backend.caches.values())
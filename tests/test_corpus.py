@@ -0,0 +1,131 @@
+"""Unit tests for the persistent multi-document corpus (no API access required)."""
+import pytest
+
+from core.corpus import DOCUMENT_HEADER, Corpus
+from core.qa_logic import PROMPT_RESERVE_TOKENS, answer_question, format_prompt
+
+FILLER = "".join(f"Section {i}. General information paragraph number {i} about the company.\n\n" for i in range(200))
+HANDBOOK = FILLER + "Vacation policy: employees receive 25 days of paid vacation per year.\n\n" + FILLER
+PRICING = FILLER + "Pricing: the enterprise plan costs 40 dollars per seat per month.\n\n" + FILLER
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    corpus = Corpus(str(tmp_path / "corpus.db"), chunk_tokens=100, overlap_tokens=10)
+    yield corpus
+    corpus.close()
+
+
+def test_ingest_is_skipped_for_unchanged_content_and_incremental_on_change(corpus):
+    added = corpus.ingest("handbook.txt", HANDBOOK.encode("utf-8"))
+    assert added.status == "added"
+    assert added.chunks_added == corpus.get("handbook.txt").chunk_count > 10
+
+    assert corpus.ingest("handbook.txt", HANDBOOK).status == "unchanged"
+
+    updated = corpus.ingest("handbook.txt", HANDBOOK + "Appendix: the office closes at 6pm.\n")
+    assert updated.status == "updated"
+    # Only the tail is re-indexed
+    assert updated.chunks_kept >= added.chunks_added - 2
+    assert 1 <= updated.chunks_added <= 2
+    assert corpus.search("office closes", ["handbook.txt"])
+
+
+def test_search_ranks_chunks_and_filters_by_document(corpus):
+    corpus.ingest_many([("handbook.txt", HANDBOOK), ("pricing.txt", PRICING)])
+
+    best = corpus.search("How many vacation days do employees get?")[0]
+    assert best.name == "handbook.txt"
+    assert "25 days" in corpus.excerpt(best.name, best.start, best.end)
+
+    assert all(hit.name == "pricing.txt" for hit in corpus.search("vacation section", ["pricing.txt"]))
+
+
+def test_selection_builds_context_across_documents(corpus):
+    corpus.ingest_many([("handbook.txt", HANDBOOK), ("pricing.txt", PRICING)])
+    selection = corpus.select(["handbook.txt", "pricing.txt", "missing.txt"])
+    assert selection.names == ["handbook.txt", "pricing.txt"]
+
+    context = selection.build_context("vacation days and enterprise plan cost", token_budget=400)
+    assert "25 days" in context
+    assert "40 dollars" in context
+    assert DOCUMENT_HEADER.format(name="handbook.txt") in context
+    assert len(context) < len(selection.text) / 4
+
+    prompt = format_prompt(selection.text, "What does the enterprise plan cost?", index=selection)
+    assert "40 dollars" in prompt
+
+
+def test_small_selections_are_sent_whole(corpus):
+    corpus.ingest("a.txt", "Alpha facts.")
+    corpus.ingest("b.txt", "Beta facts.")
+
+    assert corpus.select(["a.txt"]).build_context("anything") == "Alpha facts."
+    both = corpus.select(["a.txt", "b.txt"]).build_context("anything")
+    assert both == f"{DOCUMENT_HEADER.format(name='a.txt')}\nAlpha facts.\n\n{DOCUMENT_HEADER.format(name='b.txt')}\nBeta facts."
+
+
+def test_documents_persist_and_can_be_removed(tmp_path):
+    path = str(tmp_path / "corpus.db")
+    first = Corpus(path)
+    first.ingest("handbook.txt", HANDBOOK)
+    first.close()
+
+    reopened = Corpus(path)
+    assert [document.name for document in reopened.documents()] == ["handbook.txt"]
+    assert reopened.ingest("handbook.txt", HANDBOOK).status == "unchanged"
+    assert reopened.search("vacation")
+
+    assert reopened.remove("handbook.txt")
+    assert reopened.documents() == []
+    assert reopened.search("vacation") == []
+    reopened.close()
+
+
+def test_owners_with_same_named_documents_do_not_collide(corpus):
+    alice, bob = corpus.scoped("alice"), corpus.scoped("bob")
+    assert alice.ingest("notes.txt", HANDBOOK).status == "added"
+    assert bob.ingest("notes.txt", PRICING).status == "added"
+
+    assert "25 days" in alice.text("notes.txt")
+    assert "40 dollars" in bob.text("notes.txt")
+    # Alice's chunks are not searched for Bob
+    assert bob.search("vacation days") == []
+    assert bob.search("enterprise plan")[0].name == "notes.txt"
+    assert "vacation" not in bob.select(["notes.txt"]).build_context("vacation days", token_budget=200).lower()
+    assert corpus.documents() == []
+
+    assert bob.remove("notes.txt")
+    assert [document.name for document in alice.documents()] == ["notes.txt"]
+    assert alice.search("vacation days")
+
+
+class RecordingClient:
+    def __init__(self):
+        self.prompts = []
+
+    def get_streaming_response(self, prompt_content, document=None, question=None, document_hash=None):
+        self.prompts.append(prompt_content)
+        yield "25 days."
+
+
+def test_questions_send_retrieved_excerpts_without_loading_the_full_text(corpus):
+    corpus.ingest_many([("handbook.txt", HANDBOOK), ("pricing.txt", PRICING)])
+    selection = corpus.select(["handbook.txt", "pricing.txt"])
+    client = RecordingClient()
+
+    answer = "".join(answer_question(client, None, "How many vacation days?", index=selection,
+                                     document_hash=selection.content_hash))
+    assert answer == "25 days."
+    assert "25 days of paid vacation" in client.prompts[0]
+    assert len(client.prompts[0]) < len(HANDBOOK)
+    # Only the excerpts were read from the corpus
+    assert selection._text is None
+
+    # Selections over the context window still load it, for map-reduce
+    client = RecordingClient()
+    answer = "".join(answer_question(client, None, "How many vacation days?", index=selection,
+                                     context_window_tokens=PROMPT_RESERVE_TOKENS + 2000))
+    assert answer == "25 days."
+    assert any("Partial answer from document section" in prompt for prompt in client.prompts)
+    assert selection._text is not None
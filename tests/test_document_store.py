@@ -0,0 +1,111 @@
+"""Unit tests for the shared content-addressed document store."""
+import gc
+import threading
+
+import pytest
+
+import core.document_store as document_store
+from core.document_store import DocumentStore, hash_bytes
+
+HANDBOOK = ("Employee handbook. Vacation policy: 25 days per year.\n\n" * 50).encode("utf-8")
+
+
+def test_identical_uploads_share_one_decoded_copy():
+    store = DocumentStore()
+    first = store.open(HANDBOOK)
+    second = store.open(HANDBOOK)
+
+    assert first.doc_hash == second.doc_hash == hash_bytes(HANDBOOK)
+    assert first.document is second.document
+    assert len(store) == 1
+    assert store.total_bytes == len(HANDBOOK)
+    assert (store.hits, store.misses) == (1, 1)
+    assert store.get(first.doc_hash).refcount == 2
+
+
+def test_concurrent_uploads_decode_and_index_once(monkeypatch):
+    built = []
+    real_index = document_store.DocumentIndex
+    barrier = threading.Barrier(8)
+
+    def counting_index(text):
+        built.append(text)
+        return real_index(text)
+
+    monkeypatch.setattr(document_store, "DocumentIndex", counting_index)
+    store = DocumentStore()
+    handles = []
+
+    def upload():
+        barrier.wait()
+        handles.append(store.open(HANDBOOK))
+
+    threads = [threading.Thread(target=upload) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(store) == 1
+    assert store.get(hash_bytes(HANDBOOK)).refcount == 8
+    assert len({id(handle.document) for handle in handles}) == 1
+    # Races may build a throwaway copy, but only one is ever kept
+    assert 1 <= len(built) <= 8
+
+
+def test_unreferenced_documents_are_evicted_lru_by_bytes():
+    docs = [bytes([65 + i]) * 1000 for i in range(4)]
+    store = DocumentStore(max_bytes=2500)
+
+    handles = [store.open(doc) for doc in docs[:2]]
+    for handle in handles:
+        handle.close()
+    store.get(handles[0].doc_hash)  # touch: document 1 is now least recently used
+
+    store.open(docs[2])
+    assert handles[1].doc_hash not in store
+    assert handles[0].doc_hash in store
+    assert store.total_bytes == 2000
+    assert store.evictions == 1
+
+
+def test_referenced_documents_are_never_evicted():
+    store = DocumentStore(max_bytes=1500)
+    held = [store.open(b"a" * 1000), store.open(b"b" * 1000)]
+
+    assert all(handle.doc_hash in store for handle in held)
+    assert store.total_bytes == 2000  # over budget, but both are in use
+
+
+def test_handles_release_on_close_and_on_garbage_collection():
+    store = DocumentStore(max_bytes=0)
+    handle = store.open(HANDBOOK)
+    doc_hash = handle.doc_hash
+
+    handle.close()
+    handle.close()
+    assert doc_hash not in store
+
+    store.open(HANDBOOK)  # handle dropped immediately, like an expired session
+    gc.collect()
+    assert doc_hash not in store
+    assert store.total_bytes == 0
+
+
+def test_undecodable_uploads_are_not_stored():
+    store = DocumentStore()
+    with pytest.raises(UnicodeDecodeError):
+        store.open(b"\xff\xfe\xfa")
+    assert len(store) == 0
+
+
+def test_directory_lets_another_store_load_by_hash(tmp_path):
+    writer = DocumentStore(directory=str(tmp_path))
+    doc_hash = writer.open(HANDBOOK).doc_hash
+
+    reader = DocumentStore(directory=str(tmp_path))
+    document = reader.load(doc_hash)
+
+    assert document.text == HANDBOOK.decode("utf-8")
+    assert reader.load("0" * 64) is None
+    assert reader.load("../etc/passwd") is None
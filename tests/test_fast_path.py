@@ -0,0 +1,128 @@
+"""Unit tests for the local extractive fast path (no API access required)."""
+import json
+from pathlib import Path
+
+import pytest
+
+from core.backends import StandInBackend, StandInConfig
+from core.fast_path import (
+    ANSWER,
+    SECTION,
+    ExtractiveAnswerer,
+    FastPathConfig,
+    get_answerer,
+    release_answerers,
+    split_sections,
+)
+from core.gemini_client import GeminiClient
+from core.model_cache import ModelSelectionCache
+from core.qa_logic import answer_question
+
+DATASET = Path(__file__).parent / "data" / "golden_qa_dataset.jsonl"
+NOT_IN_DOCUMENT = "does not contain the answer"
+
+
+@pytest.fixture(scope="module")
+def goldens():
+    with open(DATASET) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+@pytest.fixture(scope="module")
+def answerer(goldens):
+    return ExtractiveAnswerer(goldens[0]["retrieval_context"])
+
+
+def test_numbered_sections_are_split_with_titles(goldens):
+    sections = split_sections(goldens[0]["retrieval_context"])
+    assert [section.number for section in sections] == [1, 2, 3, 4, 5]
+    assert sections[1].title == "Refund Policy"
+    assert sections[3].title == "Product: 'ChromaKey' Keyboard"
+    assert sections[3].body.startswith("This is a professional editing keyboard")
+
+
+def test_direct_questions_are_answered_verbatim_from_the_right_section(answerer):
+    found = answerer.match("What is the refund window for hardware?")
+    assert found.section.title == "Refund Policy"
+    assert "15-day refund window" in found.answer
+    assert "30 days" not in found.answer  # only the sentence that answers it
+
+    # Questions about a section's subject get the whole section
+    assert "not waterproof" in answerer.match("What is the ChromaKey keyboard?").answer
+
+    # Pronoun-led sentences are prefixed with the section title
+    assert answerer.match("Is the ChromaKey keyboard waterproof?").answer.startswith("Product: 'ChromaKey' Keyboard:")
+
+
+def test_questions_the_document_does_not_answer_fall_back(goldens, answerer):
+    unanswerable = [golden for golden in goldens if NOT_IN_DOCUMENT in golden["expected_output"]]
+    assert unanswerable
+    for golden in unanswerable:
+        assert answerer.match(golden["input"]) is None, golden["input"]
+
+    # The golden FAQ: most direct questions take the fast path
+    hits = [golden for golden in goldens if answerer.match(golden["input"]) is not None]
+    assert len(hits) >= len(goldens) // 2
+
+
+def test_documents_without_sections_never_match():
+    answerer = ExtractiveAnswerer("A plain paragraph about the refund policy: 30 days.")
+    assert answerer.score("What is the refund policy?") is None
+
+
+@pytest.fixture
+def client(tmp_path):
+    config = StandInConfig(time_to_first_chunk_s=0, inter_chunk_delay_s=0)
+    model_cache = ModelSelectionCache(path=str(tmp_path / "models.json"))
+    GeminiClient(model_cache=model_cache, backend=StandInBackend(config)).model
+    backend = StandInBackend(config)
+    return GeminiClient(model_cache=model_cache, backend=backend), backend
+
+
+def test_answer_question_takes_the_fast_path(goldens, client):
+    client, backend = client
+    document = goldens[0]["retrieval_context"]
+
+    answer = "".join(answer_question(client, document, "How many credits does the PixelFlow Basic plan have?",
+                                     fast_path=FastPathConfig(mode=ANSWER)))
+    assert "100 credits/month" in answer
+    assert backend.requests == 0
+
+    "".join(answer_question(client, document, "Who is the CEO of Innovatech?", fast_path=FastPathConfig(mode=ANSWER)))
+    assert backend.requests == 1  # fell back to the model
+
+    prompts = []
+    stream = client.get_streaming_response
+    client.get_streaming_response = lambda prompt, **kwargs: prompts.append(prompt) or stream(prompt, **kwargs)
+    "".join(answer_question(client, document, "Who can use the phone support line?",
+                            fast_path=FastPathConfig(mode=SECTION)))
+    assert backend.requests == 2
+    assert "Support Channels" in prompts[0]
+    assert "Refund Policy" not in prompts[0]
+
+    # Follow-ups are left to the model, which sees the conversation
+    history = [{"role": "user", "content": "Tell me about PixelFlow."}, {"role": "assistant", "content": "..."}]
+    "".join(answer_question(client, document, "How many credits does the PixelFlow Basic plan have?",
+                            fast_path=FastPathConfig(mode=ANSWER), history=history))
+    assert backend.requests == 3
+
+
+def test_answerers_are_cached_by_content_hash_until_released(goldens):
+    document = goldens[0]["retrieval_context"]
+    answerer = get_answerer(document, document_hash="doc-1")
+    assert get_answerer(document, document_hash="doc-1") is answerer
+    assert get_answerer(document) is not answerer  # keyed by hash, not by text
+    release_answerers("doc-1")
+    assert get_answerer(document, document_hash="doc-1") is not answerer
+
+    # Text given as a loader is only read when the answerer isn't cached
+    loads = []
+
+    def load():
+        loads.append(document)
+        return document
+
+    lazy = get_answerer(load, document_hash="doc-2")
+    assert get_answerer(load, document_hash="doc-2") is lazy
+    assert lazy.match(goldens[0]["input"]) == get_answerer(document).match(goldens[0]["input"])
+    assert len(loads) == 1
@@ -1,6 +1,11 @@
-"""Quick test script to verify Gemini API connection and list available models."""
+"""Quick test script to verify Gemini API connection and list available models.
+
+With GEMINI_BACKEND=standin it checks the local stand-in backend instead,
+so no API key or network is needed (see core/backends.py).
+"""
 import os
 import sys
+import time
 import google.generativeai as genai
 from dotenv import load_dotenv
 
@@ -10,59 +15,88 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 # Load environment variables from parent directory
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
 
-# Configure API
-api_key = os.getenv("GOOGLE_API_KEY")
-if not api_key:
-    print("ERROR: GOOGLE_API_KEY not found in environment")
-    exit(1)
-
-genai.configure(api_key=api_key)
-
-# List available models
-print("Available Gemini models:")
-print("-" * 60)
-flash_models = []
-for model in genai.list_models():
-    if 'generateContent' in model.supported_generation_methods:
-        print(f"Model: {model.name}")
-        print(f"  Display Name: {model.display_name}")
-        print(f"  Supported methods: {model.supported_generation_methods}")
-        print()
-        if 'flash' in model.name.lower():
-            flash_models.append(model.name)
-
-# Test available flash models
-if flash_models:
-    print(f"\n\nFound {len(flash_models)} Flash model(s). Testing the first one...")
-    test_model_name = flash_models[0]
-    print(f"Testing {test_model_name}...")
-    try:
-        model = genai.GenerativeModel(test_model_name)
-        response = model.generate_content("Say 'Hello, I am working!'")
-        print(f"✓ Success! Response: {response.text}")
-        print(f"\n✓✓ USE THIS MODEL NAME: {test_model_name}")
-    except Exception as e:
-        print(f"✗ Error: {e}")
-else:
-    print("\n✗ No Flash models found. Trying common model names...")
-
-    # Try common model name variations
-    test_names = [
-        "gemini-1.5-flash",
-        "gemini-1.5-flash-002",
-        "gemini-1.5-flash-latest",
-        "gemini-pro",
-        "gemini-1.5-pro",
-    ]
-
-    for name in test_names:
-        print(f"\nTrying '{name}'...")
+
+def check_standin():
+    """Streams one answer through GeminiClient using the local stand-in backend."""
+    from core.gemini_client import GeminiClient
+
+    client = GeminiClient()
+    print(f"Stand-in backend, model: {client.model_name}")
+    print(f"Cassette entries: {len(client.backend.cassette)}")
+    start = time.perf_counter()
+    first_chunk_at = None
+    chunks = []
+    for chunk in client.get_streaming_response("Say 'Hello, I am working!'"):
+        if first_chunk_at is None:
+            first_chunk_at = time.perf_counter() - start
+        chunks.append(chunk)
+    print(f"✓ Success! Response: {''.join(chunks)}")
+    print(f"  {len(chunks)} chunks, first after {first_chunk_at:.3f}s, total {time.perf_counter() - start:.3f}s")
+    return 0
+
+
+def main():
+    if os.getenv("GEMINI_BACKEND", "gemini").lower() == "standin":
+        return check_standin()
+
+    # Configure API
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        print("ERROR: GOOGLE_API_KEY not found in environment")
+        print("Tip: set GEMINI_BACKEND=standin to check the offline stand-in instead")
+        return 1
+
+    genai.configure(api_key=api_key)
+
+    # List available models
+    print("Available Gemini models:")
+    print("-" * 60)
+    flash_models = []
+    for model in genai.list_models():
+        if 'generateContent' in model.supported_generation_methods:
+            print(f"Model: {model.name}")
+            print(f"  Display Name: {model.display_name}")
+            print(f"  Supported methods: {model.supported_generation_methods}")
+            print()
+            if 'flash' in model.name.lower():
+                flash_models.append(model.name)
+
+    # Test available flash models
+    if flash_models:
+        print(f"\n\nFound {len(flash_models)} Flash model(s). Testing the first one...")
+        test_model_name = flash_models[0]
+        print(f"Testing {test_model_name}...")
         try:
-            model = genai.GenerativeModel(name)
+            model = genai.GenerativeModel(test_model_name)
             response = model.generate_content("Say 'Hello, I am working!'")
-            print(f"✓ Success with '{name}'! Response: {response.text}")
-            print(f"\n✓✓ USE THIS MODEL NAME: {name}")
-            break
+            print(f"✓ Success! Response: {response.text}")
+            print(f"\n✓✓ USE THIS MODEL NAME: {test_model_name}")
         except Exception as e:
-            print(f"✗ Failed: {e}")
+            print(f"✗ Error: {e}")
+    else:
+        print("\n✗ No Flash models found. Trying common model names...")
+
+        # Try common model name variations
+        test_names = [
+            "gemini-1.5-flash",
+            "gemini-1.5-flash-002",
+            "gemini-1.5-flash-latest",
+            "gemini-pro",
+            "gemini-1.5-pro",
+        ]
+
+        for name in test_names:
+            print(f"\nTrying '{name}'...")
+            try:
+                model = genai.GenerativeModel(name)
+                response = model.generate_content("Say 'Hello, I am working!'")
+                print(f"✓ Success with '{name}'! Response: {response.text}")
+                print(f"\n✓✓ USE THIS MODEL NAME: {name}")
+                break
+            except Exception as e:
+                print(f"✗ Failed: {e}")
+    return 0
+
 
+if __name__ == "__main__":
+    sys.exit(main())
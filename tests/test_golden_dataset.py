@@ -0,0 +1,51 @@
+"""Unit tests for the golden dataset formats and prompt prefix reuse (no API access required)."""
+import json
+import types
+from pathlib import Path
+
+import pytest
+
+from core.qa_logic import ContextPrompter, format_prompt
+from golden_dataset import context_id, convert, iter_goldens
+
+DATASET = Path(__file__).parent / "data" / "golden_qa_dataset.jsonl"
+
+
+def test_conversion_stores_each_context_once_and_loads_the_same_rows(tmp_path):
+    inline = [json.loads(line) for line in DATASET.read_text().splitlines() if line.strip()]
+    source = tmp_path / "inline.jsonl"
+    rows = inline + [{"input": "Other?", "expected_output": "Other.", "retrieval_context": "Another document."}]
+    source.write_text("".join(json.dumps(row) + "\n" for row in rows))
+
+    deduplicated = tmp_path / "dedup.jsonl"
+    assert convert(str(source), str(deduplicated)) == (len(rows), 2)
+    assert deduplicated.stat().st_size < source.stat().st_size / 3
+
+    for path in (source, deduplicated):
+        goldens = iter_goldens(str(path))
+        assert isinstance(goldens, types.GeneratorType)
+        goldens = list(goldens)
+        assert [(g["input"], g["expected_output"], g["retrieval_context"]) for g in goldens] == [
+            (row["input"], row["expected_output"], row["retrieval_context"]) for row in rows
+        ]
+        # Rows of one context share a single string
+        assert all(g["retrieval_context"] is goldens[0]["retrieval_context"] for g in goldens[:len(inline)])
+        assert goldens[-1]["context_id"] == context_id("Another document.")
+
+
+def test_rows_must_reference_a_context_defined_before_them(tmp_path):
+    path = tmp_path / "broken.jsonl"
+    path.write_text(json.dumps({"input": "Q?", "expected_output": "A.", "context_id": "missing"}) + "\n")
+    with pytest.raises(ValueError, match="broken.jsonl:1"):
+        list(iter_goldens(str(path)))
+
+
+def test_context_prompter_matches_format_prompt():
+    context = json.loads(DATASET.read_text().splitlines()[0])["retrieval_context"]
+    for budget in (1_000_000, 150):
+        prompter = ContextPrompter(context, system_prompt="Be brief.", prompt_budget=budget)
+        for query in ("What is the refund window?", "Summarize the support options for all customers."):
+            assert prompter.format(query) == format_prompt(context, query, system_prompt="Be brief.",
+                                                           prompt_budget=budget)
+    # Over the budget the document is truncated, as format_prompt does
+    assert len(ContextPrompter(context, prompt_budget=150).format("Q?")) < len(context)
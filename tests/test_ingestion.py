@@ -0,0 +1,154 @@
+"""Unit tests for streaming multi-format ingestion (no API access required)."""
+import io
+import zipfile
+
+import pytest
+
+from core.ingestion import (
+    DOCX,
+    HTML,
+    PDF,
+    TEXT,
+    IngestionPool,
+    UnsupportedFormatError,
+    detect_encoding,
+    detect_format,
+    extract_text,
+    spool,
+)
+
+PARAGRAPHS = ["Refund Policy: refunds within 30 days.", "Hardware: 15-day window, unopened items only."]
+
+
+def make_docx(path, paragraphs):
+    body = "".join(
+        f'<w:p><w:r><w:t xml:space="preserve">{text}</w:t></w:r></w:p>' for text in paragraphs
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", '<?xml version="1.0"?><Types/>')
+        archive.writestr(
+            "word/document.xml",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f"<w:body>{body}<w:sectPr/></w:body></w:document>",
+        )
+
+
+def make_pdf(path, pages):
+    """Writes a minimal PDF with one line of Helvetica text per page."""
+    count = len(pages)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [" + " ".join(f"{4 + 2 * i} 0 R" for i in range(count)) + f"] /Count {count} >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    out, offsets = io.BytesIO(), []
+    out.write(b"%PDF-1.4\n")
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    path.write_bytes(out.getvalue())
+
+
+def test_encodings_are_detected_from_the_first_bytes():
+    text = "Rückerstattung innerhalb von 30 Tagen – café"
+    assert detect_encoding(text.encode("utf-8")) == "utf-8"
+    # A multi-byte character cut off at the end of the sample is still UTF-8
+    assert detect_encoding(text.encode("utf-8")[:2]) == "utf-8"
+    assert detect_encoding("Rü".encode("utf-8")[:2]) == "utf-8"
+    assert detect_encoding(text.encode("cp1252")) == "cp1252"
+    assert detect_encoding(text.encode("utf-8-sig")) == "utf-8-sig"
+    assert detect_encoding(text.encode("utf-16")) == "utf-16"
+    assert detect_encoding(text.encode("utf-16-le")) == "utf-16-le"
+    assert detect_encoding(b'<html><meta charset="iso-8859-2">', html=True) == "iso8859-2"
+
+
+def test_formats_are_detected_by_extension_then_content():
+    assert detect_format("a.PDF", b"") == PDF
+    assert detect_format("upload", b"%PDF-1.7") == PDF
+    assert detect_format("upload", b"PK\x03\x04") == DOCX
+    assert detect_format("upload", b"  <!DOCTYPE html><html>") == HTML
+    assert detect_format("notes", b"plain") == TEXT
+
+
+def test_text_is_decoded_incrementally_across_chunk_boundaries(tmp_path):
+    text = "Zeile äöü €\r\n" * 5000
+    path = tmp_path / "doc.txt"
+    path.write_bytes(text.encode("cp1252"))
+    fractions = []
+    # 7-byte chunks split "\r\n" pairs and multi-byte characters alike
+    pieces = list(extract_text(str(path), chunk_bytes=7, report=fractions.append))
+    assert "".join(pieces) == text.replace("\r\n", "\n")
+    assert len(pieces) > 100 and fractions[-1] == 1.0
+
+    utf8 = tmp_path / "utf8.txt"
+    utf8.write_text(text, encoding="utf-8", newline="")
+    assert "".join(extract_text(str(utf8), chunk_bytes=7)) == text.replace("\r\n", "\n")
+
+
+def test_html_docx_and_pdf_text_is_extracted(tmp_path):
+    html = tmp_path / "faq.html"
+    html.write_text(
+        "<html><head><title>FAQ</title><style>p {color: red}</style></head><body>"
+        f"<h1>Policies</h1><p>{PARAGRAPHS[0]}</p>\n<p>{PARAGRAPHS[1].replace('&', '&amp;')}</p>"
+        "<script>track()</script></body></html>"
+    )
+    html_text = "".join(extract_text(str(html), chunk_bytes=16))
+    assert PARAGRAPHS[0] in html_text and PARAGRAPHS[1] in html_text
+    assert "color" not in html_text and "track" not in html_text
+
+    docx = tmp_path / "faq.docx"
+    make_docx(docx, PARAGRAPHS * 200)
+    assert "".join(extract_text(str(docx), chunk_bytes=512)) == "".join(p + "\n\n" for p in PARAGRAPHS * 200)
+
+    pytest.importorskip("pypdf")
+    pdf = tmp_path / "faq.pdf"
+    make_pdf(pdf, PARAGRAPHS)
+    pdf_text = "".join(extract_text(str(pdf)))
+    assert PARAGRAPHS[0] in pdf_text and PARAGRAPHS[1] in pdf_text
+
+
+def test_damaged_documents_raise_unsupported_format(tmp_path):
+    docx = tmp_path / "broken.docx"
+    docx.write_bytes(b"not a zip file")
+    with pytest.raises(UnsupportedFormatError):
+        list(extract_text(str(docx)))
+
+
+def test_pool_extracts_in_worker_processes_and_reports_progress(tmp_path):
+    text = tmp_path / "big.txt"
+    text.write_text("Refund policy: 30 days.\n" * 200_000)
+    docx = tmp_path / "faq.docx"
+    make_docx(docx, PARAGRAPHS)
+    broken = tmp_path / "broken.docx"
+    broken.write_bytes(b"nope")
+
+    with open(text, "rb") as f:
+        spooled, digest = spool(f, directory=str(tmp_path))
+    assert len(digest) == 64
+
+    progress = []
+    results = {}
+    with IngestionPool(max_workers=2, chunk_bytes=64 * 1024, spool_dir=str(tmp_path)) as pool:
+        for name, future in pool.extract_many([("big.txt", spooled), ("faq.docx", str(docx)),
+                                               ("broken.docx", str(broken))], on_progress=progress.append):
+            results[name] = future
+
+    with pytest.raises(UnsupportedFormatError):
+        results["broken.docx"].result()
+    document = results["big.txt"].result()
+    assert (document.format, document.encoding) == (TEXT, "utf-8")
+    assert document.read_text() == text.read_text()
+    assert results["faq.docx"].result().read_text().startswith(PARAGRAPHS[0])
+    assert [p.fraction for p in progress if p.name == "big.txt"][-1] == 1.0
+    document.discard()
@@ -0,0 +1,79 @@
+"""Unit tests for the queue-based logging handlers."""
+import json
+import logging
+import queue
+
+import pytest
+
+from helpers.logger import BoundedQueueHandler, DrainingQueueListener, JsonFormatter
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+def make_logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(f"test_logger.{name}")
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def test_records_are_written_as_json_by_the_listener():
+    sink = ListHandler()
+    sink.setFormatter(JsonFormatter())
+    log_queue = queue.Queue(maxsize=100)
+    listener = DrainingQueueListener(log_queue, sink)
+    listener.start()
+    logger = make_logger("json", BoundedQueueHandler(log_queue))
+
+    logger.info("answered %s", "q1", extra={"request_id": "req-42", "latency_ms": 12.5})
+    try:
+        raise RuntimeError("upstream failed")
+    except RuntimeError:
+        logger.exception("streaming failed")
+    listener.stop()
+
+    first, second = (json.loads(line) for line in sink.lines)
+    assert first["message"] == "answered q1"
+    assert first["level"] == "INFO"
+    assert (first["request_id"], first["latency_ms"]) == ("req-42", 12.5)
+    assert "RuntimeError: upstream failed" in second["exc_info"]
+
+
+@pytest.mark.parametrize("policy, kept", [("drop_new", ["m0", "m1"]), ("drop_oldest", ["m3", "m4"])])
+def test_full_queue_applies_the_drop_policy(policy, kept):
+    log_queue = queue.Queue(maxsize=2)
+    handler = BoundedQueueHandler(log_queue, drop_policy=policy)
+    logger = make_logger(policy, handler)
+
+    for i in range(5):
+        logger.info(f"m{i}")
+
+    assert handler.dropped == 3
+    assert [log_queue.get_nowait().getMessage() for _ in range(2)] == kept
+
+
+def test_stop_drains_a_full_queue():
+    sink = ListHandler()
+    log_queue = queue.Queue(maxsize=3)
+    listener = DrainingQueueListener(log_queue, sink)
+    logger = make_logger("drain", BoundedQueueHandler(log_queue))
+
+    for i in range(3):
+        logger.info(f"m{i}")
+    listener.start()
+    listener.stop()
+
+    assert sink.lines == ["m0", "m1", "m2"]
+
+
+def test_unknown_drop_policy_is_rejected():
+    with pytest.raises(ValueError):
+        BoundedQueueHandler(queue.Queue(), drop_policy="sometimes")
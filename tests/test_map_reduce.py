@@ -0,0 +1,122 @@
+"""Unit tests for map-reduce answering of oversized documents (no API access required)."""
+import threading
+import time
+
+from core.backends import StandInBackend, StandInConfig
+from core.gemini_client import NOT_FOUND_MESSAGE, STREAMING_ERROR_MESSAGE, GeminiClient
+from core.model_cache import ModelSelectionCache
+from core.qa_logic import (
+    PROMPT_RESERVE_TOKENS,
+    MapReduceTimings,
+    answer_question,
+    needs_map_reduce,
+)
+
+WINDOW = PROMPT_RESERVE_TOKENS + 100
+
+
+class FakeClient:
+    """Answers from the prompt: sections mentioning 'needle' answer, others refuse."""
+
+    latency = 0.05
+
+    def __init__(self):
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def get_streaming_response(self, prompt_content, document=None, question=None, document_hash=None):
+        with self._lock:
+            self.prompts.append(prompt_content)
+        time.sleep(self.latency)
+        if "Partial answer from document section" in prompt_content:
+            yield "Merged: "
+            yield str(prompt_content.count("Partial answer"))
+            return
+        if "needle" in prompt_content:
+            yield "The needle is here."
+        else:
+            yield NOT_FOUND_MESSAGE
+
+
+def make_document(needles: int = 1) -> str:
+    paragraphs = [f"Paragraph {i} about haystack and straw." for i in range(300)]
+    for position in range(needles):
+        paragraphs[100 + position * 100] = "The needle is in this paragraph."
+    return "\n\n".join(paragraphs)
+
+
+def test_small_documents_use_a_single_call():
+    client = FakeClient()
+    answer = "".join(answer_question(client, "A short needle document.", "Where?", context_window_tokens=WINDOW))
+
+    assert not needs_map_reduce("A short needle document.", WINDOW)
+    assert answer == "The needle is here."
+    assert len(client.prompts) == 1
+
+
+def test_oversized_documents_are_mapped_concurrently_then_reduced():
+    client = FakeClient()
+    document = make_document(needles=2)
+    timings = MapReduceTimings()
+
+    start = time.perf_counter()
+    answer = "".join(answer_question(client, document, "Where?", context_window_tokens=WINDOW, timings=timings))
+    elapsed = time.perf_counter() - start
+
+    assert needs_map_reduce(document, WINDOW)
+    assert timings.sections > 2
+    assert timings.sections_with_answer == 2
+    assert answer == "Merged: 2"
+    assert len(client.prompts) == timings.sections + 1
+    # The map step runs sections in parallel rather than one after another
+    assert elapsed < (timings.sections + 1) * FakeClient.latency
+    assert timings.reduce_first_chunk_s > 0
+    assert timings.as_dict()["total_s"] >= timings.as_dict()["map_s"]
+
+
+def test_no_reduce_call_when_no_section_has_the_answer():
+    client = FakeClient()
+    timings = MapReduceTimings()
+    answer = "".join(answer_question(client, make_document(needles=0), "Where?", context_window_tokens=WINDOW, timings=timings))
+
+    assert answer == NOT_FOUND_MESSAGE
+    assert timings.sections_with_answer == 0
+    assert len(client.prompts) == timings.sections
+
+
+def test_failed_sections_are_left_out_of_the_reduce_step():
+    client = FakeClient()
+    original = client.get_streaming_response
+
+    def flaky(prompt_content, document=None, question=None):
+        if document is not None and "Paragraph 0 " in document:
+            yield STREAMING_ERROR_MESSAGE
+            return
+        yield from original(prompt_content, document, question)
+
+    client.get_streaming_response = flaky
+    answer = "".join(answer_question(client, make_document(needles=1), "Where?", context_window_tokens=WINDOW))
+
+    assert answer == "Merged: 1"
+    assert STREAMING_ERROR_MESSAGE not in client.prompts[-1]
+
+
+
+def test_sections_failing_mid_stream_are_left_out_of_the_reduce_step(tmp_path):
+    # Every section streams its first chunk, then the connection drops
+    backend = StandInBackend(StandInConfig(time_to_first_chunk_s=0, inter_chunk_delay_s=0,
+                                           mid_stream_error_rate=1.0))
+    # The model is picked from the cache, so the backend only sees answer requests
+    model_cache = ModelSelectionCache(path=str(tmp_path / "models.json"))
+    GeminiClient(model_cache=model_cache, backend=StandInBackend(StandInConfig(time_to_first_chunk_s=0))).model
+    client = GeminiClient(model_cache=model_cache, backend=backend)
+    timings = MapReduceTimings()
+
+    answer = "".join(answer_question(client, make_document(), "Where?", context_window_tokens=WINDOW,
+                                     timings=timings))
+
+    assert timings.sections > 1
+    assert timings.sections_with_answer == 0
+    assert answer == NOT_FOUND_MESSAGE
+    # No reduce request was made from the truncated answers
+    assert backend.requests == timings.sections
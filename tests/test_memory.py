@@ -0,0 +1,140 @@
+"""Unit tests for bounded conversation memory (no API access required)."""
+import threading
+
+from core.backends import StandInBackend, StandInConfig
+from core.gemini_client import STREAMING_ERROR_MESSAGE, GeminiClient
+from core.memory import SUMMARY_ROLE, ConversationMemory, model_summarizer, summarize_locally
+from core.model_cache import ModelSelectionCache
+from core.packing import turn_tokens
+from core.qa_logic import answer_question
+from core.response_cache import ResponseCache
+
+DOCUMENT = "Refund Policy: software refunds within 30 days. Hardware refunds within 15 days."
+
+
+def conversation(turns: int) -> list[dict]:
+    return [
+        {"role": "user", "content": f"Question {i}: what does section {i} say about refunds?"} if i % 2 == 0
+        else {"role": "assistant", "content": f"Section {i} says refunds take {i} days. " + "Details follow. " * 30}
+        for i in range(turns)
+    ]
+
+
+class CountingSummarizer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, summary, turns, max_tokens):
+        self.calls.append((summary, turns))
+        return summarize_locally(summary, turns, max_tokens)
+
+
+def test_short_conversations_are_sent_verbatim():
+    memory = ConversationMemory(recent_tokens=2000)
+    messages = conversation(4)
+    assert not memory.compact(messages)
+    assert memory.history(messages) == messages
+
+
+def test_history_stays_bounded_and_each_turn_is_summarized_once():
+    summarizer = CountingSummarizer()
+    memory = ConversationMemory(summarizer, recent_tokens=600, summary_tokens=150)
+    messages, sizes = [], []
+    for turn in conversation(100):
+        messages.append(turn)
+        memory.compact(messages)
+        sizes.append(sum(turn_tokens(t) for t in memory.history(messages)))
+
+    assert max(sizes) <= 600 + 150 + 2
+    # Folding down to half the budget: a summary every few turns, not every turn
+    assert memory.compactions == len(summarizer.calls) < 40
+    folded = [turn for _, turns in summarizer.calls for turn in turns]
+    assert folded == messages[:memory.summarized_turns]
+    # Each call builds on the previous summary instead of re-reading old turns
+    assert summarizer.calls[1][0] != "" and len(summarizer.calls[1][1]) < 10
+
+    history = memory.history(messages)
+    assert history[0]["role"] == SUMMARY_ROLE
+    assert history[1:] == messages[memory.summarized_turns:]
+    assert "Question 98" in history[-2]["content"]
+
+
+def test_local_summaries_keep_the_newest_lines_within_the_limit():
+    summary = summarize_locally("", conversation(40), 120)
+    assert "Asked: Question 38" in summary
+    assert "Question 0:" not in summary
+    assert "Details follow" not in summary  # answers by their first sentence
+    assert len(summary) <= 120 * 4
+
+
+def test_clearing_the_conversation_resets_the_memory():
+    memory = ConversationMemory(recent_tokens=300)
+    messages = conversation(20)
+    assert memory.compact(messages)
+    assert memory.history([]) == []
+    assert memory.summary == ""
+    memory.compact(messages)
+    memory.reset()
+    assert (memory.summary, memory.summarized_turns, memory.compactions) == ("", 0, 0)
+
+
+def test_background_compaction_is_waited_for_by_the_next_history():
+    release = threading.Event()
+
+    def slow_summarizer(summary, turns, max_tokens):
+        release.wait(5)
+        return summarize_locally(summary, turns, max_tokens)
+
+    memory = ConversationMemory(slow_summarizer, recent_tokens=300)
+    messages = conversation(20)
+    worker = memory.compact_in_background(messages)
+    # Returned while the summary is still being written
+    assert worker.is_alive() and memory.compactions == 0
+    release.set()
+    history = memory.history(messages)
+    assert memory.compactions == 1
+    assert history[0]["role"] == SUMMARY_ROLE
+
+
+def test_model_summaries_fall_back_to_local_on_errors():
+    class FailingClient:
+        def get_streaming_response(self, prompt, **kwargs):
+            yield STREAMING_ERROR_MESSAGE
+
+    summary = model_summarizer(FailingClient())("", conversation(2), 100)
+    assert summary == summarize_locally("", conversation(2), 100)
+
+    class MidStreamFailingClient:
+        def get_streaming_response(self, prompt, **kwargs):
+            yield "The user asked about"
+            yield STREAMING_ERROR_MESSAGE
+
+    summary = model_summarizer(MidStreamFailingClient())("", conversation(2), 100)
+    assert summary == summarize_locally("", conversation(2), 100)
+
+
+def test_follow_ups_are_answered_with_history_and_cached_per_conversation(tmp_path):
+    model_cache = ModelSelectionCache(path=str(tmp_path / "models.json"))
+    GeminiClient(model_cache=model_cache, backend=StandInBackend(StandInConfig(time_to_first_chunk_s=0))).model
+    backend = StandInBackend(StandInConfig(time_to_first_chunk_s=0, inter_chunk_delay_s=0))
+    client = GeminiClient(model_cache=model_cache, backend=backend,
+                          response_cache=ResponseCache())
+    prompts = []
+    stream = client.get_streaming_response
+
+    def recording_stream(prompt, **kwargs):
+        prompts.append(prompt)
+        return stream(prompt, **kwargs)
+
+    client.get_streaming_response = recording_stream
+    history = [{"role": "user", "content": "What is the software refund window?"},
+               {"role": "assistant", "content": "30 days."}]
+
+    "".join(answer_question(client, DOCUMENT, "And for hardware?", history=history))
+    assert "User: What is the software refund window?\nAssistant: 30 days." in prompts[-1]
+
+    # The same follow-up in another conversation is not served from the cache
+    other = [{"role": "user", "content": "Who makes the ChromaKey?"}, {"role": "assistant", "content": "Innovatech."}]
+    "".join(answer_question(client, DOCUMENT, "And for hardware?", history=other))
+    "".join(answer_question(client, DOCUMENT, "And for hardware?", history=history))
+    assert backend.requests == 2
@@ -0,0 +1,108 @@
+"""Unit tests for latency-aware adaptive model routing (no API access required)."""
+import json
+
+import pytest
+
+from core.backends import StandInBackend, StandInConfig
+from core.gemini_client import GeminiClient
+from core.model_cache import ModelSelectionCache
+from core.model_router import LONG, SHORT, ModelRouter, RouterConfig
+from core.resilience import ResilienceConfig
+
+MODELS = ["primary", "light", "legacy"]
+
+# Second in GeminiClient's fallback list; made fast in the stand-in below
+FAST_MODEL = "gemini-1.5-flash"
+
+
+def observe(router, model_name, prompt_tokens, ttfc_s, times=3):
+    for _ in range(times):
+        router.observe(model_name, prompt_tokens, ttfc_s)
+
+
+def test_unexplored_models_are_tried_then_the_fastest_wins_for_short_prompts():
+    router = ModelRouter(RouterConfig(min_samples=3))
+    assert router.route(MODELS, prompt_tokens=100).ranking == MODELS
+
+    observe(router, "primary", 100, 0.8)
+    assert router.route(MODELS, prompt_tokens=100).chosen == "light"  # not measured yet
+
+    observe(router, "light", 100, 0.2)
+    observe(router, "legacy", 100, 0.5)
+    decision = router.route(MODELS, prompt_tokens=100)
+    assert decision.size_class == SHORT
+    assert decision.ranking == ["light", "legacy", "primary"]
+
+
+def test_long_prompts_weigh_the_fallback_priority():
+    router = ModelRouter(RouterConfig(short_prompt_tokens=1000, quality_weight=0.5))
+    observe(router, "primary", 5000, 0.30)
+    observe(router, "light", 5000, 0.25)  # faster, but not 1.5x faster
+    observe(router, "legacy", 5000, 0.20)
+    decision = router.route(MODELS, prompt_tokens=5000)
+    assert decision.size_class == LONG
+    assert decision.chosen == "primary"
+
+    # Short prompts are measured separately and only latency counts
+    observe(router, "primary", 100, 0.30)
+    observe(router, "light", 100, 0.25)
+    observe(router, "legacy", 100, 0.40)
+    assert router.route(MODELS, prompt_tokens=100).chosen == "light"
+
+
+def test_failing_models_are_routed_last_until_their_samples_expire():
+    now = [0.0]
+    router = ModelRouter(RouterConfig(window_s=60), clock=lambda: now[0])
+    observe(router, "primary", 100, 0.5)
+    observe(router, "light", 100, None)  # every attempt failed
+    observe(router, "legacy", 100, 0.9)
+    assert router.route(MODELS, prompt_tokens=100).ranking[-1] == "light"
+    assert router.stats("light", SHORT)["error_rate"] == 1.0
+
+    # Old samples are forgotten, so the model is explored again
+    now[0] = 61.0
+    assert router.route(MODELS, prompt_tokens=100).chosen == "primary"
+    assert router.stats("light", SHORT)["samples"] == 0
+
+
+def test_pinned_model_overrides_routing():
+    router = ModelRouter()
+    observe(router, "light", 100, 0.01)
+    decision = router.route(MODELS, prompt_tokens=100, pinned="legacy")
+    assert decision.ranking == ["legacy"]
+    assert decision.pinned
+
+
+@pytest.fixture
+def make_client(tmp_path):
+    def make(**kwargs):
+        config = StandInConfig(time_to_first_chunk_s=0.05, inter_chunk_delay_s=0)
+        model_cache = ModelSelectionCache(path=str(tmp_path / "models.json"))
+        GeminiClient(model_cache=model_cache, backend=StandInBackend(config)).model
+        client = GeminiClient(model_cache=model_cache, backend=StandInBackend(config),
+                              resilience=ResilienceConfig(max_attempts=1), **kwargs)
+        config.model_time_to_first_chunk_s = {FAST_MODEL: 0.0}
+        return client
+    return make
+
+
+def test_client_routes_to_the_faster_model_and_exports_decisions(make_client, tmp_path):
+    client = make_client(router=ModelRouter(RouterConfig(min_samples=1)))
+
+    answers = ["".join(client.get_streaming_response(f"prompt {i}")) for i in range(8)]
+    assert answers[-1].startswith(f"[stand-in {FAST_MODEL}]")
+
+    path = tmp_path / "routing.jsonl"
+    assert client.router.export_decisions(str(path)) == 8
+    decisions = [json.loads(line) for line in path.read_text().splitlines()]
+    assert decisions[-1]["served_by"] == FAST_MODEL
+    assert decisions[-1]["ttfc_s"] < 0.05
+    assert all(d["attempts"] for d in decisions)
+
+
+def test_pinned_client_never_leaves_its_model(make_client):
+    client = make_client(router=ModelRouter(RouterConfig(min_samples=1)), pinned_model="gemini-pro")
+    for i in range(4):
+        assert "".join(client.get_streaming_response(f"prompt {i}")).startswith("[stand-in gemini-pro]")
+    assert client.model_name == "gemini-pro"
+    assert {d.served_by for d in client.router.decisions} == {"gemini-pro"}
@@ -0,0 +1,46 @@
+"""Unit tests for lazy, cached model selection in GeminiClient (no API access required)."""
+import pytest
+
+from core.backends import StandInBackend, StandInConfig
+from core.gemini_client import GeminiClient
+from core.model_cache import ModelSelectionCache
+
+
+def make_backend(*working_models):
+    return StandInBackend(StandInConfig(time_to_first_chunk_s=0, inter_chunk_delay_s=0, available_models=list(working_models)))
+
+
+def make_client(backend, path, ttl_seconds=None):
+    return GeminiClient(model_cache=ModelSelectionCache(path=str(path), ttl_seconds=ttl_seconds), backend=backend)
+
+
+def test_init_makes_no_api_calls(tmp_path):
+    backend = make_backend("gemini-1.5-flash")
+    make_client(backend, tmp_path / "models.json")
+    assert backend.requests == 0
+
+
+def test_highest_priority_working_model_is_selected_and_cached(tmp_path):
+    backend = make_backend("gemini-1.5-flash", "gemini-pro")
+
+    client = make_client(backend, tmp_path / "models.json")
+    assert client.model_name == "gemini-1.5-flash"
+
+    # A fresh backend, so losing probes still finishing above aren't counted
+    warm_backend = make_backend("gemini-1.5-flash", "gemini-pro")
+    warm_client = make_client(warm_backend, tmp_path / "models.json")
+    assert warm_client.model_name == "gemini-1.5-flash"
+    assert warm_backend.requests == 0  # served from the on-disk cache
+
+
+def test_expired_cache_entry_triggers_a_new_probe(tmp_path):
+    make_client(make_backend("gemini-1.5-flash"), tmp_path / "models.json").model
+
+    client = make_client(make_backend("gemini-pro"), tmp_path / "models.json", ttl_seconds=-1)
+    assert client.model_name == "gemini-pro"
+
+
+def test_no_working_model_raises_on_first_use(tmp_path):
+    client = make_client(make_backend(), tmp_path / "models.json")
+    with pytest.raises(ValueError, match="Could not initialize any Gemini model"):
+        client.model
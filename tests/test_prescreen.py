@@ -0,0 +1,85 @@
+"""Unit tests for the DeepEval suite's local pre-screen (no API access required)."""
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from core.gemini_client import NOT_FOUND_MESSAGE, STREAMING_ERROR_MESSAGE
+from prescreen import FAIL, JUDGE, PASS, PrescreenConfig, score_dataset, screen_dataset
+
+CONTEXT = (
+    "Refund Policy: Customers may request a full refund within 30 days of purchase for any of our "
+    "software products. Hardware products are subject to a 15-day refund window."
+)
+
+
+def test_scores_match_the_textbook_definitions():
+    actual = ["the cat sat on the mat", "a b c d e f", "", "refund within 30 days"]
+    expected = ["the cat is on the mat", "a c f z", "anything", "refund within 30 days"]
+    scores = score_dataset(actual, expected, [CONTEXT] * 4)
+
+    # 5 of 6 tokens shared each way; LCS "the cat on the mat" has 5 tokens
+    assert scores["token_f1"][0] == pytest.approx(5 / 6)
+    assert scores["rouge_l"][0] == pytest.approx(5 / 6)
+    # LCS "a c f": precision 3/6, recall 3/4
+    assert scores["rouge_l"][1] == pytest.approx(2 * 0.5 * 0.75 / 1.25)
+    assert scores["token_f1"][2] == 0 and scores["rouge_l"][2] == 0
+    # Every bigram of the last answer occurs in the context
+    assert scores["context_overlap"][3] == 1.0
+    assert scores["context_overlap"][0] == 0.0
+
+
+def test_clear_rows_are_settled_and_the_rest_ordered_for_the_judges():
+    expected = [
+        "Customers may request a full refund within 30 days.",
+        "Hardware products have a 15-day refund window.",
+        NOT_FOUND_MESSAGE,
+        "Customers may request a full refund within 30 days.",
+        "Hardware products have a 15-day refund window.",
+        "Customers may request a full refund within 30 days.",
+        "Software refunds are possible within 30 days of purchase.",
+    ]
+    actual = [
+        "Customers may request a full refund within 30 days of purchase.",  # close match
+        "Bananas grow on trees in tropical climates.",                       # off-topic
+        NOT_FOUND_MESSAGE,                                                   # expected refusal
+        NOT_FOUND_MESSAGE,                                                   # wrong refusal
+        STREAMING_ERROR_MESSAGE,                                             # error
+        "You can get your money back for software if you ask in time.",     # unclear
+        "Software products can be refunded within 30 days of purchase.",     # unclear, closer
+    ]
+    screen = screen_dataset(actual, expected, [CONTEXT] * len(actual))
+
+    assert list(screen.decisions) == [PASS, FAIL, PASS, FAIL, FAIL, JUDGE, JUDGE]
+    assert screen.row(3).reason == "refused where an answer was expected"
+    # Settled rows first, then the judged ones from the lowest local score
+    assert list(screen.order[-2:]) == [5, 6]
+    assert screen.judge_calls_saved(["Answer Relevancy", "Faithfulness", "Contextual Relevancy"]) == (15, 45)
+
+    # Distinct contexts with a row index score the same; only flagged rows
+    # are generation errors, not answers that happen to start with "Error"
+    errors = [answer == STREAMING_ERROR_MESSAGE for answer in actual]
+    flagged = screen_dataset(["Error codes are listed on the refund form."] + actual[1:], expected, [CONTEXT],
+                             context_of_row=[0] * len(actual), errors=errors)
+    assert flagged.row(0).reason != "generation error"
+    assert list(flagged.decisions[1:]) == list(screen.decisions[1:])
+
+    disabled = screen_dataset(actual, expected, [CONTEXT] * len(actual), PrescreenConfig(enabled=False))
+    assert disabled.count(JUDGE) == len(actual)
+
+
+def test_golden_answers_pass_and_are_scored_in_one_batch():
+    dataset = Path(__file__).parent / "data" / "golden_qa_dataset.jsonl"
+    goldens = [json.loads(line) for line in dataset.read_text().splitlines() if line.strip()]
+    expected = [golden["expected_output"] for golden in goldens]
+    contexts = [golden["retrieval_context"] for golden in goldens]
+
+    assert screen_dataset(expected, expected, contexts).count(PASS) == len(goldens)
+
+    # Batching by length must not change any row's scores
+    many = screen_dataset(expected[::-1] * 100, expected * 100, contexts * 100)
+    single = [screen_dataset([a], [e], [c]).scores for a, e, c in zip(expected[::-1], expected, contexts)]
+    for index, scores in enumerate(single):
+        for name in ("token_f1", "rouge_l", "context_overlap"):
+            assert np.isclose(many.scores[name][index], scores[name][0])
@@ -1,10 +1,12 @@
 import pytest
-import json
+import asyncio
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
-from typing import Generator
+from typing import Generator, Optional
 
 # Add project root to Python path so we can import core modules
 # This allows the test to find core.gemini_client, core.qa_logic, etc.
@@ -12,7 +14,6 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 # Import DeepEval components
-from deepeval import assert_test
 from deepeval.test_case import LLMTestCase
 from deepeval.metrics import (
     AnswerRelevancyMetric,
@@ -20,11 +21,20 @@ from deepeval.metrics import (
     ContextualRelevancyMetric
 )  # [9, 12, 13, 32]
 from deepeval.models.base_model import DeepEvalBaseLLM
+from deepeval.utils import get_or_create_event_loop
 
 # Import the application's core logic
-from core.gemini_client import GeminiClient
-from core.qa_logic import format_prompt
+from core.async_client import AsyncModelRunner
+from core.backends import create_backend_from_env
+from core.fast_path import ANSWER, FastPathConfig, get_answerer
+from core.gemini_client import STREAMING_ERROR_MESSAGE, GeminiClient
+from core.qa_logic import ContextPrompter, format_prompt
+from core.rate_scheduler import EVAL, create_scheduler_from_env
+from core.tokens import estimate_tokens
 from helpers.logger import Logger
+from eval_cache import EvalCache, hash_text, make_key
+from golden_dataset import iter_goldens
+from prescreen import JUDGE, PASS, PrescreenConfig, ScreenResult, screen_dataset
 
 
 # Global singleton instance
@@ -36,14 +46,19 @@ logger = Logger().get_logger()
 class GeminiModelWrapper(DeepEvalBaseLLM):
     """Wrapper to use Gemini with DeepEval metrics."""
 
-    def __init__(self, model_name: str = "models/gemini-2.5-flash-preview-05-20"):
+    def __init__(self, model_name: str = "models/gemini-2.5-flash-preview-05-20", max_concurrency: int = None):
         self.model_name = model_name
-        import google.generativeai as genai
+        # Bounds DeepEval's concurrent async judge calls
+        self.runner = AsyncModelRunner(max_concurrency)
+        # Honours GEMINI_BACKEND, so judges can also run against the stand-in
+        backend = create_backend_from_env()
         api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
+        if not api_key and backend.requires_api_key:
             raise ValueError("GOOGLE_API_KEY not found in environment")
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name=model_name)
+        backend.configure(api_key or "")
+        self.model = backend.create_model(model_name)
+        # Judge calls share the API key's quota with the app, at the lowest priority
+        self.scheduler = create_scheduler_from_env()
 
     def load_model(self):
         """Load the model (already loaded in __init__)."""
@@ -52,6 +67,8 @@ class GeminiModelWrapper(DeepEvalBaseLLM):
     def generate(self, prompt: str) -> str:
         """Generate response from the model."""
         try:
+            if self.scheduler is not None:
+                self.scheduler.acquire(estimate_tokens(prompt), EVAL)
             response = self.model.generate_content(prompt)
             return response.text
         except Exception as e:
@@ -59,8 +76,14 @@ class GeminiModelWrapper(DeepEvalBaseLLM):
             return f"Error: {e}"
 
     async def a_generate(self, prompt: str) -> str:
-        """Async generate (DeepEval may use this)."""
-        return self.generate(prompt)
+        """Async generate (DeepEval may use this), run concurrently up to the runner's cap."""
+        try:
+            if self.scheduler is not None:
+                await self.scheduler.acquire_async(estimate_tokens(prompt), EVAL)
+            return await self.runner.generate(self.model, prompt)
+        except Exception as e:
+            logger.info(f"Error in Gemini model generation: {e}")
+            return f"Error: {e}"
 
     def get_model_name(self) -> str:
         """Return the model name."""
@@ -89,26 +112,138 @@ contextual_relevancy_metric = ContextualRelevancyMetric(
     model=gemini_model,
     include_reason=True
 )
+METRICS = [answer_relevancy_metric, faithfulness_metric, contextual_relevancy_metric]
+METRIC_NAMES = [metric.__name__ for metric in METRICS]
+
+# Golden dataset, inline or deduplicated (see golden_dataset.py)
+EVAL_DATASET = os.getenv("EVAL_DATASET", str(Path(__file__).parent / "data" / "golden_qa_dataset.jsonl"))
+
+# Number of concurrent generation requests while building the test cases
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", "4"))
+
+# Generated outputs and metric verdicts are cached on disk so reruns only
+# evaluate rows that changed. Set EVAL_NO_CACHE=1 to force a full run.
+EVAL_CACHE_PATH = os.getenv(
+    "EVAL_CACHE_PATH", str(Path(__file__).parent / ".eval_cache" / "eval_cache.db")
+)
+eval_cache = None if os.getenv("EVAL_NO_CACHE") else EvalCache(EVAL_CACHE_PATH)
+
+# Optional local fast path (FAST_PATH=answer|section, see core/fast_path.py);
+# its answers are scored by the same metrics as the model's
+FAST_PATH = FastPathConfig.from_env()
+
+# Local lexical pre-screen (see prescreen.py): clear passes and fails skip
+# the LLM judges, the rest are judged most doubtful first.
+# Set EVAL_PRESCREEN=off to judge every row.
+PRESCREEN = PrescreenConfig.from_env()
+
+
+def get_prompt_version(client: GeminiClient) -> str:
+    """
+    Fingerprints everything that shapes a generated answer besides the
+    inputs: the system prompt, the prompt template and the fast path.
+    """
+    fingerprint = client.system_prompt + format_prompt("{context}", "{query}")
+    if FAST_PATH.enabled:
+        fingerprint += f"fast_path:{FAST_PATH.mode}:{FAST_PATH.threshold}"
+    return hash_text(fingerprint)[:16]
+
+
+def generate_actual_output(client: GeminiClient, golden: dict, prompt_version: str,
+                           prompters: Optional[dict] = None) -> tuple[str, bool]:
+    """
+    Runs the app logic for one golden row, reusing a cached output if the
+    (input, context, model, prompt version) combination was seen before.
+
+    `prompters` maps context ids to a `ContextPrompter`, shared by all
+    rows of a context so its prompt prefix is rendered once.
+
+    Returns:
+        tuple[str, bool]: The output, and whether generation failed (the
+        output is then the error message).
+    """
+    input_query = golden["input"]
+    retrieval_context = golden["retrieval_context"]
+    context_hash = golden["context_id"]
+
+    if FAST_PATH.enabled:
+        found = get_answerer(retrieval_context, FAST_PATH.threshold, context_hash).match(input_query)
+        if found is not None:
+            if FAST_PATH.mode == ANSWER:
+                return found.answer, False
+            # Only the matched section is sent; metrics still see the full context
+            retrieval_context = found.section.text
+            context_hash = hash_text(retrieval_context)
+
+    cache_key = make_key(
+        "output", input_query, context_hash, client.model_name, prompt_version
+    )
+    if eval_cache is not None:
+        cached = eval_cache.get(cache_key)
+        if cached is not None:
+            return cached["actual_output"], False
+
+    # This is the "end-to-end" part. We are testing the
+    # *actual* response from the live model.
+
+    # Format the prompt just like the app does
+    if prompters is not None and retrieval_context is golden["retrieval_context"]:
+        prompter = prompters.get(context_hash)
+        if prompter is None:
+            prompter = prompters.setdefault(context_hash, ContextPrompter(retrieval_context))
+        formatted_prompt = prompter.format(input_query)
+    else:
+        formatted_prompt = format_prompt(retrieval_context, input_query)
+
+    # Get the streaming response and collect it
+    response_stream = client.get_streaming_response(formatted_prompt)
+
+    # Collect the full string from the generator
+    actual_output_chunks = []
+    try:
+        for chunk in response_stream:
+            actual_output_chunks.append(chunk)
+    except Exception as e:
+        logger.info(f"Error during model generation for test '{input_query}': {e}")
+        return f"Error: {e}", True
+
+    if not actual_output_chunks:
+        return "Error: No output from model", True
+
+    actual_output = "".join(actual_output_chunks)
+    if actual_output == STREAMING_ERROR_MESSAGE:
+        return actual_output, True
+    if eval_cache is not None:
+        eval_cache.set(cache_key, {"actual_output": actual_output})
+    return actual_output, False
 
 
 def load_test_cases() -> Generator:
     """
     Loads the golden dataset, runs the app logic to get 'actual_output',
-    and yields a fully formed LLMTestCase for pytest.
+    and yields a fully formed LLMTestCase for pytest, with the pre-screen's
+    verdict on it.
+
+    Outputs are generated concurrently (EVAL_WORKERS threads) and
+    cached on disk, so a warm rerun makes no generation calls at all.
+    The pre-screen then scores all outputs in one pass; rows are yielded
+    settled ones first, then the judged ones in the pre-screen's order.
     """
 
     # Initialize the *actual* application client
     # This makes it an end-to-end test
     try:
-        client = GeminiClient()
+        client = GeminiClient(priority=EVAL)
+        # Score a single model: adaptive routing or failover must not mix
+        # models within a run (the eval cache is keyed by model name)
+        client.pin_model(client.model_name)
     except ValueError as e:
         logger.info(f"Failed to initialize GeminiClient in test: {e}")
         pytest.skip(f"Skipping tests, API key issue: {e}")
         return
 
-    # Path to the golden dataset - use absolute path based on test file location
-    test_dir = Path(__file__).parent
-    dataset_path = test_dir / "data" / "golden_qa_dataset.jsonl"
+    # Path to the golden dataset - absolute by default, based on the test file location
+    dataset_path = Path(EVAL_DATASET)
 
     # Verify dataset exists
     if not dataset_path.exists():
@@ -116,53 +251,61 @@ def load_test_cases() -> Generator:
         return
 
     try:
-        with open(dataset_path, 'r') as f:
-            for line in f:
-                if not line.strip():
-                    continue
-
-                golden = json.loads(line)
-
-                # --- 1. Prepare Inputs ---
-                input_query = golden["input"]
-                retrieval_context = golden["retrieval_context"]
-                expected_output = golden["expected_output"]
-
-                # --- 2. Run App Logic to get Actual Output ---
-                # This is the "end-to-end" part. We are testing the
-                # *actual* response from the live model.
-
-                # Format the prompt just like the app does
-                formatted_prompt = format_prompt(retrieval_context, input_query)
-
-                # Get the streaming response and collect it
-                response_stream = client.get_streaming_response(formatted_prompt)
-
-                # Collect the full string from the generator
-                actual_output_chunks = []
-                try:
-                    for chunk in response_stream:
-                        actual_output_chunks.append(chunk)
-                except Exception as e:
-                    logger.info(f"Error during model generation for test '{input_query}': {e}")
-                    actual_output = f"Error: {e}"
-
-                if not actual_output_chunks:
-                    actual_output = "Error: No output from model"
-                else:
-                    actual_output = "".join(actual_output_chunks)
-
-                # --- 3. Create the DeepEval Test Case ---
-                # This object contains all data needed for evaluation [9, 11]
-                test_case = LLMTestCase(
-                    input=input_query,
-                    actual_output=actual_output,
-                    expected_output=expected_output,
-                    retrieval_context=[retrieval_context]  # Must be a list
-                )
-
-                # Yield the test case for pytest to consume
-                yield test_case
+        # --- 1. Prepare Inputs ---
+        # Every row is held for the run: pytest collects all test cases up
+        # front and the pre-screen orders them across the whole dataset.
+        # Rows of the same context share one string, so memory grows with
+        # the rows' questions and answers, not with copies of the contexts
+        goldens = list(iter_goldens(str(dataset_path)))
+
+        # --- 2. Run App Logic to get Actual Outputs (concurrently) ---
+        prompt_version = get_prompt_version(client)
+        prompters = {}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=EVAL_WORKERS) as executor:
+            generated = list(executor.map(
+                lambda golden: generate_actual_output(client, golden, prompt_version, prompters), goldens
+            ))
+        actual_outputs = [output for output, _ in generated]
+        logger.info(
+            f"Generated {len(goldens)} outputs in {time.perf_counter() - start:.2f}s "
+            f"({EVAL_WORKERS} workers, cache hits: {eval_cache.hits if eval_cache else 0})"
+        )
+
+        # --- 3. Pre-screen every output locally ---
+        # Each distinct context once, with every row's index into them
+        start = time.perf_counter()
+        contexts = {golden["context_id"]: golden["retrieval_context"] for golden in goldens}
+        context_index = {key: position for position, key in enumerate(contexts)}
+        screen = screen_dataset(
+            actual_outputs,
+            [golden["expected_output"] for golden in goldens],
+            list(contexts.values()),
+            PRESCREEN,
+            context_of_row=[context_index[golden["context_id"]] for golden in goldens],
+            errors=[failed for _, failed in generated],
+        )
+        metric_runs, judge_calls = screen.judge_calls_saved(METRIC_NAMES)
+        logger.info(
+            f"Pre-screened {len(goldens)} outputs in {(time.perf_counter() - start) * 1000:.1f}ms: "
+            f"{screen.count(PASS)} passed, {len(goldens) - screen.count(PASS) - screen.count(JUDGE)} failed, "
+            f"{screen.count(JUDGE)} left to the judges "
+            f"(saved {metric_runs} metric runs, ~{judge_calls} judge calls)"
+        )
+
+        for index in screen.order:
+            golden, actual_output = goldens[index], actual_outputs[index]
+            # --- 4. Create the DeepEval Test Case ---
+            # This object contains all data needed for evaluation [9, 11]
+            test_case = LLMTestCase(
+                input=golden["input"],
+                actual_output=actual_output,
+                expected_output=golden["expected_output"],
+                retrieval_context=[golden["retrieval_context"]]  # Must be a list
+            )
+
+            # Yield the test case for pytest to consume
+            yield pytest.param(test_case, screen.row(index), id=f"row{index}-{screen.decisions[index]}")
 
     except FileNotFoundError:
         logger.info(f"Golden dataset not found at: {dataset_path}")
@@ -172,23 +315,79 @@ def load_test_cases() -> Generator:
         pytest.fail(f"Error loading test cases: {e}")
 
 
+def get_verdict_key(test_case: LLMTestCase, metric) -> str:
+    """Cache key of one metric verdict for one test case."""
+    return make_key(
+        "verdict",
+        test_case.input,
+        hash_text("".join(test_case.retrieval_context)),
+        hash_text(test_case.actual_output),
+        gemini_model.get_model_name(),
+        metric.__name__,
+        metric.threshold,
+    )
+
+
+def evaluate_metrics(test_case: LLMTestCase, metrics: list) -> dict:
+    """
+    Scores a test case with each metric, reusing cached verdicts.
+
+    Metrics without a cached verdict are measured concurrently on
+    DeepEval's event loop; successful verdicts are then cached.
+
+    Returns:
+        dict: Metric name -> {"score", "success", "reason"}.
+    """
+    verdicts = {}
+    pending = []
+    for metric in metrics:
+        key = get_verdict_key(test_case, metric)
+        cached = eval_cache.get(key) if eval_cache is not None else None
+        if cached is not None:
+            verdicts[metric.__name__] = cached
+        else:
+            pending.append((metric, key))
+
+    if pending:
+        loop = get_or_create_event_loop()
+        loop.run_until_complete(asyncio.gather(
+            *(metric.a_measure(test_case, _show_indicator=False) for metric, _ in pending)
+        ))
+        for metric, key in pending:
+            verdict = {
+                "score": metric.score,
+                "success": metric.is_successful(),
+                "reason": metric.reason,
+                "threshold": metric.threshold,
+            }
+            verdicts[metric.__name__] = verdict
+            if eval_cache is not None and getattr(metric, "error", None) is None:
+                eval_cache.set(key, verdict)
+
+    return verdicts
+
+
 # --- The Pytest Test Function ---
 # This single function *is* the 20+ test suite.
 # Pytest's 'parametrize' decorator calls this function
 # once for each test case yielded by 'load_test_cases'.
 # [9, 20, 25]
-@pytest.mark.parametrize("test_case", load_test_cases())
-def test_qa_agent_evaluation(test_case: LLMTestCase):
+@pytest.mark.parametrize("test_case, screen", load_test_cases())
+def test_qa_agent_evaluation(test_case: LLMTestCase, screen: ScreenResult):
     """
-    Runs the DeepEval assertion on the generated test case.
+    Runs the DeepEval metrics on the generated test case, unless the
+    pre-screen already settled it.
     """
-    # assert_test runs all specified metrics and validates them
-    # against their internal thresholds. [9, 10, 26]
-    assert_test(
-        test_case,
-        [
-            answer_relevancy_metric,
-            faithfulness_metric,
-            contextual_relevancy_metric
-        ]
-    )
\ No newline at end of file
+    if screen.decision != JUDGE:
+        assert screen.decision == PASS, f"Pre-screen: {screen.reason} (scores: {screen.scores})"
+        return
+
+    # Every metric is validated against its internal threshold. [9, 10, 26]
+    verdicts = evaluate_metrics(test_case, METRICS)
+
+    failed = [
+        f"{name} (score: {verdict['score']}, threshold: {verdict['threshold']}, reason: {verdict['reason']})"
+        for name, verdict in verdicts.items()
+        if not verdict["success"]
+    ]
+    assert not failed, f"Metrics: {', '.join(failed)} failed."
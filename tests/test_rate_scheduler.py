@@ -0,0 +1,159 @@
+"""Unit tests for the shared rate scheduler (no API access required)."""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core.backends import StandInBackend, StandInConfig
+from core.gemini_client import STREAMING_ERROR_MESSAGE, GeminiClient
+from core.model_cache import ModelSelectionCache
+from core.rate_scheduler import (
+    BATCH,
+    EVAL,
+    INTERACTIVE,
+    RateLimitTimeoutError,
+    RateScheduler,
+    RateSchedulerConfig,
+)
+from core.resilience import ResilienceConfig
+
+NO_RESERVES = {BATCH: 0.0, EVAL: 0.0}
+
+
+def test_buckets_allow_a_burst_then_never_exceed_the_quota_per_window():
+    scheduler = RateScheduler(RateSchedulerConfig(requests_per_minute=20, window_s=0.5, burst_share=0.25))
+    start = time.monotonic()
+    admitted = []
+    for _ in range(35):
+        scheduler.acquire()
+        admitted.append(time.monotonic() - start)
+
+    assert admitted[4] < 0.02 and admitted[5] > 0.02
+    assert max(sum(1 for t in admitted if s <= t < s + 0.5) for s in admitted) <= 20
+    assert scheduler.stats[INTERACTIVE]["admitted"] == 35
+
+    # A request larger than the bucket goes through once it is full, then others wait off its debt
+    tokens = RateScheduler(RateSchedulerConfig(tokens_per_minute=1000, window_s=1.0))
+    assert tokens.acquire(500) < 0.05
+    assert 0.35 < asyncio.run(tokens.acquire_async(10)) < 0.7
+
+
+def test_waiting_requests_are_admitted_by_priority():
+    scheduler = RateScheduler(RateSchedulerConfig(requests_per_minute=10, window_s=1.0, reserves=NO_RESERVES))
+    scheduler.acquire()  # empties the bucket
+    order = []
+
+    def request(priority):
+        scheduler.acquire(priority=priority)
+        order.append(priority)
+
+    threads = []
+    for priority in (EVAL, BATCH, INTERACTIVE):
+        threads.append(threading.Thread(target=request, args=(priority,)))
+        threads[-1].start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+    assert order == [INTERACTIVE, BATCH, EVAL]
+    assert 0 < scheduler.stats[INTERACTIVE]["wait_s_max"] < scheduler.stats[EVAL]["wait_s_max"]
+
+
+def test_processes_share_buckets_and_lower_classes_leave_a_reserve(tmp_path):
+    def config():
+        return RateSchedulerConfig(requests_per_minute=10, burst_share=0.5, max_wait_s=0.1,
+                                   shared_path=str(tmp_path / "rate.db"), quota_backoff_s=60)
+
+    eval_process, app_process = RateScheduler(config()), RateScheduler(config())
+    for _ in range(3):
+        eval_process.acquire(priority=EVAL)
+    # Eval must leave 30% of the 5-request bucket to the classes above it
+    with pytest.raises(RateLimitTimeoutError):
+        eval_process.acquire(priority=EVAL)
+    assert eval_process.stats[EVAL]["timeouts"] == 1
+    assert app_process.acquire(priority=INTERACTIVE) < 0.05
+
+    # A quota error seen by one process pauses the other as well
+    app_process.on_quota_error()
+    with pytest.raises(RateLimitTimeoutError):
+        eval_process.acquire(priority=INTERACTIVE)
+
+
+def test_scheduled_clients_stay_within_a_simulated_quota(tmp_path):
+    def quota_backend():
+        return StandInBackend(StandInConfig(time_to_first_chunk_s=0.01, inter_chunk_delay_s=0, quota_rpm=10,
+                                            quota_window_s=0.5))
+
+    model_cache = ModelSelectionCache(path=str(tmp_path / "models.json"))
+    GeminiClient(model_cache=model_cache, backend=StandInBackend(StandInConfig(time_to_first_chunk_s=0))).model
+    no_retries = ResilienceConfig(max_attempts=1)
+
+    def ask_all(clients):
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            return list(executor.map(
+                lambda i: "".join(clients[i % 2].get_streaming_response(f"Question {i}?")), range(20)
+            ))
+
+    backend = quota_backend()
+    unscheduled = GeminiClient(model_cache=model_cache, backend=backend, resilience=no_retries)
+    assert ask_all([unscheduled, unscheduled]).count(STREAMING_ERROR_MESSAGE) == backend.quota_errors == 10
+
+    backend = quota_backend()
+    scheduler = RateScheduler(RateSchedulerConfig(requests_per_minute=10, window_s=0.5))
+    app = GeminiClient(model_cache=model_cache, backend=backend, resilience=no_retries, scheduler=scheduler)
+    evaluation = GeminiClient(model_cache=model_cache, backend=backend, resilience=no_retries,
+                              scheduler=scheduler, priority=EVAL)
+    assert STREAMING_ERROR_MESSAGE not in ask_all([app, evaluation])
+    assert backend.quota_errors == 0
+
+    waits = {priority: stats["wait_s_total"] / stats["admitted"] for priority, stats in scheduler.stats.items()
+             if stats["admitted"]}
+    assert waits[INTERACTIVE] < waits[EVAL]
+
+
+def test_quota_errors_wait_for_the_scheduler_instead_of_retrying(tmp_path):
+    # The scheduler allows far more than the stand-in's quota, so the second request gets a 429
+    backend = StandInBackend(StandInConfig(time_to_first_chunk_s=0.01, inter_chunk_delay_s=0, quota_rpm=1,
+                                           quota_window_s=0.2))
+    model_cache = ModelSelectionCache(path=str(tmp_path / "models.json"))
+    GeminiClient(model_cache=model_cache, backend=StandInBackend(StandInConfig(time_to_first_chunk_s=0))).model
+    scheduler = RateScheduler(RateSchedulerConfig(requests_per_minute=1000, quota_backoff_s=0.4))
+    client = GeminiClient(model_cache=model_cache, backend=backend, scheduler=scheduler,
+                          resilience=ResilienceConfig(max_attempts=1))
+
+    assert "".join(client.get_streaming_response("Question 1?")) != STREAMING_ERROR_MESSAGE
+    start = time.monotonic()
+    answer = "".join(client.get_streaming_response("Question 2?"))
+
+    assert answer != STREAMING_ERROR_MESSAGE
+    assert backend.quota_errors == scheduler.quota_errors == 1
+    # Sent again only once the pause is over, without using the retry budget or the breaker
+    assert backend.requests == 3
+    assert time.monotonic() - start >= 0.4
+    assert client.caller.stats["retries"] == 0 and client.caller.stats["quota_waits"] == 1
+    assert client.caller.breaker(client.model_name).failures == 0
+
+
+def test_abandoned_async_attempts_never_go_upstream(tmp_path):
+    # The hedge waits for the scheduler's next slot, which frees up while the first answer still streams
+    backend = StandInBackend(StandInConfig(time_to_first_chunk_s=0.1, inter_chunk_delay_s=0.02, chunk_size=10))
+    model_cache = ModelSelectionCache(path=str(tmp_path / "models.json"))
+    GeminiClient(model_cache=model_cache, backend=StandInBackend(StandInConfig(time_to_first_chunk_s=0))).model
+    scheduler = RateScheduler(RateSchedulerConfig(requests_per_minute=2, window_s=0.4))
+    client = GeminiClient(model_cache=model_cache, backend=backend, scheduler=scheduler,
+                          resilience=ResilienceConfig(hedge_after_s=0.05, max_hedges=1))
+
+    async def ask():
+        return "".join([chunk async for chunk in client.get_streaming_response_async("Question?")])
+
+    start = time.monotonic()
+    answer = asyncio.run(ask())
+
+    assert answer != STREAMING_ERROR_MESSAGE
+    assert time.monotonic() - start > 0.4
+    assert client.caller.stats["hedges"] == 1
+    # The hedge lost before it was admitted: no slot used, no upstream request
+    assert backend.requests == 1
+    assert scheduler.stats[INTERACTIVE]["admitted"] == 1
@@ -0,0 +1,148 @@
+"""Unit tests for deadlines, retries, hedging and circuit breaking (no API access required)."""
+import asyncio
+import time
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from core.backends import StandInBackend, StandInConfig
+from core.gemini_client import STREAMING_ERROR_MESSAGE, GeminiClient
+from core.model_cache import ModelSelectionCache
+from core.resilience import CircuitBreaker, DeadlineExceededError, ResilienceConfig, ResilientCaller
+
+FAST = dict(backoff_base_s=0.01, backoff_max_s=0.02)
+
+
+class ScriptedUpstream:
+    """`open_stream` whose calls follow a script of (delay, chunks or exception)."""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = []
+
+    def __call__(self, model):
+        self.calls.append(model)
+        delay, outcome = self.script[min(len(self.calls), len(self.script)) - 1]
+        return self._stream(delay, outcome)
+
+    @staticmethod
+    def _stream(delay, outcome):
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        for item in outcome:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+def make_caller(**overrides) -> ResilientCaller:
+    return ResilientCaller(ResilienceConfig(**{**FAST, **overrides}), build_model=lambda name: name)
+
+
+def test_transient_errors_are_retried_before_the_first_chunk():
+    caller = make_caller(max_attempts=3)
+    upstream = ScriptedUpstream(
+        (0, google_exceptions.ServiceUnavailable("down")),
+        (0, google_exceptions.TooManyRequests("slow down")),
+        (0, ["ok"]),
+    )
+
+    assert list(caller.stream(["m"], upstream)) == ["ok"]
+    assert len(upstream.calls) == 3
+    assert caller.stats["retries"] == 2
+
+
+def test_request_errors_and_mid_stream_errors_are_not_retried():
+    caller = make_caller(max_attempts=3)
+    bad_request = ScriptedUpstream((0, google_exceptions.InvalidArgument("bad prompt")))
+    with pytest.raises(google_exceptions.InvalidArgument):
+        list(caller.stream(["m"], bad_request))
+    assert len(bad_request.calls) == 1
+
+    # Once a chunk has been emitted the answer can't be restarted
+    mid_stream = ScriptedUpstream((0, ["partial", google_exceptions.ServiceUnavailable("dropped")]))
+    chunks = []
+    with pytest.raises(google_exceptions.ServiceUnavailable):
+        for chunk in caller.stream(["m"], mid_stream):
+            chunks.append(chunk)
+    assert chunks == ["partial"]
+    assert len(mid_stream.calls) == 1
+
+
+def test_hedged_request_cuts_a_latency_spike():
+    caller = make_caller(hedge_after_s=0.05)
+    upstream = ScriptedUpstream((1.0, ["slow"]), (0, ["fast"]))
+
+    start = time.perf_counter()
+    assert list(caller.stream(["m"], upstream)) == ["fast"]
+    assert time.perf_counter() - start < 0.5
+    assert caller.stats["hedges"] == 1
+    assert caller.stats["hedge_wins"] == 1
+
+
+def test_deadline_bounds_a_hung_upstream():
+    caller = make_caller(deadline_s=0.2, attempt_timeout_s=0.1, max_attempts=5)
+    upstream = ScriptedUpstream((2.0, ["too late"]))
+
+    start = time.perf_counter()
+    with pytest.raises(DeadlineExceededError):
+        list(caller.stream(["m"], upstream))
+    assert time.perf_counter() - start < 1.0
+    assert caller.stats["deadlines_exceeded"] == 1
+
+
+def test_circuit_breaker_opens_then_lets_one_trial_through():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout_s=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    now[0] = 10.0
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial at a time
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.fixture
+def outage_client(tmp_path):
+    config = StandInConfig(time_to_first_chunk_s=0, inter_chunk_delay_s=0)
+    model_cache = ModelSelectionCache(path=str(tmp_path / "models.json"))
+    GeminiClient(model_cache=model_cache, backend=StandInBackend(config)).model
+    resilience = ResilienceConfig(max_attempts=2, breaker_failure_threshold=2, **FAST)
+    client = GeminiClient(model_cache=model_cache, backend=StandInBackend(config), resilience=resilience)
+    # The selected model then has an outage
+    config.model_error_rates = {client.model_name: 1.0}
+    return client
+
+
+def test_model_outage_fails_over_to_the_next_model(outage_client):
+    client = outage_client
+    primary, fallback = client.candidate_models()[:2]
+
+    # Both attempts hit the failing model: the breaker opens on the second
+    first = "".join(client.get_streaming_response("prompt"))
+    assert first == STREAMING_ERROR_MESSAGE
+    assert client.caller.breaker(primary).state == CircuitBreaker.OPEN
+
+    # Later requests skip the open circuit and go straight to the fallback
+    requests_before = client.backend.requests
+    answer = "".join(client.get_streaming_response("prompt"))
+    assert answer.startswith(f"[stand-in {fallback}]")
+    assert client.backend.requests == requests_before + 1
+    assert client.caller.stats["failovers"] == 1
+
+
+def test_async_requests_retry_and_fail_over(outage_client):
+    client = outage_client
+    fallback = client.candidate_models()[1]
+
+    async def run():
+        return [await client.get_response_async(f"prompt {i}") for i in range(2)]
+
+    first, second = asyncio.run(run())
+    assert first == STREAMING_ERROR_MESSAGE
+    assert second.startswith(f"[stand-in {fallback}]")
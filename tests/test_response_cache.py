@@ -0,0 +1,80 @@
+"""Unit tests for the response cache (no API access required)."""
+import pytest
+
+from core.backends import StandInBackend, StandInConfig
+from core.gemini_client import GeminiClient
+from core.model_cache import ModelSelectionCache
+from core.response_cache import (
+    ResponseCache,
+    SQLiteResponseStore,
+    hash_document,
+    make_cache_key,
+    normalize_question,
+)
+
+
+def test_question_normalization_shares_keys():
+    assert normalize_question("  What is the  Refund policy? ") == "what is the refund policy"
+    key = make_cache_key("doc", "What is the refund policy?", "model", "system")
+    assert key == make_cache_key("doc", "what is the refund policy", "model", "system")
+    assert key != make_cache_key("other doc", "What is the refund policy?", "model", "system")
+    assert key != make_cache_key("doc", "What is the refund policy?", "other model", "system")
+    # A hash computed where the document was loaded stands in for hashing it again
+    assert key == make_cache_key("doc", "What is the refund policy?", "model", "system", hash_document("doc"))
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", ["1"])
+    cache.set("b", ["2"])
+    cache.get("a")
+    cache.set("c", ["3"])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == ["1"]
+    assert cache.get("c") == ["3"]
+
+
+def test_disk_tier_survives_restart_and_enforces_limits(tmp_path):
+    path = str(tmp_path / "responses.db")
+    store = SQLiteResponseStore(path, max_bytes=60)
+    ResponseCache(disk_store=store).set("a", ["x" * 20])
+    ResponseCache(disk_store=store).set("b", ["y" * 20])
+    store.set("c", ["z" * 20])  # pushes the total over 60 bytes
+
+    reopened = SQLiteResponseStore(path, max_bytes=60)
+    assert reopened.get("a") is None
+    assert reopened.get("c") == ["z" * 20]
+    assert ResponseCache(disk_store=reopened).get("b") == ["y" * 20]
+
+    expired = SQLiteResponseStore(path, ttl_seconds=-1)
+    assert expired.get("c") is None
+
+
+@pytest.fixture
+def client(tmp_path):
+    config = StandInConfig(time_to_first_chunk_s=0, inter_chunk_delay_s=0, chunk_size=8)
+    model_cache = ModelSelectionCache(path=str(tmp_path / "models.json"))
+    # Resolve the model with a throwaway backend: losing probes may still be
+    # in flight afterwards, so they must not count against the tested backend
+    GeminiClient(model_cache=model_cache, backend=StandInBackend(config)).model
+
+    client = GeminiClient(model_cache=model_cache, response_cache=ResponseCache(), backend=StandInBackend(config))
+    client.model  # served from the model cache, no probe requests
+    assert client.backend.requests == 0
+    return client
+
+
+def test_cache_hit_is_replayed_as_the_same_stream(client):
+    first = list(client.get_streaming_response("prompt", document="doc", question="Refund?"))
+    second = list(client.get_streaming_response("prompt", document="doc", question="refund"))
+
+    assert len(first) > 1
+    assert first == second
+    assert client.backend.requests == 1
+
+
+def test_requests_without_document_bypass_the_cache(client):
+    list(client.get_streaming_response("prompt"))
+    list(client.get_streaming_response("prompt"))
+    assert client.backend.requests == 2
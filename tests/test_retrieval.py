@@ -0,0 +1,48 @@
+"""Unit tests for the chunked retrieval index (no API access required)."""
+from core.qa_logic import format_prompt
+from core.retrieval import BM25Index, DocumentIndex, chunk_document, tokenize
+
+
+FAQ = (
+    "1. Refund Policy: Customers may request a full refund within 30 days.\n\n"
+    "2. Support Channels: Email support@innovatech.ai for technical support.\n\n"
+    "3. Keyboard: The ChromaKey keyboard has RGB backlighting and macro keys.\n\n"
+)
+
+
+def test_chunks_overlap_and_cover_document():
+    text = " ".join(f"word{i}" for i in range(2000))
+    chunks = chunk_document(text, chunk_tokens=100, overlap_tokens=20)
+
+    assert chunks[0].start == 0
+    assert chunks[-1].end == len(text)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.start < previous.end  # consecutive chunks overlap
+        assert current.start > previous.start
+
+
+def test_bm25_ranks_matching_passage_first():
+    index = BM25Index(FAQ.split("\n\n")[:3])
+    assert index.search("refund window", top_k=1)[0][0] == 0
+    assert index.search("keyboard backlighting", top_k=1)[0][0] == 2
+    assert index.search("unrelated zebra") == []
+
+
+def test_tokenize_drops_stopwords():
+    assert tokenize("What is the Refund policy?") == ["refund", "policy"]
+
+
+def test_small_document_is_sent_whole():
+    index = DocumentIndex(FAQ)
+    assert format_prompt(FAQ, "refund?", index=index) == format_prompt(FAQ, "refund?")
+
+
+def test_large_document_only_sends_relevant_excerpts():
+    filler = "".join(f"{i}. Filler section {i} about nothing in particular.\n\n" for i in range(4, 3000))
+    document = FAQ + filler
+    index = DocumentIndex(document, chunk_tokens=50, overlap_tokens=10)
+
+    prompt = format_prompt(document, "How do I get a refund?", index=index, token_budget=200)
+
+    assert "full refund within 30 days" in prompt
+    assert len(prompt) < len(document) // 10
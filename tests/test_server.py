@@ -0,0 +1,125 @@
+"""Unit tests for the HTTP API, served against the stand-in backend."""
+import asyncio
+import json
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from core.backends import StandInBackend, StandInConfig
+from core.document_store import DocumentStore
+from core.gemini_client import GeminiClient
+from core.model_cache import ModelSelectionCache
+from core.response_cache import ResponseCache
+from core.qa_logic import DEFAULT_CONTEXT_WINDOW_TOKENS, PROMPT_RESERVE_TOKENS
+from core.server import CLIENT_KEY, create_app
+
+DOCUMENT = "Refund policy: customers may return items within 30 days.\n\nShipping takes 5 days."
+
+
+def make_app(tmp_path, context_window_tokens=DEFAULT_CONTEXT_WINDOW_TOKENS, **config):
+    backend = StandInBackend(StandInConfig(time_to_first_chunk_s=0.05, inter_chunk_delay_s=0, **config))
+    client = GeminiClient(
+        model_cache=ModelSelectionCache(path=str(tmp_path / "models.json")),
+        response_cache=ResponseCache(),
+        backend=backend,
+    )
+    return create_app(client=client, store=DocumentStore(directory=str(tmp_path / "documents")),
+                      context_window_tokens=context_window_tokens)
+
+
+def parse_sse(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def run(app, scenario):
+    async def main():
+        async with TestClient(TestServer(app)) as http:
+            return await scenario(http)
+    return asyncio.run(main())
+
+
+def test_upload_then_stream_an_answer(tmp_path):
+    async def scenario(http):
+        upload = await http.post("/documents", data=DOCUMENT.encode("utf-8"))
+        again = await http.post("/documents", data=DOCUMENT.encode("utf-8"))
+        doc_hash = (await upload.json())["doc_hash"]
+
+        answer = await http.post(f"/documents/{doc_hash}/questions", json={"question": "Refund window?"},
+                                 headers={"X-Request-ID": "req-7"})
+        meta = await http.get(f"/documents/{doc_hash}")
+        return upload.status, again.status, answer.headers["Content-Type"], await answer.text(), await meta.json()
+
+    upload_status, again_status, content_type, body, meta = run(make_app(tmp_path), scenario)
+
+    assert (upload_status, again_status) == (201, 200)
+    assert content_type.startswith("text/event-stream")
+    events = parse_sse(body)
+    assert [name for name, _ in events[:-1]] == ["chunk"] * (len(events) - 1)
+    assert "".join(data["text"] for _, data in events[:-1]).startswith("[stand-in")
+    assert events[-1][0] == "done"
+    assert events[-1][1]["request_id"] == "req-7"
+    assert meta["bytes"] == len(DOCUMENT)
+
+
+def test_questions_are_served_concurrently(tmp_path):
+    async def scenario(http):
+        doc_hash = (await (await http.post("/documents", data=DOCUMENT.encode())).json())["doc_hash"]
+        await (await http.post(f"/documents/{doc_hash}/questions", json={"question": "warm up"})).text()
+
+        async def ask(i):
+            response = await http.post(f"/documents/{doc_hash}/questions", json={"question": f"Question {i}?"})
+            return parse_sse(await response.text())[-1]
+
+        start = asyncio.get_running_loop().time()
+        results = await asyncio.gather(*(ask(i) for i in range(8)))
+        return results, asyncio.get_running_loop().time() - start
+
+    results, elapsed = run(make_app(tmp_path), scenario)
+
+    assert all(name == "done" for name, _ in results)
+    assert elapsed < 8 * 0.05
+
+
+def test_bad_requests_get_json_errors(tmp_path):
+    async def scenario(http):
+        unknown = await http.post(f"/documents/{'0' * 64}/questions", json={"question": "Hi?"})
+        binary = await http.post("/documents", data=b"\xff\xfe\xfa")
+        doc_hash = (await (await http.post("/documents", data=DOCUMENT.encode())).json())["doc_hash"]
+        bad_body = await http.post(f"/documents/{doc_hash}/questions", data=b"not json")
+        return unknown.status, binary.status, bad_body.status
+
+    assert run(make_app(tmp_path), scenario) == (404, 415, 400)
+
+
+def test_upstream_failures_end_the_stream_with_an_error_event(tmp_path):
+    app = make_app(tmp_path)
+
+    async def scenario(http):
+        doc_hash = (await (await http.post("/documents", data=DOCUMENT.encode())).json())["doc_hash"]
+        await (await http.post(f"/documents/{doc_hash}/questions", json={"question": "warm up"})).text()
+        app[CLIENT_KEY].backend.config.error_rate = 1.0
+        response = await http.post(f"/documents/{doc_hash}/questions", json={"question": "Refund?"})
+        return parse_sse(await response.text())
+
+    events = run(app, scenario)
+    assert [name for name, _ in events] == ["error"]
+
+
+def test_oversized_documents_stream_the_reduced_answer(tmp_path):
+    app = make_app(tmp_path, context_window_tokens=PROMPT_RESERVE_TOKENS + 500)
+    document = "\n\n".join(f"Paragraph {i}: shipping and refund details." for i in range(600))
+
+    async def scenario(http):
+        doc_hash = (await (await http.post("/documents", data=document.encode())).json())["doc_hash"]
+        requests_before = app[CLIENT_KEY].backend.requests
+        response = await http.post(f"/documents/{doc_hash}/questions", json={"question": "Refund?"})
+        return parse_sse(await response.text()), app[CLIENT_KEY].backend.requests - requests_before
+
+    events, requests = run(app, scenario)
+    # Several map requests, then the reduce step streamed chunk by chunk
+    assert requests > 2
+    assert [name for name, _ in events] == ["chunk"] * (len(events) - 1) + ["done"]
+    assert len(events) > 2
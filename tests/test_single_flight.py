@@ -0,0 +1,151 @@
+"""Unit tests for single-flight coalescing of identical requests (no API access required)."""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core.backends import StandInBackend, StandInConfig
+from core.gemini_client import STREAMING_ERROR_MESSAGE, GeminiClient
+from core.model_cache import ModelSelectionCache
+from core.response_cache import ResponseCache
+from core.single_flight import AsyncSingleFlight, SingleFlight
+
+DOCUMENT = "Refund policy: customers may return items within 30 days."
+
+
+@pytest.fixture
+def client(tmp_path):
+    config = StandInConfig(time_to_first_chunk_s=0.1, inter_chunk_delay_s=0.01, chunk_size=40)
+    model_cache = ModelSelectionCache(path=str(tmp_path / "models.json"))
+    # Resolve the model with a throwaway backend so probes aren't counted
+    GeminiClient(model_cache=model_cache, backend=StandInBackend(config)).model
+    client = GeminiClient(model_cache=model_cache, response_cache=ResponseCache(), backend=StandInBackend(config))
+    client.model
+    return client
+
+
+def ask(client, question="What is the refund window?"):
+    return list(client.get_streaming_response("prompt", document=DOCUMENT, question=question))
+
+
+def test_concurrent_identical_questions_share_one_upstream_call(client):
+    # Normalization makes these the same question
+    questions = ["What is the refund window?", "what is the refund window", "What is the  refund window?!"] * 4
+    with ThreadPoolExecutor(max_workers=len(questions)) as executor:
+        answers = list(executor.map(lambda q: ask(client, q), questions))
+
+    assert client.backend.requests == 1
+    assert client.coalesced_requests == len(questions) - 1
+    assert all(answer == answers[0] for answer in answers)
+    assert len(answers[0]) > 1
+
+
+def test_late_joiners_receive_the_whole_response(client):
+    first_chunk_seen = threading.Event()
+    early = []
+
+    def early_reader():
+        for chunk in client.get_streaming_response("prompt", document=DOCUMENT, question="Refund?"):
+            early.append(chunk)
+            first_chunk_seen.set()
+
+    reader = threading.Thread(target=early_reader)
+    reader.start()
+    assert first_chunk_seen.wait(timeout=5)
+    late = ask(client, "Refund?")
+    reader.join()
+
+    assert late == early
+    assert client.backend.requests == 1
+    assert client.coalesced_requests == 1
+
+
+def test_different_questions_and_finished_flights_are_not_coalesced(client):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(lambda q: ask(client, q), ["Refund?", "Shipping?"]))
+    client.response_cache = None
+    ask(client, "Refund?")
+
+    assert client.backend.requests == 3
+    assert client.coalesced_requests == 0
+
+
+def test_an_abandoned_subscriber_does_not_cancel_the_stream(client):
+    stream = client.get_streaming_response("prompt", document=DOCUMENT, question="Refund?")
+    next(stream)
+    stream.close()
+
+    answer = ask(client, "Refund?")
+    assert client.backend.requests == 1
+    assert "".join(answer).startswith("[stand-in")
+
+
+def test_upstream_errors_reach_every_subscriber(client):
+    client.backend.config.error_rate = 1.0
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        answers = list(executor.map(lambda _: ask(client), range(4)))
+
+    assert answers == [[STREAMING_ERROR_MESSAGE]] * 4
+    # One flight, retried as configured
+    assert client.backend.requests == client.resilience.max_attempts
+
+
+def test_async_identical_questions_share_one_upstream_call(client):
+    async def run():
+        return await asyncio.gather(*(
+            client.get_response_async("prompt", document=DOCUMENT, question="Refund?") for _ in range(6)
+        ))
+
+    answers = asyncio.run(run())
+    assert len(set(answers)) == 1
+    assert client.backend.requests == 1
+    assert client.coalesced_requests == 5
+
+
+def test_completed_flight_runs_on_complete_once():
+    flight = SingleFlight()
+    completed = []
+    release = threading.Event()
+
+    def produce():
+        yield "a"
+        release.wait()
+        yield "b"
+
+    first, joined_first = flight.stream("k", produce, completed.append)
+    second, joined_second = flight.stream("k", produce, completed.append)
+    release.set()
+
+    assert (joined_first, joined_second) == (False, True)
+    assert list(first) == list(second) == ["a", "b"]
+    time.sleep(0.05)
+    assert completed == [["a", "b"]]
+    assert flight.in_flight() == 0
+
+
+def test_cancelling_the_async_upstream_fails_every_subscriber():
+    completed = []
+
+    async def produce():
+        yield "a"
+        await asyncio.sleep(10)
+        yield "b"
+
+    async def read(stream):
+        return [chunk async for chunk in stream]
+
+    async def run():
+        flight = AsyncSingleFlight()
+        leader, _ = flight.stream("k", produce, completed.append)
+        follower, _ = flight.stream("k", produce, completed.append)
+        readers = [asyncio.ensure_future(read(leader)), asyncio.ensure_future(read(follower))]
+        await asyncio.sleep(0.05)
+        flight._flights[next(iter(flight._flights))].task.cancel()
+        return await asyncio.gather(*readers, return_exceptions=True), flight.in_flight()
+
+    results, in_flight = asyncio.run(run())
+    # Neither subscriber sees the truncated ["a"] as a finished answer
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+    assert completed == [] and in_flight == 0
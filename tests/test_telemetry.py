@@ -0,0 +1,107 @@
+"""Unit tests for request tracing and metrics (no API access required)."""
+import json
+import os
+import urllib.request
+
+import pytest
+
+from core.backends import StandInBackend, StandInConfig
+from core.gemini_client import STREAMING_ERROR_MESSAGE, GeminiClient
+from core.model_cache import ModelSelectionCache
+from core.qa_logic import format_prompt
+from core.response_cache import ResponseCache
+from helpers.telemetry import Telemetry
+
+telemetry = Telemetry()
+
+
+@pytest.fixture
+def enabled():
+    telemetry.reset()
+    telemetry.enable()
+    yield telemetry
+    telemetry.disable()
+    telemetry.reset()
+
+
+def make_client(tmp_path):
+    config = StandInConfig(time_to_first_chunk_s=0, inter_chunk_delay_s=0)
+    return GeminiClient(
+        model_cache=ModelSelectionCache(path=os.path.join(tmp_path, "models.json")),
+        response_cache=ResponseCache(),
+        backend=StandInBackend(config),
+    )
+
+
+def test_spans_share_the_request_id_and_counters_track_cache_hits(tmp_path, enabled):
+    client = make_client(tmp_path)
+    client.model
+
+    for request_id in ("req-1", "req-2"):
+        with telemetry.request(request_id):
+            prompt = format_prompt("The sky is blue.", "What colour is the sky?")
+            "".join(client.get_streaming_response(prompt, document="The sky is blue.", question="Sky?"))
+
+    spans = list(telemetry.spans)
+    assert [(span["name"], span["request_id"]) for span in spans] == [
+        ("format_prompt", "req-1"), ("generate", "req-1"),
+        ("format_prompt", "req-2"), ("generate", "req-2"),
+    ]
+    assert [span["status"] for span in spans if span["name"] == "generate"] == ["ok", "cache_hit"]
+
+    model = client.model_name
+    assert telemetry.counter_value("qa_requests_total", model=model, status="ok") == 1
+    assert telemetry.counter_value("qa_cache_hits_total", model=model) == 1
+
+    page = telemetry.render_prometheus()
+    assert "# TYPE qa_time_to_first_chunk_seconds histogram" in page
+    assert f'qa_time_to_first_chunk_seconds_count{{model="{model}"}} 1' in page
+    assert 'qa_span_seconds_bucket{span="generate",le="+Inf"} 2' in page
+
+
+def test_errors_are_counted_per_model(tmp_path, enabled):
+    client = make_client(tmp_path)
+    client.model
+    client.backend.config.error_rate = 1.0
+
+    assert "".join(client.get_streaming_response("prompt")) == STREAMING_ERROR_MESSAGE
+    assert telemetry.counter_value("qa_errors_total", model=client.model_name) == 1
+    assert telemetry.spans[-1]["status"] == "error"
+
+
+def test_abandoned_streams_are_recorded_as_cancelled(tmp_path, enabled):
+    client = make_client(tmp_path)
+    client.model
+
+    stream = client.get_streaming_response("prompt")
+    next(stream)
+    stream.close()
+
+    assert telemetry.spans[-1]["status"] == "cancelled"
+
+
+def test_nothing_is_recorded_while_disabled(tmp_path):
+    telemetry.reset()
+    client = make_client(tmp_path)
+    "".join(client.get_streaming_response(format_prompt("doc", "q")))
+
+    assert len(telemetry.spans) == 0
+    assert telemetry.render_prometheus() == "\n"
+
+
+def test_metrics_endpoint_and_dump(tmp_path, enabled):
+    telemetry.inc("qa_requests_total", model='gem"ini', status="ok")
+    port = telemetry.start_http_server(0)
+
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+        page = response.read().decode("utf-8")
+    assert 'qa_requests_total{model="gem\\"ini",status="ok"} 1' in page
+
+    with telemetry.span("format_prompt"):
+        pass
+    path = os.path.join(tmp_path, "run-{pid}.json")
+    telemetry.dump(path)
+    with open(path.replace("{pid}", str(os.getpid()))) as f:
+        dumped = json.load(f)
+    assert dumped["spans"][0]["name"] == "format_prompt"
+    assert "qa_requests_total" in dumped["metrics"]
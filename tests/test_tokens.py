@@ -0,0 +1,106 @@
+"""Unit tests for local token estimation and prompt budget packing."""
+import json
+
+import core.tokens as tokens
+from core.packing import FULL, RETRIEVAL, TRUNCATED, pack_prompt
+from core.qa_logic import format_prompt
+from core.retrieval import DocumentIndex
+from core.tokens import TokenEstimator, estimate_tokens, text_features
+
+# Stands in for the model's tokenizer: digits and punctuation are single tokens
+TRUE = TokenEstimator(letters=0.2, whitespace=0.02, digits=1.0, punctuation=1.0, non_ascii=0.8)
+
+SAMPLES = [
+    "Refund Policy: Customers may request a full refund within 30 days of purchase.",
+    "Phone support (1-800-555-1234) is available from 9 AM to 5 PM, Monday-Friday.",
+    "Die Rückerstattung erfolgt innerhalb von 30 Tagen. 返金は30日以内に可能です。",
+    "SKU-2024-0091, SKU-2024-0092, SKU-2024-0093: $19.99, $24.99, $31.50.",
+    "The quick brown fox jumps over the lazy dog " * 20,
+    "Plain prose without many numbers, written to look like a typical FAQ answer.",
+]
+
+
+def test_features_partition_the_text():
+    features = text_features("Héllo, world 42!")
+    assert features == (9, 2, 2, 2, 1)
+    assert sum(features) == len("Héllo, world 42!")
+
+
+def test_default_estimate_is_four_characters_per_token():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+
+def test_calibration_from_a_cassette_beats_the_length_heuristic(tmp_path):
+    cassette = tmp_path / "cassette.jsonl"
+    with open(cassette, "w") as f:
+        for text in SAMPLES * 3:
+            f.write(json.dumps({
+                "prompt_sha256": "x", "model": "m", "chunks": [], "time_to_first_chunk_s": 0,
+                "inter_chunk_delay_s": 0, "prompt_chars": len(text),
+                "prompt_tokens": TRUE.estimate(text), "prompt_features": list(text_features(text)),
+            }) + "\n")
+
+    calibrated = TokenEstimator.from_cassette(str(cassette))
+    for text in SAMPLES:
+        actual = TRUE.estimate(text)
+        assert abs(calibrated.estimate(text) - actual) <= max(1, actual * 0.05)
+    numbers = SAMPLES[3]
+    assert abs(TokenEstimator().estimate(numbers) - TRUE.estimate(numbers)) > 10
+
+    path = tmp_path / "estimator.json"
+    calibrated.save(str(path))
+    assert TokenEstimator.load(str(path)) == calibrated
+
+
+def test_length_only_cassettes_fit_a_ratio(tmp_path):
+    cassette = tmp_path / "cassette.jsonl"
+    cassette.write_text(json.dumps({"prompt_chars": 3000, "prompt_tokens": 1000}) + "\n")
+    assert TokenEstimator.from_cassette(str(cassette)).estimate("a" * 300) == 100
+
+
+def test_estimate_tokens_uses_the_configured_estimator(monkeypatch):
+    monkeypatch.setattr(tokens, "_default_estimator", TRUE)
+    assert estimate_tokens("2024-01-01") == TRUE.estimate("2024-01-01") == 10
+
+
+HISTORY = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " + "words " * 40} for i in range(10)]
+
+
+def test_packing_keeps_question_and_recent_history_within_budget():
+    document = "Refund policy: 30 days. " * 400  # ~2.4k tokens
+    packed = pack_prompt("What is the refund window?", 1500, context=document,
+                         system_prompt="You answer from the document.", history=HISTORY)
+
+    assert packed.total_tokens <= 1500
+    assert packed.strategy == TRUNCATED
+    assert packed.history == HISTORY[packed.dropped_turns:]
+    assert 0 < packed.dropped_turns < len(HISTORY)
+    # History gets its reserved share; the document gets the rest
+    assert packed.history_tokens <= 0.25 * 1500
+    assert packed.remaining_tokens < 50
+
+
+def test_packing_uses_the_index_when_the_document_does_not_fit():
+    document = "".join(f"Section {i}: filler text about topic {i}. " * 10 + "\n\n" for i in range(100))
+    document += "Refund policy: customers may request a refund within 30 days.\n\n"
+    index = DocumentIndex(document, chunk_tokens=100, overlap_tokens=10)
+
+    packed = pack_prompt("refund policy days", 600, context=document, index=index)
+    assert packed.strategy == RETRIEVAL
+    assert "30 days" in packed.context
+    assert packed.total_tokens <= 600
+
+    small = pack_prompt("refund?", 600, context="Refunds within 30 days.")
+    assert (small.strategy, small.context) == (FULL, "Refunds within 30 days.")
+
+
+def test_format_prompt_renders_packed_history():
+    prompt = format_prompt("Refunds within 30 days.", "And for hardware?",
+                           history=[{"role": "user", "content": "What is the refund window?"},
+                                    {"role": "assistant", "content": "30 days."}])
+    assert "User: What is the refund window?\nAssistant: 30 days.\n\nAnd for hardware?" in prompt
+
+    # Without history the prompt is unchanged
+    assert "Conversation so far" not in format_prompt("Refunds within 30 days.", "And for hardware?")